@@ -1,20 +1,31 @@
-import ccxt
 import pandas as pd
-import pandas_ta as ta
-import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from motor_backtest import ejecutar_backtest, NOMBRES_MOTIVO
+from historico import cargar_historico
+from indicadores import calcular_series
+
+# ccxt solo hace falta para descargar datos; sin pandas_ta los indicadores
+# salen de indicadores.calcular_series (mismos valores que pandas_ta)
+HAS_CCXT = True
+HAS_PANDAS_TA = True
+try:
+    import ccxt
+except Exception:
+    HAS_CCXT = False
+try:
+    import pandas_ta as ta
+except Exception:
+    HAS_PANDAS_TA = False
 
 load_dotenv()
 
 # Configuración
 SYMBOL = os.getenv('SYMBOL', 'BTC/USDT')
 TIMEFRAME = '15m'
-# Queremos bajar suficientes datos. Binance permite 1000 por request.
-# Vamos a intentar bajar 4000 velas (~1000 horas = 41 días)
-CANDLES_LIMIT = 1000 
-TOTAL_CHUNKS = 4 # 4 * 1000 = 4000 velas
+# Velas a simular desde el archivo local (4000 velas ~ 41 días; 0 = todo el archivo)
+BACKTEST_VELAS = int(os.getenv('BACKTEST_VELAS', 4000))
 
 SL = float(os.getenv('STOP_LOSS_PCT', 0.01))
 TP = float(os.getenv('TAKE_PROFIT_PCT', 0.015))
@@ -24,45 +35,29 @@ TS = float(os.getenv('TRAILING_STOP_PCT', 0.005))  # Trailing Stop
 RSI_THRESHOLD = 35  # RSI < 35 para comprar
 EMA_LENGTH = 20     # EMA 20 (ajustado para datos limitados)
 
-exchange = ccxt.binance()
-
 def fetch_historical_data():
-    print(f"⏳ Descargando datos históricos para {SYMBOL} ({TIMEFRAME})...")
-    
-    all_ohlcv = []
-    # Fecha de inicio: Unas 4000 velas atrás aprox
-    # 15 min * 4000 = 60000 min = 1000 horas = 41 días
-    # timestamp en ms
-    since = exchange.milliseconds() - (4000 * 15 * 60 * 1000)
-    
-    for i in range(TOTAL_CHUNKS):
-        print(f"   📡 Bajando bloque {i+1}/{TOTAL_CHUNKS}...")
-        try:
-            ohlcv = exchange.fetch_ohlcv(SYMBOL, TIMEFRAME, limit=CANDLES_LIMIT, since=since)
-            if not ohlcv:
-                break
-            
-            all_ohlcv.extend(ohlcv)
-            # Actualizamos 'since' para la siguiente petición (último tiempo + 1 vela)
-            since = ohlcv[-1][0] + 1
-            time.sleep(1) # Respetar rate limit
-            
-        except Exception as e:
-            print(f"❌ Error descargando: {e}")
-            break
-            
-    df = pd.DataFrame(all_ohlcv, columns=['ts', 'open', 'high', 'low', 'close', 'vol'])
-    df['datetime'] = pd.to_datetime(df['ts'], unit='ms')
-    
+    # Las velas salen del archivo local (historico.py): solo se descargan las que faltan
+    print(f"⏳ Cargando datos históricos para {SYMBOL} ({TIMEFRAME})...")
+    exchange = ccxt.binance({'enableRateLimit': True}) if HAS_CCXT else None
+    df = cargar_historico(SYMBOL, TIMEFRAME, velas=BACKTEST_VELAS or None, exchange=exchange)
+    if df.empty:
+        return df
+
     # Calcular Indicadores igual que en el bot
-    df['RSI'] = ta.rsi(df['close'], length=14)
-    
-    # Bandas de Bollinger (20, 2)
-    bbands = ta.bbands(df['close'], length=20, std=2)
-    df = pd.concat([df, bbands], axis=1)
-    
-    # EMA para tendencia
-    df['EMA'] = ta.ema(df['close'], length=EMA_LENGTH)
+    if HAS_PANDAS_TA:
+        df['RSI'] = ta.rsi(df['close'], length=14)
+
+        # Bandas de Bollinger (20, 2)
+        bbands = ta.bbands(df['close'], length=20, std=2)
+        df = pd.concat([df, bbands], axis=1)
+
+        # EMA para tendencia
+        df['EMA'] = ta.ema(df['close'], length=EMA_LENGTH)
+    else:
+        # Mismas columnas (RSI, BBL_20_2.0..., EMA) con el motor incremental del bot
+        series = calcular_series(df['close'], rsi_length=14, bb_length=20, bb_std=2, ema_length=EMA_LENGTH)
+        for nombre, valores in series.items():
+            df[nombre] = valores
     
     return df
 
@@ -72,75 +67,29 @@ def run_backtest(df):
     print(f"   Hasta: {df['datetime'].iloc[-1]}")
     
     saldo_inicial = 1000.0 # USDT
-    saldo = saldo_inicial
-    posicion = None # None o dict con precio_compra
-    
-    operaciones = []
-    win_count = 0
-    loss_count = 0
-    
-    for i in range(EMA_LENGTH + 20, len(df)):  # Necesitamos datos suficientes para EMA y BB
-        row = df.iloc[i]
-        precio = row['close']
-        rsi = row['RSI']
-        ts = row['datetime']
-        
-        # Buscar columna BBL (Lower Band)
-        col_bbl = [c for c in df.columns if c.startswith('BBL')]
-        if not col_bbl:
-            continue
-        lower_band = row[col_bbl[0]]
-        ema = row['EMA']
-        
-        if posicion is None:
-            # --- LÓGICA DE COMPRA (TRIPLE FILTRO) ---
-            # 1. RSI < 35 (Sobreventa)
-            # 2. Precio < Banda Bollinger Inferior (Cheap)
-            # 3. Precio > EMA (Tendencia Alcista)
-            if pd.notna(rsi) and pd.notna(lower_band) and pd.notna(ema):
-                if rsi < RSI_THRESHOLD and precio < lower_band and precio > ema:
-                    # Compramos
-                    posicion = {
-                        'precio': precio,
-                        'fecha': ts,
-                        'max_precio': precio  # Para Trailing Stop
-                    }
-        
-        else:
-            # --- LÓGICA DE VENTA ---
-            precio_entrada = posicion['precio']
-            max_precio = posicion['max_precio']
-            
-            # Actualizar máximo precio (Trailing Stop)
-            if precio > max_precio:
-                max_precio = precio
-                posicion['max_precio'] = max_precio
-            
-            # Calcular precio de salida del Trailing Stop
-            precio_trailing = max_precio * (1 - TS)
-            
-            # 1. Trailing Stop (prioridad)
-            if precio <= precio_trailing:
-                pnl = (precio - precio_entrada) / precio_entrada
-                resultado = saldo * pnl
-                saldo += resultado
-                
-                operaciones.append({'tipo': 'TRAILING STOP', 'pnl_pct': pnl, 'fecha': ts})
-                if pnl > 0:
-                    win_count += 1
-                else:
-                    loss_count += 1
-                posicion = None
-                
-            # 2. Take Profit
-            elif precio >= precio_entrada * (1 + TP):
-                pnl = (precio - precio_entrada) / precio_entrada
-                resultado = saldo * pnl
-                saldo += resultado
-                
-                operaciones.append({'tipo': 'TP', 'pnl_pct': pnl, 'fecha': ts})
-                win_count += 1
-                posicion = None
+
+    # Buscar columna BBL (Lower Band)
+    col_bbl = [c for c in df.columns if c.startswith('BBL')]
+    if not col_bbl:
+        print("❌ No hay columna de Banda Bollinger inferior (BBL)")
+        return None
+
+    # Triple Filtro como máscara vectorizada + kernel de salidas (trailing stop / take profit).
+    # Empezamos tras EMA_LENGTH + 20 velas: necesitamos datos suficientes para EMA y BB
+    resultado = ejecutar_backtest(
+        df['close'].to_numpy(), df['RSI'].to_numpy(), df[col_bbl[0]].to_numpy(), df['EMA'].to_numpy(),
+        ts=TS, tp=TP, rsi_umbral=RSI_THRESHOLD, inicio=EMA_LENGTH + 20, saldo_inicial=saldo_inicial
+    )
+    saldo = resultado['saldo_final']
+    win_count = resultado['ganadas']
+    loss_count = resultado['perdidas']
+
+    fechas = df['datetime'].to_numpy()
+    operaciones = [
+        {'tipo': NOMBRES_MOTIVO[motivo], 'pnl_pct': pnl, 'fecha': fechas[i]}
+        for i, motivo, pnl in zip(resultado['idx_salida'].tolist(), resultado['motivos'].tolist(),
+                                  resultado['pnl_pct'].tolist())
+    ]
 
     # Resultados Finales
     print("\n📊 --- RESULTADOS DEL BACKTEST ---")
@@ -156,6 +105,8 @@ def run_backtest(df):
         print(f"✅ Ganadas: {win_count} ({(win_count/total_ops)*100:.1f}%)")
         print(f"❌ Perdidas: {loss_count} ({(loss_count/total_ops)*100:.1f}%)")
 
+    return {'saldo_final': saldo, 'ganadas': win_count, 'perdidas': loss_count, 'operaciones': operaciones}
+
 if __name__ == "__main__":
     df = fetch_historical_data()
     if not df.empty:
@@ -0,0 +1,445 @@
+"""
+Benchmarks de los caminos calientes de Argos Trading Bot
+Mide, con datos sintéticos y sin red, lo que más tiempo consume en el bot
+y en las herramientas de análisis:
+
+- indicadores: series completas (calcular_series) y el recálculo por tick
+  de la vela abierta (MotorIndicadores.sincronizar)
+- arranque: importar main.py en un proceso nuevo
+- loop: una iteración completa de main.py (obtener_mercado + evaluar_estrategia)
+  con un exchange simulado y una base temporal
+- base de datos: escritura diferida + flush y lecturas del dashboard
+- métricas: MetricasPerformance.generar_reporte_completo sobre 100k trades
+- backtest: optimize.backtest_strategy sobre una grilla de parámetros
+
+Los resultados se guardan como línea base en JSON; `--comparar` vuelve a
+medir y marca las regresiones que superan el umbral (sale con código 1).
+
+Uso:
+    python benchmark.py                                   # medir y mostrar
+    python benchmark.py --guardar benchmark_base.json     # guardar línea base
+    python benchmark.py --comparar benchmark_base.json    # medir y comparar
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from database import Database
+from indicadores import MotorIndicadores, calcular_series
+from mercados import SesionExchange, MercadosMultiples
+from metricas import MetricasPerformance
+from velas import timeframe_a_ms
+
+# Línea base por defecto y regresión tolerada (0.2 = 20% más lento)
+BENCHMARK_BASE = os.getenv("BENCHMARK_BASE", "benchmark_base.json")
+BENCHMARK_UMBRAL = float(os.getenv("BENCHMARK_UMBRAL", "0.2"))
+BENCHMARK_REPETICIONES = int(os.getenv("BENCHMARK_REPETICIONES", "5"))
+
+TIMEFRAME = '15m'
+
+
+class Caso(NamedTuple):
+    """Función a medir (ya preparada), unidades que procesa por llamada y limpieza"""
+    funcion: Callable[[], object]
+    unidades: int
+    cerrar: Optional[Callable[[], None]] = None
+
+
+class Comparacion(NamedTuple):
+    nombre: str
+    base_s: float
+    actual_s: float
+    cambio: float        # (actual - base) / base
+    regresion: bool
+
+
+# ===== DATOS SINTÉTICOS =====
+
+def velas_sinteticas(n: int, semilla: int = 42, precio: float = 50000.0,
+                     timeframe: str = TIMEFRAME, hasta_ms: Optional[int] = None) -> List[list]:
+    """
+    Velas OHLCV ([ts, open, high, low, close, vol]) de una caminata aleatoria.
+    La última vela es la que contiene `hasta_ms` (por defecto ahora): queda abierta.
+    """
+    rnd = random.Random(semilla)
+    tf_ms = timeframe_a_ms(timeframe)
+    if hasta_ms is None:
+        hasta_ms = int(time.time() * 1000)
+    inicio = hasta_ms // tf_ms * tf_ms - (n - 1) * tf_ms
+
+    velas = []
+    for i in range(n):
+        apertura = precio
+        precio = round(precio * (1 + rnd.gauss(0, 0.004)), 2)
+        maximo = max(apertura, precio) * (1 + abs(rnd.gauss(0, 0.001)))
+        minimo = min(apertura, precio) * (1 - abs(rnd.gauss(0, 0.001)))
+        velas.append([inicio + i * tf_ms, apertura, round(maximo, 2), round(minimo, 2), precio,
+                      round(rnd.uniform(1, 50), 4)])
+    return velas
+
+
+def trades_sinteticos(n: int, semilla: int = 42, dias: int = 30) -> List[Dict]:
+    """Trades cerrados repartidos en los últimos `dias` días (formato de Database.guardar_trade)"""
+    rnd = random.Random(semilla)
+    ahora = datetime.now()
+    trades = []
+    for _ in range(n):
+        venta = ahora - timedelta(seconds=rnd.uniform(60, dias * 86400 - 3600))
+        duracion = rnd.randint(15, 600)
+        compra = 50000.0 * (1 + rnd.uniform(-0.1, 0.1))
+        pnl_pct = rnd.gauss(0.1, 1.2)
+        cantidad = 0.01
+        trades.append({
+            'timestamp_compra': (venta - timedelta(minutes=duracion)).isoformat(),
+            'timestamp_venta': venta.isoformat(),
+            'precio_compra': compra,
+            'precio_venta': compra * (1 + pnl_pct / 100),
+            'cantidad': cantidad,
+            'pnl_usd': compra * cantidad * pnl_pct / 100,
+            'pnl_pct': pnl_pct,
+            'razon_salida': 'TAKE PROFIT' if pnl_pct > 0 else 'STOP LOSS',
+            'max_precio': compra * (1 + max(pnl_pct, 0) / 100 + 0.002),
+            'trailing_pct': 0.005,
+            'rsi_compra': rnd.uniform(20, 35),
+            'duracion_minutos': duracion,
+        })
+    return trades
+
+
+def dataframe_backtest(n: int, semilla: int = 42):
+    """DataFrame con las columnas de optimize.py, indicadores calculados con indicadores.py"""
+    import pandas as pd
+    cierres = [v[4] for v in velas_sinteticas(n, semilla)]
+    series = calcular_series(cierres)
+    bbl = [c for c in series if c.startswith('BBL')][0]
+    return pd.DataFrame({'close': cierres, 'RSI': series['RSI'],
+                         'BB_LOWER': series[bbl], 'EMA_20': series['EMA']}).dropna()
+
+
+class ExchangeSimulado:
+    """Exchange en memoria: OHLCV y tickers de una caminata aleatoria por par"""
+
+    has = {'fetchTickers': True}
+
+    def __init__(self, velas: int = 500, semilla: int = 42):
+        self.n = velas
+        self.semilla = semilla
+        self.velas: Dict[str, List[list]] = {}
+        self.rnd = random.Random(semilla)
+
+    def _velas(self, symbol: str) -> List[list]:
+        if symbol not in self.velas:
+            self.velas[symbol] = velas_sinteticas(self.n, self.semilla + len(self.velas))
+        return self.velas[symbol]
+
+    def load_markets(self, reload=False):
+        return {}
+
+    def fetch_ohlcv(self, symbol, timeframe=TIMEFRAME, since=None, limit=500):
+        velas = self._velas(symbol)
+        if since is not None:
+            velas = [v for v in velas if v[0] >= since]
+        return [list(v) for v in velas[-limit:]]
+
+    def fetch_tickers(self, symbols):
+        tickers = {}
+        for symbol in symbols:
+            ultima = self._velas(symbol)[-1]
+            ultima[4] = round(ultima[4] * (1 + self.rnd.gauss(0, 0.0005)), 2)
+            tickers[symbol] = {'symbol': symbol, 'last': ultima[4]}
+        return tickers
+
+
+# ===== CASOS =====
+
+def _cantidad(base: int, escala: float) -> int:
+    return max(int(base * escala), 1)
+
+
+def caso_indicadores_series(escala: float, directorio: str) -> Caso:
+    cierres = [v[4] for v in velas_sinteticas(_cantidad(20000, escala))]
+    return Caso(lambda: calcular_series(cierres), len(cierres))
+
+
+def caso_indicadores_tick(escala: float, directorio: str) -> Caso:
+    """Cada tick parchea la vela abierta y la recalcula (sin recorrer la serie)"""
+    velas = velas_sinteticas(500)
+    motor = MotorIndicadores(max_historial=500)
+    motor.sincronizar(velas, timeframe_a_ms(TIMEFRAME))
+    rnd = random.Random(1)
+    ticks = [velas[-1][4] * (1 + rnd.gauss(0, 0.001)) for _ in range(_cantidad(2000, escala))]
+
+    def funcion():
+        for precio in ticks:
+            velas[-1][4] = precio
+            motor.sincronizar(velas, timeframe_a_ms(TIMEFRAME))
+            motor.columnas(len(velas))
+    return Caso(funcion, len(ticks))
+
+
+def caso_loop(escala: float, directorio: str) -> Caso:
+    """
+    Una iteración de main.py en estado estable (caché de velas cargada):
+    ticker, vela abierta, indicadores, DataFrame, Triple Filtro y dashboard.
+    """
+    bot = _bot_simulado(directorio)
+    iteraciones = _cantidad(20, escala)
+
+    def funcion():
+        for _ in range(iteraciones):
+            snapshot = bot.obtener_mercado()
+            if snapshot:
+                bot.evaluar_estrategia(snapshot)
+    bot.obtener_mercado()   # primera carga de velas fuera de la medición
+    return Caso(funcion, iteraciones)
+
+
+def _bot_simulado(directorio: str):
+    """
+    main.py con el exchange simulado. Se importa dentro de `directorio` para
+    que su log y su argos.db queden en la carpeta temporal; la consola del
+    dashboard y los logs por pantalla se descartan.
+    """
+    anterior = os.getcwd()
+    os.chdir(directorio)
+    try:
+        import main as bot
+    finally:
+        os.chdir(anterior)
+
+    exchange = ExchangeSimulado()
+    bot.HAS_CCXT, bot.SIMULATION_MODE = True, True
+    bot.crear_exchange = lambda: exchange
+    bot.console_handler.setLevel(logging.WARNING)
+    bot.consola().file = io.StringIO()
+    bot.conectar()
+    return bot
+
+
+def caso_arranque(escala: float, directorio: str) -> Caso:
+    """Importar main.py en un proceso nuevo (lo que paga cada reinicio del watchdog)"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    comando = [sys.executable, '-c', f"import sys; sys.path.insert(0, {raiz!r}); import main"]
+    carpeta = os.path.join(directorio, "arranque")
+    os.makedirs(carpeta, exist_ok=True)
+    return Caso(lambda: subprocess.run(comando, cwd=carpeta, check=True, capture_output=True), 1)
+
+
+def caso_db_escritura(escala: float, directorio: str) -> Caso:
+    """Precios y señales por el buffer de escritura diferida, un flush por lote"""
+    db = Database(os.path.join(directorio, "argos_escritura.db"))
+    n = _cantidad(20000, escala)
+    ahora = datetime.now()
+    precios = [((ahora - timedelta(seconds=i)).isoformat(), 50000.0 + i % 100, 1.0) for i in range(n)]
+    senales = [{'timestamp': t, 'tipo': 'HOLD', 'precio': p, 'rsi': 45.0, 'posicion_abierta': False}
+               for t, p, _ in precios]
+
+    def funcion():
+        db.guardar_precios(precios)
+        db.guardar_senales(senales)
+        db.flush()
+    return Caso(funcion, 2 * n, db.cerrar)
+
+
+def caso_db_lectura(escala: float, directorio: str) -> Caso:
+    """Consultas del dashboard: últimos trades, señales y precios de 24 h"""
+    db = Database(os.path.join(directorio, "argos_lectura.db"))
+    n = _cantidad(20000, escala)
+    ahora = datetime.now()
+    db.guardar_precios([((ahora - timedelta(seconds=4 * i)).isoformat(), 50000.0, 1.0) for i in range(n)])
+    db.guardar_senales([{'timestamp': (ahora - timedelta(seconds=4 * i)).isoformat(), 'tipo': 'HOLD',
+                         'precio': 50000.0, 'posicion_abierta': False} for i in range(n)])
+    db.guardar_trades(trades_sinteticos(_cantidad(5000, escala)))
+    db.flush()
+
+    def funcion():
+        filas = len(db.obtener_trades(limit=1000))
+        filas += len(db.obtener_senales(limit=1000))
+        filas += len(db.obtener_precios_recientes(24))
+        return filas
+    return Caso(funcion, n + 2000, db.cerrar)
+
+
+def caso_metricas(escala: float, directorio: str) -> Caso:
+    db = Database(os.path.join(directorio, "argos_metricas.db"))
+    trades = trades_sinteticos(_cantidad(100000, escala))
+    db.guardar_trades(trades)
+    metricas = MetricasPerformance(db)
+    return Caso(lambda: metricas.generar_reporte_completo(30), len(trades), db.cerrar)
+
+
+def caso_backtest(escala: float, directorio: str) -> Caso:
+    """Grilla de parámetros sobre datos en memoria compartida (en este proceso, sin Pool)"""
+    import optimize
+    df = dataframe_backtest(_cantidad(20000, escala))
+    shm, descriptor = optimize.publicar_datos(df)
+    optimize.iniciar_worker(descriptor)
+    grilla = [(rsi, sl, tp, ts) for rsi in (25, 30, 35) for sl in (0.01, 0.03)
+              for tp in (0.02, 0.06) for ts in (0.005, 0.02)]
+
+    def funcion():
+        for params in grilla:
+            optimize.backtest_strategy(params)
+
+    def cerrar():
+        optimize._DATOS = None
+        optimize._SHM.close()
+        shm.close()
+        shm.unlink()
+    return Caso(funcion, len(grilla) * len(df), cerrar)
+
+
+CASOS: Dict[str, Callable[[float, str], Caso]] = {
+    'indicadores_series': caso_indicadores_series,
+    'indicadores_tick': caso_indicadores_tick,
+    'arranque': caso_arranque,
+    'loop_iteracion': caso_loop,
+    'db_escritura': caso_db_escritura,
+    'db_lectura': caso_db_lectura,
+    'metricas_reporte': caso_metricas,
+    'backtest_grilla': caso_backtest,
+}
+
+
+# ===== MEDICIÓN =====
+
+def medir(caso: Caso, repeticiones: int = BENCHMARK_REPETICIONES) -> Dict[str, float]:
+    """Tiempos de `repeticiones` llamadas (tras una de calentamiento)"""
+    caso.funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        caso.funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    mediana = statistics.median(tiempos)
+    return {
+        'mediana_s': mediana,
+        'min_s': min(tiempos),
+        'max_s': max(tiempos),
+        'repeticiones': repeticiones,
+        'unidades': caso.unidades,
+        'us_por_unidad': mediana / caso.unidades * 1e6,
+    }
+
+
+def ejecutar(nombres: Optional[List[str]] = None, escala: float = 1.0,
+             repeticiones: int = BENCHMARK_REPETICIONES) -> Dict:
+    """Correr los casos pedidos (todos por defecto) y devolver el documento de resultados"""
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre in nombres or list(CASOS):
+            caso = CASOS[nombre](escala, directorio)
+            try:
+                resultados[nombre] = medir(caso, repeticiones)
+            finally:
+                if caso.cerrar:
+                    caso.cerrar()
+    return {
+        'fecha': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'escala': escala,
+        'resultados': resultados,
+    }
+
+
+def guardar(resultados: Dict, ruta: str):
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(ruta, 'w') as f:
+        json.dump(resultados, f, indent=2)
+
+
+def cargar(ruta: str) -> Dict:
+    with open(ruta) as f:
+        return json.load(f)
+
+
+def comparar(base: Dict, actual: Dict, umbral: float = BENCHMARK_UMBRAL) -> List[Comparacion]:
+    """
+    Comparar medianas de los casos presentes en ambas corridas. Es regresión
+    si el caso tardó más de (1 + umbral) veces lo de la línea base.
+    """
+    comparaciones = []
+    for nombre, resultado in actual['resultados'].items():
+        previo = base['resultados'].get(nombre)
+        if previo is None:
+            continue
+        base_s, actual_s = previo['mediana_s'], resultado['mediana_s']
+        cambio = (actual_s - base_s) / base_s if base_s > 0 else 0.0
+        comparaciones.append(Comparacion(nombre, base_s, actual_s, cambio, cambio > umbral))
+    return comparaciones
+
+
+# ===== SALIDA =====
+
+def texto_resultados(resultados: Dict) -> str:
+    lineas = [f"{'caso':<20} {'mediana':>11} {'mínimo':>11} {'µs/unidad':>11}"]
+    for nombre, r in resultados['resultados'].items():
+        lineas.append(f"{nombre:<20} {r['mediana_s'] * 1000:>8.1f} ms {r['min_s'] * 1000:>8.1f} ms "
+                      f"{r['us_por_unidad']:>11.2f}")
+    return "\n".join(lineas)
+
+
+def texto_comparacion(comparaciones: List[Comparacion], umbral: float) -> str:
+    lineas = []
+    for c in comparaciones:
+        marca = "❌" if c.regresion else "✅"
+        lineas.append(f"{marca} {c.nombre:<20} {c.base_s * 1000:>8.1f} → {c.actual_s * 1000:>8.1f} ms "
+                      f"({c.cambio * 100:+.1f}%)")
+    regresiones = sum(c.regresion for c in comparaciones)
+    lineas.append(f"{regresiones} regresiones de más de {umbral * 100:.0f}%" if regresiones
+                  else f"Sin regresiones de más de {umbral * 100:.0f}%")
+    return "\n".join(lineas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de Argos con datos sintéticos")
+    parser.add_argument('casos', nargs='*', metavar='caso',
+                        help=f"Casos a medir (por defecto todos): {', '.join(CASOS)}")
+    parser.add_argument('--guardar', nargs='?', const=BENCHMARK_BASE, metavar='JSON',
+                        help=f"Guardar los resultados como línea base (por defecto {BENCHMARK_BASE})")
+    parser.add_argument('--comparar', nargs='?', const=BENCHMARK_BASE, metavar='JSON',
+                        help="Comparar contra una línea base y salir con 1 si hay regresiones")
+    parser.add_argument('--umbral', type=float, default=BENCHMARK_UMBRAL,
+                        help="Regresión tolerada (0.2 = 20%% más lento)")
+    parser.add_argument('--repeticiones', type=int, default=BENCHMARK_REPETICIONES)
+    parser.add_argument('--escala', type=float, default=1.0, help="Multiplica el tamaño de los datos")
+    args = parser.parse_args(argv)
+    desconocidos = [c for c in args.casos if c not in CASOS]
+    if desconocidos:
+        parser.error(f"casos desconocidos: {', '.join(desconocidos)}")
+
+    base = cargar(args.comparar) if args.comparar else None
+    if base is not None and base.get('escala') != args.escala:
+        print(f"⚠️ La línea base se midió con escala {base.get('escala')} (ahora {args.escala})")
+
+    resultados = ejecutar(args.casos, args.escala, args.repeticiones)
+    print(texto_resultados(resultados))
+
+    if args.guardar:
+        guardar(resultados, args.guardar)
+        print(f"💾 Línea base guardada en {args.guardar}")
+
+    if base is not None:
+        comparaciones = comparar(base, resultados, args.umbral)
+        print(texto_comparacion(comparaciones, args.umbral))
+        if any(c.regresion for c in comparaciones):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
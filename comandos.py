@@ -0,0 +1,132 @@
+"""
+Comandos de Telegram para Argos Trading Bot (long polling)
+Un hilo dedicado espera en getUpdates con `timeout` largo: Telegram
+responde en cuanto llega un mensaje, así que un /vender se atiende al
+instante y no en la próxima vuelta del loop. El último update_id procesado
+se guarda en disco para que, al reiniciar, no se repitan ni se pierdan
+comandos.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Segundos que Telegram retiene cada getUpdates esperando mensajes
+TELEGRAM_POLL_SEG = int(os.getenv("TELEGRAM_POLL_SEG", "30"))
+# Archivo con el último update_id procesado
+TELEGRAM_OFFSET_FILE = os.getenv("TELEGRAM_OFFSET_FILE", "telegram_offset.json")
+URL_API = "https://api.telegram.org"
+# Espera tras un error de red (se duplica hasta el máximo)
+PAUSA_ERROR_SEG = 1.0
+MAX_PAUSA_ERROR_SEG = 60.0
+
+
+def cargar_offset(ruta: str) -> int:
+    """Último update_id procesado (0 si no hay archivo o está corrupto)"""
+    try:
+        with open(ruta, "r") as f:
+            return int(json.load(f).get("update_id", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def guardar_offset(ruta: str, update_id: int):
+    """Escritura atómica: un corte a mitad no deja el archivo vacío"""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w") as f:
+        json.dump({"update_id": update_id}, f)
+    os.replace(temporal, ruta)
+
+
+class EscuchaComandos:
+    """
+    Long polling de getUpdates en un hilo propio. Cada texto recibido del
+    chat configurado se entrega con `entregar(texto)` apenas llega.
+    """
+
+    def __init__(self, token: str, chat_id: Optional[str], entregar: Callable[[str], None],
+                 ruta_offset: str = TELEGRAM_OFFSET_FILE, timeout: float = TELEGRAM_POLL_SEG,
+                 url_api: str = URL_API, sesion: Optional[requests.Session] = None):
+        self.url = f"{url_api}/bot{token}/getUpdates"
+        self.chat_id = str(chat_id) if chat_id else None
+        self.entregar = entregar
+        self.ruta_offset = ruta_offset
+        self.timeout = timeout
+        self.sesion = sesion or requests.Session()
+        self.offset = cargar_offset(ruta_offset)
+        self._offset_guardado = self.offset
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def leer(self) -> List[str]:
+        """
+        Una llamada a getUpdates (espera hasta `timeout` segundos). Devuelve
+        los textos nuevos; el próximo getUpdates (offset + 1) los confirma
+        ante Telegram y guardar() los confirma en disco.
+        """
+        r = self.sesion.get(self.url, params={'offset': self.offset + 1, 'timeout': self.timeout},
+                            timeout=self.timeout + 10)
+        data = r.json()
+        if not data.get('ok'):
+            raise requests.RequestException(data.get('description', f"HTTP {r.status_code}"))
+
+        textos = []
+        for result in data.get('result', []):
+            self.offset = max(self.offset, result['update_id'])
+            message = result.get('message') or {}
+            if self.chat_id and str(message.get('chat', {}).get('id')) != self.chat_id:
+                continue  # solo se obedece al chat configurado
+            texto = message.get('text', '').lower().strip()
+            if texto:
+                textos.append(texto)
+        return textos
+
+    def guardar(self):
+        if self.offset != self._offset_guardado:
+            guardar_offset(self.ruta_offset, self.offset)
+            self._offset_guardado = self.offset
+
+    def _bucle(self):
+        pausa = PAUSA_ERROR_SEG
+        while not self._detener.is_set():
+            try:
+                textos = self.leer()
+                pausa = PAUSA_ERROR_SEG
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"⚠️ Error leyendo comandos de Telegram: {e}")
+                self._detener.wait(pausa)
+                pausa = min(pausa * 2, MAX_PAUSA_ERROR_SEG)
+                continue
+            for texto in textos:
+                try:
+                    self.entregar(texto)
+                except Exception as e:
+                    logger.error(f"Error atendiendo comando {texto!r}: {e}", exc_info=True)
+            # Después de entregar: un corte antes de esto repite el comando, no lo pierde
+            self.guardar()
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="comandos", daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout: float = 1.0):
+        """Pedir al hilo que termine (un getUpdates en curso termina solo)"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+
+
+def crear_escucha(entregar: Callable[[str], None]) -> Optional[EscuchaComandos]:
+    """EscuchaComandos con la configuración del entorno (None sin TELEGRAM_TOKEN)"""
+    token = os.getenv('TELEGRAM_TOKEN')
+    if not token:
+        return None
+    return EscuchaComandos(token, os.getenv('TELEGRAM_CHAT_ID'), entregar)
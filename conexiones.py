@@ -0,0 +1,236 @@
+"""
+Conexiones SQLite compartidas para Argos Trading Bot
+El bot, el dashboard y el watchdog abren el mismo argos.db. Con journal WAL
+los lectores no bloquean al escritor (ni al revés) y busy_timeout hace que
+un choque puntual espere en lugar de fallar con "database is locked".
+
+- abrir_escritura(): la conexión del bot (y del watchdog), con WAL y pragmas
+- conexion_lectura(): conexión de solo lectura reutilizada por hilo, para el
+  dashboard y cualquier proceso que solo consulte
+- PoolLectura / CacheConsultas: pool acotado de lectores y caché de
+  respuestas JSON invalidada por `PRAGMA data_version`
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Milisegundos que una conexión espera un lock antes de fallar
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# FULL: cada commit llega al disco (estado de posición a prueba de cortes de
+# luz). NORMAL es más rápido en WAL pero un corte puede perder el último commit.
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "FULL").upper()
+
+# Pragmas comunes a todas las conexiones
+PRAGMAS = {
+    "temp_store": "MEMORY",
+    "cache_size": "-8000",       # ~8 MB de caché de páginas
+    "mmap_size": "67108864",     # lecturas por memory-map (64 MB)
+}
+
+# Pragmas solo del escritor
+PRAGMAS_ESCRITURA = {
+    # Antes de crear tablas: las bases nuevas devuelven espacio con
+    # incremental_vacuum (en una base existente no tiene efecto)
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",              # persistente: queda grabado en el archivo
+    "synchronous": DB_SYNCHRONOUS,
+    "journal_size_limit": "67108864",   # el -wal no crece sin límite tras un checkpoint
+}
+
+
+def _aplicar_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, str]):
+    for nombre, valor in pragmas.items():
+        conn.execute(f"PRAGMA {nombre} = {valor}")
+
+
+def abrir_escritura(ruta: str, busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS) -> sqlite3.Connection:
+    """
+    Conexión de lectura/escritura en modo WAL. Se comparte entre hilos (el
+    llamador serializa el acceso con su propio lock).
+    """
+    conn = sqlite3.connect(ruta, timeout=busy_timeout_ms / 1000, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    _aplicar_pragmas(conn, PRAGMAS)
+    try:
+        _aplicar_pragmas(conn, PRAGMAS_ESCRITURA)
+    except sqlite3.OperationalError as e:
+        # Otro proceso con una transacción abierta impide cambiar el journal;
+        # se sigue con el modo actual y se reintenta en la próxima apertura
+        logger.warning(f"⚠️ No se pudo activar WAL en {ruta}: {e}")
+    return conn
+
+
+def abrir_lectura(ruta: str, busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS) -> sqlite3.Connection:
+    """
+    Conexión de solo lectura (mode=ro + query_only): nunca toma el lock de
+    escritura, así que no puede frenar al bot.
+
+    Raises:
+        sqlite3.OperationalError: si el archivo no existe
+    """
+    uri = f"file:{os.path.abspath(ruta)}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout_ms / 1000, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute("PRAGMA query_only = ON")
+    _aplicar_pragmas(conn, PRAGMAS)
+    return conn
+
+
+_locales = threading.local()
+
+
+def conexion_lectura(ruta: str) -> sqlite3.Connection:
+    """
+    Conexión de solo lectura reutilizada: una por hilo y archivo, abierta la
+    primera vez que se pide. No hay que cerrarla después de cada consulta.
+    """
+    conexiones = getattr(_locales, "conexiones", None)
+    if conexiones is None:
+        conexiones = _locales.conexiones = {}
+    clave = os.path.abspath(ruta)
+    conn = conexiones.get(clave)
+    if conn is None:
+        conn = conexiones[clave] = abrir_lectura(ruta)
+    return conn
+
+
+def cerrar_conexiones_lectura():
+    """Cerrar las conexiones de lectura del hilo actual"""
+    for conn in getattr(_locales, "conexiones", {}).values():
+        conn.close()
+    _locales.conexiones = {}
+
+
+def filas_a_json(cursor: sqlite3.Cursor) -> bytes:
+    """Filas de un cursor serializadas directo a JSON (lista de objetos)"""
+    columnas = [c[0] for c in cursor.description]
+    return json.dumps([dict(zip(columnas, fila)) for fila in cursor],
+                      separators=(",", ":"), default=str).encode()
+
+
+class PoolLectura:
+    """
+    Pool acotado de conexiones de solo lectura a un archivo. Como mucho
+    `tamano` consultas corren a la vez; las conexiones se abren a demanda y
+    se reutilizan.
+    """
+
+    def __init__(self, ruta: str, tamano: int = 4):
+        self.ruta = ruta
+        self.tamano = tamano
+        self._libres: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamano)
+        self._conn_version: Optional[sqlite3.Connection] = None
+        self._lock_version = threading.Lock()
+
+    @contextmanager
+    def conexion(self):
+        """Tomar una conexión del pool (se devuelve al salir)"""
+        with self._cupos:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                conn = abrir_lectura(self.ruta)
+            try:
+                yield conn
+            finally:
+                self._libres.put(conn)
+
+    def version(self) -> int:
+        """
+        Versión de los datos: cambia cada vez que otro proceso confirma una
+        escritura. Sale siempre de la misma conexión, porque data_version
+        solo es comparable dentro de una conexión.
+        """
+        with self._lock_version:
+            if self._conn_version is None:
+                self._conn_version = abrir_lectura(self.ruta)
+            return self._conn_version.execute("PRAGMA data_version").fetchone()[0]
+
+    def consultar_json(self, sql: str, params=()) -> bytes:
+        with self.conexion() as conn:
+            return filas_a_json(conn.execute(sql, params))
+
+    def cerrar(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock_version:
+            if self._conn_version is not None:
+                self._conn_version.close()
+                self._conn_version = None
+
+
+class CacheConsultas:
+    """
+    Caché de respuestas ya serializadas. Una entrada vale mientras la base no
+    cambie (misma data_version) y no supere `max_edad` segundos; varias
+    peticiones simultáneas de la misma clave generan la respuesta una sola vez.
+    """
+
+    def __init__(self, pool: PoolLectura, max_edad: float = 30.0, max_entradas: int = 256):
+        self.pool = pool
+        self.max_edad = max_edad
+        self.max_entradas = max_entradas
+        self._entradas: Dict[Hashable, tuple] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _vigente(self, clave: Hashable, version: int) -> Optional[bytes]:
+        entrada = self._entradas.get(clave)
+        if entrada and entrada[0] == version and time.monotonic() - entrada[1] < self.max_edad:
+            return entrada[2]
+        return None
+
+    def obtener(self, clave: Hashable, generar: Callable[[sqlite3.Connection], bytes]) -> bytes:
+        """Respuesta en caché para `clave`, o `generar(conn)` si cambió la base"""
+        version = self.pool.version()
+        with self._lock:
+            respuesta = self._vigente(clave, version)
+            if respuesta is not None:
+                self.aciertos += 1
+                return respuesta
+            lock_clave = self._locks.setdefault(clave, threading.Lock())
+
+        with lock_clave:
+            # Otro hilo pudo generarla mientras se esperaba
+            with self._lock:
+                respuesta = self._vigente(clave, version)
+            if respuesta is not None:
+                with self._lock:
+                    self.aciertos += 1
+                return respuesta
+            with self.pool.conexion() as conn:
+                respuesta = generar(conn)
+            with self._lock:
+                self._entradas.pop(clave, None)
+                self._entradas[clave] = (version, time.monotonic(), respuesta)
+                self.fallos += 1
+                # Se descarta la entrada más vieja (los filtros del dashboard varían)
+                if len(self._entradas) > self.max_entradas:
+                    vieja = next(iter(self._entradas))
+                    del self._entradas[vieja]
+                    self._locks.pop(vieja, None)
+            return respuesta
+
+    def consultar_json(self, sql: str, params=()) -> bytes:
+        """Consulta SQL → JSON, cacheada por (sql, params)"""
+        return self.obtener((sql, tuple(params)), lambda conn: filas_a_json(conn.execute(sql, params)))
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
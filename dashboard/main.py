@@ -1,105 +1,36 @@
-@app.get("/api/procesos")
-async def get_procesos(auth: bool = Depends(check_auth)):
-    try:
-        config_path = os.path.join(BASE_DIR, "..", "procesos_config.json")
-        with open(config_path, "r") as f:
-            procesos = json.load(f)
-        return procesos
-    except Exception as e:
-        return []
-
-@app.post("/api/procesos/update")
-async def update_procesos(procesos: list, auth: bool = Depends(check_auth)):
-    try:
-        config_path = os.path.join(BASE_DIR, "..", "procesos_config.json")
-        with open(config_path, "w") as f:
-            json.dump(procesos, f, indent=2)
-        return {"status": "ok"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-from fastapi import Query
-@app.get("/api/eventos/filter")
-async def filter_eventos(
-    tipo: str = Query(None),
-    desde: str = Query(None),
-    hasta: str = Query(None),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100),
-    auth: bool = Depends(check_auth)):
-    try:
-        conn = get_db_connection()
-        query = "SELECT * FROM eventos WHERE 1=1"
-        params = []
-        if tipo:
-            query += " AND evento = ?"
-            params.append(tipo)
-        if desde:
-            query += " AND timestamp >= ?"
-            params.append(desde)
-        if hasta:
-            query += " AND timestamp <= ?"
-            params.append(hasta)
-        query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-        params.extend([page_size, (page-1)*page_size])
-        eventos = pd.read_sql_query(query, conn, params=params).to_dict('records')
-        conn.close()
-        return eventos
-    except Exception as e:
-        return []
-from fastapi.responses import StreamingResponse
-import io
-@app.get("/api/eventos/export")
-async def export_eventos(auth: bool = Depends(check_auth)):
-    try:
-        conn = get_db_connection()
-        df = pd.read_sql_query("SELECT * FROM eventos ORDER BY timestamp DESC", conn)
-        conn.close()
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
-        return StreamingResponse(output, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=eventos.csv"})
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-import psutil
-@app.get("/api/health")
-async def api_health(auth: bool = Depends(check_auth)):
-    # Procesos monitoreados
-    try:
-        with open(os.path.join(BASE_DIR, "..", "procesos_config.json"), "r") as f:
-            monitored = [p["nombre"] for p in json.load(f)]
-    except Exception:
-        monitored = ["main.py", "memoria.py"]
-    status_list = []
-    for proc_name in monitored:
-        found = False
-        for p in psutil.process_iter(['name', 'cmdline']):
-            try:
-                if proc_name in ' '.join(p.info.get('cmdline', [])):
-                    found = True
-                    break
-            except Exception:
-                continue
-        status_list.append({"name": proc_name, "running": found})
-    return status_list
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Request, Depends, Query
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
-import sqlite3
-import pandas as pd
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+import csv
 import json
 import os
+import sqlite3
 import subprocess
 from fastapi import status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 import secrets
 
+from conexiones import CacheConsultas, PoolLectura, filas_a_json
+from novedades import Cursor, FuenteNovedades
+from database import consultar_velas
+from retencion import consultar_precios
+import latencias
+from datetime import datetime, timedelta
+
 app = FastAPI(title="Argos Dashboard")
 security = HTTPBasic()
 USERNAME = os.getenv("ARGOS_DASH_USER", "admin")
 PASSWORD = os.getenv("ARGOS_DASH_PASS", "argos123")
 
-def get_db_connection():
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("ARGOS_DB_PATH", os.path.join(BASE_DIR, "..", "data", "argos.db"))
+templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+DASH_POOL = int(os.getenv("ARGOS_DASH_POOL", "4"))
+DASH_CACHE_SEG = float(os.getenv("ARGOS_DASH_CACHE_SEG", "30"))
+DASH_SYMBOL = os.getenv("SYMBOL", "BTC/USDT")
+
+def ruta_db():
     # En desarrollo local puede que la DB no esté en ../data
     db_path = DB_PATH
     if not os.path.exists(db_path):
@@ -107,10 +38,26 @@ def get_db_connection():
         local_db = os.path.join(BASE_DIR, "..", "argos.db")
         if os.path.exists(local_db):
             db_path = local_db
-            
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return db_path
+
+# Pool de lectores (WAL, solo lectura) y caché de respuestas JSON compartida
+# por todos los que miran el dashboard: mientras la base no cambie
+# (PRAGMA data_version) no se repite ninguna consulta. Los endpoints que leen
+# la base son `def`: FastAPI los corre en su threadpool, fuera del event loop
+_cache = None
+
+def get_cache() -> CacheConsultas:
+    global _cache
+    if _cache is None:
+        _cache = CacheConsultas(PoolLectura(ruta_db(), tamano=DASH_POOL), max_edad=DASH_CACHE_SEG)
+    return _cache
+
+def get_db_connection():
+    """Conexión de solo lectura del pool (usar con `with`)"""
+    return get_cache().pool.conexion()
+
+def json_response(contenido: bytes) -> Response:
+    return Response(content=contenido, media_type="application/json")
 
 def check_auth(credentials: HTTPBasicCredentials = Depends(security)):
     correct_username = secrets.compare_digest(credentials.username, USERNAME)
@@ -141,12 +88,9 @@ async def api_restart_process(process_name: str, auth: bool = Depends(check_auth
         return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"status": "error", "message": str(e)})
 
 @app.get("/api/eventos")
-async def api_eventos():
+def api_eventos():
     try:
-        conn = get_db_connection()
-        eventos = pd.read_sql_query("SELECT * FROM eventos ORDER BY timestamp DESC LIMIT 100", conn).to_dict('records')
-        conn.close()
-        return eventos
+        return json_response(get_cache().consultar_json("SELECT * FROM eventos ORDER BY timestamp DESC LIMIT 100"))
     except Exception as e:
         return []
 
@@ -155,48 +99,184 @@ async def read_root(request: Request, auth: bool = Depends(check_auth)):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/api/history")
-async def get_history():
-    """Devuelve las velas OHLCV para el gráfico"""
+def get_history(
+    symbol: str = Query(DASH_SYMBOL),
+    timeframe: str = Query("15m"),
+    desde: int = Query(None, description="Epoch en segundos"),
+    hasta: int = Query(None, description="Epoch en segundos"),
+    resolucion: int = Query(None, ge=1, description="Segundos por punto (se agranda si no entra en max_puntos)"),
+    max_puntos: int = Query(1000, ge=10, le=5000)):
+    """
+    Devuelve las velas OHLCV para el gráfico, reducidas en el servidor a
+    como mucho `max_puntos` (OHLC por tramo) para cualquier rango.
+    """
     try:
-        conn = get_db_connection()
-        # Leemos la tabla 'precios' que guarda el histórico de monitoreo
-        # Limitamos a 1000 velas para no saturar
-        df = pd.read_sql_query("SELECT timestamp, precio as close FROM precios ORDER BY timestamp DESC LIMIT 2000", conn)
-        conn.close()
-        
-        # Como argos guarda ticks, esto es una aproximación visual. 
-        # Idealmente Argos debería guardar velas OHLCV reales en la DB.
-        # Por ahora enviamos los ticks como línea simple o velas simuladas.
-        
-        # Para visualización correcta, necesitamos transformar timestamp ISO a unix timestamp (segundos)
-        df['time'] = pd.to_datetime(df['timestamp']).astype('int64') // 10**9
-        df = df.sort_values('time')
-        
-        # Formato Lightweight Charts (LineSeries)
-        data = df[['time', 'close']].to_dict('records')
-        return {"data": data}
+        def generar(conn):
+            velas, res_ms = consultar_velas(
+                conn, symbol, timeframe,
+                desde_ms=(desde or 0) * 1000,
+                hasta_ms=hasta * 1000 if hasta is not None else None,
+                max_puntos=max_puntos,
+                resolucion_ms=resolucion * 1000 if resolucion else None)
+            if not velas:
+                # Base de un bot anterior sin tabla de velas: precios (crudos o
+                # agregados 1m/1h según el rango) como línea simple
+                inicio = datetime.fromtimestamp(desde) if desde else datetime.now() - timedelta(days=1)
+                fin = datetime.fromtimestamp(hasta).isoformat() if hasta is not None else None
+                try:
+                    precios, _ = consultar_precios(conn, inicio.isoformat(), fin, max_puntos)
+                except sqlite3.OperationalError:
+                    precios = []  # base sin tablas de agregados
+                datos = [{"time": int(datetime.fromisoformat(p["inicio"]).timestamp()), "close": p["close"]}
+                         for p in precios]
+                return json.dumps({"data": datos}, separators=(",", ":")).encode()
+            # Formato Lightweight Charts: time en segundos
+            for v in velas:
+                v["time"] = v.pop("open_time") // 1000
+            # symbol y timeframe: el navegador toma de las velas del SSE solo las de este gráfico
+            return json.dumps({"data": velas, "resolucion": res_ms // 1000, "symbol": symbol,
+                               "timeframe": timeframe}, separators=(",", ":")).encode()
+        return json_response(get_cache().obtener(("history", symbol, timeframe, desde, hasta, resolucion, max_puntos), generar))
     except Exception as e:
         return {"error": str(e), "data": []}
 
 @app.get("/api/trades")
-async def get_trades():
+def get_trades():
     """Devuelve los trades ejecutados"""
     try:
-        conn = get_db_connection()
-        trades = pd.read_sql_query("SELECT * FROM trades ORDER BY timestamp_venta DESC LIMIT 50", conn).to_dict('records')
-        conn.close()
-        return trades
+        return json_response(get_cache().consultar_json("SELECT * FROM trades ORDER BY timestamp_venta DESC LIMIT 50"))
     except Exception as e:
         return []
 
+@app.get("/metrics")
+def get_metrics():
+    """Histogramas de latencia por etapa del bot en formato Prometheus"""
+    def generar(conn):
+        try:
+            return latencias.prometheus(latencias.cargar(conn)).encode()
+        except sqlite3.OperationalError:
+            return latencias.prometheus({}).encode()  # base sin tabla de latencias
+    return Response(get_cache().obtener("metrics", generar), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/stats")
-async def get_stats():
-    """Devuelve estadísticas rápidas"""
+def get_stats():
+    """
+    Devuelve estadísticas rápidas: el estado de cada par (estado_simbolos)
+    en `pares`, con la posición y el PnL sumados; una base del bot de un
+    solo par responde con su tabla estado
+    """
     try:
-        conn = get_db_connection()
-        # Obtener último estado
-        estado = pd.read_sql_query("SELECT * FROM estado LIMIT 1", conn).iloc[0].to_dict()
-        conn.close()
-        return estado
+        def generar(conn):
+            try:
+                pares = [dict(f) for f in conn.execute("SELECT * FROM estado_simbolos ORDER BY symbol")]
+            except sqlite3.OperationalError:
+                pares = []  # base anterior al bot multi-par
+            if pares:
+                return json.dumps({
+                    "posicion_abierta": any(p["posicion_abierta"] for p in pares),
+                    "pnl_acumulado": sum(p["pnl_acumulado"] or 0.0 for p in pares),
+                    "pares": pares,
+                }).encode()
+            cursor = conn.execute("SELECT * FROM estado LIMIT 1")
+            columnas = [c[0] for c in cursor.description]
+            return json.dumps(dict(zip(columnas, cursor.fetchone()))).encode()
+        return json_response(get_cache().obtener("stats", generar))
     except:
         return {"posicion_abierta": False, "pnl_acumulado": 0.0}
+
+@app.get("/api/procesos")
+async def get_procesos(auth: bool = Depends(check_auth)):
+    try:
+        config_path = os.path.join(BASE_DIR, "..", "procesos_config.json")
+        with open(config_path, "r") as f:
+            procesos = json.load(f)
+        return procesos
+    except Exception as e:
+        return []
+
+@app.post("/api/procesos/update")
+async def update_procesos(procesos: list, auth: bool = Depends(check_auth)):
+    try:
+        config_path = os.path.join(BASE_DIR, "..", "procesos_config.json")
+        with open(config_path, "w") as f:
+            json.dump(procesos, f, indent=2)
+        return {"status": "ok"}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+from fastapi import Query
+@app.get("/api/eventos/filter")
+def filter_eventos(
+    tipo: str = Query(None),
+    desde: str = Query(None),
+    hasta: str = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    auth: bool = Depends(check_auth)):
+    try:
+        query = "SELECT * FROM eventos WHERE 1=1"
+        params = []
+        if tipo:
+            query += " AND evento = ?"
+            params.append(tipo)
+        if desde:
+            query += " AND timestamp >= ?"
+            params.append(desde)
+        if hasta:
+            query += " AND timestamp <= ?"
+            params.append(hasta)
+        query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+        params.extend([page_size, (page-1)*page_size])
+        return json_response(get_cache().consultar_json(query, params))
+    except Exception as e:
+        return []
+from fastapi.responses import StreamingResponse
+import io
+@app.get("/api/eventos/export")
+def export_eventos(auth: bool = Depends(check_auth)):
+    try:
+        output = io.StringIO()
+        with get_db_connection() as conn:
+            cursor = conn.execute("SELECT * FROM eventos ORDER BY timestamp DESC")
+            writer = csv.writer(output)
+            writer.writerow([c[0] for c in cursor.description])
+            writer.writerows(cursor)
+        output.seek(0)
+        return StreamingResponse(output, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=eventos.csv"})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+import psutil
+@app.get("/api/health")
+async def api_health(auth: bool = Depends(check_auth)):
+    # Procesos monitoreados
+    try:
+        with open(os.path.join(BASE_DIR, "..", "procesos_config.json"), "r") as f:
+            monitored = [p["nombre"] for p in json.load(f)]
+    except Exception:
+        monitored = ["main.py", "memoria.py"]
+    status_list = []
+    for proc_name in monitored:
+        found = False
+        for p in psutil.process_iter(['name', 'cmdline']):
+            try:
+                if proc_name in ' '.join(p.info.get('cmdline', [])):
+                    found = True
+                    break
+            except Exception:
+                continue
+        status_list.append({"name": proc_name, "running": found})
+    return status_list
+
+@app.get("/api/stream")
+async def stream_novedades(request: Request, cursor: str = Query(None), auth: bool = Depends(check_auth)):
+    """
+    Server-Sent Events con las velas, trades y cambios de estado nuevos.
+    Al reconectar, EventSource manda el último id en Last-Event-ID y se
+    reenvía solo lo que faltó.
+    """
+    inicio = Cursor.desde_texto(request.headers.get("last-event-id") or cursor)
+    fuente = FuenteNovedades(get_cache().pool)
+    return StreamingResponse(
+        fuente.transmitir(inicio, desconectado=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
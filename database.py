@@ -2,32 +2,156 @@
 Módulo de Base de Datos SQLite para Argos Trading Bot
 Gestiona persistencia de datos: trades, señales, precios y métricas
 """
+import atexit
 import sqlite3
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
 import os
 
+from conexiones import abrir_escritura
+from velas import timeframe_a_ms
+import metricas_incrementales as mi
+import retencion
+import latencias
+
 
 # Configuración
 DB_FILE = os.getenv("DB_FILE", "argos.db")
+# Escritura diferida: segundos máximos que una fila espera en memoria antes
+# del commit (0 = escribir y confirmar cada fila al momento)
+DB_FLUSH_SEG = float(os.getenv("DB_FLUSH_SEG", "5"))
+# Filas pendientes que fuerzan un flush aunque no haya vencido el intervalo
+DB_MAX_PENDIENTES = int(os.getenv("DB_MAX_PENDIENTES", "200"))
 logger = logging.getLogger(__name__)
 
+SQL_TRADE = """
+    INSERT INTO trades (
+        timestamp_compra, timestamp_venta, precio_compra, precio_venta,
+        cantidad, pnl_usd, pnl_pct, razon_salida, max_precio,
+        trailing_pct, rsi_compra, duracion_minutos
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_SENAL = """
+    INSERT OR REPLACE INTO senales (
+        timestamp, tipo, precio, rsi, bb_lower, bb_middle, bb_upper,
+        ema, posicion_abierta, balance_usdt, razon
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_PRECIO = """
+    INSERT OR REPLACE INTO precios (timestamp, precio, volumen)
+    VALUES (?, ?, ?)
+"""
+
+SQL_VELA = """
+    INSERT INTO velas (symbol, timeframe, open_time, open, high, low, close, volumen)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(symbol, timeframe, open_time) DO UPDATE SET
+        open = excluded.open,
+        high = excluded.high,
+        low = excluded.low,
+        close = excluded.close,
+        volumen = excluded.volumen
+"""
+
+# Velas agrupadas en tramos de `resolucion` ms: máximo/mínimo/volumen por tramo
+# y apertura/cierre de la primera/última vela (búsquedas por clave primaria)
+SQL_VELAS_AGRUPADAS = """
+    SELECT g.tramo * :resolucion AS open_time, o.open, g.high, g.low, c.close, g.volumen
+    FROM (
+        SELECT open_time / :resolucion AS tramo, MIN(open_time) AS primera, MAX(open_time) AS ultima,
+               MAX(high) AS high, MIN(low) AS low, SUM(volumen) AS volumen
+        FROM velas
+        WHERE symbol = :symbol AND timeframe = :timeframe AND open_time BETWEEN :desde AND :hasta
+        GROUP BY tramo
+    ) g
+    JOIN velas o ON o.symbol = :symbol AND o.timeframe = :timeframe AND o.open_time = g.primera
+    JOIN velas c ON c.symbol = :symbol AND c.timeframe = :timeframe AND c.open_time = g.ultima
+    ORDER BY g.tramo
+"""
+
+SQL_ESTADO = """
+    UPDATE estado SET
+        posicion_abierta = ?,
+        precio_compra = ?,
+        cantidad = ?,
+        max_precio = ?,
+        pnl_acumulado = ?,
+        operaciones_hoy = ?,
+        ultimo_update = ?
+    WHERE id = 1
+"""
+
+SQL_ESTADO_SIMBOLO = """
+    INSERT INTO estado_simbolos (
+        symbol, posicion_abierta, precio_compra, cantidad, max_precio,
+        pnl_acumulado, operaciones_hoy, fecha_compra, ultimo_update
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(symbol) DO UPDATE SET
+        posicion_abierta = excluded.posicion_abierta,
+        precio_compra = excluded.precio_compra,
+        cantidad = excluded.cantidad,
+        max_precio = excluded.max_precio,
+        pnl_acumulado = excluded.pnl_acumulado,
+        operaciones_hoy = excluded.operaciones_hoy,
+        fecha_compra = excluded.fecha_compra,
+        ultimo_update = excluded.ultimo_update
+"""
+
 
 class Database:
-    """Gestor de base de datos SQLite"""
+    """
+    Gestor de base de datos SQLite.
+
+    Las escrituras frecuentes (señales, precios y los nuevos máximos del
+    trailing) se acumulan en memoria y se confirman juntas en una sola
+    transacción con executemany, cada `intervalo_flush` segundos o al llegar
+    a `max_pendientes` filas. Los eventos críticos (trades, apertura o cierre
+    de posición) vacían el buffer y confirman al momento, igual que cerrar().
+    """
     
-    def __init__(self, db_file: str = DB_FILE):
+    def __init__(self, db_file: str = DB_FILE, intervalo_flush: float = DB_FLUSH_SEG,
+                 max_pendientes: int = DB_MAX_PENDIENTES,
+                 retencion_dias: float = retencion.DB_RETENCION_DIAS,
+                 retencion_1m_dias: float = retencion.DB_RETENCION_1M_DIAS,
+                 intervalo_compactar: float = retencion.DB_COMPACTAR_SEG):
         self.db_file = db_file
         self.conn = None
+        self.intervalo_flush = intervalo_flush
+        self.max_pendientes = max_pendientes
+        self.retencion_dias = retencion_dias
+        self.retencion_1m_dias = retencion_1m_dias
+        self.intervalo_compactar = intervalo_compactar
+        self._ultima_compactacion = time.monotonic()
+        # La conexión se comparte entre el loop y los hilos del núcleo
+        self._lock = threading.RLock()
+        # Filas en espera, en orden de llegada: (sql, parámetros)
+        self._pendientes: List[Tuple[str, tuple]] = []
+        # Lock corto de los estados diferidos/confirmados: un nuevo máximo del
+        # trailing (desde el loop de eventos) no espera a un flush ni a una compactación
+        self._lock_estados = threading.Lock()
+        # Estados diferidos por clave (None = tabla estado): solo vale el último
+        self._estados_diferidos: Dict[Optional[str], Tuple[str, tuple]] = {}
+        # Campos críticos del último estado confirmado de cada clave
+        self._estados_confirmados: Dict[Optional[str], tuple] = {}
+        self._ultimo_flush = time.monotonic()
+        self._transacciones = 0
+        self.commits = 0
         self.conectar()
         self.crear_tablas()
+        self._verificar_metricas_acumuladas()
     
     def conectar(self):
         """Conectar a la base de datos"""
         try:
-            self.conn = sqlite3.connect(self.db_file)
-            self.conn.row_factory = sqlite3.Row  # Devolver rows como diccionarios
+            # WAL + busy_timeout: el dashboard y el watchdog leen sin bloquear al bot
+            self.conn = abrir_escritura(self.db_file)
             logger.info(f"✅ Conectado a base de datos: {self.db_file}")
         except sqlite3.Error as e:
             logger.error(f"❌ Error al conectar a base de datos: {e}")
@@ -120,32 +244,180 @@ class Database:
             )
         """)
         
+        # Estado por par (bot multi-símbolo)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS estado_simbolos (
+                symbol TEXT PRIMARY KEY,
+                posicion_abierta INTEGER NOT NULL DEFAULT 0,
+                precio_compra REAL DEFAULT 0,
+                cantidad REAL DEFAULT 0,
+                max_precio REAL DEFAULT 0,
+                pnl_acumulado REAL DEFAULT 0.0,
+                operaciones_hoy INTEGER DEFAULT 0,
+                fecha_compra TEXT,
+                ultimo_update TEXT NOT NULL
+            )
+        """)
+        
+        # Velas OHLCV del bot (open_time en ms epoch, como ccxt)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS velas (
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                open_time INTEGER NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volumen REAL,
+                PRIMARY KEY (symbol, timeframe, open_time)
+            ) WITHOUT ROWID
+        """)
+        
+        # Salidas colocadas en el exchange (OCO / stop-limit) de las posiciones abiertas
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ordenes_salida (
+                symbol TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                id_stop TEXT NOT NULL,
+                id_tp TEXT,
+                stop REAL NOT NULL,
+                limite REAL NOT NULL,
+                tp REAL,
+                cantidad REAL NOT NULL,
+                precio_compra REAL NOT NULL,
+                actualizada REAL NOT NULL
+            )
+        """)
+        
+        # Acumulado incremental de métricas (por día y total)
+        cursor.execute(mi.SQL_CREAR)
+        
+        # Agregados de precios y señales (1m / 1h) que quedan tras la retención
+        retencion.crear_tablas(self.conn)
+        
+        # Histogramas de latencia por etapa (los publica el dashboard)
+        latencias.crear_tablas(self.conn)
+        
         # Insertar estado inicial si no existe
         cursor.execute("""
             INSERT OR IGNORE INTO estado (id, posicion_abierta, ultimo_update)
             VALUES (1, 0, ?)
         """, (datetime.now().isoformat(),))
         
-        # Crear índices para mejorar performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp_venta)")
+        # Crear índices para mejorar performance. Los de trades y precios
+        # cubren las consultas frecuentes (rango de fechas + columnas leídas),
+        # así SQLite no vuelve a la tabla por cada fila.
+        cursor.execute("DROP INDEX IF EXISTS idx_trades_timestamp")
+        cursor.execute("DROP INDEX IF EXISTS idx_precios_timestamp")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_venta_pnl ON trades(timestamp_venta, pnl_usd, pnl_pct)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_senales_timestamp ON senales(timestamp)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_precios_timestamp ON precios(timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_precios_timestamp_precio ON precios(timestamp, precio)")
         
         self.conn.commit()
         logger.info("✅ Tablas creadas/verificadas correctamente")
     
+    # ===== ESCRITURA DIFERIDA =====
+    
+    def _commit(self):
+        """Confirmar, salvo dentro de transaccion() (confirma al salir)"""
+        if self._transacciones == 0:
+            self.conn.commit()
+            self.commits += 1
+    
+    @contextmanager
+    def transaccion(self):
+        """
+        Agrupar varias escrituras en un único commit. Se puede anidar; si
+        algo falla se deshace todo el bloque.
+        """
+        with self._lock:
+            self._transacciones += 1
+            try:
+                yield self
+            except BaseException:
+                self._transacciones -= 1
+                if self._transacciones == 0:
+                    self.conn.rollback()
+                raise
+            self._transacciones -= 1
+            self._commit()
+    
+    def _encolar(self, sql: str, filas: Iterable[tuple]):
+        """Agregar filas al buffer y vaciarlo si corresponde"""
+        with self._lock:
+            self._pendientes.extend((sql, fila) for fila in filas)
+            self.flush_si_vencido()
+    
+    def pendientes(self) -> int:
+        """Filas en memoria que aún no llegaron al disco"""
+        with self._lock:
+            return len(self._pendientes) + len(self._estados_diferidos)
+    
+    def flush_si_vencido(self):
+        """Vaciar el buffer si venció el intervalo o se llenó"""
+        with self._lock:
+            if not self.pendientes():
+                return
+            if (self.intervalo_flush <= 0 or self.pendientes() >= self.max_pendientes
+                    or time.monotonic() - self._ultimo_flush >= self.intervalo_flush):
+                self.flush()
+    
+    def flush(self):
+        """Escribir todo lo pendiente en una sola transacción"""
+        with self._lock:
+            self._ultimo_flush = time.monotonic()
+            if self.conn is None or not self.pendientes():
+                return
+            pendientes, self._pendientes = self._pendientes, []
+            with self._lock_estados:
+                diferidos, self._estados_diferidos = self._estados_diferidos, {}
+            try:
+                with self.transaccion():
+                    # Filas consecutivas de la misma sentencia van en un solo executemany
+                    for sql, grupo in groupby(pendientes, key=lambda p: p[0]):
+                        self.conn.executemany(sql, [fila for _, fila in grupo])
+                    for sql, fila in diferidos.values():
+                        self.conn.execute(sql, fila)
+            except sqlite3.Error:
+                # Se reintenta en el próximo flush (sin pisar estados más nuevos)
+                self._pendientes = pendientes + self._pendientes
+                with self._lock_estados:
+                    self._estados_diferidos = {**diferidos, **self._estados_diferidos}
+                raise
+    
+    def _escribir_estado(self, clave: Optional[str], sql: str, fila: tuple, criticos: tuple):
+        """
+        Escribir un estado. Si cambió algo crítico (posición, precio de compra,
+        cantidad, contadores) se confirma al momento junto con lo pendiente;
+        si solo cambió el máximo del trailing se difiere y se coalesce, porque
+        perderlo en un corte solo deja el trailing stop más abajo, nunca la
+        posición sin registrar. El máximo diferido solo se guarda en memoria:
+        lo escribe el próximo flush (ver flush_si_vencido).
+        """
+        with self._lock_estados:
+            if self._estados_confirmados.get(clave) == criticos:
+                self._estados_diferidos[clave] = (sql, fila)
+                return
+        with self._lock:
+            with self._lock_estados:
+                self._estados_diferidos.pop(clave, None)
+                anterior = self._estados_confirmados.get(clave)
+                self._estados_confirmados[clave] = criticos
+            try:
+                with self.transaccion():
+                    self.flush()
+                    self.conn.execute(sql, fila)
+            except Exception:
+                with self._lock_estados:
+                    self._estados_confirmados[clave] = anterior
+                raise
+    
     # ===== TRADES =====
     
-    def guardar_trade(self, trade: Dict) -> int:
-        """Guardar un trade completado"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO trades (
-                timestamp_compra, timestamp_venta, precio_compra, precio_venta,
-                cantidad, pnl_usd, pnl_pct, razon_salida, max_precio,
-                trailing_pct, rsi_compra, duracion_minutos
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    @staticmethod
+    def _fila_trade(trade: Dict) -> tuple:
+        return (
             trade['timestamp_compra'],
             trade['timestamp_venta'],
             trade['precio_compra'],
@@ -158,10 +430,27 @@ class Database:
             trade.get('trailing_pct'),
             trade.get('rsi_compra'),
             trade.get('duracion_minutos')
-        ))
-        self.conn.commit()
+        )
+    
+    def guardar_trade(self, trade: Dict) -> int:
+        """
+        Guardar un trade completado (evento crítico: se confirma al momento).
+        Las métricas acumuladas se actualizan en la misma transacción.
+        """
+        with self._lock, self.transaccion():
+            self.flush()
+            cursor = self.conn.execute(SQL_TRADE, self._fila_trade(trade))
+            self._acumular_metricas([trade])
         return cursor.lastrowid
     
+    def guardar_trades(self, trades: Iterable[Dict]):
+        """Guardar varios trades con executemany en una sola transacción"""
+        trades = list(trades)
+        with self._lock, self.transaccion():
+            self.flush()
+            self.conn.executemany(SQL_TRADE, [self._fila_trade(t) for t in trades])
+            self._acumular_metricas(trades)
+    
     def obtener_trades(self, limit: int = 100) -> List[Dict]:
         """Obtener últimos trades"""
         cursor = self.conn.cursor()
@@ -178,22 +467,111 @@ class Database:
         hoy = datetime.now().strftime("%Y-%m-%d")
         cursor.execute("""
             SELECT * FROM trades
-            WHERE date(timestamp_venta) = ?
+            WHERE timestamp_venta >= ? AND timestamp_venta < ?
             ORDER BY timestamp_venta DESC
-        """, (hoy,))
+        """, rango_dia(hoy))
         return [dict(row) for row in cursor.fetchall()]
     
+    # ===== MÉTRICAS ACUMULADAS =====
+    
+    def _tramo_metricas(self, fecha: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM metricas_acumuladas WHERE fecha = ?", (fecha,)).fetchone()
+        return dict(row) if row else None
+    
+    def _guardar_tramos(self, tramos: Iterable[Dict]):
+        self.conn.executemany(mi.SQL_GUARDAR, [tuple(t[c] for c in mi.COLUMNAS) for t in tramos])
+    
+    def _acumular_metricas(self, trades: List[Dict]):
+        """
+        Sumar trades recién guardados al tramo de su día y al total. Un trade
+        anterior al último acumulado (p. ej. una migración) no se suma: deja
+        las métricas marcadas para reconstruir desde la tabla trades.
+        """
+        total = self._tramo_metricas(mi.TOTAL) or mi.nuevo_tramo(mi.TOTAL)
+        trades = sorted(trades, key=lambda t: t['timestamp_venta'])
+        if self._metricas_desordenadas or (
+                trades and total['ultimo_timestamp'] and trades[0]['timestamp_venta'] < total['ultimo_timestamp']):
+            self._metricas_desordenadas = True
+            return
+        
+        dias = {}
+        for trade in trades:
+            fecha = trade['timestamp_venta'][:10]
+            if fecha not in dias:
+                dias[fecha] = self._tramo_metricas(fecha) or mi.nuevo_tramo(fecha, total)
+            mi.agregar_trade(dias[fecha], trade)
+            mi.agregar_trade(total, trade)
+        self._guardar_tramos([*dias.values(), total])
+    
+    def reconstruir_metricas_acumuladas(self):
+        """Recalcular todos los tramos recorriendo los trades en orden (O(n), una vez)"""
+        with self._lock, self.transaccion():
+            self.conn.execute("DELETE FROM metricas_acumuladas")
+            self._metricas_desordenadas = False
+            total = mi.nuevo_tramo(mi.TOTAL)
+            dia = None
+            tramos = []
+            for row in self.conn.execute("SELECT * FROM trades ORDER BY timestamp_venta, id"):
+                trade = dict(row)
+                fecha = trade['timestamp_venta'][:10]
+                if dia is None or dia['fecha'] != fecha:
+                    dia = mi.nuevo_tramo(fecha, total)
+                    tramos.append(dia)
+                mi.agregar_trade(dia, trade)
+                mi.agregar_trade(total, trade)
+            self._guardar_tramos([*tramos, total])
+        logger.info(f"📊 Métricas acumuladas reconstruidas: {total['trades']} trades")
+    
+    def _verificar_metricas_acumuladas(self):
+        """Al abrir: reconstruir si la tabla trades no coincide con el acumulado (base anterior)"""
+        self._metricas_desordenadas = False
+        total = self._tramo_metricas(mi.TOTAL)
+        cantidad = self.conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+        if (total['trades'] if total else 0) != cantidad:
+            self.reconstruir_metricas_acumuladas()
+    
+    def obtener_metricas_acumuladas(self, desde_fecha: Optional[str] = None) -> Dict:
+        """
+        Resumen de los tramos diarios desde `desde_fecha` (YYYY-MM-DD), o el
+        total histórico si es None. Lee como mucho un tramo por día.
+        """
+        with self._lock:
+            if self._metricas_desordenadas:
+                self.reconstruir_metricas_acumuladas()
+            if desde_fecha is None:
+                return self._tramo_metricas(mi.TOTAL) or mi.nuevo_tramo(mi.TOTAL)
+            rows = self.conn.execute("""
+                SELECT * FROM metricas_acumuladas
+                WHERE fecha >= ? AND fecha <= '9999-12-31'
+                ORDER BY fecha
+            """, (desde_fecha,)).fetchall()
+        return mi.combinar(dict(row) for row in rows)
+    
+    def obtener_tramos_metricas(self) -> List[Dict]:
+        """Tramos diarios (sin el total), del más nuevo al más viejo"""
+        with self._lock:
+            if self._metricas_desordenadas:
+                self.reconstruir_metricas_acumuladas()
+            rows = self.conn.execute("""
+                SELECT * FROM metricas_acumuladas
+                WHERE fecha <= '9999-12-31'
+                ORDER BY fecha DESC
+            """).fetchall()
+        return [dict(row) for row in rows]
+    
     # ===== SEÑALES =====
     
-    def guardar_senal(self, senal: Dict) -> int:
-        """Guardar una señal de entrada/salida"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO senales (
-                timestamp, tipo, precio, rsi, bb_lower, bb_middle, bb_upper,
-                ema, posicion_abierta, balance_usdt, razon
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    def guardar_senal(self, senal: Dict):
+        """Guardar una señal de entrada/salida (escritura diferida)"""
+        self.guardar_senales([senal])
+    
+    def guardar_senales(self, senales: Iterable[Dict]):
+        """Encolar varias señales; se escriben juntas en el próximo flush"""
+        self._encolar(SQL_SENAL, [self._fila_senal(s) for s in senales])
+    
+    @staticmethod
+    def _fila_senal(senal: Dict) -> tuple:
+        return (
             senal['timestamp'],
             senal['tipo'],
             senal['precio'],
@@ -205,12 +583,11 @@ class Database:
             senal['posicion_abierta'],
             senal.get('balance_usdt'),
             senal.get('razon')
-        ))
-        self.conn.commit()
-        return cursor.lastrowid
+        )
     
     def obtener_senales(self, limit: int = 100) -> List[Dict]:
         """Obtener últimas señales"""
+        self.flush()
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT * FROM senales
@@ -222,49 +599,113 @@ class Database:
     # ===== PRECIOS =====
     
     def guardar_precio(self, timestamp: str, precio: float, volumen: float = None):
-        """Guardar precio histórico"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO precios (timestamp, precio, volumen)
-            VALUES (?, ?, ?)
-        """, (timestamp, precio, volumen))
-        self.conn.commit()
+        """Guardar precio histórico (escritura diferida)"""
+        self._encolar(SQL_PRECIO, [(timestamp, precio, volumen)])
+    
+    def guardar_precios(self, precios: Iterable[Tuple[str, float, Optional[float]]]):
+        """Encolar varios (timestamp, precio, volumen)"""
+        self._encolar(SQL_PRECIO, [tuple(p) for p in precios])
     
     def obtener_precios_recientes(self, horas: int = 24) -> List[Dict]:
-        """Obtener precios de las últimas N horas"""
+        """Obtener precios crudos de las últimas N horas (dentro de la retención)"""
+        self.flush()
+        # Mismo formato que los timestamps guardados (isoformat local)
+        desde = (datetime.now() - timedelta(hours=horas)).isoformat()
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT * FROM precios
-            WHERE timestamp >= datetime('now', '-' || ? || ' hours')
+            WHERE timestamp >= ?
             ORDER BY timestamp DESC
-        """, (horas,))
+        """, (desde,))
         return [dict(row) for row in cursor.fetchall()]
     
+    def obtener_precios_agregados(self, desde: str, hasta: Optional[str] = None,
+                                  max_puntos: int = 1000) -> Tuple[List[Dict], str]:
+        """Precios OHLC del rango desde el nivel adecuado (ver retencion.consultar_precios)"""
+        with self._lock:
+            self.flush()
+            return retencion.consultar_precios(self.conn, desde, hasta, max_puntos)
+    
+    # ===== RETENCIÓN =====
+    
+    def compactar(self, ahora: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Agregar precios y señales en velas de 1m/1h, borrar lo que venció y
+        devolver parte del espacio libre al sistema (ver retencion.py)
+        """
+        with self._lock:
+            self._ultima_compactacion = time.monotonic()
+            with self.transaccion():
+                self.flush()
+                cambios = retencion.compactar(self.conn, ahora, self.retencion_dias, self.retencion_1m_dias)
+            # Fuera de la transacción: incremental_vacuum confirma por su cuenta
+            cambios["paginas_liberadas"] = retencion.vacuum_incremental(self.conn)
+        logger.info(f"🧹 Compactación: {cambios}")
+        return cambios
+    
+    def compactar_si_vencido(self):
+        """Compactar si pasaron `intervalo_compactar` segundos desde la última vez"""
+        if self.intervalo_compactar > 0 and time.monotonic() - self._ultima_compactacion >= self.intervalo_compactar:
+            self.compactar()
+    
+    # ===== VELAS =====
+    
+    def guardar_velas(self, symbol: str, timeframe: str, velas: Iterable[list]):
+        """
+        Encolar velas [ts_ms, open, high, low, close, vol] (upsert: la vela
+        abierta se va pisando hasta que cierra)
+        """
+        self._encolar(SQL_VELA, [(symbol, timeframe, int(v[0]), v[1], v[2], v[3], v[4], v[5]) for v in velas])
+    
+    def obtener_velas(self, symbol: str, timeframe: str, desde_ms: int = 0, hasta_ms: Optional[int] = None,
+                      max_puntos: int = 1000) -> Tuple[List[Dict], int]:
+        """Velas del rango agrupadas (ver consultar_velas)"""
+        with self._lock:
+            self.flush()
+            return consultar_velas(self.conn, symbol, timeframe, desde_ms, hasta_ms, max_puntos)
+
+    def ultimas_velas(self, symbol: str, timeframe: str, n: int) -> List[list]:
+        """Últimas `n` velas [ts_ms, open, high, low, close, vol] en orden cronológico"""
+        with self._lock:
+            self.flush()
+            filas = self.conn.execute("""
+                SELECT open_time, open, high, low, close, volumen FROM velas
+                WHERE symbol = ? AND timeframe = ?
+                ORDER BY open_time DESC
+                LIMIT ?
+            """, (symbol, timeframe, n)).fetchall()
+        return [list(f) for f in reversed(filas)]
+    
     # ===== ESTADO =====
     
     def cargar_estado(self) -> Dict:
         """Cargar estado actual del bot"""
+        self.flush()
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM estado WHERE id = 1")
         row = cursor.fetchone()
         if row:
-            return dict(row)
+            estado = dict(row)
+            with self._lock_estados:
+                self._estados_confirmados[None] = self._criticos(estado)
+            return estado
         return self._estado_default()
     
+    @staticmethod
+    def _criticos(estado: Dict) -> tuple:
+        """Campos cuyo cambio se confirma al momento (todo salvo max_precio)"""
+        return (
+            bool(estado.get('posicion_abierta')),
+            float(estado.get('precio_compra', 0) or 0),
+            float(estado.get('cantidad', 0) or 0),
+            float(estado.get('pnl_acumulado', 0.0) or 0),
+            int(estado.get('operaciones_hoy', 0) or 0),
+            estado.get('fecha_compra'),
+        )
+    
     def guardar_estado(self, estado: Dict):
-        """Guardar estado del bot"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE estado SET
-                posicion_abierta = ?,
-                precio_compra = ?,
-                cantidad = ?,
-                max_precio = ?,
-                pnl_acumulado = ?,
-                operaciones_hoy = ?,
-                ultimo_update = ?
-            WHERE id = 1
-        """, (
+        """Guardar estado del bot (solo un nuevo max_precio se difiere)"""
+        self._escribir_estado(None, SQL_ESTADO, (
             estado['posicion_abierta'],
             estado.get('precio_compra', 0),
             estado.get('cantidad', 0),
@@ -272,8 +713,82 @@ class Database:
             estado.get('pnl_acumulado', 0.0),
             estado.get('operaciones_hoy', 0),
             datetime.now().isoformat()
-        ))
-        self.conn.commit()
+        ), self._criticos(estado))
+    
+    def cargar_estado_simbolo(self, symbol: str, inicial: Optional[Dict] = None) -> Dict:
+        """
+        Cargar el estado de un par. Si el par aún no tiene fila se crea con
+        `inicial` (p. ej. el estado heredado del bot de un solo par) o el default.
+        """
+        with self._lock:
+            self.flush()
+            row = self.conn.execute("SELECT * FROM estado_simbolos WHERE symbol = ?", (symbol,)).fetchone()
+            if row:
+                estado = dict(row)
+                estado['posicion_abierta'] = bool(estado['posicion_abierta'])
+                with self._lock_estados:
+                    self._estados_confirmados[symbol] = self._criticos(estado)
+                return estado
+
+            estado = {**self._estado_default(), **(inicial or {}), 'symbol': symbol}
+            self.guardar_estado_simbolo(symbol, estado)
+            return estado
+    
+    def guardar_estado_simbolo(self, symbol: str, estado: Dict):
+        """
+        Guardar (upsert) el estado de un par. Abrir o cerrar la posición se
+        confirma al momento; un nuevo max_precio del trailing se difiere.
+        """
+        self._escribir_estado(symbol, SQL_ESTADO_SIMBOLO, (
+                symbol,
+                int(bool(estado['posicion_abierta'])),
+                estado.get('precio_compra', 0),
+                float(estado.get('cantidad', 0) or 0),
+                estado.get('max_precio', 0),
+                estado.get('pnl_acumulado', 0.0),
+                estado.get('operaciones_hoy', 0),
+                estado.get('fecha_compra'),
+                datetime.now().isoformat()
+            ), self._criticos(estado))
+    
+    def obtener_estados_simbolos(self) -> Dict[str, Dict]:
+        """Estado de todos los pares, indexado por símbolo"""
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute("SELECT * FROM estado_simbolos ORDER BY symbol").fetchall()
+        return {row['symbol']: dict(row) for row in rows}
+    
+    # ===== SALIDAS EN EL EXCHANGE =====
+    
+    def guardar_orden_salida(self, orden: Dict):
+        """Guardar la salida colocada de un par (se confirma al momento)"""
+        columnas = ", ".join(orden)
+        with self._lock, self.transaccion():
+            self.flush()
+            self.conn.execute(f"INSERT OR REPLACE INTO ordenes_salida ({columnas}) "
+                              f"VALUES ({', '.join('?' * len(orden))})", tuple(orden.values()))
+    
+    def borrar_orden_salida(self, symbol: str):
+        with self._lock, self.transaccion():
+            self.flush()
+            self.conn.execute("DELETE FROM ordenes_salida WHERE symbol = ?", (symbol,))
+    
+    def obtener_ordenes_salida(self) -> Dict[str, Dict]:
+        """Salidas vivas indexadas por símbolo"""
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM ordenes_salida").fetchall()
+        return {row['symbol']: dict(row) for row in rows}
+    
+    # ===== LATENCIAS =====
+    
+    def guardar_latencias(self, histogramas: Dict[str, latencias.Histograma]):
+        """Reemplazar los histogramas de latencia guardados (una transacción)"""
+        with self._lock, self.transaccion():
+            latencias.guardar(self.conn, histogramas)
+    
+    def obtener_latencias(self) -> Dict[str, latencias.Histograma]:
+        with self._lock:
+            return latencias.cargar(self.conn)
     
     def _estado_default(self) -> Dict:
         """Estado por defecto"""
@@ -295,7 +810,7 @@ class Database:
         
         cursor = self.conn.cursor()
         
-        # Obtener trades del día
+        # Obtener trades del día (rango sobre el índice cubriente, sin leer la tabla)
         cursor.execute("""
             SELECT 
                 COUNT(*) as total,
@@ -305,11 +820,13 @@ class Database:
                 AVG(pnl_pct) as pnl_total_pct,
                 AVG(CASE WHEN pnl_usd > 0 THEN pnl_usd ELSE NULL END) as ganancia_prom,
                 AVG(CASE WHEN pnl_usd <= 0 THEN pnl_usd ELSE NULL END) as perdida_prom,
+                SUM(CASE WHEN pnl_usd > 0 THEN pnl_usd ELSE 0 END) as ganancias_totales,
+                SUM(CASE WHEN pnl_usd <= 0 THEN pnl_usd ELSE 0 END) as perdidas_totales,
                 MAX(pnl_usd) as max_ganancia,
                 MIN(pnl_usd) as max_perdida
             FROM trades
-            WHERE date(timestamp_venta) = ?
-        """, (fecha,))
+            WHERE timestamp_venta >= ? AND timestamp_venta < ?
+        """, rango_dia(fecha))
         
         row = cursor.fetchone()
         
@@ -317,15 +834,8 @@ class Database:
             win_rate = (row['ganadoras'] / row['total']) * 100 if row['total'] > 0 else 0
             
             # Profit Factor = Ganancias Totales / Pérdidas Totales
-            ganancias_totales = cursor.execute("""
-                SELECT SUM(pnl_usd) FROM trades
-                WHERE date(timestamp_venta) = ? AND pnl_usd > 0
-            """, (fecha,)).fetchone()[0] or 0
-            
-            perdidas_totales = abs(cursor.execute("""
-                SELECT SUM(pnl_usd) FROM trades
-                WHERE date(timestamp_venta) = ? AND pnl_usd <= 0
-            """, (fecha,)).fetchone()[0] or 0)
+            ganancias_totales = row['ganancias_totales'] or 0
+            perdidas_totales = abs(row['perdidas_totales'] or 0)
             
             profit_factor = ganancias_totales / perdidas_totales if perdidas_totales > 0 else 0
             
@@ -350,7 +860,7 @@ class Database:
                 row['max_ganancia'],
                 row['max_perdida']
             ))
-            self.conn.commit()
+            self._commit()
     
     def obtener_metricas_diarias(self, fecha: str = None) -> Optional[Dict]:
         """Obtener métricas de un día específico"""
@@ -405,9 +915,11 @@ class Database:
         }
     
     def cerrar(self):
-        """Cerrar conexión a la base de datos"""
+        """Escribir lo pendiente y cerrar la conexión a la base de datos"""
         if self.conn:
+            self.flush()
             self.conn.close()
+            self.conn = None
             logger.info("🔒 Conexión a base de datos cerrada")
     
     def __enter__(self):
@@ -419,6 +931,56 @@ class Database:
         self.cerrar()
 
 
+def rango_dia(fecha: str) -> Tuple[str, str]:
+    """
+    Límites [inicio, fin) de un día YYYY-MM-DD para filtrar timestamps ISO.
+    `timestamp >= inicio AND timestamp < fin` es un rango sobre el índice;
+    `date(timestamp) = fecha` obliga a recorrer la tabla entera.
+    """
+    siguiente = datetime.strptime(fecha, "%Y-%m-%d") + timedelta(days=1)
+    return fecha, siguiente.strftime("%Y-%m-%d")
+
+
+def resolucion_velas(timeframe_ms: int, desde_ms: int, hasta_ms: int, max_puntos: int,
+                     resolucion_ms: Optional[int] = None) -> int:
+    """
+    Tramo (múltiplo del timeframe) para que el rango entre en `max_puntos`.
+    Una resolución pedida más fina que eso se agranda.
+    """
+    velas = max((hasta_ms - desde_ms) // timeframe_ms + 1, 1)
+    multiplo = -(-velas // max(max_puntos, 1))
+    if resolucion_ms:
+        multiplo = max(multiplo, -(-resolucion_ms // timeframe_ms))
+    return max(multiplo, 1) * timeframe_ms
+
+
+def consultar_velas(conn: sqlite3.Connection, symbol: str, timeframe: str, desde_ms: int = 0,
+                    hasta_ms: Optional[int] = None, max_puntos: int = 1000,
+                    resolucion_ms: Optional[int] = None) -> Tuple[List[Dict], int]:
+    """
+    Velas OHLC de [desde_ms, hasta_ms] reducidas en SQLite a como mucho
+    `max_puntos` tramos (apertura de la primera vela, máximo, mínimo, cierre
+    de la última y volumen sumado). Sirve con cualquier conexión, también las
+    de solo lectura del dashboard.
+
+    Returns:
+        (velas con open_time en ms, resolución usada en ms)
+    """
+    timeframe_ms = timeframe_a_ms(timeframe)
+    fila = conn.execute("SELECT MIN(open_time), MAX(open_time) FROM velas "
+                        "WHERE symbol = ? AND timeframe = ? AND open_time BETWEEN ? AND ?",
+                        (symbol, timeframe, desde_ms, hasta_ms if hasta_ms is not None else 2 ** 62)).fetchone()
+    if fila[0] is None:
+        return [], timeframe_ms
+    # El tramo se calcula sobre los datos que existen, no sobre el rango pedido
+    desde_ms, hasta_ms = fila[0], fila[1]
+    resolucion = resolucion_velas(timeframe_ms, desde_ms, hasta_ms, max_puntos, resolucion_ms)
+    cursor = conn.execute(SQL_VELAS_AGRUPADAS, {"symbol": symbol, "timeframe": timeframe, "desde": desde_ms,
+                                                "hasta": hasta_ms, "resolucion": resolucion})
+    columnas = [c[0] for c in cursor.description]
+    return [dict(zip(columnas, f)) for f in cursor], resolucion
+
+
 # ===== FUNCIONES DE COMPATIBILIDAD CON memoria.py =====
 
 _db_instance = None
@@ -428,6 +990,8 @@ def get_db() -> Database:
     global _db_instance
     if _db_instance is None:
         _db_instance = Database()
+        # Lo que quede en el buffer se escribe aunque el proceso salga sin cerrar()
+        atexit.register(_db_instance.flush)
     return _db_instance
 
 
@@ -0,0 +1,140 @@
+"""
+Ejecución de órdenes para Argos Trading Bot
+Entre una señal y su orden no debería quedar ningún cálculo ni petición
+previa: en cada ciclo de mercado (fuera del camino de la señal) se prepara
+por par una plantilla con el saldo libre, el gasto, el mínimo del exchange
+y el paso de cantidad ya resueltos. Cuando el Triple Filtro dispara, la
+compra se arma con la plantilla y sale en una sola llamada al exchange.
+
+Cada orden registra la latencia señal → confirmación del exchange (ack)
+en los histogramas de latencias.py (etapas senal_ack_compra / senal_ack_venta).
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import latencias
+from mercados import SesionExchange
+
+logger = logging.getLogger('ArgosBot')
+
+# Saldo libre mínimo para comprar (Binance suele pedir min $10, ponemos $15 por seguridad)
+SALDO_MINIMO_USDT = 15.0
+# Edad máxima de una plantilla antes de rehacerla al usarla
+EJECUCION_PLANTILLA_SEG = float(os.getenv("EJECUCION_PLANTILLA_SEG", "120"))
+
+
+class PlantillaOrden(NamedTuple):
+    """Compra lista para enviar: solo falta el precio de la señal"""
+    symbol: str
+    gasto_usdt: float
+    min_cost: float
+    creada: float
+    motivo: Optional[str] = None  # si no es None, la compra se omite por esto
+
+
+class EjecutorOrdenes:
+    """
+    Plantillas de compra por par y envío de órdenes de mercado con
+    registro de latencia.
+    """
+
+    def __init__(self, sesion: SesionExchange, pos_size: float,
+                 saldo_minimo: float = SALDO_MINIMO_USDT,
+                 ttl_plantilla: float = EJECUCION_PLANTILLA_SEG, reloj=time.monotonic,
+                 registro: latencias.RegistroLatencias = latencias.REGISTRO):
+        self.sesion = sesion
+        self.pos_size = pos_size
+        self.saldo_minimo = saldo_minimo
+        self.ttl_plantilla = ttl_plantilla
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._plantillas: Dict[str, PlantillaOrden] = {}
+        self.registro = registro
+
+    # ===== PLANTILLAS =====
+
+    def _armar(self, symbol: str, pares_libres: int) -> PlantillaOrden:
+        """Saldo, gasto y mínimo del par (balance y mercados en caché de la sesión)"""
+        ahora = self._reloj()
+        usdt_free = self.sesion.saldo_libre('USDT')
+        if usdt_free < self.saldo_minimo:
+            return PlantillaOrden(symbol, 0.0, 0.0, ahora,
+                                  f"Saldo insuficiente (${usdt_free:.2f} < ${self.saldo_minimo:.0f} USDT)")
+
+        # El saldo libre se reparte entre los pares que aún no tienen posición
+        gasto_usdt = usdt_free * self.pos_size / max(pares_libres, 1)
+        min_cost = (self.sesion.mercado(symbol).get('limits', {}).get('cost', {}).get('min') or 10.0)
+        if gasto_usdt < min_cost:
+            return PlantillaOrden(symbol, gasto_usdt, min_cost, ahora,
+                                  f"Monto calculado menor al mínimo de Binance (${min_cost:.2f} USD)")
+        return PlantillaOrden(symbol, gasto_usdt, min_cost, ahora)
+
+    def preparar(self, symbols: Iterable[str], pares_libres: int) -> Dict[str, PlantillaOrden]:
+        """
+        Rehacer las plantillas de los pares sin posición. Se llama en cada
+        ciclo de mercado, en un hilo: si el balance venció, el fetch_balance
+        ocurre acá y no cuando llega la señal.
+        """
+        plantillas = {}
+        for symbol in symbols:
+            try:
+                plantillas[symbol] = self._armar(symbol, pares_libres)
+            except Exception as e:
+                logger.warning(f"No se pudo preparar la orden de {symbol}: {e}")
+        with self._lock:
+            self._plantillas.update(plantillas)
+        return plantillas
+
+    def plantilla(self, symbol: str, pares_libres: int) -> PlantillaOrden:
+        """La plantilla preparada, o una nueva si no hay o está vencida"""
+        with self._lock:
+            plantilla = self._plantillas.get(symbol)
+        if plantilla is None or self._reloj() - plantilla.creada >= self.ttl_plantilla:
+            plantilla = self._armar(symbol, pares_libres)
+            with self._lock:
+                self._plantillas[symbol] = plantilla
+        return plantilla
+
+    def descartar_plantillas(self):
+        """El saldo cambió (una orden se llenó): las plantillas se rehacen al usarlas"""
+        with self._lock:
+            self._plantillas.clear()
+
+    # ===== ENVÍO =====
+
+    def cantidad(self, plantilla: PlantillaOrden, precio: float) -> float:
+        """Cantidad de la compra al precio de la señal, redondeada a la precisión del par"""
+        return self.sesion.cantidad_a_precision(plantilla.symbol, plantilla.gasto_usdt / precio)
+
+    def comprar(self, plantilla: PlantillaOrden, precio: float, t_senal: Optional[float] = None) -> Dict:
+        """Enviar la compra de mercado de la plantilla (una sola petición)"""
+        cantidad = self.cantidad(plantilla, precio)
+        return self._enviar('COMPRA', 'create_market_buy_order', plantilla.symbol, cantidad, t_senal)
+
+    def vender(self, symbol: str, cantidad: float, t_senal: Optional[float] = None) -> Dict:
+        return self._enviar('VENTA', 'create_market_sell_order', symbol, cantidad, t_senal)
+
+    def _enviar(self, tipo: str, metodo: str, symbol: str, cantidad, t_senal: Optional[float]) -> Dict:
+        order = self.sesion.llamar(metodo, symbol, cantidad)
+        ack = self._reloj()
+        # La orden se llenó (o no): el saldo de la caché ya no es el de las plantillas
+        self.sesion.aplicar_orden(symbol, order)
+        self.descartar_plantillas()
+        if t_senal is not None:
+            latencia = ack - t_senal
+            self.registrar_latencia(tipo, latencia)
+            logger.info(f"⏱️ {tipo} {symbol}: señal → ack en {latencia * 1000:.0f} ms")
+        return order
+
+    # ===== LATENCIA =====
+
+    def registrar_latencia(self, tipo: str, segundos: float):
+        self.registro.registrar(f"senal_ack_{tipo.lower()}", segundos)
+
+    def resumen_latencias(self) -> Dict[str, Dict[str, float]]:
+        """Por tipo de orden: cantidad, p50, p95, p99 y máximo (en milisegundos)"""
+        return {etapa[len("senal_ack_"):].upper(): h.resumen()
+                for etapa, h in self.registro.instantanea().items() if etapa.startswith("senal_ack_")}
@@ -0,0 +1,67 @@
+"""
+Datos públicos de Binance por REST, sin ccxt
+En los teléfonos donde ccxt no está instalado el bot igual puede operar en
+simulación: velas (klines) y precios (ticker/price) son endpoints públicos
+que no necesitan firma. La clase expone el subconjunto de la interfaz de
+ccxt que usan SesionExchange y CacheVelas, así el resto del bot no cambia.
+"""
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger('ArgosBot')
+
+# API REST pública (testnet por defecto, igual que el exchange de ccxt y el feed WebSocket)
+BINANCE_REST_URL = os.getenv('BINANCE_REST_URL', 'https://testnet.binance.vision')
+BINANCE_REST_TIMEOUT_SEG = float(os.getenv('BINANCE_REST_TIMEOUT_SEG', '10'))
+# Máximo de velas por petición de klines
+MAX_VELAS = 1000
+
+
+def id_mercado(symbol: str) -> str:
+    """'BTC/USDT' -> 'BTCUSDT'"""
+    return symbol.replace('/', '')
+
+
+class BinancePublico:
+    """Cliente mínimo de datos de mercado (no opera: no tiene claves)"""
+
+    has = {'fetchTickers': True}
+
+    def __init__(self, url: str = BINANCE_REST_URL, timeout: float = BINANCE_REST_TIMEOUT_SEG,
+                 sesion: Optional[requests.Session] = None):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.sesion = sesion or requests.Session()
+
+    def _get(self, ruta: str, params: Dict):
+        r = self.sesion.get(f"{self.url}{ruta}", params=params, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def load_markets(self, reload=False) -> Dict:
+        return {}
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '15m', since: Optional[int] = None,
+                    limit: int = 500) -> List[list]:
+        """Velas [ts, open, high, low, close, vol] como las devuelve ccxt"""
+        params = {'symbol': id_mercado(symbol), 'interval': timeframe, 'limit': min(limit, MAX_VELAS)}
+        if since is not None:
+            params['startTime'] = since
+        return [[int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])]
+                for k in self._get('/api/v3/klines', params)]
+
+    def fetch_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Último precio de varios pares en una petición"""
+        por_id = {id_mercado(s): s for s in symbols}
+        precios = self._get('/api/v3/ticker/price',
+                            {'symbols': json.dumps(list(por_id), separators=(',', ':'))})
+        return {por_id[p['symbol']]: {'symbol': por_id[p['symbol']], 'last': float(p['price'])}
+                for p in precios if p['symbol'] in por_id}
+
+    def fetch_ticker(self, symbol: str) -> Dict:
+        precio = self._get('/api/v3/ticker/price', {'symbol': id_mercado(symbol)})
+        return {'symbol': symbol, 'last': float(precio['price'])}
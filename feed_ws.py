@@ -0,0 +1,203 @@
+"""
+Feed de mercado por WebSocket para Argos Trading Bot
+Se suscribe a los streams kline y bookTicker de Binance para que las
+salidas (trailing stop, take profit, stop loss) se evalúen en cada
+actualización de precio en lugar de una vez por minuto.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+# websocket-client es opcional: sin él el bot sigue en modo polling REST
+HAS_WEBSOCKET = True
+try:
+    import websocket
+except Exception:
+    HAS_WEBSOCKET = False
+
+logger = logging.getLogger('ArgosBot')
+
+# Endpoint de streams combinados (testnet por defecto, igual que el exchange REST)
+WS_URL = os.getenv('BINANCE_WS_URL', 'wss://testnet.binance.vision/stream')
+# Sin mensajes durante este tiempo el feed se considera caído (fallback a REST)
+MAX_SILENCIO_SEG = 30
+RECONEXION_MIN_SEG = 1
+RECONEXION_MAX_SEG = 60
+
+
+class ConexionWebSocket:
+    """Conexión real usando websocket-client (bloquea hasta que se cierra)"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._ws = None
+
+    def ejecutar(self, al_recibir: Callable[[str], None]):
+        self._ws = websocket.WebSocketApp(self.url, on_message=lambda ws, msg: al_recibir(msg))
+        self._ws.run_forever(ping_interval=20, ping_timeout=10)
+
+    def cerrar(self):
+        if self._ws is not None:
+            self._ws.close()
+
+
+class ReplayWebSocket:
+    """
+    Conexión simulada que reproduce mensajes grabados (un JSON por línea).
+    Sirve para tests y para depurar la lógica de salida sin red.
+    """
+
+    def __init__(self, mensajes: Iterable[str], pausa_seg: float = 0.0):
+        self.mensajes = list(mensajes)
+        self.pausa_seg = pausa_seg
+        self._cerrado = False
+
+    @classmethod
+    def desde_archivo(cls, ruta: str, pausa_seg: float = 0.0) -> "ReplayWebSocket":
+        with open(ruta, 'r') as f:
+            return cls([linea for linea in f if linea.strip()], pausa_seg)
+
+    def ejecutar(self, al_recibir: Callable[[str], None]):
+        for mensaje in self.mensajes:
+            if self._cerrado:
+                break
+            al_recibir(mensaje)
+            if self.pausa_seg:
+                time.sleep(self.pausa_seg)
+
+    def cerrar(self):
+        self._cerrado = True
+
+
+class FeedBinance:
+    """
+    Feed de precio en vivo para uno o varios pares (una sola conexión).
+
+    Corre en un hilo propio y se reconecta automáticamente con backoff
+    exponencial. El núcleo consume el último precio de cada par con
+    `esperar_precios()`; las actualizaciones intermedias se descartan porque
+    solo importa el precio más reciente. Mientras `activo` es False (feed
+    caído o sin conectar aún), el núcleo sigue las salidas por ticker REST.
+    """
+
+    def __init__(self, symbol: Union[str, List[str]], timeframe: str = '15m', url: str = WS_URL,
+                 conector: Optional[Callable[[str], object]] = None,
+                 max_silencio_seg: float = MAX_SILENCIO_SEG,
+                 reconexion_min_seg: float = RECONEXION_MIN_SEG,
+                 reconexion_max_seg: float = RECONEXION_MAX_SEG):
+        self.symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        self.symbol = self.symbols[0]
+        # 'BTCUSDT' (campo "s" de los mensajes) -> 'BTC/USDT'
+        self._por_par = {s.replace('/', '').upper(): s for s in self.symbols}
+        self.streams = []
+        for par in self._por_par:
+            self.streams += [f"{par.lower()}@kline_{timeframe}", f"{par.lower()}@bookTicker"]
+        self.url = f"{url}?streams={'/'.join(self.streams)}"
+        self.conector = conector or ConexionWebSocket
+        self.max_silencio_seg = max_silencio_seg
+        self.reconexion_min_seg = reconexion_min_seg
+        self.reconexion_max_seg = reconexion_max_seg
+
+        self.ultimo_precio: Optional[float] = None
+        self.precios: Dict[str, float] = {}
+        self.ultimo_mensaje: Optional[float] = None  # time.monotonic()
+        self.reconexiones = 0
+
+        self._condicion = threading.Condition()
+        self._pendientes: Dict[str, float] = {}
+        self._conexion = None
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    # ===== CICLO DE VIDA =====
+
+    def iniciar(self):
+        """Arrancar el hilo del feed"""
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name=f"feed-{self.symbol}", daemon=True)
+        self._hilo.start()
+        logger.info(f"Feed WebSocket iniciado: {', '.join(self.streams)}")
+
+    def detener(self, timeout: float = 5.0):
+        """Detener el hilo y cerrar la conexión"""
+        self._detener.set()
+        if self._conexion is not None:
+            self._conexion.cerrar()
+        with self._condicion:
+            self._condicion.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+
+    def _ejecutar(self):
+        espera = self.reconexion_min_seg
+        while not self._detener.is_set():
+            inicio = time.monotonic()
+            try:
+                self._conexion = self.conector(self.url)
+                self._conexion.ejecutar(self.procesar_mensaje)
+            except Exception as e:
+                logger.warning(f"Feed WebSocket con error: {e}")
+
+            if self._detener.is_set():
+                break
+
+            # Si la conexión duró, reiniciar el backoff
+            if time.monotonic() - inicio > self.reconexion_max_seg:
+                espera = self.reconexion_min_seg
+            self.reconexiones += 1
+            logger.warning(f"Feed WebSocket desconectado, reintentando en {espera:.0f}s")
+            self._detener.wait(espera)
+            espera = min(espera * 2, self.reconexion_max_seg)
+
+    # ===== MENSAJES =====
+
+    def procesar_mensaje(self, mensaje: str):
+        """Interpretar un mensaje de stream combinado (kline o bookTicker)"""
+        try:
+            datos = json.loads(mensaje)
+        except (TypeError, ValueError):
+            logger.debug(f"Mensaje WebSocket inválido: {mensaje!r}")
+            return
+        datos = datos.get('data', datos)
+
+        precio = None
+        if datos.get('e') == 'kline':
+            precio = float(datos['k']['c'])
+        elif 'b' in datos and 'a' in datos:
+            # bookTicker: el mejor bid es el precio al que saldría una venta a mercado
+            precio = float(datos['b'])
+
+        if precio is None:
+            return
+
+        symbol = self._por_par.get(datos.get('s'), self.symbol)
+        with self._condicion:
+            self.ultimo_precio = precio
+            self.precios[symbol] = precio
+            self._pendientes[symbol] = precio
+            self.ultimo_mensaje = time.monotonic()
+            self._condicion.notify_all()
+
+    # ===== CONSUMO =====
+
+    @property
+    def activo(self) -> bool:
+        """True si el feed recibió datos recientemente"""
+        return (self.ultimo_mensaje is not None and
+                time.monotonic() - self.ultimo_mensaje < self.max_silencio_seg)
+
+    def esperar_precios(self, timeout: float) -> Dict[str, float]:
+        """
+        Esperar hasta `timeout` segundos por precios nuevos de cualquier par.
+
+        Returns:
+            Último precio de cada par actualizado desde la última lectura
+        """
+        with self._condicion:
+            if not self._pendientes:
+                self._condicion.wait(timeout)
+            precios, self._pendientes = self._pendientes, {}
+            return precios
@@ -0,0 +1,230 @@
+"""
+Archivo local de velas históricas para Argos Trading Bot
+Guarda las velas OHLCV cerradas de cada par/timeframe en un .npy columnar
+(una fila por columna: ts, open, high, low, close, vol) que se abre con
+memory-map, de modo que backtest.py y optimize.py cargan años de datos en
+milisegundos sin volver a descargarlos de Binance.
+
+Uso:
+    python historico.py backfill --symbol BTC/USDT --timeframe 15m --dias 365
+    python historico.py actualizar --symbol BTC/USDT
+    python historico.py estado --symbol BTC/USDT
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from velas import COLUMNAS, timeframe_a_ms
+
+logger = logging.getLogger('ArgosBot')
+
+HISTORICO_DIR = os.getenv('HISTORICO_DIR', 'historico')
+# Velas por petición (máximo de Binance)
+LIMITE_PETICION = 1000
+
+
+def _fecha(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+
+class ArchivoVelas:
+    """
+    Archivo de velas cerradas de un par y timeframe.
+
+    Las velas se mantienen ordenadas y sin duplicados por timestamp. Cada
+    escritura reemplaza el archivo de forma atómica (archivo temporal +
+    os.replace), así que un lector nunca ve un archivo a medio escribir.
+    """
+
+    def __init__(self, symbol: str, timeframe: str = '15m', directorio: str = HISTORICO_DIR):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_a_ms(timeframe)
+        self.ruta = os.path.join(directorio, f"{symbol.replace('/', '_')}_{timeframe}.npy")
+
+    # ===== LECTURA =====
+
+    def cargar(self, mmap: bool = True) -> np.ndarray:
+        """
+        Matriz (6, n) con las columnas COLUMNAS. Con `mmap` no se copia a
+        memoria: solo se leen del disco las páginas que se usan.
+        """
+        if not os.path.exists(self.ruta):
+            return np.empty((len(COLUMNAS), 0), dtype=np.float64)
+        return np.load(self.ruta, mmap_mode='r' if mmap else None)
+
+    def a_dataframe(self, ultimas: Optional[int] = None):
+        """DataFrame con las columnas que espera el bot (y 'datetime')"""
+        import pandas as pd
+        datos = self.cargar()
+        if ultimas:
+            datos = datos[:, -ultimas:]
+        df = pd.DataFrame({columna: datos[i] for i, columna in enumerate(COLUMNAS)})
+        df['ts'] = df['ts'].astype(np.int64)
+        df['datetime'] = pd.to_datetime(df['ts'], unit='ms')
+        return df
+
+    def rango(self) -> Optional[Tuple[int, int]]:
+        """(primer ts, último ts) del archivo, o None si está vacío"""
+        ts = self.cargar()[0]
+        if ts.size == 0:
+            return None
+        return int(ts[0]), int(ts[-1])
+
+    def huecos(self) -> List[Tuple[int, int]]:
+        """
+        Tramos faltantes dentro del archivo como (primer ts faltante, último ts faltante)
+        """
+        ts = self.cargar()[0]
+        if ts.size < 2:
+            return []
+        saltos = np.flatnonzero(np.diff(ts) > self.timeframe_ms)
+        return [(int(ts[i]) + self.timeframe_ms, int(ts[i + 1]) - self.timeframe_ms) for i in saltos]
+
+    # ===== ESCRITURA =====
+
+    def fusionar(self, velas) -> int:
+        """
+        Agregar velas ([ts, o, h, l, c, v]) al archivo. Si un timestamp ya
+        existe, gana la vela nueva.
+
+        Returns:
+            Número de velas en el archivo tras la fusión
+        """
+        nuevas = np.asarray(velas, dtype=np.float64).reshape(-1, len(COLUMNAS)).T
+        if nuevas.shape[1] == 0:
+            return self.cargar().shape[1]
+
+        # Nuevas primero: np.unique se queda con la primera aparición de cada ts
+        datos = np.concatenate([nuevas, self.cargar(mmap=False)], axis=1)
+        _, indices = np.unique(datos[0], return_index=True)
+        datos = np.ascontiguousarray(datos[:, indices])
+
+        os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'wb') as f:
+            np.save(f, datos)
+        os.replace(temporal, self.ruta)
+        return datos.shape[1]
+
+    # ===== DESCARGA =====
+
+    def descargar(self, exchange, desde_ms: int, hasta_ms: int, pausa_seg: float = 0.0) -> int:
+        """
+        Descargar las velas cerradas en [desde_ms, hasta_ms] y guardarlas.
+
+        Returns:
+            Número de velas descargadas
+        """
+        # La vela abierta todavía cambia: solo se guardan velas cerradas
+        ultima_cerrada = (int(time.time() * 1000) // self.timeframe_ms - 1) * self.timeframe_ms
+        hasta_ms = min(hasta_ms, ultima_cerrada)
+
+        recibidas = []
+        since = desde_ms
+        while since <= hasta_ms:
+            ohlcv = exchange.fetch_ohlcv(self.symbol, self.timeframe, since=since, limit=LIMITE_PETICION)
+            ohlcv = [v for v in ohlcv if v[0] <= hasta_ms]
+            if not ohlcv:
+                break
+            recibidas.extend(ohlcv)
+            since = ohlcv[-1][0] + self.timeframe_ms
+            if pausa_seg:
+                time.sleep(pausa_seg)
+
+        if recibidas:
+            self.fusionar(recibidas)
+            logger.info(f"{self.symbol} {self.timeframe}: {len(recibidas)} velas descargadas "
+                        f"({_fecha(recibidas[0][0])} → {_fecha(recibidas[-1][0])})")
+        return len(recibidas)
+
+    def backfill(self, exchange, desde_ms: int, pausa_seg: float = 0.0) -> int:
+        """
+        Completar el archivo desde `desde_ms` hasta la última vela cerrada:
+        el tramo anterior al archivo, los huecos internos y el tramo final.
+        """
+        ahora = int(time.time() * 1000)
+        desde_ms = desde_ms // self.timeframe_ms * self.timeframe_ms
+        rango = self.rango()
+        if rango is None:
+            return self.descargar(exchange, desde_ms, ahora, pausa_seg)
+
+        total = 0
+        if desde_ms < rango[0]:
+            total += self.descargar(exchange, desde_ms, rango[0] - self.timeframe_ms, pausa_seg)
+        for inicio, fin in self.huecos():
+            if fin >= desde_ms:
+                total += self.descargar(exchange, max(inicio, desde_ms), fin, pausa_seg)
+        return total + self.actualizar(exchange, pausa_seg)
+
+    def actualizar(self, exchange, pausa_seg: float = 0.0) -> int:
+        """Top-up incremental: solo las velas posteriores a la última guardada"""
+        rango = self.rango()
+        if rango is None:
+            return 0
+        return self.descargar(exchange, rango[1] + self.timeframe_ms, int(time.time() * 1000), pausa_seg)
+
+
+def cargar_historico(symbol: str, timeframe: str = '15m', velas: Optional[int] = None,
+                     exchange=None, directorio: str = HISTORICO_DIR):
+    """
+    DataFrame con las últimas `velas` del archivo (todas si es None).
+    Con `exchange`, antes se completa el archivo: backfill si no alcanza y
+    top-up de las velas nuevas. Sin red se usa lo que haya en disco.
+    """
+    archivo = ArchivoVelas(symbol, timeframe, directorio)
+    if exchange is not None:
+        try:
+            disponibles = archivo.cargar().shape[1]
+            if velas and disponibles < velas:
+                desde = int(time.time() * 1000) - velas * archivo.timeframe_ms
+                archivo.backfill(exchange, desde)
+            else:
+                archivo.actualizar(exchange)
+        except Exception as e:
+            logger.warning(f"No se pudo actualizar el histórico de {symbol}, se usa el archivo local: {e}")
+    return archivo.a_dataframe(ultimas=velas)
+
+
+def crear_exchange():
+    import ccxt
+    return ccxt.binance({'enableRateLimit': True})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archivo local de velas históricas")
+    parser.add_argument('comando', choices=['backfill', 'actualizar', 'estado'])
+    parser.add_argument('--symbol', default=os.getenv('SYMBOL', 'BTC/USDT'))
+    parser.add_argument('--timeframe', default='15m')
+    parser.add_argument('--dias', type=int, default=365, help="Días hacia atrás para backfill")
+    parser.add_argument('--directorio', default=HISTORICO_DIR)
+    args = parser.parse_args(argv)
+
+    archivo = ArchivoVelas(args.symbol, args.timeframe, args.directorio)
+
+    if args.comando == 'backfill':
+        desde = int(time.time() * 1000) - args.dias * 24 * 60 * 60 * 1000
+        print(f"⏳ Backfill de {args.symbol} {args.timeframe} desde {_fecha(desde)}...")
+        print(f"✅ {archivo.backfill(crear_exchange(), desde)} velas descargadas")
+    elif args.comando == 'actualizar':
+        print(f"✅ {archivo.actualizar(crear_exchange())} velas nuevas")
+
+    rango = archivo.rango()
+    if rango is None:
+        print(f"📂 {archivo.ruta}: vacío")
+        return
+    huecos = archivo.huecos()
+    print(f"📂 {archivo.ruta}: {archivo.cargar().shape[1]} velas ({_fecha(rango[0])} → {_fecha(rango[1])})")
+    print(f"{'⚠️' if huecos else '✅'} Huecos: {len(huecos)}")
+    for inicio, fin in huecos[:10]:
+        print(f"   {_fecha(inicio)} → {_fecha(fin)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
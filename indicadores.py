@@ -0,0 +1,374 @@
+"""
+Motor incremental de indicadores técnicos para Argos Trading Bot
+RSI (Wilder), Bandas de Bollinger y EMA actualizados en O(1) por vela.
+
+Los indicadores se siembran con el histórico y luego se actualizan vela a
+vela. Reproducen las mismas recurrencias que pandas_ta (ewm / rolling de
+pandas), por lo que sobre la misma serie devuelven los mismos valores.
+"""
+import math
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+NAN = float('nan')
+
+
+def _suma_pairwise(valores: List[float]) -> float:
+    """Suma por pares con el mismo orden de operaciones que numpy.sum"""
+    n = len(valores)
+    if n < 8:
+        total = 0.0
+        for v in valores:
+            total += v
+        return total
+    if n <= 128:
+        r = list(valores[:8])
+        i = 8
+        while i < n - (n % 8):
+            for j in range(8):
+                r[j] += valores[i + j]
+            i += 8
+        total = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+        for k in range(i, n):
+            total += valores[k]
+        return total
+    n2 = n // 2
+    n2 -= n2 % 8
+    return _suma_pairwise(valores[:n2]) + _suma_pairwise(valores[n2:])
+
+
+def _alpha_desde_com(com: float) -> float:
+    """pandas convierte span/alpha a center of mass y vuelve a alpha"""
+    return 1.0 / (1.0 + com)
+
+
+class EMAIncremental:
+    """
+    EMA sembrada con SMA, equivalente a ta.ema(close, length)
+    (ewm(span=length, adjust=False) sobre la serie con la SMA inicial).
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = _alpha_desde_com((length - 1) / 2.0)
+        self._semilla: Optional[List[float]] = []
+        self.valor = NAN
+
+    def _paso(self, valor: float) -> float:
+        if self._semilla is not None:
+            if len(self._semilla) + 1 < self.length:
+                return NAN
+            return _suma_pairwise(self._semilla + [valor]) / self.length
+        ema = self.valor
+        if ema != valor:
+            old_wt = 1.0 * (1.0 - self.alpha)
+            ema = (old_wt * ema + self.alpha * valor) / (old_wt + self.alpha)
+        return ema
+
+    def actualizar(self, valor: float) -> float:
+        """Agregar una vela cerrada y devolver la nueva EMA"""
+        resultado = self._paso(valor)
+        if self._semilla is not None:
+            self._semilla.append(valor)
+            if len(self._semilla) == self.length:
+                self._semilla = None
+        self.valor = resultado
+        return resultado
+
+    def previsualizar(self, valor: float) -> float:
+        """EMA que resultaría de agregar `valor`, sin modificar el estado"""
+        return self._paso(valor)
+
+
+class _RMA:
+    """Media de Wilder: ewm(alpha=1/length, min_periods=length, adjust=True)"""
+
+    def __init__(self, length: int):
+        self.length = length
+        alpha = 1.0 / length
+        self.factor = 1.0 - _alpha_desde_com((1.0 - alpha) / alpha)
+        self.media = NAN
+        self.peso = 1.0
+        self.nobs = 0
+
+    def _paso(self, valor: float):
+        if self.nobs == 0:
+            return valor, 1.0, 1
+        peso = self.peso * self.factor
+        media = self.media
+        if media != valor:
+            media = (peso * media + valor) / (peso + 1.0)
+        return media, peso + 1.0, self.nobs + 1
+
+    def actualizar(self, valor: float) -> float:
+        self.media, self.peso, self.nobs = self._paso(valor)
+        return self.media if self.nobs >= self.length else NAN
+
+    def previsualizar(self, valor: float) -> float:
+        media, _, nobs = self._paso(valor)
+        return media if nobs >= self.length else NAN
+
+
+class RSIIncremental:
+    """RSI de Wilder equivalente a ta.rsi(close, length)"""
+
+    def __init__(self, length: int = 14):
+        self.length = length
+        self._subidas = _RMA(length)
+        self._bajadas = _RMA(length)
+        self._ultimo_cierre: Optional[float] = None
+        self.valor = NAN
+
+    @staticmethod
+    def _rsi(subida: float, bajada: float) -> float:
+        denominador = subida + abs(bajada)
+        if denominador == 0 or math.isnan(denominador):
+            return NAN
+        return 100 * subida / denominador
+
+    def actualizar(self, cierre: float) -> float:
+        """Agregar una vela cerrada y devolver el nuevo RSI"""
+        if self._ultimo_cierre is None:
+            self._ultimo_cierre = cierre
+            return NAN
+        cambio = cierre - self._ultimo_cierre
+        self._ultimo_cierre = cierre
+        subida = self._subidas.actualizar(cambio if cambio > 0 else 0.0)
+        bajada = self._bajadas.actualizar(cambio if cambio < 0 else 0.0)
+        self.valor = self._rsi(subida, bajada)
+        return self.valor
+
+    def previsualizar(self, cierre: float) -> float:
+        """RSI que resultaría de agregar `cierre`, sin modificar el estado"""
+        if self._ultimo_cierre is None:
+            return NAN
+        cambio = cierre - self._ultimo_cierre
+        return self._rsi(self._subidas.previsualizar(cambio if cambio > 0 else 0.0),
+                         self._bajadas.previsualizar(cambio if cambio < 0 else 0.0))
+
+
+class BollingerIncremental:
+    """
+    Bandas de Bollinger equivalentes a ta.bbands(close, length, std):
+    media móvil simple +/- std * desviación estándar poblacional (ddof=0).
+
+    Usa la suma con compensación de Kahan y la varianza online de Welford
+    con altas y bajas en la ventana, igual que rolling().mean()/var().
+    """
+
+    def __init__(self, length: int = 20, std: float = 2.0):
+        self.length = length
+        self.std = std
+        self.ventana = deque()
+        # Estado de la media (suma compensada)
+        self._suma = 0.0
+        self._comp_suma_alta = 0.0
+        self._comp_suma_baja = 0.0
+        self._negativos = 0
+        # Estado de la varianza (Welford compensado)
+        self._media = 0.0
+        self._ssqdm = 0.0
+        self._comp_var_alta = 0.0
+        self._comp_var_baja = 0.0
+        # Valores repetidos consecutivos (pandas los trata como varianza 0)
+        self._repetidos = 0
+        self._previo = NAN
+        self.valor = (NAN, NAN, NAN)
+
+    @property
+    def columnas(self) -> List[str]:
+        sufijo = f"{self.length}_{float(self.std)}"
+        return [f"BBL_{sufijo}", f"BBM_{sufijo}", f"BBU_{sufijo}"]
+
+    @staticmethod
+    def _sumar(suma, comp, valor):
+        y = valor - comp
+        t = suma + y
+        return t, t - suma - y
+
+    @staticmethod
+    def _welford_alta(nobs, media, ssqdm, comp, valor):
+        media_previa = media - comp
+        y = valor - comp
+        t = y - media
+        comp = t + media - y
+        media = media + t / nobs
+        ssqdm = ssqdm + (valor - media_previa) * (valor - media)
+        return media, ssqdm, comp
+
+    @staticmethod
+    def _welford_baja(nobs, media, ssqdm, comp, valor):
+        if not nobs:
+            return 0.0, 0.0, comp
+        media_previa = media - comp
+        y = valor - comp
+        t = y - media
+        comp = t + media - y
+        media = media - t / nobs
+        ssqdm = ssqdm - (valor - media_previa) * (valor - media)
+        return media, ssqdm, comp
+
+    def _paso(self, valor: float):
+        suma, comp_sa, comp_sb = self._suma, self._comp_suma_alta, self._comp_suma_baja
+        media, ssqdm = self._media, self._ssqdm
+        comp_va, comp_vb = self._comp_var_alta, self._comp_var_baja
+        negativos = self._negativos
+        nobs = len(self.ventana)
+
+        if not self.ventana:
+            # Primera ventana: pandas parte con el primer valor como "previo"
+            repetidos, previo = 0, valor
+        else:
+            repetidos, previo = self._repetidos, self._previo
+
+        if nobs == self.length:
+            saliente = self.ventana[0]
+            nobs -= 1
+            suma, comp_sb = self._sumar(suma, comp_sb, -saliente)
+            if math.copysign(1.0, saliente) < 0:
+                negativos -= 1
+            media, ssqdm, comp_vb = self._welford_baja(nobs, media, ssqdm, comp_vb, saliente)
+
+        nobs += 1
+        suma, comp_sa = self._sumar(suma, comp_sa, valor)
+        if math.copysign(1.0, valor) < 0:
+            negativos += 1
+        repetidos = repetidos + 1 if valor == previo else 1
+        media, ssqdm, comp_va = self._welford_alta(nobs, media, ssqdm, comp_va, valor)
+
+        estado = (suma, comp_sa, comp_sb, negativos, media, ssqdm, comp_va, comp_vb, valor, repetidos)
+        return estado, self._bandas(nobs, suma, negativos, ssqdm, repetidos, valor)
+
+    def _bandas(self, nobs, suma, negativos, ssqdm, repetidos, previo):
+        if nobs < self.length:
+            return (NAN, NAN, NAN)
+        if repetidos >= nobs:
+            mid, varianza = previo, 0.0
+        else:
+            mid = suma / nobs
+            if negativos == 0 and mid < 0:
+                mid = 0.0
+            elif negativos == nobs and mid > 0:
+                mid = 0.0
+            varianza = 0.0 if nobs == 1 else ssqdm / nobs
+        desvio = self.std * (math.sqrt(varianza) if varianza > 0 else 0.0)
+        return (mid - desvio, mid, mid + desvio)
+
+    def actualizar(self, valor: float):
+        """Agregar una vela cerrada y devolver (inferior, media, superior)"""
+        estado, bandas = self._paso(valor)
+        (self._suma, self._comp_suma_alta, self._comp_suma_baja, self._negativos,
+         self._media, self._ssqdm, self._comp_var_alta, self._comp_var_baja,
+         self._previo, self._repetidos) = estado
+        if len(self.ventana) == self.length:
+            self.ventana.popleft()
+        self.ventana.append(valor)
+        self.valor = bandas
+        return bandas
+
+    def previsualizar(self, valor: float):
+        """Bandas que resultarían de agregar `valor`, sin modificar el estado"""
+        return self._paso(valor)[1]
+
+
+class MotorIndicadores:
+    """
+    Conjunto de indicadores de la estrategia Triple Filtro (RSI, Bollinger, EMA)
+    alineado con una serie de velas OHLCV cuya última vela está abierta.
+
+    Las velas cerradas se confirman una sola vez; la vela abierta se recalcula
+    en cada tick a partir del estado confirmado, sin recorrer la serie.
+    """
+
+    def __init__(self, rsi_length: int = 14, bb_length: int = 20, bb_std: float = 2.0,
+                 ema_length: int = 20, max_historial: int = 500):
+        self.parametros = (rsi_length, bb_length, bb_std, ema_length)
+        self.max_historial = max_historial
+        self._reiniciar()
+
+    def _reiniciar(self):
+        rsi_length, bb_length, bb_std, ema_length = self.parametros
+        self.rsi = RSIIncremental(rsi_length)
+        self.bollinger = BollingerIncremental(bb_length, bb_std)
+        self.ema = EMAIncremental(ema_length)
+        self.ts_confirmado: Optional[int] = None
+        self.series: Dict[str, deque] = {
+            nombre: deque(maxlen=self.max_historial)
+            for nombre in ['RSI'] + self.bollinger.columnas + ['EMA']
+        }
+        self._abierta: Optional[Dict[str, float]] = None
+
+    def _guardar(self, destino: Dict, rsi, bandas, ema):
+        bbl, bbm, bbu = self.bollinger.columnas
+        destino['RSI'] = rsi
+        destino[bbl], destino[bbm], destino[bbu] = bandas
+        destino['EMA'] = ema
+
+    def confirmar(self, cierre: float):
+        """Agregar una vela cerrada a todos los indicadores"""
+        valores = {}
+        self._guardar(valores, self.rsi.actualizar(cierre),
+                      self.bollinger.actualizar(cierre), self.ema.actualizar(cierre))
+        for nombre, valor in valores.items():
+            self.series[nombre].append(valor)
+
+    def previsualizar(self, cierre: float) -> Dict[str, float]:
+        """Valores de los indicadores para una vela abierta con este cierre"""
+        valores = {}
+        self._guardar(valores, self.rsi.previsualizar(cierre),
+                      self.bollinger.previsualizar(cierre), self.ema.previsualizar(cierre))
+        return valores
+
+    def sincronizar(self, velas: List[list], timeframe_ms: Optional[int] = None):
+        """
+        Procesar velas OHLCV ([ts, open, high, low, close, vol]) cuya última
+        vela está abierta: confirma las velas cerradas nuevas y recalcula la
+        abierta. Si hay un hueco respecto a lo ya confirmado, se vuelve a sembrar.
+        """
+        if not velas:
+            return
+        cerradas = velas[:-1]
+
+        if self.ts_confirmado is not None:
+            nuevas = [v for v in cerradas if v[0] > self.ts_confirmado]
+            if nuevas and timeframe_ms and nuevas[0][0] != self.ts_confirmado + timeframe_ms:
+                self._reiniciar()
+                nuevas = cerradas
+        else:
+            nuevas = cerradas
+
+        for vela in nuevas:
+            self.confirmar(vela[4])
+            self.ts_confirmado = vela[0]
+
+        self._abierta = self.previsualizar(velas[-1][4])
+
+    def ultimos(self) -> Dict[str, float]:
+        """Valores actuales (vela abierta si la hay, si no la última confirmada)"""
+        if self._abierta is not None:
+            return dict(self._abierta)
+        return {nombre: (serie[-1] if serie else NAN) for nombre, serie in self.series.items()}
+
+    def columnas(self, n: int) -> Dict[str, List[float]]:
+        """
+        Últimos `n` valores de cada indicador (incluida la vela abierta),
+        rellenando con NaN al inicio si el historial es más corto.
+        """
+        resultado = {}
+        for nombre, serie in self.series.items():
+            valores = list(serie)
+            if self._abierta is not None:
+                valores.append(self._abierta[nombre])
+            valores = valores[-n:]
+            resultado[nombre] = [NAN] * (n - len(valores)) + valores
+        return resultado
+
+
+def calcular_series(cierres: Iterable[float], rsi_length: int = 14, bb_length: int = 20,
+                    bb_std: float = 2.0, ema_length: int = 20) -> Dict[str, List[float]]:
+    """Calcular las series completas de indicadores (todas las velas confirmadas)"""
+    cierres = list(cierres)
+    motor = MotorIndicadores(rsi_length, bb_length, bb_std, ema_length, max_historial=max(len(cierres), 1))
+    for cierre in cierres:
+        motor.confirmar(cierre)
+    return {nombre: list(serie) for nombre, serie in motor.series.items()}
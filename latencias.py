@@ -0,0 +1,257 @@
+"""
+Latencias por etapa para Argos Trading Bot
+Cada etapa del bot (datos de mercado, indicadores, estrategia, dashboard,
+comandos, órdenes y cada llamada al exchange) se mide con
+`REGISTRO.medir(etapa)` y se acumula en un histograma en memoria al estilo
+HDR: cubetas log-lineales en microsegundos (32 por potencia de 2, ~3% de
+error) que cuestan un incremento de diccionario por muestra.
+
+El bot guarda los histogramas en la tabla `latencias` de argos.db; el
+dashboard los expone en formato Prometheus (/metrics) y el reporte diario
+resume los percentiles del día.
+"""
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Segundos entre volcados de los histogramas a la base
+LATENCIAS_GUARDAR_SEG = float(os.getenv("LATENCIAS_GUARDAR_SEG", "60"))
+
+# Bits de la parte lineal: 2**BITS valores exactos, luego 2**(BITS-1) cubetas por potencia de 2
+BITS = 6
+LINEAL = 1 << BITS
+MITAD = LINEAL >> 1
+
+# Límites (segundos) de las cubetas `le` que se publican en Prometheus
+LIMITES_PROMETHEUS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                      1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SQL_CREAR = """
+    CREATE TABLE IF NOT EXISTS latencias (
+        etapa TEXT PRIMARY KEY,
+        cubetas TEXT NOT NULL,          -- JSON {indice: cantidad}
+        cantidad INTEGER NOT NULL,
+        suma REAL NOT NULL,
+        maximo REAL NOT NULL,
+        actualizado TEXT NOT NULL
+    )
+"""
+
+
+def indice(us: int) -> int:
+    """Cubeta de un valor en microsegundos"""
+    if us < LINEAL:
+        return max(us, 0)
+    corrimiento = us.bit_length() - BITS
+    return LINEAL + (corrimiento - 1) * MITAD + (us >> corrimiento) - MITAD
+
+
+def techo(i: int) -> int:
+    """Mayor valor (µs) que cae en la cubeta `i`"""
+    if i < LINEAL:
+        return i
+    corrimiento = (i - LINEAL) // MITAD + 1
+    sub = (i - LINEAL) % MITAD + MITAD
+    return ((sub + 1) << corrimiento) - 1
+
+
+class Histograma:
+    """Distribución de latencias (no es seguro entre hilos: lo protege el registro)"""
+
+    __slots__ = ("cubetas", "cantidad", "suma", "maximo")
+
+    def __init__(self):
+        self.cubetas: Dict[int, int] = {}
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos: float):
+        i = indice(int(segundos * 1e6))
+        self.cubetas[i] = self.cubetas.get(i, 0) + 1
+        self.cantidad += 1
+        self.suma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p: float) -> float:
+        """Percentil `p` (0-100) en segundos, con el error relativo de las cubetas"""
+        if self.cantidad == 0:
+            return 0.0
+        objetivo = max(p / 100 * self.cantidad, 1)
+        acumulado = 0
+        for i in sorted(self.cubetas):
+            acumulado += self.cubetas[i]
+            if acumulado >= objetivo:
+                return min(techo(i) / 1e6, self.maximo)
+        return self.maximo
+
+    def hasta(self, limite: float) -> int:
+        """Muestras de hasta `limite` segundos (para las cubetas acumuladas de Prometheus)"""
+        return sum(n for i, n in self.cubetas.items() if techo(i) <= limite * 1e6)
+
+    def resumen(self) -> Dict[str, float]:
+        return {"cantidad": self.cantidad, "p50_ms": self.percentil(50) * 1000,
+                "p95_ms": self.percentil(95) * 1000, "p99_ms": self.percentil(99) * 1000,
+                "max_ms": self.maximo * 1000}
+
+    def copia(self) -> "Histograma":
+        otro = Histograma()
+        otro.cubetas = dict(self.cubetas)
+        otro.cantidad, otro.suma, otro.maximo = self.cantidad, self.suma, self.maximo
+        return otro
+
+
+class _Medicion:
+    """Context manager de REGISTRO.medir() (clase y no generador: menos costo por uso)"""
+
+    __slots__ = ("registro", "etapa", "inicio")
+
+    def __init__(self, registro: "RegistroLatencias", etapa: str):
+        self.registro = registro
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registro.registrar(self.etapa, time.perf_counter() - self.inicio)
+        return False
+
+
+class RegistroLatencias:
+    """
+    Histogramas por etapa. Cada muestra va al acumulado desde el arranque
+    (el que se publica) y al del periodo en curso (el del reporte diario).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total: Dict[str, Histograma] = {}
+        self.periodo: Dict[str, Histograma] = {}
+        self._ultimo_guardado = 0.0
+
+    def medir(self, etapa: str) -> _Medicion:
+        return _Medicion(self, etapa)
+
+    def registrar(self, etapa: str, segundos: float):
+        with self._lock:
+            for histogramas in (self.total, self.periodo):
+                histograma = histogramas.get(etapa)
+                if histograma is None:
+                    histograma = histogramas[etapa] = Histograma()
+                histograma.registrar(segundos)
+
+    def instantanea(self) -> Dict[str, Histograma]:
+        """Copia del acumulado total (para volcarlo sin frenar a quien registra)"""
+        with self._lock:
+            return {etapa: h.copia() for etapa, h in self.total.items()}
+
+    def cerrar_periodo(self) -> Dict[str, Histograma]:
+        """Histogramas del periodo que termina; empieza uno nuevo"""
+        with self._lock:
+            periodo, self.periodo = self.periodo, {}
+        return periodo
+
+    def guardar_si_vencido(self, db, intervalo: float = LATENCIAS_GUARDAR_SEG):
+        """Volcar a la base como mucho cada `intervalo` segundos"""
+        if time.monotonic() - self._ultimo_guardado >= intervalo:
+            self._ultimo_guardado = time.monotonic()
+            db.guardar_latencias(self.instantanea())
+
+
+# Registro global del proceso
+REGISTRO = RegistroLatencias()
+
+
+def medir(etapa: str) -> _Medicion:
+    return REGISTRO.medir(etapa)
+
+
+def registrar(etapa: str, segundos: float):
+    REGISTRO.registrar(etapa, segundos)
+
+
+def cronometrado(etapa: str):
+    """Decorador: cada llamada a la función se mide como `etapa`"""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with REGISTRO.medir(etapa):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# ===== PERSISTENCIA =====
+
+def crear_tablas(conn: sqlite3.Connection):
+    conn.execute(SQL_CREAR)
+
+
+def guardar(conn: sqlite3.Connection, histogramas: Dict[str, Histograma]):
+    """
+    Reemplazar los histogramas guardados (no confirma). Son acumulados desde
+    el arranque del bot: al reiniciar vuelven a cero, como un contador de Prometheus.
+    """
+    ahora = datetime.now().isoformat()
+    conn.execute("DELETE FROM latencias")
+    conn.executemany("INSERT OR REPLACE INTO latencias VALUES (?, ?, ?, ?, ?, ?)", [
+        (etapa, json.dumps(h.cubetas, separators=(',', ':')), h.cantidad, h.suma, h.maximo, ahora)
+        for etapa, h in histogramas.items()])
+
+
+def cargar(conn: sqlite3.Connection) -> Dict[str, Histograma]:
+    histogramas = {}
+    for etapa, cubetas, cantidad, suma, maximo, _ in conn.execute("SELECT * FROM latencias ORDER BY etapa"):
+        h = Histograma()
+        h.cubetas = {int(i): n for i, n in json.loads(cubetas).items()}
+        h.cantidad, h.suma, h.maximo = cantidad, suma, maximo
+        histogramas[etapa] = h
+    return histogramas
+
+
+# ===== FORMATOS =====
+
+def _etiqueta(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus(histogramas: Dict[str, Histograma], limites: Iterable[float] = LIMITES_PROMETHEUS) -> str:
+    """Exposición en formato de texto de Prometheus (un histograma con la etapa como etiqueta)"""
+    lineas: List[str] = [
+        "# HELP argos_etapa_segundos Duración de cada etapa del bot",
+        "# TYPE argos_etapa_segundos histogram",
+    ]
+    for etapa, h in sorted(histogramas.items()):
+        nombre = _etiqueta(etapa)
+        for limite in limites:
+            lineas.append(f'argos_etapa_segundos_bucket{{etapa="{nombre}",le="{limite}"}} {h.hasta(limite)}')
+        lineas.append(f'argos_etapa_segundos_bucket{{etapa="{nombre}",le="+Inf"}} {h.cantidad}')
+        lineas.append(f'argos_etapa_segundos_sum{{etapa="{nombre}"}} {h.suma}')
+        lineas.append(f'argos_etapa_segundos_count{{etapa="{nombre}"}} {h.cantidad}')
+    lineas += [
+        "# HELP argos_etapa_max_segundos Máxima duración observada de cada etapa",
+        "# TYPE argos_etapa_max_segundos gauge",
+    ]
+    lineas += [f'argos_etapa_max_segundos{{etapa="{_etiqueta(etapa)}"}} {h.maximo}'
+               for etapa, h in sorted(histogramas.items())]
+    return "\n".join(lineas) + "\n"
+
+
+def texto_resumen(histogramas: Dict[str, Histograma], etapas: Optional[Iterable[str]] = None) -> str:
+    """Líneas 'etapa: p50 / p95 / max (n)' en milisegundos, para el reporte diario"""
+    lineas = []
+    for etapa in etapas or sorted(histogramas):
+        h = histogramas.get(etapa)
+        if h is None or h.cantidad == 0:
+            continue
+        r = h.resumen()
+        lineas.append(f"{etapa}: {r['p50_ms']:.0f} / {r['p95_ms']:.0f} / {r['max_ms']:.0f} ms ({h.cantidad})")
+    return "\n".join(lineas)
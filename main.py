@@ -1,47 +1,30 @@
+import asyncio
+import contextlib
+import importlib.util
+from array import array
+import math
 import os
-import sys
-
-# Mock or make optional heavy imports so the app can run in degraded mode on-device
-HAS_NUMBA = True
-try:
-    import numba
-except Exception:
-    HAS_NUMBA = False
-    from unittest.mock import MagicMock
-    mock_numba = MagicMock()
-    mock_numba.njit = lambda f=None, *args, **kwargs: f if f else lambda x: x
-    mock_numba.jit = lambda f=None, *args, **kwargs: f if f else lambda x: x
-    sys.modules["numba"] = mock_numba
-
 import time
-import requests
 import datetime
-# Optional heavy libs
-HAS_CCXT = True
-HAS_PANDAS = True
-HAS_PANDAS_TA = True
-try:
-    import ccxt
-except Exception:
-    HAS_CCXT = False
-try:
-    import pandas as pd
-except Exception:
-    HAS_PANDAS = False
-try:
-    import pandas_ta as ta
-except Exception:
-    HAS_PANDAS_TA = False
+# Dependencias pesadas (ccxt, rich): solo se comprueba que estén instaladas;
+# se importan al usarlas, así un reinicio del watchdog no paga su importación
+# antes de volver a operar. pandas no hace falta (ver obtener_datos)
+HAS_CCXT = importlib.util.find_spec("ccxt") is not None
 import logging
 from logging.handlers import RotatingFileHandler
-from rich.console import Console
-from rich.table import Table
-from rich.live import Live
-from rich.panel import Panel
-from rich.text import Text
 from dotenv import load_dotenv
-from notificaciones import enviar_telegram 
-from memoria import cargar_estado, guardar_estado
+from notificaciones import enviar_telegram, ALTA, NORMAL, BAJA
+from comandos import crear_escucha
+from nucleo import NucleoAsync
+from memoria import cargar_estado
+from database import get_db
+from mercados import SesionExchange, MercadosMultiples
+from exchange_publico import BinancePublico
+from ejecucion import EjecutorOrdenes
+from salidas import GestorSalidas
+import latencias
+from latencias import cronometrado
+from feed_ws import FeedBinance, HAS_WEBSOCKET
 
 # 1. Configuración Inicial
 load_dotenv()
@@ -66,56 +49,160 @@ logger.setLevel(logging.DEBUG)
 logger.addHandler(file_handler)
 logger.addHandler(console_handler)
 
-# Configurar Rich Console para dashboard
-console = Console()
+# Rich Console del dashboard (se crea al primer uso, ver consola())
+console = None
 
-# Configuración del Exchange (Binance por defecto)
-# Se usa 'enableRateLimit': True para respetar los límites de la API
+# Exchange (Binance por defecto): se crea en conectar() al arrancar el loop, no al importar
 exchange_id = 'binance'
 exchange = None
-if HAS_CCXT:
-    try:
-        exchange_class = getattr(ccxt, exchange_id)
-        exchange = exchange_class({
-            'apiKey': os.getenv('BINANCE_API_KEY'),
-            'secret': os.getenv('BINANCE_SECRET_KEY'),
-            'enableRateLimit': True,
-            'options': {'defaultType': 'spot'} 
-        })
-        # Si estamos en modo TESTNET (Sandbox), activar si el exchange lo soporta
-        try:
-            exchange.set_sandbox_mode(True)
-        except Exception:
-            pass
-    except Exception as e:
-        logger = logging.getLogger('ArgosBot') if 'logger' in globals() else None
-        if logger:
-            logger.warning(f"ccxt cargado pero no se pudo inicializar exchange: {e}")
-        exchange = None
-else:
-    # En modo degradado no hay acceso a ccxt; desactivar trading en vivo
-    pass
 
 SYMBOL = os.getenv('SYMBOL', 'BTC/USDT')
+# Pares a operar desde un mismo proceso (separados por coma); por defecto solo SYMBOL
+SYMBOLS = [s.strip() for s in os.getenv('SYMBOLS', SYMBOL).split(',') if s.strip()]
 # Parsear porcentajes
 SL = float(os.getenv('STOP_LOSS_PCT', 0.01))
 TP = float(os.getenv('TAKE_PROFIT_PCT', 0.015))
 TS = float(os.getenv('TRAILING_STOP_PCT', 0.005))
 POS_SIZE = float(os.getenv('POSITION_SIZE_PCT', 0.95)) # 95% del saldo
 SIMULATION_MODE = os.getenv('SIMULATION_MODE', 'True').lower() == 'true'
-
-estado = cargar_estado()
+# Feed WebSocket (kline + bookTicker) para evaluar salidas en cada precio
+MODO_WEBSOCKET = os.getenv('MODO_WEBSOCKET', 'False').lower() == 'true'
+
+# Sesión, mercados, plantillas de compra y salidas del exchange: los crea conectar()
+sesion = None
+mercados = None
+ejecutor = None
+salidas = None
+
+# Base de datos y estado por par: los abre abrir_base(), no la importación
+db = None
+estados = {}
 ultima_vez_vivo = datetime.datetime.now()
 ultimo_reporte_dia = datetime.datetime.now().day
 
+# Núcleo asíncrono y feed WebSocket (se crean en main())
+nucleo = None
+feed = None
+# Pares cuyas velas en caché ya se volcaron completas a la tabla velas
+velas_persistidas = set()
+
+
+def consola():
+    """Consola de Rich del dashboard (rich se importa al primer uso)"""
+    global console
+    if console is None:
+        from rich.console import Console
+        console = Console()
+    return console
+
+
+def crear_exchange():
+    """Cliente ccxt del exchange (importa ccxt: unos segundos en Termux)"""
+    import ccxt
+    # Se usa 'enableRateLimit': True para respetar los límites de la API
+    cliente = getattr(ccxt, exchange_id)({
+        'apiKey': os.getenv('BINANCE_API_KEY'),
+        'secret': os.getenv('BINANCE_SECRET_KEY'),
+        'enableRateLimit': True,
+        'options': {'defaultType': 'spot'}
+    })
+    # Si estamos en modo TESTNET (Sandbox), activar si el exchange lo soporta
+    try:
+        cliente.set_sandbox_mode(True)
+    except Exception:
+        pass
+    return cliente
+
+
+def crear_mercados(sesion, symbols=None):
+    """Por par: caché de velas incremental e indicadores RSI 14, Bollinger (20, 2) y EMA 20"""
+    return MercadosMultiples(sesion, symbols or SYMBOLS, timeframe='15m', limite=500, rsi_length=14,
+                             bb_length=20, bb_std=2, ema_length=20)
+
+
+def abrir_base():
+    """
+    Abrir argos.db (esquema, migraciones y acumuladores de métricas) y
+    cargar el estado de cada par; el primer par hereda el estado JSON del
+    bot de un solo par
+    """
+    global db
+    if db is not None:
+        return
+    db = get_db()
+    estados.update({s: db.cargar_estado_simbolo(s, inicial=cargar_estado() if s == SYMBOLS[0] else None)
+                    for s in SYMBOLS})
+
+
+def conectar():
+    """
+    Abrir la base y crear el exchange y lo que depende de él. Los mercados (load_markets) y
+    el balance se piden recién cuando se usan; las velas e indicadores de
+    cada par arrancan en caliente desde las últimas velas guardadas, así
+    el primer ciclo solo descarga las velas que faltan desde el reinicio.
+    Sin ccxt, en simulación, los datos de mercado salen de la API pública
+    de Binance (BinancePublico) y la estrategia corre igual.
+    """
+    global exchange, sesion, mercados, ejecutor, salidas
+    abrir_base()
+    if exchange is not None:
+        return
+    if HAS_CCXT:
+        try:
+            exchange = crear_exchange()
+        except Exception as e:
+            logger.warning(f"ccxt cargado pero no se pudo inicializar exchange: {e}")
+            return
+    elif SIMULATION_MODE:
+        logger.info("ccxt no está instalado: datos de mercado por la API pública de Binance (simulación)")
+        exchange = BinancePublico()
+    else:
+        return
+
+    # Una sola sesión para todos los pares (un rate limit y un load_markets compartidos)
+    sesion = SesionExchange(exchange)
+    mercados = crear_mercados(sesion)
+    precargadas = mercados.precargar(db)
+    # Lo precargado ya está en la tabla velas: solo se persisten las velas nuevas
+    velas_persistidas.update(s for s, n in precargadas.items() if n)
+    logger.info(f"Velas precargadas (arranque en caliente): {precargadas}")
+    # Compras preparadas por par (saldo, gasto y mínimos) para enviarlas apenas llega la señal
+    ejecutor = EjecutorOrdenes(sesion, POS_SIZE)
+    # Salidas (OCO / stop-limit con trailing) colocadas en el exchange en modo real
+    salidas = GestorSalidas(sesion, SL, TP, TS, db) if not SIMULATION_MODE else None
+
+
+def guardar_estado(symbol):
+    db.guardar_estado_simbolo(symbol, estados[symbol])
+
+
+def notificar(mensaje, prioridad=NORMAL):
+    """
+    Notificación no bloqueante: se encola y la envía el despachador de
+    Telegram en segundo plano (con la API lenta se descartan primero las de
+    prioridad BAJA; trades y errores van con ALTA).
+    """
+    enviar_telegram(mensaje, prioridad=prioridad)
+
+
+# Etapas que resume el reporte diario (el resto se ve en /metrics)
+ETAPAS_REPORTE = ("mercado", "velas", "indicadores", "estrategia", "dashboard", "comandos", "orden",
+                  "senal_ack_compra", "senal_ack_venta", "exchange_fetch_tickers", "exchange_fetch_ohlcv")
+
+
 def verificar_reporte_diario():
+    """
+    Reporte diario y reinicio de los contadores del día. Corre en
+    mantener_base(): guardar los contadores es una escritura crítica
+    (commit inmediato) que no debe esperar al lock de la base en el loop.
+    """
     global ultimo_reporte_dia
     ahora = datetime.datetime.now()
     
     # Si cambió de día y son las 8:00 AM (o después)
     if ahora.day != ultimo_reporte_dia and ahora.hour >= 8:
-        ops = estado.get("operaciones_hoy", 0)
-        pnl = estado.get("pnl_acumulado", 0.0)
+        ops = sum(e.get("operaciones_hoy", 0) for e in estados.values())
+        pnl = sum(e.get("pnl_acumulado", 0.0) for e in estados.values())
         saldo_simulado = 1000 * (1 + pnl/100) # Estimado
         
         msg = f"""📅 **REPORTE DIARIO ARGOS**
@@ -124,13 +211,18 @@ def verificar_reporte_diario():
 💰 PnL del Día: {pnl:+.2f}%
 💵 Capital Est.: ${saldo_simulado:.2f}
 -------------------------"""
-        enviar_telegram(msg)
+        # Latencias del día por etapa (p50 / p95 / max)
+        resumen_latencias = latencias.texto_resumen(latencias.REGISTRO.cerrar_periodo(), ETAPAS_REPORTE)
+        if resumen_latencias:
+            msg += f"\n⏱️ Latencias (p50 / p95 / max):\n{resumen_latencias}"
+        notificar(msg)
         logger.info(f"Reporte diario enviado: {ops} operaciones, PnL: {pnl:.2f}%")
         
         # Resetear contadores
-        estado["operaciones_hoy"] = 0
-        estado["pnl_acumulado"] = 0.0
-        guardar_estado(estado)
+        for symbol, estado in estados.items():
+            estado["operaciones_hoy"] = 0
+            estado["pnl_acumulado"] = 0.0
+            guardar_estado(symbol)
         
         ultimo_reporte_dia = ahora.day
 
@@ -149,156 +241,190 @@ def guardar_trade_csv(fecha, tipo, precio, resultado_pct):
         f.write(f"{fecha},{tipo},{precio},{resultado_pct:.4f},{ganancia_usd:.2f}\n")
         logger.info(f"Trade guardado: {tipo} a ${precio:.2f}, PnL: {resultado_pct*100:.2f}%")
 
-def registrar_operacion(tipo, precio_venta, pnl_pct):
+def guardar_trade_db(symbol, tipo, precio_venta, pnl_pct, cantidad=None):
+    """Trade cerrado en la tabla trades (con la posición del estado antes de cerrarla)"""
+    estado = estados[symbol]
+    ahora = datetime.datetime.now()
+    try:
+        compra = datetime.datetime.fromisoformat(str(estado.get("fecha_compra")))
+    except ValueError:
+        compra = ahora
+    cantidad = float(cantidad or estado.get("cantidad") or 0)
+    try:
+        db.guardar_trade({
+            'timestamp_compra': compra.isoformat(),
+            'timestamp_venta': ahora.isoformat(),
+            'precio_compra': estado["precio_compra"],
+            'precio_venta': precio_venta,
+            'cantidad': cantidad,
+            'pnl_usd': (precio_venta - estado["precio_compra"]) * cantidad,
+            'pnl_pct': pnl_pct * 100,
+            'razon_salida': tipo,
+            'max_precio': estado.get("max_precio"),
+            'trailing_pct': TS * 100,
+            'duracion_minutos': int((ahora - compra).total_seconds() // 60),
+        })
+    except Exception as e:
+        logger.error(f"Error guardando trade de {symbol}: {e}", exc_info=True)
+
+def registrar_operacion(symbol, tipo, precio_venta, pnl_pct, cantidad=None):
+    estado = estados[symbol]
     # Actualizar Stats en Memoria
     estado["operaciones_hoy"] = estado.get("operaciones_hoy", 0) + 1
     estado["pnl_acumulado"] = estado.get("pnl_acumulado", 0.0) + (pnl_pct * 100)
     
-    # Guardar en CSV
+    # Guardar en CSV y en la tabla trades
     guardar_trade_csv(datetime.datetime.now(), tipo, precio_venta, pnl_pct)
+    guardar_trade_db(symbol, tipo, precio_venta, pnl_pct, cantidad)
 
     # Cerrar Posición
     estado["posicion_abierta"] = False
     estado["max_precio"] = 0.0
-    guardar_estado(estado)
+    guardar_estado(symbol)
     
-    logger.info(f"{tipo} ejecutado: Precio=${precio_venta:.2f}, PnL={pnl_pct*100:.2f}%")
+    logger.info(f"{symbol} {tipo} ejecutado: Precio=${precio_venta:.2f}, PnL={pnl_pct*100:.2f}%")
 
     # Mensaje Telegram
     icono = "✅" if pnl_pct > 0 else "❌"
-    enviar_telegram(f"{icono} **{tipo} EJECUTADO**\nVenta: {precio_venta}\nResultado: {pnl_pct*100:.2f}%")
-
-
-def check_balance():
+    notificar(f"{icono} **{tipo} EJECUTADO** ({symbol})\nVenta: {precio_venta}\nResultado: {pnl_pct*100:.2f}%", ALTA)
+
+
+def registrar_llenado(symbol, llenado):
+    """Cierre de una posición por una salida que se llenó en el exchange"""
+    # La venta no pasó por la sesión: el balance en caché ya no vale
+    sesion.invalidar_balance()
+    ejecutor.descartar_plantillas()
+    precio_entrada = estados[symbol]["precio_compra"]
+    registrar_operacion(symbol, llenado.razon, llenado.precio, (llenado.precio - precio_entrada) / precio_entrada,
+                        llenado.cantidad)
+
+@cronometrado("salidas")
+def reconciliar_salidas():
+    """Llenados de las salidas del exchange, re-anclaje del trailing y salidas faltantes"""
+    if salidas is None:
+        return
+    for symbol, estado in estados.items():
+        # El llenado se registra antes de soltar el lock: una venta del loop ya ve la posición cerrada
+        with salidas.bloqueo(symbol):
+            try:
+                llenado = salidas.reconciliar(symbol, estado)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo reconciliar la salida de {symbol}: {e}")
+                continue
+            if llenado is not None:
+                registrar_llenado(symbol, llenado)
+
+@cronometrado("velas")
+def actualizar_mercados():
+    """Actualiza velas e indicadores de todos los pares (un ticker batch por ciclo)"""
+    if mercados is None:
+        return {}
+    recibidas = mercados.actualizar()
+    logger.debug(f"Velas OHLCV recibidas por par: {recibidas}")
+    guardar_velas(recibidas)
+    return recibidas
+
+def guardar_velas(recibidas):
     """
-    Verifica si tenemos suficiente USDT en la billetera SPOT para operar.
-    Retorna True si hay > 15 USDT (mínimo de seguridad).
+    Persistir las velas para el gráfico del dashboard: la primera vez todo el
+    caché del par, después solo las velas recibidas más la vela abierta
+    (escritura diferida, en lote)
     """
-    try:
-        balance = exchange.fetch_balance()
-        usdt_free = balance.get('USDT', {}).get('free', 0.0)
-        
-        if usdt_free < 15: # Binance suele pedir min $10, ponemos $15 por seguridad
-            logger.warning(f"Saldo insuficiente: ${usdt_free:.2f} USDT")
-            return False
-            
-        logger.debug(f"Saldo verificado: ${usdt_free:.2f} USDT")
-        return True
-    except Exception as e:
-        logger.error(f"Error verificando saldo: {e}")
-        return False # Ante la duda, no operar
-
-def obtener_datos():
+    for symbol, cantidad in recibidas.items():
+        cache = mercados[symbol].velas
+        if symbol not in velas_persistidas:
+            cantidad = len(cache.velas)
+            velas_persistidas.add(symbol)
+        if cache.velas:
+            db.guardar_velas(symbol, cache.timeframe, cache.velas[-(cantidad + 1):])
+
+@cronometrado("obtener_datos")
+def obtener_datos(symbol):
     """
-    Obtiene las velas y calcula indicadores.
+    Velas e indicadores de un par (ya actualizados) como {columna: array de
+    float}; {} si aún no hay datos. No usa pandas: sin él (Termux) la
+    estrategia corre completa con la memoria de unos arrays.
     """
+    if mercados is None:
+        return {}
     try:
-        # Si no disponemos de pandas/ccxt/pandas_ta, devolvemos un objeto vacío para evitar fallos
-        if not (HAS_CCXT and HAS_PANDAS and HAS_PANDAS_TA and exchange is not None):
-            logger.warning("Modo degradado: indicadores desactivados por falta de dependencias (ccxt/pandas/pandas_ta).")
-            class DummyDF:
-                def __init__(self):
-                    self.empty = True
-                def __getitem__(self, key):
-                    raise KeyError
-            return DummyDF()
-
-        # Fetch OHLCV
-        velas = exchange.fetch_ohlcv(SYMBOL, timeframe='15m', limit=500)
-        df = pd.DataFrame(velas, columns=['ts', 'open', 'high', 'low', 'close', 'vol'])
-        logger.debug(f"Datos recibidos: {len(df)} velas")
-
-        # Calcular RSI 14
-        df['RSI'] = ta.rsi(df['close'], length=14)
-
-        # Calcular Bollinger (20, 2)
-        bbands = ta.bbands(df['close'], length=20, std=2)
-        df = pd.concat([df, bbands], axis=1)
-
-        # Calcular EMA 20 (ajustado para testnet con datos limitados)
-        df['EMA_200'] = ta.ema(df['close'], length=20)
-
-        return df
+        # Velas en caché (incrementales) e indicadores ya sincronizados por actualizar_mercados():
+        # solo se confirman las velas cerradas nuevas y se recalcula la vela abierta
+        mercado = mercados[symbol]
+        if not mercado.velas.velas:
+            return {}
+        datos = mercado.velas.columnas()
+        for nombre, valores in mercado.indicadores.columnas(len(mercado.velas.velas)).items():
+            # EMA 20 (ajustado para testnet con datos limitados)
+            datos['EMA_200' if nombre == 'EMA' else nombre] = array('d', valores)
+        return datos
     except Exception as e:
         logger.error(f"Error obteniendo datos: {e}", exc_info=True)
-        try:
-            return pd.DataFrame()
-        except Exception:
-            class DummyDF:
-                def __init__(self):
-                    self.empty = True
-                def __getitem__(self, key):
-                    raise KeyError
-            return DummyDF()
-
-# Variable para no repetir comandos viejos
-ultimo_update_id = 0
-
-def procesar_comandos(df_actual):
-    global ultimo_update_id
-    token = os.getenv('TELEGRAM_TOKEN')
-    if not token: return
-
-    url = f"https://api.telegram.org/bot{token}/getUpdates"
-    params = {'offset': ultimo_update_id + 1, 'timeout': 1}
-    
-    try:
-        r = requests.get(url, params=params, timeout=5)
-        data = r.json()
-        
-        if not data.get('ok'): return
-        
-        for result in data.get('result', []):
-            update_id = result['update_id']
-            ultimo_update_id = update_id # Actualizamos para no leerlo de nuevo
-            
-            message = result.get('message', {})
-            texto = message.get('text', '').lower().strip()
-            
-            if not texto: continue
-            
-            # --- COMANDO /STATUS ---
-            if texto == '/status':
-                precio = df_actual['close'].iloc[-1] if not df_actual.empty else 0
-                rsi = df_actual['RSI'].iloc[-1] if not df_actual.empty else 0
-                pos = "Abierta ✅" if estado["posicion_abierta"] else "Esperando 💤"
-                tendencia = "ALCISTA 🐂" if not df_actual.empty and precio > df_actual['EMA_200'].iloc[-1] else "BAJISTA 🐻"
-                
-                msg = f"""📊 **STATUS ARGOS**
+        return {}
+
+@cronometrado("comandos")
+def atender_comando(texto, snapshot):
+    """
+    Atiende un comando de Telegram. Las respuestas se encolan como
+    notificaciones; /vender devuelve las órdenes de venta para el ejecutor.
+    `snapshot` es el último {symbol: columnas} del núcleo (ver obtener_datos).
+    """
+    snapshot = snapshot or {}
+    partes = texto.split()
+    comando = partes[0] if partes else ''
+    # /vender btc/usdt -> solo ese par; sin argumento -> todos
+    filtro = partes[1].upper() if len(partes) > 1 else None
+
+    # --- COMANDO /STATUS ---
+    if comando == '/status':
+        lineas = ["📊 **STATUS ARGOS**"]
+        for symbol, estado in estados.items():
+            datos = snapshot.get(symbol)
+            precio = datos['close'][-1] if datos else 0
+            rsi = datos['RSI'][-1] if datos else 0
+            pos = "Abierta ✅" if estado["posicion_abierta"] else "Esperando 💤"
+            tendencia = "ALCISTA 🐂" if datos and precio > datos['EMA_200'][-1] else "BAJISTA 🐻"
+
+            lineas.append(f"""
+**{symbol}**
 Precio: {precio}
 RSI: {rsi:.2f}
 Tendencia: {tendencia}
 Posición: {pos}
-PNL Acum: {estado.get('pnl_acumulado',0):.2f}%"""
-                enviar_telegram(msg)
-
-            # --- COMANDO /SALDO ---
-            elif texto == '/saldo':
-                pnl = estado.get("pnl_acumulado", 0.0)
-                saldo_est = 1000 * (1 + pnl/100)
-                enviar_telegram(f"💵 **Saldo Estimado:** ${saldo_est:.2f}\nPnL Acumulado: {pnl:.2f}%")
-
-            # --- COMANDO /VENDER (PÁNICO) ---
-            elif texto == '/vender':
-                if estado["posicion_abierta"]:
-                    precio = df_actual['close'].iloc[-1]
-                    precio_compra = estado["precio_compra"]
-                    pnl_pct = (precio - precio_compra) / precio_compra
-                    
-                    registrar_operacion("VENTA MANUAL (PÁNICO)", precio, pnl_pct)
-                    enviar_telegram("🚨 **VENTA FORZADA EJECUTADA**")
-                else:
-                    enviar_telegram("⚠️ No hay posición abierta para vender.")
-                    
-    except Exception as e:
-        logger.error(f"Error procesando comandos: {e}", exc_info=True)
-
-def generar_dashboard(precio, rsi, ema, tendencia, posicion_abierta, estado):
+PNL Acum: {estado.get('pnl_acumulado',0):.2f}%""")
+        notificar("\n".join(lineas))
+
+    # --- COMANDO /SALDO ---
+    elif comando == '/saldo':
+        pnl = sum(e.get("pnl_acumulado", 0.0) for e in estados.values())
+        saldo_est = 1000 * (1 + pnl/100)
+        notificar(f"💵 **Saldo Estimado:** ${saldo_est:.2f}\nPnL Acumulado: {pnl:.2f}%")
+
+    # --- COMANDO /VENDER (PÁNICO) ---
+    elif comando == '/vender':
+        ordenes = []
+        for symbol, estado in estados.items():
+            datos = snapshot.get(symbol)
+            if filtro and symbol != filtro:
+                continue
+            if estado["posicion_abierta"] and datos:
+                ordenes.append({"tipo": "VENTA", "symbol": symbol, "razon": "VENTA MANUAL (PÁNICO)",
+                                "precio": datos['close'][-1]})
+        if ordenes:
+            return ordenes
+        notificar("⚠️ No hay posición abierta para vender.")
+
+    return []
+
+@cronometrado("dashboard_tabla")
+def generar_dashboard(symbol, precio, rsi, ema, tendencia, posicion_abierta, estado):
     """
     Genera una tabla visual con Rich para mostrar el estado del bot
     """
+    from rich.table import Table
+
     # Crear tabla principal
-    tabla = Table(title="🤖 ARGOS TRADING BOT - Dashboard", 
+    tabla = Table(title=f"🤖 ARGOS TRADING BOT - {symbol}", 
                   show_header=True, header_style="bold magenta", border_style="blue",
                   expand=False)
     
@@ -307,7 +433,7 @@ def generar_dashboard(precio, rsi, ema, tendencia, posicion_abierta, estado):
     tabla.add_column("Estado", style="green", width=18, no_wrap=True)
     
     # Datos de mercado
-    tabla.add_row("💰 Precio BTC/USDT", f"${precio:,.2f}", "🔴 LIVE")
+    tabla.add_row(f"💰 Precio {symbol}", f"${precio:,.2f}", "🔴 LIVE")
     
     # RSI con color según valor
     rsi_color = "red" if rsi < 35 else "yellow" if rsi < 70 else "green"
@@ -336,291 +462,430 @@ def generar_dashboard(precio, rsi, ema, tendencia, posicion_abierta, estado):
     return tabla
 
 def run_degraded_loop():
-    """Loop degradado: sin ccxt/pandas. Obtiene precio público y registra actividad mínima."""
-    logger.warning("Iniciando modo degradado: características avanzadas deshabilitadas (ccxt/pandas).")
+    """
+    Loop degradado: modo real sin ccxt (no hay con qué firmar órdenes).
+    Sigue velas e indicadores del primer par con la API pública de Binance
+    y responde /status y /saldo, pero no opera.
+    """
+    logger.warning("Iniciando modo degradado: sin ccxt no se envían órdenes (solo datos públicos).")
+    symbol = SYMBOLS[0]
+    estado = estados[symbol]
+    publicos = crear_mercados(SesionExchange(BinancePublico()), [symbol])
+    publicos.precargar(db)
+    mercado = publicos[symbol]
+
+    def ultimos():
+        """(precio, RSI) actuales; RSI NaN hasta tener velas suficientes"""
+        precio = mercado.velas.velas[-1][4] if mercado.velas.velas else 0.0
+        return precio, mercado.indicadores.ultimos()['RSI']
+
+    def atender_degradado(texto):
+        """Comandos mínimos vía Telegram (solo /status y /saldo)"""
+        if texto == '/status':
+            precio, rsi = ultimos()
+            notificar(f"📊 STATUS (degradado)\nPrecio: ${precio:.2f}\nRSI: {rsi:.2f}\nModo: degradado\nPNL Acum: {estado.get('pnl_acumulado',0):.2f}%")
+        if texto == '/saldo':
+            pnl = estado.get('pnl_acumulado', 0.0)
+            saldo_est = 1000 * (1 + pnl/100)
+            notificar(f"💵 Saldo Estimado: ${saldo_est:.2f}\nPnL: {pnl:.2f}%")
+
+    # Long polling en su hilo: responde al momento, no cada 60 s
+    escucha = crear_escucha(atender_degradado)
+    if escucha is not None:
+        escucha.iniciar()
     while True:
         try:
-            # Intentar obtener precio público desde Binance (sin criptografía)
-            try:
-                sym = SYMBOL.replace('/','')
-                r = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={sym}", timeout=5)
-                price = float(r.json().get('price', 0)) if r.status_code == 200 else 0.0
-            except Exception as e:
-                logger.error(f"Error fetching public price: {e}")
-                price = 0.0
-
-            # Valores por defecto para indicadores en modo degradado
-            precio_actual = price
-            rsi_actual = 50.0
-            ema_200 = precio_actual
+            # Velas e indicadores desde los endpoints públicos (sin firma)
+            publicos.actualizar()
+            precio_actual, rsi_actual = ultimos()
 
             status_msg = f"[{datetime.datetime.now().strftime('%H:%M:%S')}] P: ${precio_actual:.2f} | RSI: {rsi_actual:.2f} | MODO DEGRADADO"
             logger.info(status_msg)
 
-            # Procesar comandos mínimos vía Telegram (solo /status y /saldo)
-            try:
-                token = os.getenv('TELEGRAM_TOKEN')
-                if token:
-                    url = f"https://api.telegram.org/bot{token}/getUpdates"
-                    resp = requests.get(url, timeout=5)
-                    data = resp.json()
-                    if data.get('ok'):
-                        for result in data.get('result', []):
-                            texto = result.get('message', {}).get('text', '').lower().strip()
-                            if texto == '/status':
-                                enviar_telegram(f"📊 STATUS (degradado)\nPrecio: ${precio_actual:.2f}\nModo: degradado\nPNL Acum: {estado.get('pnl_acumulado',0):.2f}%")
-                            if texto == '/saldo':
-                                pnl = estado.get('pnl_acumulado', 0.0)
-                                saldo_est = 1000 * (1 + pnl/100)
-                                enviar_telegram(f"💵 Saldo Estimado: ${saldo_est:.2f}\nPnL: {pnl:.2f}%")
-            except Exception as e:
-                logger.debug(f"Error procesando comandos degradados: {e}")
-
             time.sleep(60)
         except Exception as e:
             logger.error(f"Error en loop degradado: {e}", exc_info=True)
             time.sleep(30)
 
 
-# 2. Loop Principal
-logger.info(f"=== ARGOS BOT INICIADO PARA {SYMBOL} ===")
-modo_msg = "MODO SIMULACIÓN (PAPER TRADING)" if SIMULATION_MODE else "MODO REAL (DINERO REAL)"
-logger.info(modo_msg)
-
-# Banner de inicio con Rich
-console.print("\n")
-console.print("[bold green]═══════════════════════════════════════════════════════════════[/bold green]")
-console.print(f"[bold cyan]           🤖 ARGOS TRADING BOT v2.1 🤖[/bold cyan]")
-console.print("[bold green]═══════════════════════════════════════════════════════════════[/bold green]")
-console.print(f"[yellow]Par:[/yellow] [bold]{SYMBOL}[/bold]")
-console.print(f"[yellow]Estrategia:[/yellow] Triple Filtro (RSI + Bollinger + EMA20) + Trailing Stop")
-console.print(f"[yellow]Modo:[/yellow] [bold red]{modo_msg}[/bold red]" if not SIMULATION_MODE else f"[yellow]Modo:[/yellow] [bold blue]{modo_msg}[/bold blue]")
-console.print(f"[yellow]Exchange:[/yellow] Binance Testnet")
-console.print("[bold green]═══════════════════════════════════════════════════════════════[/bold green]")
-console.print("\n")
+def evaluar_salida(symbol, precio_actual):
+    """
+    Evalúa las salidas de la posición abierta de un par (trailing stop, take
+    profit y stop loss de emergencia) para el precio dado. Se llama en cada
+    snapshot de mercado y, en modo WebSocket, en cada actualización de precio.
 
-enviar_telegram(f"🤖 **Argos Bot Iniciado**\\n{modo_msg}\\nPar: {SYMBOL}\\nEstrategia: RSI + Bollinger + EMA20 + Trailing")
+    Returns:
+        Lista con la orden de venta a ejecutar (vacía si no hay salida)
+    """
+    estado = estados[symbol]
+    if not estado["posicion_abierta"]:
+        return []
+
+    # --- LÓGICA DE SALIDA (VENTA) ---
+    precio_entrada = estado["precio_compra"]
+    max_precio_historico = estado.get("max_precio", precio_entrada)
+
+    # Actualizamos el Trailing (Precio Máximo visto)
+    if precio_actual > max_precio_historico:
+        max_precio_historico = precio_actual
+        estado["max_precio"] = max_precio_historico
+        guardar_estado(symbol)
+        # print(f"📈 Nuevo máximo alcanzado: {max_precio_historico}")
+
+    # Calculamos el precio de salida dinámica (Trailing Stop)
+    precio_salida_trailing = max_precio_historico * (1 - TS)
+    # Con la salida colocada en el exchange, el loop solo sigue el máximo (el stop se re-ancla al reconciliar)
+    if salidas is not None and salidas.cubre(symbol, precio_actual):
+        return []
+
+    venta = {"tipo": "VENTA", "symbol": symbol, "precio": precio_actual, "t_senal": time.monotonic()}
+
+    # 1. Verificar TRAILING STOP
+    if precio_actual <= precio_salida_trailing:
+        pnl_pct = (precio_actual - precio_entrada) / precio_entrada
+        logger.info(f"📉 {symbol} TRAILING STOP DISPARADO (PnL: {pnl_pct*100:.2f}%)")
+        print(f"\n📉 TRAILING STOP DISPARADO ({symbol})\n")
+        return [{**venta, "razon": "TRAILING STOP"}]
+
+    # 2. Verificar TAKE PROFIT
+    elif precio_actual >= precio_entrada * (1 + TP):
+        logger.info(f"✅ {symbol} TAKE PROFIT EJECUTADO")
+        print(f"\n✅ TAKE PROFIT EJECUTADO ({symbol})\n")
+        return [{**venta, "razon": "TAKE PROFIT"}]
+
+    # 3. Stop Loss de Emergencia
+    elif precio_actual <= precio_entrada * (1 - SL):
+        logger.warning(f"❌ {symbol} STOP LOSS DE EMERGENCIA ACTIVADO")
+        print(f"\n❌ STOP LOSS DE EMERGENCIA ({symbol})\n")
+        return [{**venta, "razon": "STOP LOSS (EMERGENCIA)"}]
+
+    # 3. (Opcional) Salida por RSI alto (si el usuario quisiera vender por RSI > 70 también)
+    # elif rsi_actual > 70: ...
+    return []
+
+def ejecutar_venta(symbol, razon, precio_actual, t_senal=None):
+    """
+    Vende la posición de un par (en modo real) y registra la operación.
+    Con salidas en el exchange, toma el lock del par: la reconciliación no
+    vuelve a proteger la posición entre la cancelación y la venta. Si la
+    venta falla, la posición queda abierta y la reconciliación la protege.
+    """
+    with salidas.bloqueo(symbol) if salidas is not None else contextlib.nullcontext():
+        estado = estados[symbol]
+        if not estado["posicion_abierta"]:
+            return
+        precio_entrada = estado["precio_compra"]
+        cantidad_venta = estado.get("cantidad", 0)
+        if not SIMULATION_MODE:
+            if salidas is not None:
+                # Quitar la salida del exchange antes de vender; si ya se llenó, vale ese llenado
+                try:
+                    llenado = salidas.cancelar(symbol)
+                except Exception as e:
+                    logger.error(f"Error cancelando la salida de {symbol}: {e}", exc_info=True)
+                    notificar(f"❌ No se pudo cancelar la salida de {symbol} en Binance, venta omitida: {e}", ALTA)
+                    return
+                if llenado is not None:
+                    registrar_llenado(symbol, llenado)
+                    return
+            try:
+                # Lo que la salida liberó (un stop llenado en parte deja menos): saldo fresco, tope en la posición
+                if salidas is not None:
+                    cantidad_venta = min(cantidad_venta, sesion.saldo_libre(symbol.split('/')[0], max_edad=0))
+                order = ejecutor.vender(symbol, cantidad_venta, t_senal)
+                precio_actual = order.get('average') or order.get('price') or precio_actual
+                logger.info(f"✅ Venta ejecutada ({symbol} {razon})")
+                print(f"✅ Venta ejecutada ({symbol} {razon})")
+            except Exception as e:
+                # La posición sigue abierta: la próxima reconciliación vuelve a colocar la salida
+                logger.error(f"Error ejecutando venta: {e}", exc_info=True)
+                notificar(f"❌ Error al vender {symbol} ({razon}), la posición sigue abierta: {e}", ALTA)
+                return
+        pnl_pct = (precio_actual - precio_entrada) / precio_entrada
+        registrar_operacion(symbol, razon, precio_actual, pnl_pct, cantidad_venta)
+
+def ejecutar_compra(symbol, precio_actual, rsi_actual, ema_200, t_senal=None):
+    """Compra según el tamaño de posición configurado y abre la posición del par"""
+    estado = estados[symbol]
+    if estado["posicion_abierta"]:
+        return
+
+    cantidad_compra = 0.0
+    precio_efectivo = precio_actual
+
+    if not SIMULATION_MODE:
+        import ccxt  # ya importado por conectar(): solo para sus excepciones
+        try:
+            # Saldo, gasto y mínimo notional ya resueltos en el último ciclo de mercado
+            pares_libres = sum(1 for e in estados.values() if not e["posicion_abierta"])
+            plantilla = ejecutor.plantilla(symbol, pares_libres)
+            if plantilla.motivo:
+                logger.warning(f"Compra omitida en {symbol}: {plantilla.motivo}")
+                notificar(f"⚠️ **SEÑAL OMITIDA** ({symbol}): {plantilla.motivo}.")
+                return
+
+            # Cantidad al precio de la señal, ajustada a la precisión de Binance, y una sola petición
+            order = ejecutor.comprar(plantilla, precio_actual, t_senal)
+            cantidad_compra = order.get('filled') or order.get('amount') or ejecutor.cantidad(plantilla, precio_actual)
+            precio_efectivo = order.get('average') or order.get('price') or precio_actual
+            logger.info(f"✅ Compra ejecutada: {cantidad_compra} {symbol.split('/')[0]} con ${plantilla.gasto_usdt:.2f} USDT a ${precio_efectivo:.2f}")
+            print(f"✅ Orden ejecutada a precio: {precio_efectivo}")
+
+        except ccxt.InsufficientFunds as e:
+            logger.error(f"Fondos insuficientes: {e}")
+            sesion.invalidar_balance()  # el caché no coincidía con la cuenta
+            ejecutor.descartar_plantillas()
+            notificar(f"❌ Fondos insuficientes para comprar {symbol}: {e}", ALTA)
+            return
+        except ccxt.InvalidOrder as e:
+            logger.error(f"Orden inválida: {e}")
+            notificar(f"❌ Orden inválida en {symbol} (posible mín. notional): {e}", ALTA)
+            return
+        except ccxt.NetworkError as e:
+            logger.error(f"Error de red: {e}")
+            notificar(f"⚠️ Error de conexión con Binance: {e}")
+            return
+        except ccxt.ExchangeError as e:
+            logger.error(f"Error del exchange: {e}")
+            notificar(f"❌ Error de Binance: {e}", ALTA)
+            return
+        except Exception as e:
+            logger.error(f"Error calculando tamaño posición: {e}", exc_info=True)
+            notificar(f"❌ Error al intentar comprar {symbol}: {e}", ALTA)
+            return
+    else:
+        # En simulación, asumimos 0.01 unidades como referencia
+        cantidad_compra = 0.01
+
+    # Guardar estado
+    estado.update({
+        "posicion_abierta": True,
+        "precio_compra": precio_efectivo,
+        "cantidad": cantidad_compra,
+        "max_precio": precio_efectivo,
+        "fecha_compra": str(datetime.datetime.now())
+    })
+    guardar_estado(symbol)
+    guardar_trade_csv(datetime.datetime.now(), "COMPRA", precio_actual, 0)
+    if salidas is not None:
+        salidas.proteger(symbol, estado)
+
+    notificar(f"🚀 **COMPRA EJECUTADA** ({symbol})\nPrecio: {precio_actual}\nCant: {cantidad_compra}\nRSI: {rsi_actual:.2f}\nEMA200: {ema_200:.2f}", ALTA)
+
+@cronometrado("orden")
+def ejecutar_orden(orden):
+    """Ejecutor de órdenes del núcleo (corre en un hilo, fuera del loop de eventos)"""
+    if orden["tipo"] == "COMPRA":
+        ejecutar_compra(orden["symbol"], orden["precio"], orden["rsi"], orden["ema"], orden.get("t_senal"))
+    elif orden["tipo"] == "VENTA":
+        ejecutar_venta(orden["symbol"], orden["razon"], orden["precio"], orden.get("t_senal"))
+
+def verificar_heartbeat():
+    global ultima_vez_vivo
+    # Heartbeat cada 12 horas (43200 segundos)
+    ahora = datetime.datetime.now()
+    if (ahora - ultima_vez_vivo).total_seconds() >= 43200:
+        abiertas = [s for s, e in estados.items() if e["posicion_abierta"]]
+        notificar(f"💓 **Heartbeat:** El bot sigue activo. Pares: {len(estados)} | Posiciones abiertas: {', '.join(abiertas) or 'ninguna'}", BAJA)
+        ultima_vez_vivo = ahora
 
-# Si faltan dependencias pesadas, ejecutamos un loop degradado y salimos del flujo completo
-if not (HAS_CCXT and HAS_PANDAS and HAS_PANDAS_TA and exchange):
-    run_degraded_loop()
+def precios_rest():
+    """
+    Último precio de los pares con posición abierta por ticker REST (una
+    petición): las salidas siguen evaluándose si el feed WebSocket se cae
+    """
+    abiertas = [s for s, e in estados.items() if e["posicion_abierta"]]
+    if sesion is None or not abiertas:
+        return {}
+    tickers = sesion.obtener_tickers(abiertas)
+    return {s: t['last'] for s, t in tickers.items() if t.get('last') is not None}
+
+@cronometrado("mantenimiento")
+def mantener_base():
+    """
+    Mantenimiento periódico de argos.db (tarea del núcleo, en un hilo): un
+    commit o una compactación nunca frenan el loop, que evalúa precios y comandos
+    """
+    # Reporte diario: reinicia y guarda (con commit) los contadores de cada par
+    verificar_reporte_diario()
+    # Escritura diferida (precios, velas y máximos del trailing) cada DB_FLUSH_SEG
+    db.flush_si_vencido()
+    # Retención de precios/señales crudos y agregados 1m/1h
+    db.compactar_si_vencido()
+    # Histogramas de latencia para /metrics del dashboard
+    latencias.REGISTRO.guardar_si_vencido(db)
+
+@cronometrado("mercado")
+def obtener_mercado():
+    """
+    Snapshot de mercado para el núcleo: {symbol: columnas} con los pares
+    listos para operar; None si ninguno tiene aún datos suficientes.
+    """
+    actualizar_mercados()
+    reconciliar_salidas()
+    if not SIMULATION_MODE and ejecutor is not None:
+        libres = [s for s, e in estados.items() if not e["posicion_abierta"]]
+        ejecutor.preparar(libres, len(libres))
 
-while True:
-    try:
-        verificar_reporte_diario()
-        
-        # Heartbeat cada 12 horas (43200 segundos)
-        ahora = datetime.datetime.now()
-        if (ahora - ultima_vez_vivo).total_seconds() >= 43200:
-            enviar_telegram(f"💓 **Heartbeat:** El bot sigue activo. Precio: {estado.get('precio_compra', 'N/A')}")
-            ultima_vez_vivo = ahora
+    snapshot = {}
+    for symbol in SYMBOLS:
+        datos = obtener_datos(symbol)
 
-        df = obtener_datos()
-        
-        if df.empty:
-            time.sleep(10)
+        if not datos:
             continue
-            
+
         # Asegurarnos de tener suficientes datos para EMA
-        if pd.isna(df['EMA_200'].iloc[-1]):
-            logger.warning(f"Esperando datos suficientes para EMA... ({len(df)} velas disponibles)")
-            time.sleep(10)
+        if math.isnan(datos['EMA_200'][-1]):
+            logger.warning(f"Esperando datos suficientes para EMA en {symbol}... ({len(datos['close'])} velas disponibles)")
             continue
-            
-        # PROCESAR COMANDOS DE TELEGRAM
-        procesar_comandos(df)
 
-        precio_actual = df['close'].iloc[-1]
-        rsi_actual = df['RSI'].iloc[-1]
-        
-        # Búsqueda inteligente de la columna BBL (Lower Band)
-        # A veces panda_ta la llama BBL_20_2.0, otras veces diferente
-        col_bbl = [c for c in df.columns if c.startswith('BBL')][0]
-        lower_band = df[col_bbl].iloc[-1]
-        
-        ema_200 = df['EMA_200'].iloc[-1]
+        snapshot[symbol] = datos
 
-        # Log de consola con dashboard visual
-        tendencia = "ALCISTA" if precio_actual > ema_200 else "BAJISTA"
-        
-        # Logger para archivo
-        status_msg = f"[{datetime.datetime.now().strftime('%H:%M:%S')}] P: ${precio_actual:.2f} | RSI: {rsi_actual:.2f} | {tendencia} | Pos: {'SÍ' if estado['posicion_abierta'] else 'NO'}"
-        logger.info(status_msg)
-        
-        # Dashboard visual con Rich
-        dashboard = generar_dashboard(precio_actual, rsi_actual, ema_200, tendencia, 
-                                       estado['posicion_abierta'], estado)
-        
-        # Limpiar pantalla y mostrar dashboard
+    return snapshot or None
+
+def evaluar_par(symbol, datos):
+    """Triple Filtro sobre un par; devuelve sus órdenes y su tabla de dashboard"""
+    estado = estados[symbol]
+    precio_actual = datos['close'][-1]
+    rsi_actual = datos['RSI'][-1]
+
+    # Búsqueda inteligente de la columna BBL (Lower Band)
+    # Con los parámetros de Bollinger en el nombre, como pandas_ta: BBL_20_2.0
+    col_bbl = [c for c in datos if c.startswith('BBL')][0]
+    lower_band = datos[col_bbl][-1]
+
+    ema_200 = datos['EMA_200'][-1]
+
+    # Log de consola con dashboard visual
+    tendencia = "ALCISTA" if precio_actual > ema_200 else "BAJISTA"
+
+    # Logger para archivo
+    status_msg = f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {symbol} P: ${precio_actual:.2f} | RSI: {rsi_actual:.2f} | {tendencia} | Pos: {'SÍ' if estado['posicion_abierta'] else 'NO'}"
+    logger.info(status_msg)
+
+    # Dashboard visual con Rich
+    dashboard = generar_dashboard(symbol, precio_actual, rsi_actual, ema_200, tendencia,
+                                   estado['posicion_abierta'], estado)
+
+    if estado["posicion_abierta"]:
+        return evaluar_salida(symbol, precio_actual), dashboard
+
+    # --- LÓGICA DE ENTRADA (COMPRA) ---
+    # FILTRO TRIPLE:
+    # 1. RSI < 35 (Oversold)
+    # 2. Precio < Banda Bollinger Inferior (Cheap)
+    # 3. Precio > EMA 200 (Trend is Up - Solo compramos correcciones en subida)
+
+    condicion_rsi = rsi_actual < 35
+    condicion_bb = precio_actual < lower_band
+    condicion_ema = precio_actual > ema_200
+    if condicion_rsi and condicion_bb and condicion_ema:
+        logger.info(f"🚀 SEÑAL DE COMPRA CONFIRMADA (Triple Filtro) en {symbol}")
+        print(f"\n🚀 SEÑAL PERFECTA CONFIRMADA ({symbol})\n")
+        return [{"tipo": "COMPRA", "symbol": symbol, "precio": precio_actual, "rsi": rsi_actual, "ema": ema_200,
+                 "t_senal": time.monotonic()}], dashboard
+
+    return [], dashboard
+
+@cronometrado("estrategia")
+def evaluar_estrategia(snapshot):
+    """
+    Evalúa el Triple Filtro sobre el snapshot de mercado de todos los pares y
+    devuelve las órdenes a ejecutar. Corre en el loop de eventos, así que no
+    hace E/S de red: las órdenes las ejecuta el núcleo, las notificaciones
+    se encolan y la base (flush, compactación, latencias y el reinicio
+    diario de contadores) se mantiene en mantener_base().
+    """
+    verificar_heartbeat()
+
+    ordenes = []
+    tablas = []
+    for symbol, datos in snapshot.items():
+        try:
+            ordenes_par, tabla = evaluar_par(symbol, datos)
+        except Exception as e:
+            logger.error(f"Error evaluando {symbol}: {e}", exc_info=True)
+            continue
+        ordenes += ordenes_par
+        tablas.append(tabla)
+
+    # Limpiar pantalla y mostrar dashboard
+    with latencias.medir("dashboard"):
+        console = consola()
         console.clear()
-        console.print(dashboard)
+        for tabla in tablas:
+            console.print(tabla)
         console.print(f"\\n[dim]⏰ Actualizado: {datetime.datetime.now().strftime('%H:%M:%S')} | ⏳ Próxima actualización en 60s[/dim]\\n")
 
-        if not estado["posicion_abierta"]:
-            # --- LÓGICA DE ENTRADA (COMPRA) ---
-            # FILTRO TRIPLE: 
-            # 1. RSI < 35 (Oversold)
-            # 2. Precio < Banda Bollinger Inferior (Cheap)
-            # 3. Precio > EMA 200 (Trend is Up - Solo compramos correcciones en subida)
-            
-            condicion_rsi = rsi_actual < 35
-            condicion_bb = precio_actual < lower_band
-            condicion_ema = precio_actual > ema_200
-            if condicion_rsi and condicion_bb and condicion_ema:
-                logger.info("🚀 SEÑAL DE COMPRA CONFIRMADA (Triple Filtro)")
-                print("\n🚀 SEÑAL PERFECTA CONFIRMADA\n")
-                
-                # --- VERIFICACIÓN DE SEGURIDAD ANTES DE DISPARAR ---
-                # Validamos saldo solo si vamos a operar de verdad
-                if not SIMULATION_MODE and not check_balance():
-                     enviar_telegram("⚠️ **SEÑAL OMITIDA**: Saldo insuficiente en Binance (<$15 USDT).")
-                cantidad_compra = 0.0
-                
-                if not SIMULATION_MODE:
-                    try:
-                        # 1. Obtener Saldo Libre
-                        balance = exchange.fetch_balance()
-                        usdt_free = balance.get('USDT', {}).get('free', 0.0)
-                        
-                        # VERIFICAR SI HAY SUFICIENTE SALDO
-                        if usdt_free < 15:
-                             enviar_telegram("⚠️ **SEÑAL OMITIDA**: Saldo insuficiente (< $15 USD).")
-                             time.sleep(60)
-                             continue
-                        
-                        # VERIFICAR MÍNIMO NOTIONAL DE BINANCE
-                        market_info = exchange.markets.get(SYMBOL, {})
-                        min_cost = market_info.get('limits', {}).get('cost', {}).get('min', 10.0)
-                        if usdt_free * POS_SIZE < min_cost:
-                            enviar_telegram(f"⚠️ **SEÑAL OMITIDA**: Monto calculado menor al mínimo de Binance (${min_cost:.2f} USD).")
-                            time.sleep(60)
-                            continue
-
-                        # 2. Calcular cuánto gastar (Ej. 95% de 100 USDT = 95 USD)
-                        gasto_usdt = usdt_free * POS_SIZE
-                        
-                        # 3. Calcular cantidad de BTC (95 / 90000 = 0.00105 BTC)
-                        cantidad_bruta = gasto_usdt / precio_actual
-                        
-                        # 4. Ajustar decimales según reglas de Binance (PRECISIÓN)
-                        cantidad_compra = exchange.amount_to_precision(SYMBOL, cantidad_bruta)
-                        
-                        logger.info(f"Ejecutando compra: {cantidad_compra} {SYMBOL.split('/')[0]} con ${gasto_usdt:.2f} USDT")
-                        print(f"💰 Comprando {cantidad_compra} {SYMBOL.split('/')[0]} con ${gasto_usdt:.2f} USDT")
-                        
-                        # 5. Ejecutar Orden
-                        order = exchange.create_market_buy_order(SYMBOL, cantidad_compra)
-                        precio_real_ejecucion = order.get('average') or order.get('price') or precio_actual
-                        logger.info(f"✅ Orden ejecutada exitosamente a precio: ${precio_real_ejecucion:.2f}")
-                        print(f"✅ Orden ejecutada a precio: {precio_real_ejecucion}")
-                        
-                    except ccxt.InsufficientFunds as e:
-                        logger.error(f"Fondos insuficientes: {e}")
-                        enviar_telegram(f"❌ Fondos insuficientes para comprar: {e}")
-                        continue
-                    except ccxt.InvalidOrder as e:
-                        logger.error(f"Orden inválida: {e}")
-                        enviar_telegram(f"❌ Orden inválida (posible mín. notional): {e}")
-                        continue
-                    except ccxt.NetworkError as e:
-                        logger.error(f"Error de red: {e}")
-                        enviar_telegram(f"⚠️ Error de conexión con Binance: {e}")
-                        continue
-                    except ccxt.ExchangeError as e:
-                        logger.error(f"Error del exchange: {e}")
-                        enviar_telegram(f"❌ Error de Binance: {e}")
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error calculando tamaño posición: {e}", exc_info=True)
-                        enviar_telegram(f"❌ Error al intentar comprar: {e}")
-                        continue
-                else:
-                    # En simulación, asumimos 0.01 BTC como referencia
-                    cantidad_compra = 0.01 
-
-                # Guardar estado
-                precio_efectivo = precio_real_ejecucion if not SIMULATION_MODE and 'precio_real_ejecucion' in locals() else precio_actual
-                estado.update({
-                    "posicion_abierta": True, 
-                    "precio_compra": precio_efectivo,
-                    "cantidad": cantidad_compra,
-                    "max_precio": precio_efectivo, 
-                    "fecha_compra": str(datetime.datetime.now())
-                })
-                guardar_estado(estado)
-                guardar_trade_csv(datetime.datetime.now(), "COMPRA", precio_actual, 0)
-                
-                enviar_telegram(f"🚀 **COMPRA EJECUTADA**\nPrecio: {precio_actual}\nCant: {cantidad_compra}\nRSI: {rsi_actual:.2f}\nEMA200: {ema_200:.2f}")
-    
-        else:
-            # --- LÓGICA DE SALIDA (VENTA) ---
-            precio_entrada = estado["precio_compra"]
-            max_precio_historico = estado.get("max_precio", precio_entrada)
-            
-            # Actualizamos el Trailing (Precio Máximo visto)
-            if precio_actual > max_precio_historico:
-                max_precio_historico = precio_actual
-                estado["max_precio"] = max_precio_historico
-                guardar_estado(estado)
-                # print(f"📈 Nuevo máximo alcanzado: {max_precio_historico}")
-
-            # Calculamos el precio de salida dinámica (Trailing Stop)
-            precio_salida_trailing = max_precio_historico * (1 - TS)
-
-            # 1. Verificar TRAILING STOP
-            if precio_actual <= precio_salida_trailing:
-                pnl_pct = (precio_actual - precio_entrada) / precio_entrada
-                logger.info(f"📉 TRAILING STOP DISPARADO (PnL: {pnl_pct*100:.2f}%)")
-                print(f"\n📉 TRAILING STOP DISPARADO\n")
-                if not SIMULATION_MODE:
-                    try:
-                        cantidad_venta = estado.get("cantidad", 0)
-                        order = exchange.create_market_sell_order(SYMBOL, cantidad_venta)
-                        logger.info(f"✅ Venta ejecutada (Trailing Stop)")
-                        print(f"✅ Venta ejecutada (Trailing Stop)")
-                    except Exception as e:
-                        logger.error(f"Error ejecutando venta: {e}", exc_info=True)
-                        enviar_telegram(f"❌ Error al vender (Trailing Stop): {e}")
-                registrar_operacion("TRAILING STOP", precio_actual, pnl_pct)
-            
-            # 2. Verificar TAKE PROFIT
-            elif precio_actual >= precio_entrada * (1 + TP):
-                logger.info(f"✅ TAKE PROFIT EJECUTADO")
-                print(f"\n✅ TAKE PROFIT EJECUTADO\n")
-                if not SIMULATION_MODE:
-                    try:
-                        cantidad_venta = estado.get("cantidad", 0)
-                        order = exchange.create_market_sell_order(SYMBOL, cantidad_venta)
-                        logger.info(f"✅ Venta ejecutada (Take Profit)")
-                        print(f"✅ Venta ejecutada (Take Profit)")
-                    except Exception as e:
-                        logger.error(f"Error ejecutando venta: {e}", exc_info=True)
-                        enviar_telegram(f"❌ Error al vender (Take Profit): {e}")
-                pnl_pct = (precio_actual - precio_entrada) / precio_entrada
-                registrar_operacion("TAKE PROFIT", precio_actual, pnl_pct)
-            
-            # 3. Stop Loss de Emergencia
-            elif precio_actual <= precio_entrada * (1 - SL):
-                 logger.warning(f"❌ STOP LOSS DE EMERGENCIA ACTIVADO")
-                 print(f"\n❌ STOP LOSS DE EMERGENCIA\n")
-                 if not SIMULATION_MODE:
-                     try:
-                         cantidad_venta = estado.get("cantidad", 0)
-                         order = exchange.create_market_sell_order(SYMBOL, cantidad_venta)
-                         logger.info(f"✅ Venta ejecutada (Stop Loss)")
-                         print(f"✅ Venta ejecutada (Stop Loss)")
-                     except Exception as e:
-                         logger.error(f"Error ejecutando venta: {e}", exc_info=True)
-                         enviar_telegram(f"❌ Error al vender (Stop Loss): {e}")
-                 pnl_pct = (precio_actual - precio_entrada) / precio_entrada
-                 registrar_operacion("STOP LOSS (EMERGENCIA)", precio_actual, pnl_pct)
-            
-            # 3. (Opcional) Salida por RSI alto (si el usuario quisiera vender por RSI > 70 también)
-            # elif rsi_actual > 70: ...
+    return ordenes
 
-    except Exception as e:
-        logger.error(f"Error en bucle principal: {e}", exc_info=True)
-        time.sleep(30) # Esperar antes de reintentar si falla algo grave
-    
-    # Revisar cada 60 segundos
-    time.sleep(60) 
+
+def main():
+    global nucleo, feed
+
+    # 2. Loop Principal
+    logger.info(f"=== ARGOS BOT INICIADO PARA {', '.join(SYMBOLS)} ===")
+    modo_msg = "MODO SIMULACIÓN (PAPER TRADING)" if SIMULATION_MODE else "MODO REAL (DINERO REAL)"
+    logger.info(modo_msg)
+
+    # Banner de inicio con Rich
+    console = consola()
+    console.print("\n")
+    console.print("[bold green]═══════════════════════════════════════════════════════════════[/bold green]")
+    console.print(f"[bold cyan]           🤖 ARGOS TRADING BOT v2.1 🤖[/bold cyan]")
+    console.print("[bold green]═══════════════════════════════════════════════════════════════[/bold green]")
+    console.print(f"[yellow]Pares:[/yellow] [bold]{', '.join(SYMBOLS)}[/bold]")
+    console.print(f"[yellow]Estrategia:[/yellow] Triple Filtro (RSI + Bollinger + EMA20) + Trailing Stop")
+    console.print(f"[yellow]Modo:[/yellow] [bold red]{modo_msg}[/bold red]" if not SIMULATION_MODE else f"[yellow]Modo:[/yellow] [bold blue]{modo_msg}[/bold blue]")
+    console.print(f"[yellow]Exchange:[/yellow] Binance Testnet")
+    console.print("[bold green]═══════════════════════════════════════════════════════════════[/bold green]")
+    console.print("\n")
+
+    enviar_telegram(f"🤖 **Argos Bot Iniciado**\\n{modo_msg}\\nPares: {', '.join(SYMBOLS)}\\nEstrategia: RSI + Bollinger + EMA20 + Trailing")
+
+    # Base y estado por par, exchange, sesión y velas precargadas (los mercados se cargan al usarlos)
+    conectar()
+
+    # Si faltan dependencias pesadas, ejecutamos un loop degradado y salimos del flujo completo
+    if exchange is None:
+        run_degraded_loop()
+
+    if MODO_WEBSOCKET:
+        if HAS_WEBSOCKET:
+            feed = FeedBinance(SYMBOLS, timeframe='15m')
+            feed.iniciar()
+        else:
+            logger.warning("MODO_WEBSOCKET activo pero websocket-client no está instalado; se usa polling REST.")
+
+    # Tareas independientes: mercado, estrategia, órdenes, comandos y mantenimiento.
+    # Revisar el mercado cada 60 segundos (con WebSocket, las salidas se evalúan en cada precio)
+    nucleo = NucleoAsync(
+        obtener_mercado=obtener_mercado,
+        evaluar=evaluar_estrategia,
+        ejecutar=ejecutar_orden,
+        atender_comando=atender_comando,
+        feed=feed,
+        evaluar_precio=evaluar_salida,
+        obtener_precios=precios_rest,
+        mantenimiento=mantener_base,
+        intervalo_mercado=60,
+    )
+    # Comandos por long polling en su propio hilo: un /vender llega al
+    # núcleo en cuanto Telegram lo entrega
+    escucha = crear_escucha(nucleo.recibir_comando)
+    if escucha is not None:
+        escucha.iniciar()
+    try:
+        asyncio.run(nucleo.ejecutar_tareas())
+    except KeyboardInterrupt:
+        logger.info("Bot detenido por el usuario")
+    finally:
+        if escucha is not None:
+            escucha.detener()
+        if feed is not None:
+            feed.detener()
+        db.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Datos de mercado multi-par para Argos Trading Bot
+Una sola sesión ccxt (un cliente, un presupuesto de rate limit y un caché
+de load_markets) compartida por todos los pares que opera el bot.
+
+La sesión también guarda el estado de la cuenta: los mercados se recargan
+cada EXCHANGE_MERCADOS_SEG y el balance se pide como mucho una vez cada
+EXCHANGE_BALANCE_SEG; entre medio, cada orden ejecutada lo ajusta con lo
+que se llenó, así que el camino de compra no espera un fetch_balance.
+"""
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import latencias
+from velas import CacheVelas
+from indicadores import MotorIndicadores
+
+logger = logging.getLogger('ArgosBot')
+
+# Segundos entre recargas de mercados (límites y precisión cambian muy rara vez)
+EXCHANGE_MERCADOS_SEG = float(os.getenv("EXCHANGE_MERCADOS_SEG", "21600"))
+# Edad máxima del balance en caché antes de volver a pedirlo
+EXCHANGE_BALANCE_SEG = float(os.getenv("EXCHANGE_BALANCE_SEG", "60"))
+
+
+class SesionExchange:
+    """
+    Envoltorio de un cliente ccxt compartido.
+
+    ccxt aplica el rate limit por instancia pero no es seguro entre hilos:
+    todas las llamadas pasan por un mismo lock, de modo que los pares (y las
+    tareas en hilos del núcleo) consumen un único presupuesto de peticiones.
+    """
+
+    def __init__(self, exchange, ttl_mercados: float = EXCHANGE_MERCADOS_SEG,
+                 ttl_balance: float = EXCHANGE_BALANCE_SEG, reloj=time.monotonic):
+        self.exchange = exchange
+        self._lock = threading.RLock()
+        self._mercados: Optional[Dict] = None
+        self._mercados_cargados = 0.0
+        self._balance: Optional[Dict] = None
+        self._balance_leido = 0.0
+        self.ttl_mercados = ttl_mercados
+        self.ttl_balance = ttl_balance
+        self._reloj = reloj
+        self.peticiones = 0
+
+    def llamar(self, metodo: str, *args, **kwargs):
+        """Ejecutar un método del exchange serializado con el resto"""
+        with self._lock:
+            self.peticiones += 1
+            # Una etapa por método: una lentitud del exchange se ve en su histograma
+            with latencias.medir(f"exchange_{metodo}"):
+                return getattr(self.exchange, metodo)(*args, **kwargs)
+
+    # ===== MERCADOS =====
+
+    def cargar_mercados(self) -> Dict:
+        """
+        load_markets la primera vez y luego cada `ttl_mercados` segundos.
+        Si una recarga falla se siguen usando los mercados anteriores.
+        """
+        with self._lock:
+            if self._mercados is not None and self._reloj() - self._mercados_cargados < self.ttl_mercados:
+                return self._mercados
+            try:
+                # reload=True: ccxt ignora su propio caché de mercados
+                recarga = (True,) if self._mercados is not None else ()
+                self._mercados = self.llamar('load_markets', *recarga) or {}
+                logger.info(f"Mercados cargados: {len(self._mercados)} pares")
+            except Exception as e:
+                if self._mercados is None:
+                    raise
+                logger.warning(f"No se pudieron recargar los mercados, se usan los anteriores: {e}")
+            self._mercados_cargados = self._reloj()
+            return self._mercados
+
+    def mercado(self, symbol: str) -> Dict:
+        return self.cargar_mercados().get(symbol, {})
+
+    def cantidad_a_precision(self, symbol: str, cantidad: float):
+        """amount_to_precision con los mercados ya cargados (ccxt los necesita)"""
+        self.cargar_mercados()
+        with self._lock:
+            return self.exchange.amount_to_precision(symbol, cantidad)
+
+    def precio_a_precision(self, symbol: str, precio: float) -> float:
+        """price_to_precision con los mercados ya cargados"""
+        self.cargar_mercados()
+        with self._lock:
+            return float(self.exchange.price_to_precision(symbol, precio))
+
+    # ===== BALANCE =====
+
+    def balance(self, max_edad: Optional[float] = None) -> Dict:
+        """
+        fetch_balance en caché: solo se pide si tiene más de `max_edad`
+        segundos (por defecto `ttl_balance`) o se invalidó.
+        """
+        max_edad = self.ttl_balance if max_edad is None else max_edad
+        with self._lock:
+            if self._balance is None or self._reloj() - self._balance_leido >= max_edad:
+                self._balance = self.llamar('fetch_balance') or {}
+                self._balance_leido = self._reloj()
+            return self._balance
+
+    def saldo_libre(self, moneda: str, max_edad: Optional[float] = None) -> float:
+        return self.balance(max_edad).get(moneda, {}).get('free', 0.0) or 0.0
+
+    def invalidar_balance(self):
+        """Forzar un fetch_balance en la próxima consulta"""
+        with self._lock:
+            self._balance = None
+
+    def _sumar_libre(self, moneda: str, cantidad: float):
+        cuenta = self._balance.setdefault(moneda, {})
+        cuenta['free'] = (cuenta.get('free') or 0.0) + cantidad
+        if isinstance(self._balance.get('free'), dict):
+            self._balance['free'][moneda] = cuenta['free']
+
+    def aplicar_orden(self, symbol: str, orden: Dict):
+        """
+        Ajustar el balance en caché con lo llenado por una orden de mercado
+        (cantidad, costo y comisión). Si a la orden le faltan datos, el
+        balance se invalida y se vuelve a pedir en la próxima consulta.
+        """
+        with self._lock:
+            if self._balance is None:
+                return
+            orden = orden or {}
+            llenado = orden.get('filled')
+            costo = orden.get('cost')
+            if costo is None and llenado is not None:
+                precio = orden.get('average') or orden.get('price')
+                costo = llenado * precio if precio else None
+            if llenado is None or costo is None or orden.get('side') not in ('buy', 'sell'):
+                self._balance = None
+                return
+
+            self._balance = copy.deepcopy(self._balance)
+            base, cotizada = symbol.split('/')
+            signo = 1 if orden['side'] == 'buy' else -1
+            self._sumar_libre(base, signo * llenado)
+            self._sumar_libre(cotizada, -signo * costo)
+            for comision in orden.get('fees') or ([orden['fee']] if orden.get('fee') else []):
+                if comision and comision.get('cost') and comision.get('currency'):
+                    self._sumar_libre(comision['currency'], -comision['cost'])
+
+    # ===== DATOS DE MERCADO =====
+
+    def fetch_ohlcv(self, *args, **kwargs):
+        return self.llamar('fetch_ohlcv', *args, **kwargs)
+
+    def obtener_tickers(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Tickers de varios pares en una sola petición (fetch_tickers).
+        Si el exchange no lo soporta, se piden uno a uno.
+        """
+        if not symbols:
+            return {}
+        if self.exchange.has.get('fetchTickers'):
+            try:
+                tickers = self.llamar('fetch_tickers', symbols)
+                return {s: tickers[s] for s in symbols if s in tickers}
+            except Exception as e:
+                logger.warning(f"fetch_tickers falló, se piden tickers uno a uno: {e}")
+
+        tickers = {}
+        for symbol in symbols:
+            try:
+                tickers[symbol] = self.llamar('fetch_ticker', symbol)
+            except Exception as e:
+                logger.warning(f"No se pudo obtener el ticker de {symbol}: {e}")
+        return tickers
+
+
+class MercadoSimbolo:
+    """Velas e indicadores incrementales de un par"""
+
+    def __init__(self, sesion: SesionExchange, symbol: str, timeframe: str = '15m', limite: int = 500,
+                 rsi_length: int = 14, bb_length: int = 20, bb_std: float = 2.0, ema_length: int = 20):
+        self.symbol = symbol
+        self.velas = CacheVelas(sesion, symbol, timeframe=timeframe, limite=limite)
+        self.indicadores = MotorIndicadores(rsi_length=rsi_length, bb_length=bb_length, bb_std=bb_std,
+                                            ema_length=ema_length, max_historial=limite)
+
+    def sincronizar_indicadores(self):
+        self.indicadores.sincronizar(self.velas.velas, self.velas.timeframe_ms)
+
+
+class MercadosMultiples:
+    """
+    Datos de mercado de todos los pares configurados.
+
+    Cada ciclo hace una sola petición de tickers para todos los pares y
+    parchea con ella la vela abierta; solo los pares cuya vela abierta ya
+    cerró (o que aún no tienen histórico) piden OHLCV.
+    """
+
+    def __init__(self, sesion: SesionExchange, symbols: List[str], **kwargs):
+        self.sesion = sesion
+        self.symbols = list(symbols)
+        self.mercados: Dict[str, MercadoSimbolo] = {s: MercadoSimbolo(sesion, s, **kwargs) for s in self.symbols}
+
+    def __getitem__(self, symbol: str) -> MercadoSimbolo:
+        return self.mercados[symbol]
+
+    def precargar(self, db) -> Dict[str, int]:
+        """
+        Arranque en caliente: sembrar velas e indicadores de cada par con las
+        últimas velas guardadas en la base (las que persiste el loop para el
+        dashboard). Los indicadores se recalculan de esas velas en milisegundos.
+
+        Returns:
+            Velas precargadas por par (0 si ese par hará la recarga completa)
+        """
+        precargadas = {}
+        for symbol, mercado in self.mercados.items():
+            try:
+                velas = db.ultimas_velas(symbol, mercado.velas.timeframe, mercado.velas.limite)
+                precargadas[symbol] = mercado.velas.precargar(velas)
+                if precargadas[symbol]:
+                    with latencias.medir("indicadores"):
+                        mercado.sincronizar_indicadores()
+            except Exception as e:
+                logger.warning(f"No se pudieron precargar las velas de {symbol}: {e}")
+                precargadas[symbol] = 0
+        return precargadas
+
+    def actualizar(self, ahora_ms: Optional[int] = None) -> Dict[str, int]:
+        """
+        Actualizar velas e indicadores de todos los pares.
+
+        Returns:
+            Velas OHLCV recibidas por par (0 si bastó con el ticker)
+        """
+        if ahora_ms is None:
+            ahora_ms = int(time.time() * 1000)
+
+        con_historico = [s for s in self.symbols if self.mercados[s].velas.velas]
+        tickers = self.sesion.obtener_tickers(con_historico)
+
+        recibidas = {}
+        for symbol, mercado in self.mercados.items():
+            precio = (tickers.get(symbol) or {}).get('last')
+            try:
+                if precio is not None and mercado.velas.aplicar_precio(precio, ahora_ms):
+                    recibidas[symbol] = 0
+                else:
+                    recibidas[symbol] = mercado.velas.actualizar(ahora_ms)
+                with latencias.medir("indicadores"):
+                    mercado.sincronizar_indicadores()
+            except Exception as e:
+                logger.error(f"Error actualizando datos de {symbol}: {e}", exc_info=True)
+        return recibidas
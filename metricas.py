@@ -6,6 +6,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from database import Database
+import metricas_incrementales as mi
 import math
 
 logger = logging.getLogger(__name__)
@@ -17,39 +18,40 @@ class MetricasPerformance:
     def __init__(self, db: Database = None):
         self.db = db if db else Database()
     
+    # Todas las métricas salen del acumulado incremental (metricas_acumuladas):
+    # un tramo por día del periodo, sin releer la tabla trades.
+    
+    def _resumen(self, periodo_dias: int, resumen: Optional[Dict] = None) -> Dict:
+        """Acumulado de los trades cerrados en los últimos `periodo_dias` días"""
+        if resumen is not None:
+            return resumen
+        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
+        return self.db.obtener_metricas_acumuladas(fecha_inicio)
+    
     # ===== SHARPE RATIO =====
     
-    def calcular_sharpe_ratio(self, periodo_dias: int = 30, rf_rate: float = 0.0) -> float:
+    def calcular_sharpe_ratio(self, periodo_dias: int = 30, rf_rate: float = 0.0,
+                              resumen: Optional[Dict] = None) -> float:
         """
         Calcular Sharpe Ratio: (Retorno promedio - Tasa libre de riesgo) / Desviación estándar
         
         Args:
             periodo_dias: Días a considerar para el cálculo
             rf_rate: Tasa libre de riesgo anual (default 0%)
+            resumen: Acumulado del periodo ya leído (evita otra consulta)
         
         Returns:
             Sharpe Ratio (>1 es bueno, >2 es excelente)
         """
-        # Obtener trades del periodo
-        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
-        
-        cursor = self.db.conn.cursor()
-        cursor.execute("""
-            SELECT pnl_pct FROM trades
-            WHERE date(timestamp_venta) >= ?
-            ORDER BY timestamp_venta
-        """, (fecha_inicio,))
-        
-        retornos = [row['pnl_pct'] / 100 for row in cursor.fetchall()]  # Convertir % a decimal
+        resumen = self._resumen(periodo_dias, resumen)
         
-        if len(retornos) < 2:
+        if resumen['trades'] < 2:
             logger.warning("⚠️  Insuficientes datos para calcular Sharpe Ratio")
             return 0.0
         
-        # Calcular promedio y desviación estándar
-        retorno_promedio = sum(retornos) / len(retornos)
-        varianza = sum((r - retorno_promedio) ** 2 for r in retornos) / (len(retornos) - 1)
-        desviacion_std = math.sqrt(varianza)
+        # Promedio y desviación estándar (Welford) de los retornos en decimal
+        retorno_promedio = resumen['media_retorno']
+        desviacion_std = mi.desviacion_retornos(resumen)
         
         if desviacion_std == 0:
             return 0.0
@@ -64,59 +66,22 @@ class MetricasPerformance:
     
     # ===== MAXIMUM DRAWDOWN =====
     
-    def calcular_maximum_drawdown(self, periodo_dias: int = 30) -> Tuple[float, str, str]:
+    def calcular_maximum_drawdown(self, periodo_dias: int = 30,
+                                  resumen: Optional[Dict] = None) -> Tuple[float, str, str]:
         """
-        Calcular Maximum Drawdown: Mayor caída desde un pico
+        Calcular Maximum Drawdown: Mayor caída desde un pico. La equity
+        parte de 10K y el pico es el máximo histórico (high-water mark).
         
         Returns:
             (drawdown_pct, fecha_pico, fecha_valle)
         """
-        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
-        
-        cursor = self.db.conn.cursor()
-        cursor.execute("""
-            SELECT timestamp_venta, pnl_usd FROM trades
-            WHERE date(timestamp_venta) >= ?
-            ORDER BY timestamp_venta
-        """, (fecha_inicio,))
+        resumen = self._resumen(periodo_dias, resumen)
         
-        trades = cursor.fetchall()
-        
-        if len(trades) < 2:
+        if resumen['trades'] < 2:
             return 0.0, "", ""
         
-        # Calcular equity curve (capital acumulado)
-        capital_inicial = 10000  # Asumimos 10K inicial
-        equity_curve = []
-        capital_actual = capital_inicial
-        
-        for trade in trades:
-            capital_actual += trade['pnl_usd']
-            equity_curve.append({
-                'fecha': trade['timestamp_venta'],
-                'capital': capital_actual
-            })
-        
-        # Encontrar máximo drawdown
-        max_dd = 0.0
-        fecha_pico = ""
-        fecha_valle = ""
-        pico = equity_curve[0]['capital']
-        fecha_pico_actual = equity_curve[0]['fecha']
-        
-        for punto in equity_curve:
-            if punto['capital'] > pico:
-                pico = punto['capital']
-                fecha_pico_actual = punto['fecha']
-            
-            dd = ((pico - punto['capital']) / pico) * 100
-            
-            if dd > max_dd:
-                max_dd = dd
-                fecha_pico = fecha_pico_actual
-                fecha_valle = punto['fecha']
-        
-        return round(max_dd, 2), fecha_pico, fecha_valle
+        return (round(resumen['max_drawdown'], 2), resumen['fecha_pico_dd'] or "",
+                resumen['fecha_valle_dd'] or "")
     
     # ===== WIN RATE POR PERIODO =====
     
@@ -130,27 +95,25 @@ class MetricasPerformance:
         Returns:
             Lista de dicts con {periodo, win_rate, total, ganadoras, perdedoras}
         """
-        cursor = self.db.conn.cursor()
-        
         if periodo == "diario":
-            group_by = "date(timestamp_venta)"
-            format_str = "%Y-%m-%d"
+            group_by = "fecha"
         elif periodo == "semanal":
-            group_by = "strftime('%Y-W%W', timestamp_venta)"
-            format_str = "Semana %W de %Y"
+            group_by = "strftime('%Y-W%W', fecha)"
         elif periodo == "mensual":
-            group_by = "strftime('%Y-%m', timestamp_venta)"
-            format_str = "%Y-%m"
+            group_by = "strftime('%Y-%m', fecha)"
         else:
             raise ValueError("Periodo debe ser 'diario', 'semanal' o 'mensual'")
         
+        # Sobre los tramos diarios (uno por día con trades), no sobre los trades
+        cursor = self.db.conn.cursor()
         cursor.execute(f"""
             SELECT 
                 {group_by} as periodo,
-                COUNT(*) as total,
-                SUM(CASE WHEN pnl_usd > 0 THEN 1 ELSE 0 END) as ganadoras,
-                SUM(CASE WHEN pnl_usd <= 0 THEN 1 ELSE 0 END) as perdedoras
-            FROM trades
+                SUM(trades) as total,
+                SUM(ganadoras) as ganadoras,
+                SUM(perdedoras) as perdedoras
+            FROM metricas_acumuladas
+            WHERE fecha <= '9999-12-31'
             GROUP BY {group_by}
             ORDER BY periodo DESC
             LIMIT 30
@@ -171,7 +134,7 @@ class MetricasPerformance:
     
     # ===== PROFIT FACTOR =====
     
-    def calcular_profit_factor(self, periodo_dias: int = 30) -> float:
+    def calcular_profit_factor(self, periodo_dias: int = 30, resumen: Optional[Dict] = None) -> float:
         """
         Calcular Profit Factor: Ganancias Totales / Pérdidas Totales
         >1 = rentable, >2 = muy bueno, >3 = excelente
@@ -179,21 +142,10 @@ class MetricasPerformance:
         Returns:
             Profit Factor (0 si no hay pérdidas)
         """
-        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
-        
-        cursor = self.db.conn.cursor()
+        resumen = self._resumen(periodo_dias, resumen)
         
-        # Ganancias totales
-        ganancias = cursor.execute("""
-            SELECT SUM(pnl_usd) as total FROM trades
-            WHERE date(timestamp_venta) >= ? AND pnl_usd > 0
-        """, (fecha_inicio,)).fetchone()['total'] or 0
-        
-        # Pérdidas totales (valor absoluto)
-        perdidas = abs(cursor.execute("""
-            SELECT SUM(pnl_usd) as total FROM trades
-            WHERE date(timestamp_venta) >= ? AND pnl_usd <= 0
-        """, (fecha_inicio,)).fetchone()['total'] or 0)
+        ganancias = resumen['suma_ganancias']
+        perdidas = abs(resumen['suma_perdidas'])
         
         if perdidas == 0:
             return 0.0 if ganancias == 0 else float('inf')
@@ -202,7 +154,7 @@ class MetricasPerformance:
     
     # ===== EXPECTANCY =====
     
-    def calcular_expectancy(self, periodo_dias: int = 30) -> float:
+    def calcular_expectancy(self, periodo_dias: int = 30, resumen: Optional[Dict] = None) -> float:
         """
         Calcular Expectancy: (Win% * Avg Win) - (Loss% * Avg Loss)
         Valor esperado por trade
@@ -210,28 +162,15 @@ class MetricasPerformance:
         Returns:
             Expectancy en USD
         """
-        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
+        resumen = self._resumen(periodo_dias, resumen)
         
-        cursor = self.db.conn.cursor()
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN pnl_usd > 0 THEN 1 ELSE 0 END) as ganadoras,
-                AVG(CASE WHEN pnl_usd > 0 THEN pnl_usd ELSE NULL END) as avg_win,
-                AVG(CASE WHEN pnl_usd <= 0 THEN pnl_usd ELSE NULL END) as avg_loss
-            FROM trades
-            WHERE date(timestamp_venta) >= ?
-        """, (fecha_inicio,))
-        
-        row = cursor.fetchone()
-        
-        if row['total'] == 0:
+        if resumen['trades'] == 0:
             return 0.0
         
-        win_pct = row['ganadoras'] / row['total']
+        win_pct = resumen['ganadoras'] / resumen['trades']
         loss_pct = 1 - win_pct
-        avg_win = row['avg_win'] or 0
-        avg_loss = row['avg_loss'] or 0
+        avg_win = resumen['suma_ganancias'] / resumen['ganadoras'] if resumen['ganadoras'] else 0
+        avg_loss = resumen['suma_perdidas'] / resumen['perdedoras'] if resumen['perdedoras'] else 0
         
         expectancy = (win_pct * avg_win) - (loss_pct * abs(avg_loss))
         
@@ -239,7 +178,7 @@ class MetricasPerformance:
     
     # ===== RECOVERY FACTOR =====
     
-    def calcular_recovery_factor(self, periodo_dias: int = 30) -> float:
+    def calcular_recovery_factor(self, periodo_dias: int = 30, resumen: Optional[Dict] = None) -> float:
         """
         Calcular Recovery Factor: Net Profit / Max Drawdown
         >10 es excelente
@@ -247,24 +186,17 @@ class MetricasPerformance:
         Returns:
             Recovery Factor
         """
-        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
+        resumen = self._resumen(periodo_dias, resumen)
         
-        # Calcular net profit
-        cursor = self.db.conn.cursor()
-        net_profit = cursor.execute("""
-            SELECT SUM(pnl_usd) as total FROM trades
-            WHERE date(timestamp_venta) >= ?
-        """, (fecha_inicio,)).fetchone()['total'] or 0
-        
-        # Calcular max drawdown
-        max_dd, _, _ = self.calcular_maximum_drawdown(periodo_dias)
+        net_profit = resumen['suma_ganancias'] + resumen['suma_perdidas']
+        max_dd, _, _ = self.calcular_maximum_drawdown(periodo_dias, resumen)
         
         if max_dd == 0:
             return 0.0
         
         # Recovery Factor = Net Profit / Max DD (en términos absolutos)
         # Asumimos capital inicial de 10K para calcular DD en USD
-        max_dd_usd = (max_dd / 100) * 10000
+        max_dd_usd = (max_dd / 100) * mi.CAPITAL_INICIAL
         
         if max_dd_usd == 0:
             return float('inf') if net_profit > 0 else 0.0
@@ -273,49 +205,24 @@ class MetricasPerformance:
     
     # ===== AVERAGE MAE/MFE =====
     
-    def calcular_mae_mfe_promedio(self, periodo_dias: int = 30) -> Tuple[float, float]:
+    def calcular_mae_mfe_promedio(self, periodo_dias: int = 30,
+                                  resumen: Optional[Dict] = None) -> Tuple[float, float]:
         """
         Calcular MAE (Maximum Adverse Excursion) y MFE (Maximum Favorable Excursion) promedio
         
-        MAE: Máxima pérdida flotante durante el trade
-        MFE: Máxima ganancia flotante durante el trade
+        MAE: Máxima pérdida flotante durante el trade (simplificado: pérdida realizada)
+        MFE: Máxima ganancia flotante durante el trade (max_precio - precio_compra)
         
         Returns:
             (mae_promedio, mfe_promedio) en USD
         """
-        fecha_inicio = (datetime.now() - timedelta(days=periodo_dias)).strftime("%Y-%m-%d")
-        
-        cursor = self.db.conn.cursor()
-        cursor.execute("""
-            SELECT 
-                precio_compra,
-                precio_venta,
-                max_precio,
-                cantidad
-            FROM trades
-            WHERE date(timestamp_venta) >= ? AND max_precio IS NOT NULL
-        """, (fecha_inicio,))
-        
-        trades = cursor.fetchall()
+        resumen = self._resumen(periodo_dias, resumen)
         
-        if not trades:
+        n = resumen['trades_con_max']
+        if not n:
             return 0.0, 0.0
         
-        mae_total = 0.0
-        mfe_total = 0.0
-        
-        for trade in trades:
-            # MAE: Máxima pérdida = precio_compra - (mínimo teórico, asumimos 1% peor)
-            # En este caso simplificado, usamos precio_compra vs precio_venta
-            mae = abs(min(0, (trade['precio_venta'] - trade['precio_compra']) * trade['cantidad']))
-            mae_total += mae
-            
-            # MFE: Máxima ganancia = max_precio - precio_compra
-            mfe = (trade['max_precio'] - trade['precio_compra']) * trade['cantidad']
-            mfe_total += mfe
-        
-        n = len(trades)
-        return round(mae_total / n, 2), round(mfe_total / n, 2)
+        return round(resumen['suma_mae'] / n, 2), round(resumen['suma_mfe'] / n, 2)
     
     # ===== REPORTE COMPLETO =====
     
@@ -328,19 +235,21 @@ class MetricasPerformance:
         """
         logger.info(f"📊 Generando reporte de métricas ({periodo_dias} días)...")
         
-        sharpe = self.calcular_sharpe_ratio(periodo_dias)
-        max_dd, fecha_pico_dd, fecha_valle_dd = self.calcular_maximum_drawdown(periodo_dias)
-        profit_factor = self.calcular_profit_factor(periodo_dias)
-        expectancy = self.calcular_expectancy(periodo_dias)
-        recovery_factor = self.calcular_recovery_factor(periodo_dias)
-        mae, mfe = self.calcular_mae_mfe_promedio(periodo_dias)
+        # Un solo acumulado del periodo para todas las métricas
+        resumen = self._resumen(periodo_dias)
+        sharpe = self.calcular_sharpe_ratio(periodo_dias, resumen=resumen)
+        max_dd, fecha_pico_dd, fecha_valle_dd = self.calcular_maximum_drawdown(periodo_dias, resumen)
+        profit_factor = self.calcular_profit_factor(periodo_dias, resumen)
+        expectancy = self.calcular_expectancy(periodo_dias, resumen)
+        recovery_factor = self.calcular_recovery_factor(periodo_dias, resumen)
+        mae, mfe = self.calcular_mae_mfe_promedio(periodo_dias, resumen)
         
         # Win rate diario
         win_rates = self.calcular_win_rate_por_periodo("diario")
         win_rate_promedio = sum(wr['win_rate'] for wr in win_rates) / len(win_rates) if win_rates else 0
         
-        # Estadísticas globales
-        stats = self.db.obtener_estadisticas_globales()
+        # Estadísticas globales (tramo total)
+        total = self.db.obtener_metricas_acumuladas()
         
         reporte = {
             'periodo_dias': periodo_dias,
@@ -357,13 +266,14 @@ class MetricasPerformance:
             'mfe_promedio': mfe,
             
             # Estadísticas generales
-            'total_trades': stats['total_trades'],
+            'total_trades': total['trades'],
             'win_rate_promedio': round(win_rate_promedio, 2),
-            'pnl_total': stats['pnl_total'],
-            'pnl_promedio_pct': stats['pnl_promedio'],
-            'mejor_trade': stats['mejor_trade'],
-            'peor_trade': stats['peor_trade'],
-            'duracion_promedio_min': stats['duracion_promedio'],
+            'pnl_total': total['suma_ganancias'] + total['suma_perdidas'],
+            'pnl_promedio_pct': total['media_retorno'] * 100,
+            'mejor_trade': total['mejor_trade'] or 0.0,
+            'peor_trade': total['peor_trade'] or 0.0,
+            'duracion_promedio_min': (total['suma_duracion'] / total['trades_con_duracion']
+                                      if total['trades_con_duracion'] else 0.0),
             
             # Interpretaciones
             'interpretacion': {
@@ -0,0 +1,151 @@
+"""
+Acumulador incremental de métricas de trading para Argos Trading Bot
+Cada trade cerrado actualiza un tramo por día y un tramo total con sumas,
+la varianza de los retornos (Welford) y la curva de equity (pico y
+drawdown). Los reportes combinan tramos en lugar de releer los trades, así
+que su costo no crece con el historial.
+"""
+import math
+from typing import Dict, Iterable, Optional
+
+# Capital de referencia de la curva de equity (el mismo que asumía metricas.py)
+CAPITAL_INICIAL = 10000.0
+# Clave del tramo con el acumulado histórico
+TOTAL = "total"
+
+COLUMNAS = (
+    "fecha", "trades", "ganadoras", "perdedoras", "suma_ganancias", "suma_perdidas",
+    "media_retorno", "m2_retorno", "mejor_trade", "peor_trade",
+    "suma_duracion", "trades_con_duracion", "suma_mae", "suma_mfe", "trades_con_max",
+    "capital", "pico", "fecha_pico", "max_drawdown", "fecha_pico_dd", "fecha_valle_dd",
+    "ultimo_timestamp",
+)
+
+SQL_CREAR = """
+    CREATE TABLE IF NOT EXISTS metricas_acumuladas (
+        fecha TEXT PRIMARY KEY,             -- YYYY-MM-DD o 'total'
+        trades INTEGER NOT NULL DEFAULT 0,
+        ganadoras INTEGER NOT NULL DEFAULT 0,
+        perdedoras INTEGER NOT NULL DEFAULT 0,
+        suma_ganancias REAL NOT NULL DEFAULT 0,
+        suma_perdidas REAL NOT NULL DEFAULT 0,
+        media_retorno REAL NOT NULL DEFAULT 0,
+        m2_retorno REAL NOT NULL DEFAULT 0,
+        mejor_trade REAL,
+        peor_trade REAL,
+        suma_duracion REAL NOT NULL DEFAULT 0,
+        trades_con_duracion INTEGER NOT NULL DEFAULT 0,
+        suma_mae REAL NOT NULL DEFAULT 0,
+        suma_mfe REAL NOT NULL DEFAULT 0,
+        trades_con_max INTEGER NOT NULL DEFAULT 0,
+        capital REAL NOT NULL,
+        pico REAL NOT NULL,
+        fecha_pico TEXT,
+        max_drawdown REAL NOT NULL DEFAULT 0,
+        fecha_pico_dd TEXT,
+        fecha_valle_dd TEXT,
+        ultimo_timestamp TEXT
+    )
+"""
+
+SQL_GUARDAR = (f"INSERT OR REPLACE INTO metricas_acumuladas ({', '.join(COLUMNAS)}) "
+               f"VALUES ({', '.join('?' * len(COLUMNAS))})")
+
+
+def nuevo_tramo(fecha: str, anterior: Optional[Dict] = None) -> Dict:
+    """
+    Tramo vacío. La curva de equity continúa desde `anterior` (el tramo
+    total antes del primer trade de `fecha`).
+    """
+    capital = anterior["capital"] if anterior else CAPITAL_INICIAL
+    return {
+        "fecha": fecha, "trades": 0, "ganadoras": 0, "perdedoras": 0,
+        "suma_ganancias": 0.0, "suma_perdidas": 0.0, "media_retorno": 0.0, "m2_retorno": 0.0,
+        "mejor_trade": None, "peor_trade": None,
+        "suma_duracion": 0.0, "trades_con_duracion": 0,
+        "suma_mae": 0.0, "suma_mfe": 0.0, "trades_con_max": 0,
+        "capital": capital,
+        "pico": anterior["pico"] if anterior else capital,
+        "fecha_pico": anterior["fecha_pico"] if anterior else None,
+        "max_drawdown": 0.0, "fecha_pico_dd": None, "fecha_valle_dd": None,
+        "ultimo_timestamp": anterior["ultimo_timestamp"] if anterior else None,
+    }
+
+
+def agregar_trade(tramo: Dict, trade: Dict) -> Dict:
+    """Sumar un trade cerrado al tramo (en orden de timestamp_venta)"""
+    pnl_usd = trade["pnl_usd"]
+    tramo["trades"] += 1
+    if pnl_usd > 0:
+        tramo["ganadoras"] += 1
+        tramo["suma_ganancias"] += pnl_usd
+    else:
+        tramo["perdedoras"] += 1
+        tramo["suma_perdidas"] += pnl_usd
+
+    # Welford: media y suma de cuadrados de desvíos de los retornos (decimal)
+    retorno = trade["pnl_pct"] / 100
+    delta = retorno - tramo["media_retorno"]
+    tramo["media_retorno"] += delta / tramo["trades"]
+    tramo["m2_retorno"] += delta * (retorno - tramo["media_retorno"])
+
+    tramo["mejor_trade"] = pnl_usd if tramo["mejor_trade"] is None else max(tramo["mejor_trade"], pnl_usd)
+    tramo["peor_trade"] = pnl_usd if tramo["peor_trade"] is None else min(tramo["peor_trade"], pnl_usd)
+    if trade.get("duracion_minutos") is not None:
+        tramo["suma_duracion"] += trade["duracion_minutos"]
+        tramo["trades_con_duracion"] += 1
+    if trade.get("max_precio") is not None:
+        # MAE simplificado (pérdida realizada) y MFE (máximo visto), como metricas.py
+        tramo["suma_mae"] += abs(min(0, (trade["precio_venta"] - trade["precio_compra"]) * trade["cantidad"]))
+        tramo["suma_mfe"] += (trade["max_precio"] - trade["precio_compra"]) * trade["cantidad"]
+        tramo["trades_con_max"] += 1
+
+    # Curva de equity: drawdown contra el máximo histórico (high-water mark)
+    fecha = trade["timestamp_venta"]
+    tramo["capital"] += pnl_usd
+    if tramo["capital"] > tramo["pico"]:
+        tramo["pico"] = tramo["capital"]
+        tramo["fecha_pico"] = fecha
+    drawdown = (tramo["pico"] - tramo["capital"]) / tramo["pico"] * 100
+    if drawdown > tramo["max_drawdown"]:
+        tramo["max_drawdown"] = drawdown
+        tramo["fecha_pico_dd"] = tramo["fecha_pico"]
+        tramo["fecha_valle_dd"] = fecha
+    tramo["ultimo_timestamp"] = fecha
+    return tramo
+
+
+def combinar(tramos: Iterable[Dict]) -> Dict:
+    """
+    Resumen de varios tramos (p. ej. los días de un periodo). La varianza se
+    combina con la fórmula de Chan et al.; el drawdown es el peor de los tramos.
+    """
+    resumen = nuevo_tramo("")
+    for tramo in tramos:
+        n_a, n_b = resumen["trades"], tramo["trades"]
+        if n_b == 0:
+            continue
+        n = n_a + n_b
+        delta = tramo["media_retorno"] - resumen["media_retorno"]
+        resumen["media_retorno"] += delta * n_b / n
+        resumen["m2_retorno"] += tramo["m2_retorno"] + delta * delta * n_a * n_b / n
+        for campo in ("trades", "ganadoras", "perdedoras", "suma_ganancias", "suma_perdidas",
+                      "suma_duracion", "trades_con_duracion", "suma_mae", "suma_mfe", "trades_con_max"):
+            resumen[campo] += tramo[campo]
+        for campo, elegir in (("mejor_trade", max), ("peor_trade", min)):
+            resumen[campo] = tramo[campo] if resumen[campo] is None else elegir(resumen[campo], tramo[campo])
+        if tramo["max_drawdown"] > resumen["max_drawdown"]:
+            for campo in ("max_drawdown", "fecha_pico_dd", "fecha_valle_dd"):
+                resumen[campo] = tramo[campo]
+        for campo in ("capital", "pico", "fecha_pico", "ultimo_timestamp"):
+            resumen[campo] = tramo[campo]
+    return resumen
+
+
+def desviacion_retornos(tramo: Dict) -> float:
+    """Desvío estándar muestral de los retornos (0 con menos de 2 trades)"""
+    if tramo["trades"] < 2:
+        return 0.0
+    varianza = tramo["m2_retorno"] / (tramo["trades"] - 1)
+    # Retornos idénticos: Welford puede dejar un residuo de redondeo en vez de 0
+    return math.sqrt(varianza) if varianza > 1e-24 else 0.0
@@ -27,8 +27,8 @@ def migrar_csv_a_sqlite():
     logger.info(f"📂 Iniciando migración desde {csv_file}")
     
     with Database() as db:
-        # Leer CSV
-        with open(csv_file, 'r', encoding='utf-8') as f:
+        # Leer CSV (todas las filas en una sola transacción)
+        with open(csv_file, 'r', encoding='utf-8') as f, db.transaccion():
             reader = csv.DictReader(f)
             trades_migrados = 0
             
@@ -0,0 +1,228 @@
+"""
+Motor de backtest vectorizado para Argos Trading Bot
+Las señales de entrada (Triple Filtro) se calculan como máscaras NumPy y las
+salidas, que dependen del camino (trailing stop, take profit, stop loss), se
+resuelven con un kernel compilado con numba si está instalado. Sin numba se
+usa una búsqueda por trade (saltando las velas sin posición) que da
+exactamente el mismo resultado.
+"""
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# numba es opcional: sin él se usa la búsqueda por trade en NumPy
+HAS_NUMBA = True
+try:
+    from numba import njit
+except Exception:
+    HAS_NUMBA = False
+
+# Motivos de salida (códigos del kernel)
+TRAILING_STOP = 1
+TAKE_PROFIT = 2
+STOP_LOSS = 3
+NOMBRES_MOTIVO = {TRAILING_STOP: 'TRAILING STOP', TAKE_PROFIT: 'TP', STOP_LOSS: 'SL'}
+
+# Velas de un trade que se recorren una a una antes de pasar a tramos vectorizados
+VENTANA_INICIAL = 32
+
+
+def senales_entrada(close: np.ndarray, rsi: np.ndarray, bb_lower: np.ndarray, ema: np.ndarray,
+                    rsi_umbral: float = 35, inicio: int = 0) -> np.ndarray:
+    """
+    Máscara de velas que cumplen el Triple Filtro:
+    RSI < umbral, precio < banda inferior de Bollinger y precio > EMA.
+    Los NaN nunca cumplen las comparaciones.
+    """
+    entradas = (rsi < rsi_umbral) & (close < bb_lower) & (close > ema)
+    entradas[:inicio] = False
+    return entradas
+
+
+def _recorrer_salidas(close, entradas, ts, tp, sl):
+    """
+    Kernel secuencial: recorre las velas una vez, igual que el loop original.
+    Se compila con numba cuando está disponible (ver `_recorrer_salidas_nb`).
+    """
+    n = close.shape[0]
+    idx_entrada = np.empty(n, dtype=np.int64)
+    idx_salida = np.empty(n, dtype=np.int64)
+    motivos = np.empty(n, dtype=np.int8)
+    total = 0
+
+    en_posicion = False
+    precio_entrada = 0.0
+    max_precio = 0.0
+    i_entrada = 0
+    for i in range(n):
+        precio = close[i]
+        if not en_posicion:
+            if entradas[i]:
+                en_posicion = True
+                precio_entrada = precio
+                max_precio = precio
+                i_entrada = i
+            continue
+
+        if precio > max_precio:
+            max_precio = precio
+
+        motivo = 0
+        if precio <= max_precio * (1 - ts):
+            motivo = TRAILING_STOP
+        elif precio >= precio_entrada * (1 + tp):
+            motivo = TAKE_PROFIT
+        elif sl > 0 and precio <= precio_entrada * (1 - sl):
+            motivo = STOP_LOSS
+
+        if motivo:
+            idx_entrada[total] = i_entrada
+            idx_salida[total] = i
+            motivos[total] = motivo
+            total += 1
+            en_posicion = False
+
+    return idx_entrada[:total], idx_salida[:total], motivos[:total]
+
+
+_recorrer_salidas_nb = njit(cache=True, nogil=True)(_recorrer_salidas) if HAS_NUMBA else None
+
+
+def _buscar_salidas(close, entradas, ts, tp, sl):
+    """
+    Resolución de salidas sin numba. Las velas sin posición se saltan con
+    búsqueda binaria sobre las señales; cada trade se recorre vela a vela
+    durante las primeras VENTANA_INICIAL velas (la mayoría sale antes) y, si
+    sigue abierto, con operaciones vectorizadas sobre tramos crecientes.
+    """
+    n = close.shape[0]
+    valores = close.tolist()
+    candidatas = np.flatnonzero(entradas)
+    lista_entrada, lista_salida, lista_motivos = [], [], []
+
+    desde = 0
+    while True:
+        k = np.searchsorted(candidatas, desde)
+        if k >= candidatas.size:
+            break
+        i = int(candidatas[k])
+        precio_entrada = valores[i]
+        nivel_tp = precio_entrada * (1 + tp)
+        nivel_sl = precio_entrada * (1 - sl)
+        max_precio = precio_entrada
+
+        salida = -1
+        motivo = 0
+        fin = min(i + 1 + VENTANA_INICIAL, n)
+        for j in range(i + 1, fin):
+            precio = valores[j]
+            if precio > max_precio:
+                max_precio = precio
+            if precio <= max_precio * (1 - ts):
+                motivo = TRAILING_STOP
+            elif precio >= nivel_tp:
+                motivo = TAKE_PROFIT
+            elif sl > 0 and precio <= nivel_sl:
+                motivo = STOP_LOSS
+            if motivo:
+                salida = j
+                break
+
+        inicio = fin
+        ventana = VENTANA_INICIAL * 2
+        while salida < 0 and inicio < n:
+            fin = min(inicio + ventana, n)
+            tramo = close[inicio:fin]
+            maximos = np.maximum.accumulate(tramo)
+            np.maximum(maximos, max_precio, out=maximos)
+            trailing = tramo <= maximos * (1 - ts)
+            salidas = trailing | (tramo >= nivel_tp)
+            if sl > 0:
+                salidas |= tramo <= nivel_sl
+
+            aciertos = np.flatnonzero(salidas)
+            if aciertos.size:
+                j = aciertos[0]
+                salida = inicio + int(j)
+                if trailing[j]:
+                    motivo = TRAILING_STOP
+                elif tramo[j] >= nivel_tp:
+                    motivo = TAKE_PROFIT
+                else:
+                    motivo = STOP_LOSS
+                break
+            max_precio = maximos[-1]
+            inicio = fin
+            ventana *= 2
+
+        if salida < 0:
+            break  # posición abierta al final de los datos: no cuenta
+        lista_entrada.append(i)
+        lista_salida.append(salida)
+        lista_motivos.append(motivo)
+        desde = salida + 1
+
+    return (np.array(lista_entrada, dtype=np.int64), np.array(lista_salida, dtype=np.int64),
+            np.array(lista_motivos, dtype=np.int8))
+
+
+def resolver_salidas(close: np.ndarray, entradas: np.ndarray, ts: float, tp: float,
+                     sl: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Resolver los trades a partir de la máscara de entradas.
+
+    Args:
+        sl: Stop loss fijo; None lo desactiva (como en backtest.run_backtest)
+
+    Returns:
+        (índices de entrada, índices de salida, motivos) de los trades cerrados
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    entradas = np.ascontiguousarray(entradas, dtype=np.bool_)
+    sl = float(sl or 0.0)
+    if HAS_NUMBA:
+        return _recorrer_salidas_nb(close, entradas, float(ts), float(tp), sl)
+    return _buscar_salidas(close, entradas, float(ts), float(tp), sl)
+
+
+def ejecutar_backtest(close, rsi, bb_lower, ema, ts: float, tp: float, sl: Optional[float] = None,
+                      rsi_umbral: float = 35, inicio: int = 0, saldo_inicial: float = 1000.0,
+                      tp_al_limite: bool = False) -> Dict:
+    """
+    Backtest completo del Triple Filtro + Trailing Stop sobre arrays de indicadores.
+
+    Args:
+        tp_al_limite: El take profit se llena al precio límite (entrada * (1 + tp))
+            en lugar del cierre de la vela, como asume optimize.py
+
+    Returns:
+        Dict con saldo_final, ganadas, perdidas y los arrays por trade
+        (idx_entrada, idx_salida, motivos, pnl_pct)
+    """
+    close = np.asarray(close, dtype=np.float64)
+    entradas = senales_entrada(close, np.asarray(rsi, dtype=np.float64), np.asarray(bb_lower, dtype=np.float64),
+                               np.asarray(ema, dtype=np.float64), rsi_umbral, inicio)
+    idx_entrada, idx_salida, motivos = resolver_salidas(close, entradas, ts, tp, sl)
+
+    precios_entrada = close[idx_entrada]
+    precios_salida = close[idx_salida]
+    if tp_al_limite:
+        precios_salida = np.where(motivos == TAKE_PROFIT, precios_entrada * (1 + tp), precios_salida)
+    pnl_pct = (precios_salida - precios_entrada) / precios_entrada
+
+    # Interés compuesto en el mismo orden que el loop original (mismo redondeo)
+    saldo = saldo_inicial
+    for pnl in pnl_pct.tolist():
+        saldo += saldo * pnl
+
+    # El take profit siempre cuenta como ganada
+    ganadas = int(np.count_nonzero((pnl_pct > 0) | (motivos == TAKE_PROFIT)))
+    return {
+        'saldo_inicial': saldo_inicial,
+        'saldo_final': saldo,
+        'ganadas': ganadas,
+        'perdidas': int(pnl_pct.size - ganadas),
+        'idx_entrada': idx_entrada,
+        'idx_salida': idx_salida,
+        'motivos': motivos,
+        'pnl_pct': pnl_pct,
+    }
@@ -1,40 +1,267 @@
-import requests
+"""
+Notificaciones de Telegram para Argos Trading Bot
+enviar_telegram() no hace la petición: encola el mensaje y vuelve al
+instante. Un hilo despachador lo envía con una sesión HTTP persistente,
+respetando el límite de Telegram por chat; los mensajes que se juntan
+mientras tanto (una ráfaga de avisos parecidos) salen en un solo resumen.
+Si la API está lenta o caída, el bot sigue operando: los envíos se
+reintentan con backoff y, si la cola se llena, se descartan primero los
+mensajes de menor prioridad.
+"""
+import atexit
+import logging
 import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Mensajes en espera como máximo (los de baja prioridad se descartan primero)
+TELEGRAM_MAX_COLA = int(os.getenv("TELEGRAM_MAX_COLA", "100"))
+# Telegram admite ~1 mensaje por segundo a un mismo chat
+TELEGRAM_INTERVALO_SEG = float(os.getenv("TELEGRAM_INTERVALO_SEG", "1.0"))
+TELEGRAM_REINTENTOS = int(os.getenv("TELEGRAM_REINTENTOS", "4"))
+TELEGRAM_TIMEOUT_SEG = float(os.getenv("TELEGRAM_TIMEOUT_SEG", "10"))
+# Espera máxima entre reintentos
+MAX_BACKOFF_SEG = 30.0
+# Largo máximo de un mensaje de Telegram
+LIMITE_TEXTO = 4096
 
+# Prioridades (menor = más importante)
+ALTA = 0     # trades, errores
+NORMAL = 1
+BAJA = 2     # heartbeat, estado periódico
 
-def enviar_telegram(mensaje, tipo="info"):
+PREFIJOS = {
+    "info": "ℹ️",
+    "error": "❌",
+    "warning": "⚠️",
+    "success": "✅"
+}
+
+
+class Mensaje(NamedTuple):
+    texto: str
+    tipo: str
+    prioridad: int
+    chat_id: str
+
+
+class DespachadorTelegram:
     """
-    Envía una notificación al chat de Telegram configurado en las variables de entorno.
-    tipo: "info", "error", "warning", "success"
+    Cola acotada de mensajes y un hilo que los envía. Nunca bloquea a quien
+    encola: ni por la red ni por el límite de envíos.
     """
+
+    def __init__(self, token: str, chat_id: str, max_cola: int = TELEGRAM_MAX_COLA,
+                 intervalo: float = TELEGRAM_INTERVALO_SEG, reintentos: int = TELEGRAM_REINTENTOS,
+                 timeout: float = TELEGRAM_TIMEOUT_SEG, sesion: Optional[requests.Session] = None,
+                 dormir: Callable[[float], None] = time.sleep):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.max_cola = max_cola
+        self.intervalo = intervalo
+        self.reintentos = reintentos
+        self.timeout = timeout
+        # Sesión persistente: reutiliza la conexión TLS entre mensajes
+        self.sesion = sesion or requests.Session()
+        self._dormir = dormir
+        self._cola: List[Mensaje] = []
+        self._cond = threading.Condition()
+        self._ultimo_envio: Dict[str, float] = {}
+        self._enviando = False
+        self._detener = False
+        self._hilo: Optional[threading.Thread] = None
+        self.enviados = 0
+        self.descartados = 0
+        self.fallidos = 0
+
+    # ===== COLA =====
+
+    def encolar(self, texto: str, tipo: str = "info", prioridad: int = NORMAL,
+                chat_id: Optional[str] = None) -> bool:
+        """
+        Agregar un mensaje a la cola (no bloquea).
+
+        Returns:
+            False si se descartó por estar la cola llena
+        """
+        mensaje = Mensaje(texto, tipo, prioridad, chat_id or self.chat_id)
+        with self._cond:
+            if len(self._cola) >= self.max_cola:
+                # Candidato: el más nuevo de la prioridad más baja en espera
+                victima = max(range(len(self._cola)), key=lambda i: (self._cola[i].prioridad, i))
+                if self._cola[victima].prioridad > prioridad or prioridad == ALTA:
+                    descartado = self._cola.pop(victima)
+                else:
+                    descartado = mensaje
+                self.descartados += 1
+                logger.warning(f"Cola de Telegram llena, se descarta: {descartado.texto[:60]!r}")
+                if descartado is mensaje:
+                    return False
+            self._cola.append(mensaje)
+            self._cond.notify_all()
+        return True
+
+    def pendientes(self) -> int:
+        with self._cond:
+            return len(self._cola)
+
+    def _tomar_lote(self) -> Tuple[Mensaje, List[str]]:
+        """
+        El mensaje más importante (y más viejo) junto con los que esperan del
+        mismo chat, tipo y prioridad, hasta el largo máximo de un mensaje.
+        """
+        primero = min(self._cola, key=lambda m: m.prioridad)
+        lote, restantes, largo = [], [], 0
+        for m in self._cola:
+            similar = (m.chat_id, m.tipo, m.prioridad) == (primero.chat_id, primero.tipo, primero.prioridad)
+            if similar and (not lote or largo + len(m.texto) + 4 < LIMITE_TEXTO - 100):
+                lote.append(m.texto)
+                largo += len(m.texto) + 4
+            else:
+                restantes.append(m)
+        self._cola = restantes
+        return primero, lote
+
+    @staticmethod
+    def resumen(tipo: str, textos: List[str]) -> str:
+        """Un solo mensaje para varios textos (los repetidos se cuentan una vez)"""
+        prefijo = PREFIJOS.get(tipo, "ℹ️")
+        cuentas: Dict[str, int] = {}
+        for texto in textos:
+            cuentas[texto] = cuentas.get(texto, 0) + 1
+        partes = [f"{prefijo} {texto}" + (f" (x{n})" if n > 1 else "") for texto, n in cuentas.items()]
+        return "\n\n".join(partes)[:LIMITE_TEXTO]
+
+    # ===== ENVÍO =====
+
+    def _enviar(self, chat_id: str, texto: str) -> bool:
+        """POST con reintentos: backoff ante errores de red o 5xx, retry_after ante 429"""
+        payload = {'chat_id': chat_id, 'text': texto, 'parse_mode': 'Markdown'}
+        intento = 0
+        while True:
+            espera = min(2 ** intento, MAX_BACKOFF_SEG)
+            try:
+                response = self.sesion.post(self.url, data=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                logger.warning(f"⚠️ Excepción al enviar a Telegram: {e}")
+            else:
+                if response.status_code == 200:
+                    self.enviados += 1
+                    return True
+                if response.status_code == 429:
+                    try:
+                        espera = float(response.json()['parameters']['retry_after'])
+                    except (ValueError, KeyError, TypeError):
+                        pass
+                elif response.status_code == 400 and 'parse_mode' in payload:
+                    # Markdown inválido (p. ej. un "_" suelto): se manda como texto plano
+                    payload.pop('parse_mode')
+                    continue
+                elif response.status_code < 500:
+                    logger.warning(f"⚠️ Error enviando a Telegram: {response.text}")
+                    self.fallidos += 1
+                    return False
+            intento += 1
+            if intento > self.reintentos:
+                self.fallidos += 1
+                logger.error(f"❌ Telegram: mensaje no enviado tras {self.reintentos} reintentos")
+                return False
+            self._dormir(espera)
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while not self._cola and not self._detener:
+                    self._cond.wait()
+                if not self._cola:
+                    return
+                # Límite por chat: mientras se espera, la ráfaga se sigue juntando
+                chat_id = min(self._cola, key=lambda m: m.prioridad).chat_id
+                espera = self._ultimo_envio.get(chat_id, 0) + self.intervalo - time.monotonic()
+                if espera > 0:
+                    self._cond.wait(espera)
+                    continue
+                primero, textos = self._tomar_lote()
+                self._enviando = True
+            try:
+                self._enviar(primero.chat_id, self.resumen(primero.tipo, textos))
+            except Exception as e:
+                logger.error(f"❌ Error en el despachador de Telegram: {e}")
+            finally:
+                with self._cond:
+                    self._enviando = False
+                    self._ultimo_envio[primero.chat_id] = time.monotonic()
+                    self._cond.notify_all()
+
+    # ===== CICLO DE VIDA =====
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._detener = False
+            self._hilo = threading.Thread(target=self._bucle, name="telegram", daemon=True)
+            self._hilo.start()
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Esperar a que se envíe todo lo encolado (True si se vació a tiempo)"""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            while self._cola or self._enviando:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                self._cond.wait(restante)
+        return True
+
+    def detener(self, timeout: float = 5.0):
+        """Enviar lo pendiente (hasta `timeout` segundos) y terminar el hilo"""
+        with self._cond:
+            self._detener = True
+            self._cond.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+            self._hilo = None
+
+
+_despachador: Optional[DespachadorTelegram] = None
+_lock_despachador = threading.Lock()
+
+
+def obtener_despachador() -> Optional[DespachadorTelegram]:
+    """Despachador global (se crea al primer mensaje; None si Telegram no está configurado)"""
+    global _despachador
     token = os.getenv('TELEGRAM_TOKEN')
     chat_id = os.getenv('TELEGRAM_CHAT_ID')
-
     if not token or not chat_id:
+        return None
+    with _lock_despachador:
+        if _despachador is None:
+            _despachador = DespachadorTelegram(token, chat_id)
+            _despachador.iniciar()
+            atexit.register(_despachador.detener)
+        return _despachador
+
+
+def enviar_telegram(mensaje, tipo="info", prioridad=None):
+    """
+    Envía una notificación al chat de Telegram configurado en las variables de entorno.
+    tipo: "info", "error", "warning", "success"
+    prioridad: ALTA, NORMAL o BAJA (por defecto ALTA para errores y avisos)
+
+    No bloquea: el mensaje se encola y lo envía el despachador en segundo plano.
+    """
+    despachador = obtener_despachador()
+    if despachador is None:
         print(f"⚠️ Telegram no configurado. Mensaje no enviado: {mensaje}")
         return
 
-    # Emoji según tipo
-    prefix = {
-        "info": "ℹ️",
-        "error": "❌",
-        "warning": "⚠️",
-        "success": "✅"
-    }.get(tipo, "ℹ️")
-    texto = f"{prefix} {mensaje}"
-
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        'chat_id': chat_id,
-        'text': texto,
-        'parse_mode': 'Markdown'
-    }
-    try:
-        response = requests.post(url, data=payload, timeout=10)
-        if response.status_code != 200:
-            print(f"⚠️ Error enviando a Telegram: {response.text}")
-    except Exception as e:
-        print(f"⚠️ Excepción al enviar a Telegram: {e}")
+    if prioridad is None:
+        prioridad = ALTA if tipo in ("error", "warning") else NORMAL
+    despachador.encolar(mensaje, tipo, prioridad)
 
 def enviar_alerta_error(mensaje):
     enviar_telegram(mensaje, tipo="error")
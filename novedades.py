@@ -0,0 +1,194 @@
+"""
+Novedades de argos.db para el dashboard (Server-Sent Events)
+En lugar de que el navegador vuelva a pedir historial, estado y trades cada
+5 segundos, el servidor manda solo lo nuevo (velas, cambios de estado y
+trades) a medida que el bot lo escribe. Cada evento lleva un cursor como
+`id:`; al reconectar, EventSource lo reenvía en `Last-Event-ID` y el cliente
+recibe lo que se perdió sin recargar todo.
+"""
+import asyncio
+import json
+import sqlite3
+import time
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, NamedTuple, Optional, Tuple
+
+from conexiones import PoolLectura
+
+# Ticks (o velas por par) máximos que se reenvían al reanudar; si se perdieron más, el cliente recarga
+LIMITE_TICKS = 2000
+
+# Última vela de cada par y timeframe (la clave primaria de velas la resuelve)
+SQL_ULTIMAS_VELAS = """
+    SELECT symbol, timeframe, MAX(open_time) AS open_time FROM velas GROUP BY symbol, timeframe
+"""
+SQL_VELAS_DESDE = """
+    SELECT symbol, timeframe, open_time, open, high, low, close, volumen FROM velas
+    WHERE symbol = ? AND timeframe = ? AND open_time >= ? ORDER BY open_time LIMIT ?
+"""
+
+
+class Cursor(NamedTuple):
+    """
+    Hasta dónde vio el cliente: últimos ids, últimas actualizaciones de
+    estado y, por par y timeframe, la última vela (open_time en ms y cierre:
+    la vela abierta se reescribe con el mismo open_time)
+    """
+    precio: int = 0
+    trade: int = 0
+    estado: str = ""
+    pares: str = ""
+    velas: Tuple[Tuple[str, str, int, float], ...] = ()
+
+    def __str__(self) -> str:
+        velas = ";".join(f"{s},{tf},{ms},{cierre!r}" for s, tf, ms, cierre in self.velas)
+        return f"{self.precio}|{self.trade}|{self.estado}|{self.pares}|{velas}"
+
+    @classmethod
+    def desde_texto(cls, texto: Optional[str]) -> Optional["Cursor"]:
+        """Cursor de `Last-Event-ID` (None si falta o no es válido)"""
+        try:
+            partes = (texto or "").split("|")
+            if len(partes) == 4:
+                partes.append("")  # cursor anterior a las velas
+            precio, trade, estado, pares, velas = partes
+            return cls(int(precio), int(trade), estado, pares,
+                       tuple((s, tf, int(ms), float(cierre))
+                             for s, tf, ms, cierre in (v.split(",") for v in velas.split(";") if v)))
+        except ValueError:
+            return None
+
+
+def formatear_sse(evento: str, datos, id_evento: Optional[str] = None) -> str:
+    """Un mensaje SSE (el JSON no lleva saltos de línea)"""
+    mensaje = f"event: {evento}\n"
+    if id_evento is not None:
+        mensaje += f"id: {id_evento}\n"
+    return mensaje + f"data: {json.dumps(datos, separators=(',', ':'), default=str)}\n\n"
+
+
+class FuenteNovedades:
+    """Lee de la base lo posterior a un cursor"""
+
+    def __init__(self, pool: PoolLectura):
+        self.pool = pool
+
+    @staticmethod
+    def _filas(conn, sql: str, params=()) -> List[dict]:
+        try:
+            return [dict(fila) for fila in conn.execute(sql, params)]
+        except sqlite3.OperationalError:
+            return []  # tabla que todavía no existe (base vieja o vacía)
+
+    def cursor_actual(self) -> Cursor:
+        """Cursor al final de los datos (conexión nueva: solo lo que venga)"""
+        with self.pool.conexion() as conn:
+            def maximo(sql):
+                filas = self._filas(conn, sql)
+                return filas[0]["m"] if filas and filas[0]["m"] is not None else None
+            return Cursor(
+                maximo("SELECT MAX(id) AS m FROM precios") or 0,
+                maximo("SELECT MAX(id) AS m FROM trades") or 0,
+                maximo("SELECT ultimo_update AS m FROM estado WHERE id = 1") or "",
+                maximo("SELECT MAX(ultimo_update) AS m FROM estado_simbolos") or "",
+                # Sin cursor previo, cada par arranca en su última vela
+                self._leer_velas(conn, Cursor())[1],
+            )
+
+    def _leer_velas(self, conn, cursor: Cursor) -> Tuple[List[dict], Tuple, bool]:
+        """
+        Velas nuevas o cambiadas de cada par desde el cursor (la última vista
+        se reenvía solo si cambió su cierre), el cursor de velas nuevo y si el
+        cliente se atrasó demasiado. Un par que aparece después empieza en su
+        última vela.
+        """
+        vistas = {(s, tf): (ms, cierre) for s, tf, ms, cierre in cursor.velas}
+        velas, nuevo, atrasado = [], [], False
+        for fila in self._filas(conn, SQL_ULTIMAS_VELAS):
+            clave = (fila["symbol"], fila["timeframe"])
+            desde, cierre = vistas.get(clave, (fila["open_time"], None))
+            filas = self._filas(conn, SQL_VELAS_DESDE, (*clave, desde, LIMITE_TICKS + 1))
+            atrasado = atrasado or len(filas) > LIMITE_TICKS
+            if filas and filas[0]["open_time"] == desde and filas[0]["close"] == cierre:
+                filas = filas[1:]
+            if filas:
+                desde, cierre = filas[-1]["open_time"], filas[-1]["close"]
+            nuevo.append((*clave, desde, cierre))
+            for v in filas:
+                # Formato Lightweight Charts: time en segundos
+                v["time"] = v.pop("open_time") // 1000
+            velas += filas
+        return velas, tuple(nuevo), atrasado
+
+    def leer(self, cursor: Cursor) -> Tuple[List[Tuple[str, object]], Cursor]:
+        """
+        Eventos posteriores a `cursor` y el cursor nuevo. Eventos:
+        'velas' (OHLCV de cualquier par, con time en segundos), 'trades',
+        'estado' y 'pares' (estado por símbolo); 'reset' si el cliente se
+        atrasó demasiado. 'ticks' (lista de {id, time, close}) sale de la
+        tabla precios, que el bot multi-par ya no escribe (no tiene columna
+        symbol): solo la llenan bases de versiones anteriores o benchmark.py.
+        """
+        eventos = []
+        with self.pool.conexion() as conn:
+            ticks = self._filas(conn, """
+                SELECT id, timestamp, precio AS close FROM precios WHERE id > ? ORDER BY id LIMIT ?
+            """, (cursor.precio, LIMITE_TICKS + 1))
+            for tick in ticks:
+                # Timestamps isoformat en hora local: igual que el historial de /api/history
+                tick["time"] = int(datetime.fromisoformat(tick.pop("timestamp")).timestamp())
+            velas, cursor_velas, velas_atrasadas = self._leer_velas(conn, cursor)
+            atrasado = len(ticks) > LIMITE_TICKS or velas_atrasadas
+            trades = self._filas(conn, "SELECT * FROM trades WHERE id > ? ORDER BY id", (cursor.trade,))
+            estado = self._filas(conn, "SELECT * FROM estado WHERE id = 1 AND ultimo_update > ?", (cursor.estado,))
+            pares = self._filas(conn, "SELECT * FROM estado_simbolos WHERE ultimo_update > ? ORDER BY symbol",
+                                (cursor.pares,))
+
+        if atrasado:
+            return [("reset", {})], self.cursor_actual()
+        if ticks:
+            eventos.append(("ticks", ticks))
+            cursor = cursor._replace(precio=ticks[-1]["id"])
+        if velas:
+            eventos.append(("velas", velas))
+        cursor = cursor._replace(velas=cursor_velas)
+        if trades:
+            eventos.append(("trades", trades))
+            cursor = cursor._replace(trade=trades[-1]["id"])
+        if estado:
+            eventos.append(("estado", estado[0]))
+            cursor = cursor._replace(estado=estado[0]["ultimo_update"])
+        if pares:
+            eventos.append(("pares", pares))
+            cursor = cursor._replace(pares=max(p["ultimo_update"] for p in pares))
+        return eventos, cursor
+
+    async def transmitir(self, cursor: Optional[Cursor] = None, intervalo: float = 1.0, latido: float = 15.0,
+                         desconectado: Optional[Callable[[], Awaitable[bool]]] = None) -> AsyncIterator[str]:
+        """
+        Flujo SSE. Sin cursor empieza con un evento 'cursor' (el cliente hace
+        la carga inicial completa); con cursor reenvía lo que se perdió.
+        Solo consulta las tablas cuando cambió `PRAGMA data_version`.
+        """
+        if cursor is None:
+            # La versión antes que el cursor: una escritura entre ambos se relee
+            version = await asyncio.to_thread(self.pool.version)
+            cursor = await asyncio.to_thread(self.cursor_actual)
+            yield formatear_sse("cursor", {"cursor": str(cursor)}, str(cursor))
+        else:
+            version = None  # forzar la primera lectura (catch-up)
+
+        ultimo_envio = time.monotonic()
+        while not (desconectado and await desconectado()):
+            actual = await asyncio.to_thread(self.pool.version)
+            if actual != version:
+                version = actual
+                eventos, cursor = await asyncio.to_thread(self.leer, cursor)
+                for evento, datos in eventos:
+                    yield formatear_sse(evento, datos, str(cursor))
+                    ultimo_envio = time.monotonic()
+            if time.monotonic() - ultimo_envio >= latido:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": ping\n\n"
+                ultimo_envio = time.monotonic()
+            await asyncio.sleep(intervalo)
@@ -0,0 +1,233 @@
+"""
+Núcleo asíncrono de Argos Trading Bot
+Separa en tareas asyncio independientes la obtención de datos de mercado,
+la evaluación de la estrategia, la ejecución de órdenes y la atención de
+comandos, comunicadas por colas. Las notificaciones no pasan por el núcleo:
+las envía el despachador de Telegram en su propio hilo (notificaciones.py).
+
+Las funciones de E/S bloqueantes (ccxt, SQLite) se ejecutan en hilos con
+asyncio.to_thread, de modo que una petición lenta nunca retrasa la
+evaluación ni la ejecución de una orden.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger('ArgosBot')
+
+REINTENTO_MERCADO_SEG = 10
+PAUSA_COMANDOS_SEG = 2
+ESPERA_PRECIO_SEG = 1.0
+# Con el feed WebSocket caído, segundos entre consultas de precio por REST
+INTERVALO_PRECIOS_REST_SEG = 5
+INTERVALO_MANTENIMIENTO_SEG = 5
+
+
+class NucleoAsync:
+    """
+    Runtime del bot basado en asyncio.
+
+    Callbacks (todas síncronas):
+        obtener_mercado(): snapshot de mercado, o None si aún no hay datos suficientes (en hilo)
+        evaluar(snapshot): lista de órdenes a ejecutar (rápida, en el loop)
+        ejecutar(orden): envía la orden al exchange y actualiza el estado (en hilo)
+        leer_comandos(): lista de comandos recibidos (en hilo). Opcional: los
+            comandos también pueden llegar con recibir_comando() desde otro hilo
+        atender_comando(comando, snapshot): lista de órdenes derivadas del comando
+        evaluar_precio(symbol, precio): lista de órdenes para un precio del feed en vivo
+        obtener_precios(): {symbol: precio} por REST mientras el feed no está activo (en hilo)
+        mantenimiento(): tareas periódicas de la base (flush, compactación) (en hilo)
+    """
+
+    def __init__(self, obtener_mercado: Callable[[], Any],
+                 evaluar: Callable[[Any], List[Dict]],
+                 ejecutar: Callable[[Dict], None],
+                 leer_comandos: Optional[Callable[[], List[str]]] = None,
+                 atender_comando: Optional[Callable[[str, Any], List[Dict]]] = None,
+                 feed=None,
+                 evaluar_precio: Optional[Callable[[str, float], List[Dict]]] = None,
+                 obtener_precios: Optional[Callable[[], Dict[str, float]]] = None,
+                 mantenimiento: Optional[Callable[[], None]] = None,
+                 intervalo_mercado: float = 60,
+                 intervalo_mantenimiento: float = INTERVALO_MANTENIMIENTO_SEG,
+                 intervalo_precios_rest: float = INTERVALO_PRECIOS_REST_SEG,
+                 reintento_mercado: float = REINTENTO_MERCADO_SEG,
+                 pausa_comandos: float = PAUSA_COMANDOS_SEG):
+        self.obtener_mercado = obtener_mercado
+        self.evaluar = evaluar
+        self.ejecutar = ejecutar
+        self.leer_comandos = leer_comandos
+        self.atender_comando = atender_comando
+        self.feed = feed
+        self.evaluar_precio = evaluar_precio
+        self.obtener_precios = obtener_precios
+        self.mantenimiento = mantenimiento
+        self.intervalo_mercado = intervalo_mercado
+        self.intervalo_mantenimiento = intervalo_mantenimiento
+        self.intervalo_precios_rest = intervalo_precios_rest
+        self.reintento_mercado = reintento_mercado
+        self.pausa_comandos = pausa_comandos
+
+        # El mercado solo conserva el snapshot más reciente
+        self.cola_mercado: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.cola_ordenes: asyncio.Queue = asyncio.Queue()
+
+        self.ultimo_mercado = None
+        # Pares con una orden en cola o ejecutándose
+        self.en_curso: Set[Optional[str]] = set()
+        self._comandos_pendientes: List[str] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tareas: List[asyncio.Task] = []
+
+    # ===== API PARA EL RESTO DEL BOT =====
+
+    def recibir_comando(self, comando: str):
+        """
+        Comando que llega desde otro hilo (p. ej. comandos.EscuchaComandos):
+        se atiende en el loop en cuanto se recibe, sin esperar a la próxima
+        lectura de `leer_comandos`.
+        """
+        if self._loop is None:
+            # Núcleo aún no iniciado: se atiende al arrancar
+            self._comandos_pendientes.append(comando)
+            return
+        self._loop.call_soon_threadsafe(self._atender_comando, comando)
+
+    def _atender_comando(self, comando: str):
+        try:
+            self._encolar_ordenes(self.atender_comando(comando, self.ultimo_mercado))
+        except Exception as e:
+            logger.error(f"Error procesando comando {comando!r}: {e}", exc_info=True)
+
+    def _encolar_ordenes(self, ordenes: Optional[List[Dict]]):
+        """
+        Una orden a la vez por par: mientras un par tiene una en curso se
+        ignoran sus señales nuevas, pero las de los otros pares se encolan
+        """
+        for orden in ordenes or []:
+            symbol = orden.get('symbol')
+            if symbol in self.en_curso:
+                logger.debug(f"Orden ignorada (hay otra en curso para {symbol}): {orden}")
+                continue
+            self.en_curso.add(symbol)
+            self.cola_ordenes.put_nowait(orden)
+
+    # ===== TAREAS =====
+
+    async def _tarea_mercado(self):
+        while True:
+            espera = self.intervalo_mercado
+            try:
+                snapshot = await asyncio.to_thread(self.obtener_mercado)
+                if snapshot is None:
+                    espera = self.reintento_mercado
+                else:
+                    if self.cola_mercado.full():
+                        self.cola_mercado.get_nowait()
+                    self.cola_mercado.put_nowait(snapshot)
+            except Exception as e:
+                logger.error(f"Error obteniendo datos de mercado: {e}", exc_info=True)
+                espera = self.reintento_mercado
+            await asyncio.sleep(espera)
+
+    async def _tarea_estrategia(self):
+        while True:
+            snapshot = await self.cola_mercado.get()
+            self.ultimo_mercado = snapshot
+            try:
+                self._encolar_ordenes(self.evaluar(snapshot))
+            except Exception as e:
+                logger.error(f"Error evaluando estrategia: {e}", exc_info=True)
+
+    async def _tarea_precios(self):
+        caido = False
+        while True:
+            if self.obtener_precios is not None and not self.feed.activo:
+                # Feed caído (o aún sin conectar): salidas por ticker REST hasta que vuelva
+                if not caido:
+                    logger.warning(f"Feed WebSocket sin datos: precios por REST cada {self.intervalo_precios_rest}s")
+                    caido = True
+                try:
+                    precios = await asyncio.to_thread(self.obtener_precios)
+                except Exception as e:
+                    logger.error(f"Error obteniendo precios por REST: {e}", exc_info=True)
+                    precios = {}
+                espera = self.intervalo_precios_rest
+            else:
+                if caido:
+                    logger.info("Feed WebSocket activo de nuevo")
+                    caido = False
+                precios = await asyncio.to_thread(self.feed.esperar_precios, ESPERA_PRECIO_SEG)
+                espera = 0
+            for symbol, precio in precios.items():
+                try:
+                    self._encolar_ordenes(self.evaluar_precio(symbol, precio))
+                except Exception as e:
+                    logger.error(f"Error evaluando precio en vivo de {symbol}: {e}", exc_info=True)
+            if espera:
+                await asyncio.sleep(espera)
+
+    async def _tarea_ejecucion(self):
+        while True:
+            orden = await self.cola_ordenes.get()
+            try:
+                await asyncio.to_thread(self.ejecutar, orden)
+            except Exception as e:
+                logger.error(f"Error ejecutando orden {orden}: {e}", exc_info=True)
+            finally:
+                self.en_curso.discard(orden.get('symbol'))
+
+    async def _tarea_mantenimiento(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.mantenimiento)
+            except Exception as e:
+                logger.error(f"Error en el mantenimiento: {e}", exc_info=True)
+            await asyncio.sleep(self.intervalo_mantenimiento)
+
+    async def _tarea_comandos(self):
+        while True:
+            try:
+                comandos = await asyncio.to_thread(self.leer_comandos)
+                for comando in comandos or []:
+                    self._encolar_ordenes(self.atender_comando(comando, self.ultimo_mercado))
+            except Exception as e:
+                logger.error(f"Error procesando comandos: {e}", exc_info=True)
+            await asyncio.sleep(self.pausa_comandos)
+
+    # ===== CICLO DE VIDA =====
+
+    async def ejecutar_tareas(self):
+        """Lanzar todas las tareas y esperar (hasta cancelación o error fatal)"""
+        self._loop = asyncio.get_running_loop()
+        corrutinas = {
+            'mercado': self._tarea_mercado(),
+            'estrategia': self._tarea_estrategia(),
+            'ejecucion': self._tarea_ejecucion(),
+        }
+        if self.leer_comandos and self.atender_comando:
+            corrutinas['comandos'] = self._tarea_comandos()
+        if self.feed is not None and self.evaluar_precio:
+            corrutinas['precios'] = self._tarea_precios()
+        if self.mantenimiento:
+            corrutinas['mantenimiento'] = self._tarea_mantenimiento()
+
+        self._tareas = [asyncio.create_task(c, name=nombre) for nombre, c in corrutinas.items()]
+        for comando in self._comandos_pendientes:
+            self._loop.call_soon(self._atender_comando, comando)
+        self._comandos_pendientes = []
+        logger.info(f"Núcleo asíncrono iniciado: {', '.join(corrutinas)}")
+        try:
+            await asyncio.gather(*self._tareas)
+        finally:
+            for tarea in self._tareas:
+                tarea.cancel()
+            self._loop = None
+
+    def detener(self):
+        """Cancelar todas las tareas (seguro desde cualquier hilo)"""
+        loop = self._loop
+        if loop is None:
+            return
+        for tarea in self._tareas:
+            loop.call_soon_threadsafe(tarea.cancel)
@@ -1,12 +1,28 @@
 import pandas as pd
-import pandas_ta as ta
-import ccxt
+import numpy as np
 import time
 import os
 from dotenv import load_dotenv
 import itertools
 import multiprocessing
+from multiprocessing import shared_memory
 from datetime import datetime
+from motor_backtest import ejecutar_backtest
+from historico import cargar_historico
+from indicadores import calcular_series
+
+# ccxt solo hace falta para descargar datos; sin pandas_ta los indicadores
+# salen de indicadores.calcular_series (mismos valores que pandas_ta)
+HAS_CCXT = True
+HAS_PANDAS_TA = True
+try:
+    import ccxt
+except Exception:
+    HAS_CCXT = False
+try:
+    import pandas_ta as ta
+except Exception:
+    HAS_PANDAS_TA = False
 
 # Cargar configuración
 load_dotenv()
@@ -21,36 +37,37 @@ TRAILING_RANGE = [0.005, 0.01, 0.02] # 0.5% a 2%
 
 RISK_FREE_RATE = 0.0  # Para Sharpe Ratio
 
+# Velas a usar del archivo local (4000 velas * 15m = ~41 días; 0 = todo el archivo)
+OPTIMIZE_VELAS = int(os.getenv('OPTIMIZE_VELAS', 4000))
+
+# Columnas que necesitan los workers (se publican una sola vez en memoria compartida)
+COLUMNAS = ('close', 'RSI', 'BB_LOWER', 'EMA_20')
+# Tareas por worker: cada chunk es una lista de tuplas de parámetros
+CHUNKS_POR_PROCESO = 4
+
+# Datos del worker: vistas NumPy sobre el bloque de memoria compartida
+_SHM = None
+_DATOS = None
+
 def get_data():
-    """Descarga datos históricos de Binance para optimización"""
-    exchange = ccxt.binance()
-    print(f"⏳ Descargando datos históricos para {SYMBOL}...")
-    
-    all_ohlcv = []
-    # 4000 velas * 15m = ~41 días
-    since = exchange.milliseconds() - (4000 * 15 * 60 * 1000)
-    
-    for _ in range(4):
-        try:
-            ohlcv = exchange.fetch_ohlcv(SYMBOL, '15m', limit=1000, since=since)
-            if not ohlcv: break
-            all_ohlcv.extend(ohlcv)
-            since = ohlcv[-1][0] + 1
-            time.sleep(0.5)
-        except Exception as e:
-            print(f"❌ Error descargando datos: {e}")
-            break
-            
-    df = pd.DataFrame(all_ohlcv, columns=['ts', 'open', 'high', 'low', 'close', 'vol'])
-    df['datetime'] = pd.to_datetime(df['ts'], unit='ms')
+    """Carga datos históricos del archivo local (descarga solo las velas que faltan)"""
+    print(f"⏳ Cargando datos históricos para {SYMBOL}...")
+    exchange = ccxt.binance({'enableRateLimit': True}) if HAS_CCXT else None
+    df = cargar_historico(SYMBOL, '15m', velas=OPTIMIZE_VELAS or None, exchange=exchange)
     
     # Calcular indicadores base
-    df['RSI'] = ta.rsi(df['close'], length=14)
-    df['EMA_20'] = ta.ema(df['close'], length=20)
-    
-    # Bandas de Bollinger (usamos bb_lower)
-    bb = ta.bbands(df['close'], length=20, std=2)
-    df = pd.concat([df, bb], axis=1)
+    if HAS_PANDAS_TA:
+        df['RSI'] = ta.rsi(df['close'], length=14)
+        df['EMA_20'] = ta.ema(df['close'], length=20)
+
+        # Bandas de Bollinger (usamos bb_lower)
+        bb = ta.bbands(df['close'], length=20, std=2)
+        df = pd.concat([df, bb], axis=1)
+    else:
+        series = calcular_series(df['close'], rsi_length=14, bb_length=20, bb_std=2, ema_length=20)
+        series['EMA_20'] = series.pop('EMA')
+        for nombre, valores in series.items():
+            df[nombre] = valores
     # Renombrar columna BBL para consistencia
     bbl_col = [c for c in df.columns if c.startswith('BBL')][0]
     df['BB_LOWER'] = df[bbl_col]
@@ -59,78 +76,47 @@ def get_data():
     df.dropna(inplace=True)
     return df
 
-def backtest_strategy(args):
+def publicar_datos(df):
+    """
+    Copiar las columnas de la estrategia a un bloque de memoria compartida.
+
+    Returns:
+        (SharedMemory, descriptor) - el descriptor es lo único que reciben los workers
+    """
+    n = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=max(len(COLUMNAS) * n * 8, 1))
+    matriz = np.ndarray((len(COLUMNAS), n), dtype=np.float64, buffer=shm.buf)
+    for i, columna in enumerate(COLUMNAS):
+        matriz[i] = df[columna].to_numpy(dtype=np.float64)
+    return shm, {'nombre': shm.name, 'filas': n}
+
+def iniciar_worker(descriptor):
+    """Initializer del Pool: adjuntar el bloque compartido sin copiar datos"""
+    global _SHM, _DATOS
+    _SHM = shared_memory.SharedMemory(name=descriptor['nombre'])
+    matriz = np.ndarray((len(COLUMNAS), descriptor['filas']), dtype=np.float64, buffer=_SHM.buf)
+    _DATOS = dict(zip(COLUMNAS, matriz))
+
+def backtest_strategy(params):
     """
     Ejecuta el backtest para una combinación específica de parámetros.
-    Esta función debe ser estática/aislada para multiprocessing.
+    Solo recibe la tupla de parámetros: los datos están en memoria compartida
+    (ver iniciar_worker) y el backtest usa el motor vectorizado.
     """
-    df, params = args
     rsi_limit, sl, tp, trailing = params
     
     saldo_inicial = 1000.0
-    saldo = saldo_inicial
-    posicion = None # {precio, max_price}
-    
-    wins = 0
-    losses = 0
-    trades = 0
-    returns = [] # Lista de retornos % para Sharpe
-    
-    # Convertir DataFrame a lista de dicts es mucho más rápido para iterar
-    records = df.to_dict('records')
-    
-    for row in records:
-        price = row['close']
-        
-        if posicion is None:
-            # --- Lógica de Compra ---
-            # Triple Filtro: RSI + Bollinger + EMA
-            if (row['RSI'] < rsi_limit and 
-                price < row['BB_LOWER'] and 
-                price > row['EMA_20']):
-                
-                posicion = {
-                    'precio': price,
-                    'max_price': price
-                }
-        else:
-            # --- Lógica de Venta ---
-            precio_entrada = posicion['precio']
-            
-            # Actualizar Trailing Stop
-            if price > posicion['max_price']:
-                posicion['max_price'] = price
-            
-            stop_price = posicion['max_price'] * (1 - trailing)
-            
-            # 1. Verificar Stop Loss / Trailing Stop
-            # Stop Loss fijo (SL) es un "stop de emergencia" basado en precio de entrada
-            sl_price = precio_entrada * (1 - sl)
-            
-            exit_price = None
-            reason = None
-            
-            if price <= stop_price:
-                exit_price = stop_price if price > stop_price else price # Simulamos ejecucion
-                reason = "Trailing"
-            elif price <= sl_price:
-                exit_price = sl_price if price > sl_price else price
-                reason = "SL"
-            elif price >= precio_entrada * (1 + tp):
-                exit_price = precio_entrada * (1 + tp) # Limit order assumption
-                reason = "TP"
-                
-            if exit_price:
-                pnl = (exit_price - precio_entrada) / precio_entrada
-                pnl_usd = saldo * pnl
-                saldo += pnl_usd
-                
-                returns.append(pnl)
-                trades += 1
-                if pnl > 0: wins += 1
-                else: losses += 1
-                
-                posicion = None
+
+    # Triple Filtro: RSI + Bollinger + EMA. Salidas: Trailing, SL de emergencia y
+    # TP como orden límite (se llena a entrada * (1 + tp))
+    resultado = ejecutar_backtest(
+        _DATOS['close'], _DATOS['RSI'], _DATOS['BB_LOWER'], _DATOS['EMA_20'],
+        ts=trailing, tp=tp, sl=sl, rsi_umbral=rsi_limit, saldo_inicial=saldo_inicial, tp_al_limite=True
+    )
+    saldo = resultado['saldo_final']
+    returns = resultado['pnl_pct'] # Retornos % para Sharpe
+    trades = len(returns)
+    wins = int(np.count_nonzero(returns > 0))
 
     # Métricas Finales
     total_return = (saldo - saldo_inicial) / saldo_inicial
@@ -138,11 +124,10 @@ def backtest_strategy(args):
     
     # Sharpe Ratio Simplificado (basado en trades, no en tiempo)
     sharpe = 0
-    if len(returns) > 1:
-        s_returns = pd.Series(returns)
-        std = s_returns.std()
+    if trades > 1:
+        std = returns.std(ddof=1)
         if std > 0:
-            sharpe = (s_returns.mean() / std) * (len(returns)**0.5)
+            sharpe = (returns.mean() / std) * (trades**0.5)
 
     return {
         'RSI': rsi_limit,
@@ -156,6 +141,21 @@ def backtest_strategy(args):
         'Sharpe': sharpe
     }
 
+def optimizar(df, combinations, procesos=None):
+    """
+    Evaluar todas las combinaciones en paralelo. El DataFrame se publica una
+    vez en memoria compartida; a los workers solo viajan chunks de tuplas.
+    """
+    procesos = procesos or multiprocessing.cpu_count()
+    chunksize = max(1, len(combinations) // (procesos * CHUNKS_POR_PROCESO))
+    shm, descriptor = publicar_datos(df)
+    try:
+        with multiprocessing.Pool(procesos, initializer=iniciar_worker, initargs=(descriptor,)) as pool:
+            return pool.map(backtest_strategy, combinations, chunksize=chunksize)
+    finally:
+        shm.close()
+        shm.unlink()
+
 def run_optimization():
     # 1. Obtener Datos
     df = get_data()
@@ -169,13 +169,9 @@ def run_optimization():
     # 3. Multiprocessing
     start_time = time.time()
     
-    # Preparamos argumentos (df debe pasarse a cada proceso)
-    # Nota: En sistemas reales con Big Data esto se hace diferente (shared memory),
-    # pero para 4000 velas copiar el DF es despreciable.
-    args = [(df, params) for params in combinations]
-    
-    with multiprocessing.Pool() as pool:
-        results = pool.map(backtest_strategy, args)
+    # Los datos van a memoria compartida una sola vez; a cada worker solo
+    # le llegan chunks de tuplas de parámetros
+    results = optimizar(df, combinations)
         
     elapsed_time = time.time() - start_time
     
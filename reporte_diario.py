@@ -8,6 +8,7 @@ import os
 from datetime import datetime
 from database import Database
 from metricas import MetricasPerformance
+import latencias
 
 # Agregar path del proyecto
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -111,13 +112,21 @@ def generar_reporte_diario():
             if metricas_hoy['operaciones_total'] > 0:
                 print(f"  Profit Factor: {metricas_hoy['profit_factor']:.2f}")
             print()
+        
+        # 6. Latencias por etapa (acumuladas desde el último arranque del bot)
+        resumen_latencias = latencias.texto_resumen(db.obtener_latencias())
+        if resumen_latencias:
+            print("⏱️ LATENCIAS (p50 / p95 / max):")
+            for linea in resumen_latencias.splitlines():
+                print(f"  {linea}")
+            print()
     
     print("=" * 70)
     print(f"  Reporte generado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 70)
     print()
     
-    # 6. Enviar por Telegram (opcional)
+    # 7. Enviar por Telegram (opcional)
     try:
         from notificaciones import enviar_telegram
         
@@ -0,0 +1,230 @@
+"""
+Retención y agregados de precios y señales para Argos Trading Bot
+Los ticks crudos de `precios` y las filas de `senales` se guardan solo
+DB_RETENCION_DIAS días. Antes de borrarlos se resumen en niveles OHLC:
+
+- precios_1m: una vela por minuto, se guarda DB_RETENCION_1M_DIAS días
+- precios_1h: una vela por hora (desde precios_1m), se guarda siempre
+- senales_1h: conteo y rango de precio por hora y tipo de señal
+
+Los agregados se completan en cada compactación (minutos y horas ya
+cerrados), así que cada nivel cubre todo su periodo de retención y el
+tamaño de la base queda acotado. El espacio liberado vuelve al sistema con
+`PRAGMA incremental_vacuum`, de a poco en cada pasada.
+
+Las claves `inicio` son el comienzo del tramo en el mismo formato ISO que
+los timestamps ('YYYY-MM-DDTHH:MM'), así que se comparan como texto.
+"""
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Días de ticks y señales crudos (0 = no borrar nunca)
+DB_RETENCION_DIAS = float(os.getenv("DB_RETENCION_DIAS", "7"))
+# Días de velas de 1 minuto (las de 1 hora no se borran)
+DB_RETENCION_1M_DIAS = float(os.getenv("DB_RETENCION_1M_DIAS", "90"))
+# Segundos entre compactaciones
+DB_COMPACTAR_SEG = float(os.getenv("DB_COMPACTAR_SEG", "600"))
+# Páginas que devuelve cada pasada de incremental_vacuum (4 KB c/u)
+DB_VACUUM_PAGINAS = int(os.getenv("DB_VACUUM_PAGINAS", "2000"))
+
+SQL_CREAR = [
+    """
+    CREATE TABLE IF NOT EXISTS precios_1m (
+        inicio TEXT PRIMARY KEY,
+        open REAL NOT NULL,
+        high REAL NOT NULL,
+        low REAL NOT NULL,
+        close REAL NOT NULL,
+        volumen REAL,
+        ticks INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS precios_1h (
+        inicio TEXT PRIMARY KEY,
+        open REAL NOT NULL,
+        high REAL NOT NULL,
+        low REAL NOT NULL,
+        close REAL NOT NULL,
+        volumen REAL,
+        ticks INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS senales_1h (
+        inicio TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        cantidad INTEGER NOT NULL,
+        precio_min REAL,
+        precio_max REAL,
+        precio_promedio REAL,
+        rsi_promedio REAL,
+        PRIMARY KEY (inicio, tipo)
+    ) WITHOUT ROWID
+    """,
+]
+
+# Cada agregado recalcula entero el último tramo guardado (pudo quedar a
+# medias) y los tramos cerrados posteriores; apertura y cierre salen de la
+# primera y la última fila del tramo, buscadas por clave única.
+SQL_PRECIOS_1M = """
+    INSERT OR REPLACE INTO precios_1m (inicio, open, high, low, close, volumen, ticks)
+    SELECT g.inicio, o.precio, g.high, g.low, c.precio, g.volumen, g.ticks
+    FROM (
+        SELECT substr(timestamp, 1, 16) AS inicio, MIN(timestamp) AS primero, MAX(timestamp) AS ultimo,
+               MAX(precio) AS high, MIN(precio) AS low, SUM(volumen) AS volumen, COUNT(*) AS ticks
+        FROM precios
+        WHERE timestamp >= :desde AND timestamp < :hasta
+        GROUP BY inicio
+    ) g
+    JOIN precios o ON o.timestamp = g.primero
+    JOIN precios c ON c.timestamp = g.ultimo
+"""
+
+SQL_PRECIOS_1H = """
+    INSERT OR REPLACE INTO precios_1h (inicio, open, high, low, close, volumen, ticks)
+    SELECT g.hora, o.open, g.high, g.low, c.close, g.volumen, g.ticks
+    FROM (
+        SELECT substr(inicio, 1, 13) || ':00' AS hora, MIN(inicio) AS primero, MAX(inicio) AS ultimo,
+               MAX(high) AS high, MIN(low) AS low, SUM(volumen) AS volumen, SUM(ticks) AS ticks
+        FROM precios_1m
+        WHERE inicio >= :desde AND inicio < :hasta
+        GROUP BY hora
+    ) g
+    JOIN precios_1m o ON o.inicio = g.primero
+    JOIN precios_1m c ON c.inicio = g.ultimo
+"""
+
+SQL_SENALES_1H = """
+    INSERT OR REPLACE INTO senales_1h (inicio, tipo, cantidad, precio_min, precio_max,
+                                       precio_promedio, rsi_promedio)
+    SELECT substr(timestamp, 1, 13) || ':00', tipo, COUNT(*), MIN(precio), MAX(precio), AVG(precio), AVG(rsi)
+    FROM senales
+    WHERE timestamp >= :desde AND timestamp < :hasta
+    GROUP BY 1, 2
+"""
+
+# Niveles de precios de más fino a más grueso: (tabla, columna de tiempo)
+NIVELES_PRECIOS = (("precios", "timestamp"), ("precios_1m", "inicio"), ("precios_1h", "inicio"))
+
+
+def crear_tablas(conn: sqlite3.Connection):
+    for sql in SQL_CREAR:
+        conn.execute(sql)
+
+
+def inicio_minuto(momento: datetime) -> str:
+    return momento.strftime("%Y-%m-%dT%H:%M")
+
+
+def inicio_hora(momento: datetime) -> str:
+    return momento.strftime("%Y-%m-%dT%H:00")
+
+
+def _ultimo_tramo(conn: sqlite3.Connection, tabla: str) -> str:
+    return conn.execute(f"SELECT MAX(inicio) FROM {tabla}").fetchone()[0] or ""
+
+
+def compactar(conn: sqlite3.Connection, ahora: Optional[datetime] = None,
+              retencion_dias: float = DB_RETENCION_DIAS,
+              retencion_1m_dias: float = DB_RETENCION_1M_DIAS) -> Dict[str, int]:
+    """
+    Completar los agregados con los minutos y horas ya cerrados y borrar lo
+    que salió de la retención. No confirma: el llamador decide la transacción.
+
+    Returns:
+        Filas escritas o borradas por tabla
+    """
+    ahora = ahora or datetime.now()
+    cambios = {}
+
+    minuto, hora = inicio_minuto(ahora), inicio_hora(ahora)
+    cambios["precios_1m"] = conn.execute(
+        SQL_PRECIOS_1M, {"desde": _ultimo_tramo(conn, "precios_1m"), "hasta": minuto}).rowcount
+    cambios["precios_1h"] = conn.execute(
+        SQL_PRECIOS_1H, {"desde": _ultimo_tramo(conn, "precios_1h"), "hasta": hora}).rowcount
+    cambios["senales_1h"] = conn.execute(
+        SQL_SENALES_1H, {"desde": _ultimo_tramo(conn, "senales_1h"), "hasta": hora}).rowcount
+
+    # Cortes en hora exacta: nunca se borra la mitad de un tramo ya agregado
+    if retencion_dias > 0:
+        corte = inicio_hora(ahora - timedelta(days=retencion_dias))
+        cambios["precios_borrados"] = conn.execute("DELETE FROM precios WHERE timestamp < ?", (corte,)).rowcount
+        cambios["senales_borradas"] = conn.execute("DELETE FROM senales WHERE timestamp < ?", (corte,)).rowcount
+    if retencion_1m_dias > 0:
+        corte = inicio_hora(ahora - timedelta(days=retencion_1m_dias))
+        cambios["precios_1m_borrados"] = conn.execute(
+            "DELETE FROM precios_1m WHERE inicio < ?", (corte,)).rowcount
+    return cambios
+
+
+def vacuum_incremental(conn: sqlite3.Connection, paginas: int = DB_VACUUM_PAGINAS) -> int:
+    """
+    Devolver al sistema hasta `paginas` páginas libres. Solo funciona si la
+    base está en auto_vacuum INCREMENTAL (las nuevas lo están; una base
+    anterior necesita un VACUUM completo una vez).
+
+    Returns:
+        Páginas liberadas
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # Cada paso de la sentencia libera una página: executescript la corre entera
+    conn.executescript(f"PRAGMA incremental_vacuum({int(paginas)})")
+    return libres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _cubre(conn: sqlite3.Connection, tabla: str, columna: str, desde: str) -> bool:
+    """
+    Si `tabla` tiene todos los datos desde `desde`: su primer dato es
+    anterior, o no hay nada más viejo en el nivel de 1 hora (no se borró nada).
+    """
+    primero = conn.execute(f"SELECT MIN({columna}) FROM {tabla}").fetchone()[0]
+    if primero is None:
+        return False
+    if primero <= desde or tabla == "precios_1h":
+        return True
+    return conn.execute("SELECT 1 FROM precios_1h WHERE inicio < ? LIMIT 1",
+                        (primero[:13] + ":00",)).fetchone() is None
+
+
+def consultar_precios(conn: sqlite3.Connection, desde: str, hasta: Optional[str] = None,
+                      max_puntos: int = 1000) -> Tuple[List[Dict], str]:
+    """
+    Precios OHLC entre `desde` y `hasta` (timestamps ISO) del nivel más fino
+    que cubra el rango con como mucho `max_puntos` filas: ticks crudos,
+    velas de 1 minuto o de 1 hora.
+
+    Returns:
+        (filas {inicio, open, high, low, close, volumen}, tabla usada)
+    """
+    hasta = hasta or "9999-12-31"
+    for tabla, columna in NIVELES_PRECIOS:
+        if not _cubre(conn, tabla, columna, desde):
+            continue
+        cantidad = conn.execute(f"""
+            SELECT COUNT(*) FROM (SELECT 1 FROM {tabla} WHERE {columna} >= ? AND {columna} <= ? LIMIT ?)
+        """, (desde, hasta, max_puntos + 1)).fetchone()[0]
+        if cantidad <= max_puntos or tabla == "precios_1h":
+            break
+    else:
+        return [], "precios"
+
+    if tabla == "precios":
+        columnas = "timestamp AS inicio, precio AS open, precio AS high, precio AS low, precio AS close, volumen"
+    else:
+        columnas = "inicio, open, high, low, close, volumen"
+    filas = conn.execute(f"""
+        SELECT * FROM (
+            SELECT {columnas} FROM {tabla}
+            WHERE {columna} >= ? AND {columna} <= ?
+            ORDER BY {columna} DESC LIMIT ?
+        ) ORDER BY inicio
+    """, (desde, hasta, max_puntos)).fetchall()
+    return [dict(zip(("inicio", "open", "high", "low", "close", "volumen"), fila)) for fila in filas], tabla
@@ -0,0 +1,287 @@
+"""
+Salidas en el exchange para Argos Trading Bot
+Con una posición abierta, la salida queda colocada en Binance en lugar de
+esperar a que el loop vea el precio y mande una venta de mercado:
+
+- OCO: take profit (LIMIT_MAKER) y stop-limit en una sola lista; cuando
+  una pata se llena, el exchange cancela la otra.
+- Si el exchange no admite OCO, solo el stop-limit (el take profit sigue
+  evaluándose en el loop).
+
+El stop es el más alto entre el stop loss y el trailing stop. A medida que
+sube el máximo de la posición, el stop se vuelve a anclar (cancelar y
+colocar) como mucho cada EXIT_REANCLAJE_SEG. Las órdenes vivas se guardan
+en la tabla `ordenes_salida`, así que al reiniciar se reconcilian los
+llenados que ocurrieron con el bot apagado.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from mercados import SesionExchange
+
+logger = logging.getLogger('ArgosBot')
+
+# Segundos mínimos entre re-anclajes del trailing stop
+EXIT_REANCLAJE_SEG = float(os.getenv("EXIT_REANCLAJE_SEG", "60"))
+# Suba mínima del stop para re-anclarlo (fracción)
+EXIT_PASO_PCT = float(os.getenv("EXIT_PASO_PCT", "0.001"))
+# Precio límite del stop por debajo del disparo, para que se llene en una caída rápida
+EXIT_MARGEN_PCT = float(os.getenv("EXIT_MARGEN_PCT", "0.003"))
+
+OCO = "OCO"
+STOP = "STOP"
+
+
+class OrdenSalida(NamedTuple):
+    """Salida colocada en el exchange para la posición de un par"""
+    symbol: str
+    tipo: str              # OCO o STOP
+    id_stop: str
+    id_tp: Optional[str]
+    stop: float            # precio de disparo del stop
+    limite: float          # precio límite del stop
+    tp: Optional[float]
+    cantidad: float
+    precio_compra: float
+    actualizada: float     # epoch de la última colocación
+
+
+class Llenado(NamedTuple):
+    razon: str
+    precio: float
+    cantidad: float
+
+
+class GestorSalidas:
+    """
+    Coloca, re-ancla y reconcilia las salidas de las posiciones abiertas.
+    Todas las llamadas hacen E/S de red: se usan desde hilos, nunca en el loop.
+
+    La reconciliación y la venta de mercado de un par corren en hilos
+    distintos: ambas toman `bloqueo(symbol)`, así la reconciliación no vuelve
+    a colocar una salida entre la cancelación y la venta.
+    """
+
+    def __init__(self, sesion: SesionExchange, sl: float, tp: float, ts: float, db,
+                 oco: Optional[bool] = None, reanclaje: float = EXIT_REANCLAJE_SEG,
+                 paso: float = EXIT_PASO_PCT, margen: float = EXIT_MARGEN_PCT,
+                 reloj: Callable[[], float] = time.time):
+        self.sesion = sesion
+        self.sl, self.tp, self.ts = sl, tp, ts
+        self.db = db
+        # OCO por la API implícita de Binance en ccxt (POST /api/v3/orderList/oco)
+        self.oco = hasattr(sesion.exchange, 'private_post_orderlist_oco') if oco is None else oco
+        self.reanclaje = reanclaje
+        self.paso = paso
+        self.margen = margen
+        self._reloj = reloj
+        self.ordenes: Dict[str, OrdenSalida] = {
+            symbol: OrdenSalida(**fila) for symbol, fila in db.obtener_ordenes_salida().items()}
+        self._bloqueos: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def bloqueo(self, symbol: str) -> threading.RLock:
+        """Lock del par (reentrante): tomarlo durante toda una venta de mercado"""
+        with self._lock:
+            return self._bloqueos.setdefault(symbol, threading.RLock())
+
+    # ===== NIVELES =====
+
+    def nivel_stop(self, estado: Dict) -> float:
+        """Stop loss fijo o trailing desde el máximo, el que esté más arriba"""
+        entrada = estado["precio_compra"]
+        maximo = max(estado.get("max_precio") or entrada, entrada)
+        return max(entrada * (1 - self.sl), maximo * (1 - self.ts))
+
+    def nivel_tp(self, estado: Dict) -> float:
+        return estado["precio_compra"] * (1 + self.tp)
+
+    def activa(self, symbol: str) -> bool:
+        return symbol in self.ordenes
+
+    def cubre(self, symbol: str, precio: float) -> bool:
+        """
+        Si la salida del exchange se encarga de este precio (el loop no debe
+        vender). No cubre un precio bajo el límite del stop: el stop-limit
+        pudo saltearse en una caída brusca y hace falta la venta de mercado.
+        """
+        orden = self.ordenes.get(symbol)
+        if orden is None or precio < orden.limite:
+            return False
+        return orden.tp is not None or precio < orden.precio_compra * (1 + self.tp)
+
+    # ===== COLOCACIÓN =====
+
+    def _cantidad(self, symbol: str, estado: Dict) -> float:
+        """Lo comprado, sin pasar del saldo libre (la comisión pudo cobrarse en la moneda base)"""
+        cantidad = float(estado.get("cantidad") or 0)
+        libre = self.sesion.saldo_libre(symbol.split('/')[0])
+        if 0 < libre < cantidad:
+            cantidad = libre
+        return float(self.sesion.cantidad_a_precision(symbol, cantidad))
+
+    def _colocar_oco(self, symbol: str, cantidad: float, stop: float, limite: float, tp: float) -> Tuple[str, str]:
+        mercado = self.sesion.mercado(symbol)
+        respuesta = self.sesion.llamar('private_post_orderlist_oco', {
+            'symbol': mercado.get('id', symbol.replace('/', '')),
+            'side': 'SELL',
+            'quantity': cantidad,
+            'aboveType': 'LIMIT_MAKER',
+            'abovePrice': tp,
+            'belowType': 'STOP_LOSS_LIMIT',
+            'belowStopPrice': stop,
+            'belowPrice': limite,
+            'belowTimeInForce': 'GTC',
+        })
+        ids = {r.get('type'): str(r['orderId']) for r in respuesta.get('orderReports', [])}
+        return ids['STOP_LOSS_LIMIT'], ids['LIMIT_MAKER']
+
+    def proteger(self, symbol: str, estado: Dict) -> Optional[OrdenSalida]:
+        """
+        Colocar la salida de la posición abierta. Si falla, la posición queda
+        con las salidas del loop (se reintenta en la próxima reconciliación).
+        Si el par ya tiene una salida colocada, la devuelve sin colocar otra.
+        """
+        with self.bloqueo(symbol):
+            if symbol in self.ordenes:
+                return self.ordenes[symbol]
+            return self._proteger(symbol, estado)
+
+    def _proteger(self, symbol: str, estado: Dict) -> Optional[OrdenSalida]:
+        try:
+            cantidad = self._cantidad(symbol, estado)
+            stop = self.sesion.precio_a_precision(symbol, self.nivel_stop(estado))
+            limite = self.sesion.precio_a_precision(symbol, stop * (1 - self.margen))
+            if self.oco:
+                tp = self.sesion.precio_a_precision(symbol, self.nivel_tp(estado))
+                id_stop, id_tp = self._colocar_oco(symbol, cantidad, stop, limite, tp)
+                tipo = OCO
+            else:
+                tp, id_tp, tipo = None, None, STOP
+                orden = self.sesion.llamar('create_order', symbol, 'STOP_LOSS_LIMIT', 'sell', cantidad, limite,
+                                           {'stopPrice': stop})
+                id_stop = str(orden['id'])
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo colocar la salida de {symbol} en el exchange: {e}")
+            return None
+
+        orden = OrdenSalida(symbol, tipo, id_stop, id_tp, stop, limite, tp, cantidad,
+                            estado["precio_compra"], self._reloj())
+        self.ordenes[symbol] = orden
+        self.db.guardar_orden_salida(orden._asdict())
+        logger.info(f"🛡️ Salida {tipo} de {symbol} en el exchange: stop {stop} (límite {limite})"
+                    + (f", take profit {tp}" if tp else ""))
+        return orden
+
+    def _olvidar(self, symbol: str):
+        self.ordenes.pop(symbol, None)
+        self.db.borrar_orden_salida(symbol)
+
+    # ===== RECONCILIACIÓN =====
+
+    def _razon(self, orden: OrdenSalida, pata: str) -> str:
+        if pata == 'tp':
+            return "TAKE PROFIT"
+        if orden.stop > orden.precio_compra * (1 - self.sl) * (1 + self.paso):
+            return "TRAILING STOP"
+        return "STOP LOSS"
+
+    def _buscar_llenado(self, orden: OrdenSalida) -> Tuple[Optional[Llenado], bool]:
+        """
+        Estado de las patas de la salida: (llenado, sigue_abierta). Una pata
+        parcialmente llenada y cancelada cuenta como llenado por lo vendido.
+        """
+        abierta = False
+        for pata, id_orden in (('stop', orden.id_stop), ('tp', orden.id_tp)):
+            if not id_orden:
+                continue
+            info = self.sesion.llamar('fetch_order', id_orden, orden.symbol)
+            vendido = info.get('filled') or 0
+            if info.get('status') == 'open':
+                abierta = True
+            elif vendido > 0:
+                precio = info.get('average') or info.get('price') or (orden.tp if pata == 'tp' else orden.limite)
+                return Llenado(self._razon(orden, pata), precio, vendido), False
+        return None, abierta
+
+    def reconciliar(self, symbol: str, estado: Dict) -> Optional[Llenado]:
+        """
+        Revisar la salida de un par: devuelve el llenado si el exchange cerró
+        la posición; si no, re-ancla el trailing stop o coloca la salida que
+        falte. Una consulta (fetch_open_orders) por par cuando nada cambió.
+        """
+        with self.bloqueo(symbol):
+            return self._reconciliar(symbol, estado)
+
+    def _reconciliar(self, symbol: str, estado: Dict) -> Optional[Llenado]:
+        if not estado.get("posicion_abierta"):
+            if symbol in self.ordenes:
+                # Posición cerrada por otro camino: la salida no puede quedar viva en el exchange
+                try:
+                    self.cancelar(symbol)
+                except Exception as e:
+                    logger.warning(f"⚠️ No se pudo cancelar la salida huérfana de {symbol}: {e}")
+            return None
+
+        orden = self.ordenes.get(symbol)
+        if orden is None:
+            self.proteger(symbol, estado)
+            return None
+
+        abiertas = {str(o.get('id')) for o in self.sesion.llamar('fetch_open_orders', symbol)}
+        if orden.id_stop in abiertas and (orden.id_tp is None or orden.id_tp in abiertas):
+            return self._reanclar_si_corresponde(orden, estado)
+
+        llenado, abierta = self._buscar_llenado(orden)
+        if llenado is not None:
+            self._olvidar(symbol)
+            logger.info(f"🎯 {symbol} {llenado.razon} llenado en el exchange a {llenado.precio}")
+            return llenado
+        if not abierta:
+            # Cancelada desde fuera del bot: se vuelve a colocar
+            logger.warning(f"⚠️ La salida de {symbol} ya no está en el exchange, se vuelve a colocar")
+            self._olvidar(symbol)
+            self.proteger(symbol, estado)
+        return None
+
+    def _reanclar_si_corresponde(self, orden: OrdenSalida, estado: Dict) -> Optional[Llenado]:
+        """Subir el stop si el máximo subió lo suficiente (devuelve el llenado si se adelantó)"""
+        nuevo = self.nivel_stop(estado)
+        if nuevo < orden.stop * (1 + self.paso) or self._reloj() - orden.actualizada < self.reanclaje:
+            return None
+        try:
+            llenado = self.cancelar(orden.symbol)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo re-anclar el stop de {orden.symbol}: {e}")
+            return None
+        if llenado is None:
+            self.proteger(orden.symbol, estado)
+        return llenado
+
+    def cancelar(self, symbol: str) -> Optional[Llenado]:
+        """
+        Quitar la salida del exchange (antes de una venta de mercado o de
+        re-anclar). Si ya se había llenado, devuelve el llenado; si no se
+        pudo cancelar y sigue abierta, propaga el error (no hay que vender).
+        """
+        with self.bloqueo(symbol):
+            return self._cancelar(symbol)
+
+    def _cancelar(self, symbol: str) -> Optional[Llenado]:
+        orden = self.ordenes.get(symbol)
+        if orden is None:
+            return None
+        llenado = None
+        try:
+            # En Binance, cancelar una pata de una OCO cancela la lista entera
+            self.sesion.llamar('cancel_order', orden.id_stop, symbol)
+        except Exception as e:
+            logger.info(f"No se pudo cancelar la salida de {symbol} ({e}); se revisa si se llenó")
+            llenado, abierta = self._buscar_llenado(orden)
+            if abierta:
+                raise
+        self._olvidar(symbol)
+        return llenado
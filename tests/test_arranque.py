@@ -0,0 +1,62 @@
+"""
+Tests para el arranque rápido de main.py (importaciones diferidas)
+"""
+import pytest
+import subprocess
+import sys
+import os
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, RAIZ)
+
+
+class TestArranque:
+
+    def test_importar_main_no_carga_dependencias_pesadas(self, tmp_path):
+        """ccxt, pandas y rich se importan al usarlos; numba no se toca ni se simula"""
+        codigo = (f"import sys; sys.path.insert(0, {RAIZ!r}); import main; "
+                  "print(','.join(m for m in ('ccxt', 'pandas', 'numpy', 'rich', 'numba') if m in sys.modules))")
+
+        salida = subprocess.run([sys.executable, '-c', codigo], cwd=tmp_path, capture_output=True,
+                                text=True, check=True)
+
+        assert salida.stdout.strip() == ""
+
+    def test_importar_main_no_abre_la_base(self, tmp_path):
+        """argos.db (esquema, migraciones, estado por par) se abre en conectar(), no al importar"""
+        codigo = f"import sys; sys.path.insert(0, {RAIZ!r}); import main; print(main.db, main.estados)"
+
+        salida = subprocess.run([sys.executable, '-c', codigo], cwd=tmp_path, capture_output=True,
+                                text=True, check=True)
+
+        assert salida.stdout.split() == ['None', '{}']
+        assert not (tmp_path / 'argos.db').exists()
+
+    def test_estrategia_completa_sin_pandas_ni_numpy(self, tmp_path):
+        """Un ciclo de mercado y de estrategia con pandas y numpy imposibles de importar"""
+        codigo = f"""
+import io, logging, sys
+sys.modules['pandas'] = sys.modules['numpy'] = None
+sys.path.insert(0, {RAIZ!r})
+import main
+from benchmark import ExchangeSimulado
+main.HAS_CCXT, main.crear_exchange = True, ExchangeSimulado
+main.console_handler.setLevel(logging.WARNING)
+main.consola().file = io.StringIO()
+main.conectar()
+snapshot = main.obtener_mercado()
+ordenes = main.evaluar_estrategia(snapshot)
+datos = snapshot['BTC/USDT']
+print(len(datos['close']), datos['RSI'][-1] == datos['RSI'][-1], isinstance(ordenes, list))
+"""
+        entorno = dict(os.environ, SYMBOLS='BTC/USDT', SIMULATION_MODE='True')
+
+        salida = subprocess.run([sys.executable, '-c', codigo], cwd=tmp_path, capture_output=True,
+                                text=True, env=entorno)
+
+        assert salida.returncode == 0, salida.stderr
+        assert salida.stdout.split() == ['500', 'True', 'True']
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,159 @@
+"""
+Tests para el motor de backtest vectorizado (comparado trade a trade con el loop original)
+"""
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import motor_backtest
+from motor_backtest import ejecutar_backtest, senales_entrada, NOMBRES_MOTIVO
+import backtest
+from indicadores import calcular_series
+
+BBL = 'BBL_20_2.0'
+
+
+def dataframe_sintetico(n, semilla=3, volatilidad=0.006):
+    """
+    Velas de 15m con columnas de indicadores aleatorias alrededor del precio,
+    para que el Triple Filtro dispare a menudo (la comparación es de la lógica
+    de trades, no de los indicadores).
+    """
+    rnd = np.random.default_rng(semilla)
+    cierres = np.round(90000.0 * np.cumprod(1 + rnd.normal(0, volatilidad, n)), 2)
+    rsi = rnd.uniform(0, 100, n)
+    bbl = cierres * (1 + rnd.uniform(-0.01, 0.01, n))
+    ema = cierres * (1 + rnd.uniform(-0.01, 0.01, n))
+    rsi[:14] = bbl[:19] = ema[:19] = np.nan
+    return pd.DataFrame({
+        'close': cierres,
+        'datetime': pd.date_range('2025-01-01', periods=n, freq='15min'),
+        'RSI': rsi,
+        BBL: bbl,
+        'EMA': ema,
+    })
+
+
+def loop_original(df, ts, tp, sl=None, rsi_umbral=35, inicio=40):
+    """Loop fila a fila de run_backtest (referencia), con SL opcional como en main.py"""
+    saldo = 1000.0
+    posicion = None
+    operaciones = []
+    for i in range(inicio, len(df)):
+        row = df.iloc[i]
+        precio = row['close']
+        if posicion is None:
+            if pd.notna(row['RSI']) and pd.notna(row[BBL]) and pd.notna(row['EMA']):
+                if row['RSI'] < rsi_umbral and precio < row[BBL] and precio > row['EMA']:
+                    posicion = {'precio': precio, 'max_precio': precio}
+        else:
+            precio_entrada = posicion['precio']
+            if precio > posicion['max_precio']:
+                posicion['max_precio'] = precio
+            tipo = None
+            if precio <= posicion['max_precio'] * (1 - ts):
+                tipo = 'TRAILING STOP'
+            elif precio >= precio_entrada * (1 + tp):
+                tipo = 'TP'
+            elif sl and precio <= precio_entrada * (1 - sl):
+                tipo = 'SL'
+            if tipo:
+                pnl = (precio - precio_entrada) / precio_entrada
+                saldo += saldo * pnl
+                operaciones.append((i, tipo, pnl))
+                posicion = None
+    return saldo, operaciones
+
+
+def operaciones_motor(resultado):
+    return list(zip(resultado['idx_salida'].tolist(),
+                    [NOMBRES_MOTIVO[m] for m in resultado['motivos'].tolist()],
+                    resultado['pnl_pct'].tolist()))
+
+
+def correr_motor(df, **kwargs):
+    return ejecutar_backtest(df['close'], df['RSI'], df[BBL], df['EMA'], inicio=40, **kwargs)
+
+
+class TestCompatibilidadLoop:
+
+    @pytest.mark.parametrize("semilla", [1, 2, 3])
+    @pytest.mark.parametrize("ts,tp,sl", [(0.005, 0.015, None), (0.02, 0.01, 0.008), (0.01, 0.05, None)])
+    def test_igual_al_loop_trade_a_trade(self, semilla, ts, tp, sl):
+        df = dataframe_sintetico(3000, semilla=semilla)
+        saldo, esperadas = loop_original(df, ts, tp, sl)
+
+        resultado = correr_motor(df, ts=ts, tp=tp, sl=sl)
+
+        assert len(esperadas) > 5, "Los datos sintéticos deben generar trades"
+        assert operaciones_motor(resultado) == esperadas
+        assert resultado['saldo_final'] == saldo
+
+    @pytest.mark.parametrize("sl", [None, 0.008])
+    def test_kernel_y_busqueda_vectorizada_coinciden(self, sl):
+        """El kernel secuencial (numba) y la búsqueda sin numba dan los mismos trades"""
+        df = dataframe_sintetico(20000, semilla=9)
+        close = df['close'].to_numpy()
+        entradas = senales_entrada(close, df['RSI'].to_numpy(), df[BBL].to_numpy(), df['EMA'].to_numpy(), inicio=40)
+
+        secuencial = motor_backtest._recorrer_salidas(close, entradas, 0.005, 0.015, sl or 0.0)
+        vectorizado = motor_backtest._buscar_salidas(close, entradas, 0.005, 0.015, sl or 0.0)
+
+        for a, b in zip(secuencial, vectorizado):
+            assert np.array_equal(a, b)
+
+    def test_run_backtest_usa_el_motor(self, capsys):
+        df = dataframe_sintetico(3000, semilla=2)
+        saldo, esperadas = loop_original(df, backtest.TS, backtest.TP, rsi_umbral=backtest.RSI_THRESHOLD,
+                                         inicio=backtest.EMA_LENGTH + 20)
+
+        resultado = backtest.run_backtest(df)
+
+        assert resultado['saldo_final'] == saldo
+        assert [(op['tipo'], op['pnl_pct']) for op in resultado['operaciones']] == [(t, p) for _, t, p in esperadas]
+        assert "RESULTADOS DEL BACKTEST" in capsys.readouterr().out
+
+
+class TestIndicadores:
+
+    def test_sin_pandas_ta_usa_el_motor_del_bot(self, monkeypatch):
+        """Sin pandas_ta, fetch_historical_data calcula RSI, BBL y EMA con indicadores.calcular_series"""
+        velas = dataframe_sintetico(300)[['datetime', 'close']]
+        monkeypatch.setattr(backtest, 'HAS_CCXT', False)
+        monkeypatch.setattr(backtest, 'HAS_PANDAS_TA', False)
+        monkeypatch.setattr(backtest, 'cargar_historico', lambda *args, **kwargs: velas.copy())
+
+        df = backtest.fetch_historical_data()
+
+        esperado = calcular_series(velas['close'], ema_length=backtest.EMA_LENGTH)
+        for columna in ('RSI', BBL, 'EMA'):
+            assert np.array_equal(df[columna].to_numpy(), np.array(esperado[columna]), equal_nan=True)
+        assert backtest.run_backtest(df) is not None
+
+
+class TestCasosBorde:
+
+    def test_posicion_abierta_al_final_no_cuenta(self):
+        close = np.array([100.0, 100.5, 101.0, 101.2])
+        entradas = np.array([True, False, False, False])
+
+        idx_entrada, idx_salida, motivos = motor_backtest.resolver_salidas(close, entradas, ts=0.05, tp=0.5)
+
+        assert idx_entrada.size == 0
+
+    def test_take_profit_siempre_cuenta_como_ganada(self):
+        close = np.array([100.0, 102.0, 50.0])
+        resultado = ejecutar_backtest(close, rsi=np.array([10.0, 90, 90]), bb_lower=np.array([200.0, 0, 0]),
+                                      ema=np.array([50.0, np.nan, np.nan]), ts=0.5, tp=0.015)
+
+        assert resultado['motivos'].tolist() == [motor_backtest.TAKE_PROFIT]
+        assert resultado['ganadas'] == 1
+        assert resultado['saldo_final'] == pytest.approx(1020.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,91 @@
+"""
+Tests para los benchmarks: datos sintéticos, línea base JSON y comparación
+"""
+import json
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import benchmark
+import optimize
+from velas import timeframe_a_ms
+
+
+def corrida(**medianas):
+    return {'escala': 1.0, 'resultados': {n: {'mediana_s': s} for n, s in medianas.items()}}
+
+
+class TestDatosSinteticos:
+
+    def test_velas_contiguas_con_la_ultima_abierta(self):
+        tf = timeframe_a_ms('15m')
+        ahora = 1_700_000_123_456
+
+        velas = benchmark.velas_sinteticas(300, hasta_ms=ahora)
+
+        assert len(velas) == 300
+        assert all(b[0] - a[0] == tf for a, b in zip(velas, velas[1:]))
+        assert velas[-1][0] <= ahora < velas[-1][0] + tf
+        assert all(v[3] <= min(v[1], v[4]) and v[2] >= max(v[1], v[4]) for v in velas)
+
+    def test_deterministas(self):
+        assert benchmark.velas_sinteticas(50, hasta_ms=0) == benchmark.velas_sinteticas(50, hasta_ms=0)
+        assert benchmark.trades_sinteticos(20)[5]['pnl_pct'] == benchmark.trades_sinteticos(20)[5]['pnl_pct']
+
+    def test_dataframe_backtest_sin_nan(self):
+        df = benchmark.dataframe_backtest(200)
+
+        assert list(df.columns) == ['close', 'RSI', 'BB_LOWER', 'EMA_20']
+        assert not df.isna().any().any()
+
+
+class TestComparacion:
+
+    def test_regresion_sobre_el_umbral(self):
+        base = corrida(indicadores=1.0, metricas=2.0)
+        actual = corrida(indicadores=1.25, metricas=2.2)
+
+        comparaciones = {c.nombre: c for c in benchmark.comparar(base, actual, umbral=0.2)}
+
+        assert comparaciones['indicadores'].regresion
+        assert comparaciones['indicadores'].cambio == pytest.approx(0.25)
+        assert not comparaciones['metricas'].regresion
+
+    def test_casos_nuevos_no_se_comparan(self):
+        comparaciones = benchmark.comparar(corrida(a=1.0), corrida(a=0.5, b=3.0))
+
+        assert [c.nombre for c in comparaciones] == ['a']
+        assert not comparaciones[0].regresion
+
+
+class TestEjecucion:
+
+    def test_guardar_y_comparar_sale_con_1_si_hay_regresion(self, tmp_path, capsys):
+        ruta = str(tmp_path / "base" / "benchmark_base.json")
+
+        assert benchmark.main(['indicadores_series', 'db_escritura', '--escala', '0.01',
+                               '--repeticiones', '1', '--guardar', ruta]) == 0
+        base = benchmark.cargar(ruta)
+        assert set(base['resultados']) == {'indicadores_series', 'db_escritura'}
+        assert base['resultados']['db_escritura']['unidades'] == 400
+
+        # Una línea base imposible de igualar
+        base['resultados']['indicadores_series']['mediana_s'] = 1e-9
+        with open(ruta, 'w') as f:
+            json.dump(base, f)
+
+        assert benchmark.main(['indicadores_series', '--escala', '0.01', '--repeticiones', '1',
+                               '--comparar', ruta]) == 1
+        assert "❌ indicadores_series" in capsys.readouterr().out
+
+    def test_backtest_libera_la_memoria_compartida(self):
+        resultados = benchmark.ejecutar(['backtest_grilla'], escala=0.01, repeticiones=1)
+
+        assert resultados['resultados']['backtest_grilla']['mediana_s'] > 0
+        assert optimize._DATOS is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
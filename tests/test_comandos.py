@@ -0,0 +1,170 @@
+"""
+Tests para la escucha de comandos de Telegram (long polling contra una Bot API local)
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from comandos import EscuchaComandos, cargar_offset, guardar_offset
+
+CHAT = "42"
+
+
+class BotApiFalsa:
+    """
+    Bot API de Telegram local (solo getUpdates): retiene la petición hasta
+    `timeout` segundos si no hay updates, y con `offset` descarta los
+    anteriores, como la real.
+    """
+
+    def __init__(self):
+        self.updates = []
+        self.peticiones = []
+        self._cond = threading.Condition()
+        api = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                api.peticiones.append(params)
+                if not url.path.endswith("/getUpdates"):
+                    self._responder(404, {'ok': False, 'description': 'Not Found'})
+                    return
+                self._responder(200, {'ok': True, 'result': api.esperar(int(params.get('offset', 0)),
+                                                                        float(params.get('timeout', 0)))})
+
+            def _responder(self, codigo, datos):
+                cuerpo = json.dumps(datos).encode()
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}"
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def enviar(self, texto, chat_id=CHAT):
+        """Simular un mensaje de un usuario"""
+        with self._cond:
+            update_id = 100 + len(self.updates)
+            self.updates.append({'update_id': update_id,
+                                 'message': {'chat': {'id': int(chat_id)}, 'text': texto}})
+            self._cond.notify_all()
+        return update_id
+
+    def esperar(self, offset, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: any(u['update_id'] >= offset for u in self.updates), timeout)
+            return [u for u in self.updates if u['update_id'] >= offset]
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+@pytest.fixture
+def api():
+    api = BotApiFalsa()
+    yield api
+    api.cerrar()
+
+
+@pytest.fixture
+def ruta_offset(tmp_path):
+    return str(tmp_path / "telegram_offset.json")
+
+
+def escucha(api, ruta_offset, recibidos, timeout=5):
+    return EscuchaComandos("TOKEN", CHAT, recibidos.append, ruta_offset=ruta_offset,
+                           timeout=timeout, url_api=api.url)
+
+
+def esperar(condicion, timeout=3.0):
+    limite = time.monotonic() + timeout
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+class TestEscuchaComandos:
+
+    def test_comando_llega_al_instante(self, api, ruta_offset):
+        recibidos = []
+        e = escucha(api, ruta_offset, recibidos)
+        e.iniciar()
+        try:
+            assert esperar(lambda: len(api.peticiones) == 1)  # ya esperando en getUpdates
+            enviado = time.monotonic()
+            api.enviar("/VENDER btc/usdt")
+
+            assert esperar(lambda: recibidos == ["/vender btc/usdt"])
+            assert time.monotonic() - enviado < 0.5, "Long polling: sin esperar al próximo ciclo"
+        finally:
+            e.detener()
+
+    def test_usa_long_polling(self, api, ruta_offset):
+        e = escucha(api, ruta_offset, [], timeout=25)
+        api.enviar("/status")
+
+        e.leer()
+
+        assert api.peticiones[0] == {'offset': '1', 'timeout': '25'}
+
+    def test_offset_persistido_entre_reinicios(self, api, ruta_offset):
+        api.enviar("/status")
+        api.enviar("/saldo")
+        recibidos = []
+        e = escucha(api, ruta_offset, recibidos, timeout=0.2)
+        e.iniciar()
+        assert esperar(lambda: recibidos == ["/status", "/saldo"])
+        e.detener(timeout=3)  # espera a que termine el getUpdates en curso
+        assert cargar_offset(ruta_offset) == 101
+
+        api.enviar("/vender")
+        otros = []
+        e = escucha(api, ruta_offset, otros, timeout=0)
+
+        assert e.leer() == ["/vender"], "Tras reiniciar no se repiten /status ni /saldo"
+
+    def test_solo_el_chat_configurado(self, api, ruta_offset):
+        api.enviar("/vender", chat_id="666")
+        api.enviar("/status")
+        e = escucha(api, ruta_offset, [], timeout=0)
+
+        assert e.leer() == ["/status"]
+        assert e.offset == 101, "El update ajeno igual se confirma"
+
+    def test_error_de_api_reintenta(self, ruta_offset):
+        recibidos = []
+        e = EscuchaComandos("TOKEN", CHAT, recibidos.append, ruta_offset=ruta_offset,
+                            timeout=0, url_api="http://127.0.0.1:9")
+        e.iniciar()
+        time.sleep(0.1)
+        e.detener()
+
+        assert recibidos == []
+
+    def test_offset_corrupto(self, ruta_offset):
+        with open(ruta_offset, "w") as f:
+            f.write("{no es json")
+        assert cargar_offset(ruta_offset) == 0
+
+        guardar_offset(ruta_offset, 7)
+        assert cargar_offset(ruta_offset) == 7
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,143 @@
+"""
+Tests para las conexiones SQLite compartidas (WAL, lectores de solo lectura y caché)
+"""
+import json
+import sqlite3
+import threading
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from conexiones import (abrir_lectura, conexion_lectura, cerrar_conexiones_lectura,
+                        PoolLectura, CacheConsultas, filas_a_json)
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / "argos_test.db"), intervalo_flush=0) as db:
+        yield db
+    cerrar_conexiones_lectura()
+
+
+class TestConexiones:
+
+    def test_base_en_modo_wal(self, db):
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert db.conn.execute("PRAGMA busy_timeout").fetchone()[0] > 0
+
+    def test_lector_no_puede_escribir(self, db):
+        conn = abrir_lectura(db.db_file)
+
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM trades")
+        conn.close()
+
+    def test_lector_con_transaccion_abierta_no_bloquea_al_bot(self, db):
+        lector = abrir_lectura(db.db_file)
+        lector.execute("BEGIN")
+        lector.execute("SELECT COUNT(*) FROM precios").fetchone()
+
+        # Con journal rollback esto esperaría al lector y terminaría en "database is locked"
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+
+        assert lector.execute("SELECT COUNT(*) FROM precios").fetchone()[0] == 0, "El lector ve su snapshot"
+        lector.execute("COMMIT")
+        assert lector.execute("SELECT COUNT(*) FROM precios").fetchone()[0] == 1
+        lector.close()
+
+    def test_conexion_lectura_se_reutiliza_por_hilo(self, db):
+        conn = conexion_lectura(db.db_file)
+        assert conexion_lectura(db.db_file) is conn
+
+        otra = []
+        hilo = threading.Thread(target=lambda: otra.append(conexion_lectura(db.db_file)))
+        hilo.start()
+        hilo.join()
+        assert otra[0] is not conn
+
+    def test_lectura_reutilizada_ve_escrituras_nuevas(self, db):
+        conn = conexion_lectura(db.db_file)
+        assert conn.execute("SELECT COUNT(*) FROM precios").fetchone()[0] == 0
+
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+
+        assert conn.execute("SELECT COUNT(*) FROM precios").fetchone()[0] == 1
+
+    def test_archivo_inexistente(self, tmp_path):
+        with pytest.raises(sqlite3.OperationalError):
+            abrir_lectura(str(tmp_path / "no_existe.db"))
+
+
+@pytest.fixture
+def cache(db):
+    pool = PoolLectura(db.db_file, tamano=2)
+    yield CacheConsultas(pool)
+    pool.cerrar()
+
+
+class TestCacheConsultas:
+
+    SQL = "SELECT timestamp, precio FROM precios ORDER BY timestamp"
+
+    def test_filas_a_json(self, db):
+        db.guardar_precio('2025-01-01T00:00:00', 90000.5)
+
+        contenido = filas_a_json(conexion_lectura(db.db_file).execute(self.SQL))
+
+        assert json.loads(contenido) == [{'timestamp': '2025-01-01T00:00:00', 'precio': 90000.5}]
+
+    def test_sin_cambios_no_repite_la_consulta(self, db, cache):
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+
+        primera = cache.consultar_json(self.SQL)
+        for _ in range(10):
+            assert cache.consultar_json(self.SQL) is primera
+
+        assert cache.fallos == 1
+        assert cache.aciertos == 10
+
+    def test_escritura_del_bot_invalida(self, db, cache):
+        assert json.loads(cache.consultar_json(self.SQL)) == []
+
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+
+        assert len(json.loads(cache.consultar_json(self.SQL))) == 1
+        assert cache.fallos == 2
+
+    def test_entrada_vencida_se_regenera(self, db, cache):
+        cache.max_edad = 0
+        cache.consultar_json(self.SQL)
+        cache.consultar_json(self.SQL)
+
+        assert cache.fallos == 2
+
+    def test_varios_clientes_generan_una_sola_vez(self, db, cache):
+        llamadas = []
+
+        def generar(conn):
+            llamadas.append(1)
+            time.sleep(0.05)
+            return b'[]'
+
+        hilos = [threading.Thread(target=cache.obtener, args=("clave", generar)) for _ in range(8)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        assert len(llamadas) == 1
+
+    def test_cantidad_de_entradas_acotada(self, db, cache):
+        cache.max_entradas = 3
+        for i in range(10):
+            cache.consultar_json("SELECT ? AS n", (i,))
+
+        assert len(cache._entradas) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
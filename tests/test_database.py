@@ -0,0 +1,405 @@
+"""
+Tests para la base de datos SQLite (estado por par, escritura diferida y planes de consulta)
+"""
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import Database, resolucion_velas, rango_dia
+from metricas import MetricasPerformance
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / "argos_test.db")) as db:
+        yield db
+
+
+class TestEstadoSimbolos:
+
+    def test_par_nuevo_con_estado_default(self, db):
+        estado = db.cargar_estado_simbolo('ETH/USDT')
+
+        assert estado['posicion_abierta'] is False
+        assert estado['symbol'] == 'ETH/USDT'
+        assert 'ETH/USDT' in db.obtener_estados_simbolos()
+
+    def test_par_nuevo_hereda_estado_inicial(self, db):
+        """El primer par puede heredar el estado del bot de un solo par"""
+        estado = db.cargar_estado_simbolo('BTC/USDT', inicial={'posicion_abierta': True, 'precio_compra': 90000})
+
+        assert estado['posicion_abierta'] is True
+        assert db.cargar_estado_simbolo('BTC/USDT')['precio_compra'] == 90000
+
+    def test_estados_independientes_por_par(self, db):
+        btc = db.cargar_estado_simbolo('BTC/USDT')
+        eth = db.cargar_estado_simbolo('ETH/USDT')
+
+        btc.update({'posicion_abierta': True, 'precio_compra': 90000.0, 'cantidad': '0.00105', 'max_precio': 90500.0})
+        db.guardar_estado_simbolo('BTC/USDT', btc)
+        eth['pnl_acumulado'] = -1.5
+        db.guardar_estado_simbolo('ETH/USDT', eth)
+
+        estados = db.obtener_estados_simbolos()
+        assert estados['BTC/USDT']['max_precio'] == 90500.0
+        assert estados['BTC/USDT']['cantidad'] == 0.00105
+        assert estados['ETH/USDT']['posicion_abierta'] == 0
+        assert estados['ETH/USDT']['pnl_acumulado'] == -1.5
+
+    def test_estado_persiste_al_reabrir(self, tmp_path):
+        ruta = str(tmp_path / "argos_test.db")
+        with Database(ruta) as db:
+            estado = db.cargar_estado_simbolo('SOL/USDT')
+            estado['posicion_abierta'] = True
+            db.guardar_estado_simbolo('SOL/USDT', estado)
+
+        with Database(ruta) as db:
+            assert db.cargar_estado_simbolo('SOL/USDT')['posicion_abierta'] is True
+
+
+
+def filas(ruta, tabla):
+    """Contar filas desde otra conexión: solo ve lo que ya está en disco"""
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def senal(i):
+    return {'timestamp': f'2025-01-01T00:{i:02d}:00', 'tipo': 'CHECK', 'precio': 90000.0 + i,
+            'posicion_abierta': 0}
+
+
+class TestEscrituraDiferida:
+
+    @pytest.fixture
+    def ruta(self, tmp_path):
+        return str(tmp_path / "argos_test.db")
+
+    def test_senales_y_precios_se_agrupan_en_un_commit(self, ruta):
+        with Database(ruta, intervalo_flush=60, max_pendientes=1000) as db:
+            commits = db.commits
+            for i in range(50):
+                db.guardar_senal(senal(i))
+                db.guardar_precio(f'2025-01-01T00:{i:02d}:00', 90000.0 + i)
+
+            assert db.commits == commits
+            assert filas(ruta, 'senales') == 0
+            assert db.pendientes() == 100
+
+            db.flush()
+
+            assert db.commits == commits + 1
+            assert filas(ruta, 'senales') == filas(ruta, 'precios') == 50
+
+    def test_flush_al_llenarse_el_buffer(self, ruta):
+        with Database(ruta, intervalo_flush=60, max_pendientes=10) as db:
+            db.guardar_senales([senal(i) for i in range(9)])
+            assert filas(ruta, 'senales') == 0
+
+            db.guardar_senal(senal(9))
+
+            assert filas(ruta, 'senales') == 10
+            assert db.pendientes() == 0
+
+    def test_sin_intervalo_escribe_al_momento(self, ruta):
+        with Database(ruta, intervalo_flush=0) as db:
+            db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+
+            assert filas(ruta, 'precios') == 1
+
+    def test_cerrar_escribe_lo_pendiente(self, ruta):
+        with Database(ruta, intervalo_flush=60) as db:
+            db.guardar_senales([senal(i) for i in range(5)])
+
+        assert filas(ruta, 'senales') == 5
+
+    def test_lectura_ve_lo_pendiente(self, ruta):
+        with Database(ruta, intervalo_flush=60) as db:
+            db.guardar_senal(senal(1))
+
+            assert len(db.obtener_senales()) == 1
+
+    def test_trade_es_critico_y_arrastra_lo_pendiente(self, ruta):
+        trade = {'timestamp_compra': '2025-01-01T00:00:00', 'timestamp_venta': '2025-01-01T01:00:00',
+                 'precio_compra': 90000.0, 'precio_venta': 91000.0, 'cantidad': 0.01,
+                 'pnl_usd': 10.0, 'pnl_pct': 1.11, 'razon_salida': 'TP'}
+        with Database(ruta, intervalo_flush=60) as db:
+            db.guardar_senal(senal(1))
+
+            db.guardar_trade(trade)
+
+            assert filas(ruta, 'trades') == 1
+            assert filas(ruta, 'senales') == 1
+
+    def test_transaccion_agrupa_y_deshace(self, ruta):
+        trade = {'timestamp_venta': '2025-01-01T01:00:00', 'precio_compra': 1.0, 'precio_venta': 1.0,
+                 'cantidad': 1.0, 'pnl_usd': 0.0, 'pnl_pct': 0.0, 'razon_salida': 'TP'}
+        with Database(ruta) as db:
+            commits = db.commits
+            with db.transaccion():
+                for i in range(3):
+                    db.guardar_trade({**trade, 'timestamp_compra': f'2025-01-01T00:0{i}:00'})
+            assert db.commits == commits + 1
+
+            with pytest.raises(RuntimeError):
+                with db.transaccion():
+                    db.guardar_trade({**trade, 'timestamp_compra': '2025-01-02T00:00:00'})
+                    raise RuntimeError("fallo a mitad")
+
+            assert filas(ruta, 'trades') == 3
+
+
+class TestEstadoCrashSafe:
+
+    @pytest.fixture
+    def ruta(self, tmp_path):
+        return str(tmp_path / "argos_test.db")
+
+    def test_apertura_de_posicion_se_confirma_al_momento(self, ruta):
+        with Database(ruta, intervalo_flush=60) as db:
+            estado = db.cargar_estado_simbolo('BTC/USDT')
+            estado.update({'posicion_abierta': True, 'precio_compra': 90000.0, 'cantidad': 0.01,
+                           'max_precio': 90000.0})
+
+            db.guardar_estado_simbolo('BTC/USDT', estado)
+
+            # Un "corte" ahora: otra conexión ya ve la posición
+            otra = Database(ruta)
+            assert otra.obtener_estados_simbolos()['BTC/USDT']['posicion_abierta'] == 1
+            otra.cerrar()
+
+    def test_maximos_del_trailing_se_coalescen(self, ruta):
+        with Database(ruta, intervalo_flush=60) as db:
+            estado = db.cargar_estado_simbolo('BTC/USDT')
+            estado.update({'posicion_abierta': True, 'precio_compra': 90000.0, 'cantidad': 0.01})
+            db.guardar_estado_simbolo('BTC/USDT', estado)
+            commits = db.commits
+
+            for maximo in range(90001, 90101):
+                estado['max_precio'] = float(maximo)
+                db.guardar_estado_simbolo('BTC/USDT', estado)
+
+            assert db.commits == commits
+            assert db.pendientes() == 1
+
+        with Database(ruta) as db:
+            assert db.cargar_estado_simbolo('BTC/USDT')['max_precio'] == 90100.0
+
+    def test_maximo_diferido_no_espera_al_lock_de_la_conexion(self, ruta):
+        """Un nuevo máximo (desde el loop) no espera a un flush o una compactación en otro hilo"""
+        with Database(ruta, intervalo_flush=0) as db:
+            estado = db.cargar_estado_simbolo('BTC/USDT')
+            estado.update({'posicion_abierta': True, 'precio_compra': 90000.0, 'cantidad': 0.01})
+            db.guardar_estado_simbolo('BTC/USDT', estado)
+            estado['max_precio'] = 90500.0
+
+            with db._lock:
+                hilo = threading.Thread(target=db.guardar_estado_simbolo, args=('BTC/USDT', estado))
+                hilo.start()
+                hilo.join(1)
+                assert not hilo.is_alive()
+            assert db.pendientes() == 1
+
+            db.flush_si_vencido()
+            assert db.pendientes() == 0
+
+    def test_cierre_descarta_el_maximo_diferido(self, ruta):
+        with Database(ruta, intervalo_flush=60) as db:
+            estado = db.cargar_estado_simbolo('ETH/USDT')
+            estado.update({'posicion_abierta': True, 'precio_compra': 3000.0, 'cantidad': 0.5})
+            db.guardar_estado_simbolo('ETH/USDT', estado)
+            estado['max_precio'] = 3100.0
+            db.guardar_estado_simbolo('ETH/USDT', estado)
+
+            estado.update({'posicion_abierta': False, 'max_precio': 0.0})
+            db.guardar_estado_simbolo('ETH/USDT', estado)
+
+            assert db.pendientes() == 0
+            otra = Database(ruta)
+            guardado = otra.cargar_estado_simbolo('ETH/USDT')
+            otra.cerrar()
+            assert guardado['posicion_abierta'] is False
+            assert guardado['max_precio'] == 0.0
+
+
+
+TF_MS = 15 * 60 * 1000
+
+
+def velas_sinteticas(n, desde=0):
+    """[ts, o, h, l, c, v] con precios que permiten verificar el agrupado"""
+    return [[(desde + i) * TF_MS, 100.0 + i, 100.5 + i, 99.5 + i, 100.25 + i, 1.0] for i in range(n)]
+
+
+class TestVelas:
+
+    def test_upsert_de_la_vela_abierta(self, db):
+        db.guardar_velas('BTC/USDT', '15m', [[0, 100.0, 101.0, 99.0, 100.5, 1.0]])
+        db.guardar_velas('BTC/USDT', '15m', [[0, 100.0, 102.0, 99.0, 101.5, 2.0]])
+
+        velas, resolucion = db.obtener_velas('BTC/USDT', '15m')
+
+        assert resolucion == TF_MS
+        assert velas == [{'open_time': 0, 'open': 100.0, 'high': 102.0, 'low': 99.0, 'close': 101.5, 'volumen': 2.0}]
+
+    def test_separadas_por_par_y_timeframe(self, db):
+        db.guardar_velas('BTC/USDT', '15m', velas_sinteticas(3))
+        db.guardar_velas('ETH/USDT', '15m', velas_sinteticas(5))
+        db.guardar_velas('BTC/USDT', '1h', velas_sinteticas(7))
+
+        assert len(db.obtener_velas('BTC/USDT', '15m')[0]) == 3
+        assert len(db.obtener_velas('ETH/USDT', '15m')[0]) == 5
+
+    def test_rango_pedido(self, db):
+        db.guardar_velas('BTC/USDT', '15m', velas_sinteticas(100))
+
+        velas, _ = db.obtener_velas('BTC/USDT', '15m', desde_ms=10 * TF_MS, hasta_ms=19 * TF_MS)
+
+        assert [v['open_time'] for v in velas] == [i * TF_MS for i in range(10, 20)]
+
+    def test_reduccion_ohlc_por_tramo(self, db):
+        db.guardar_velas('BTC/USDT', '15m', velas_sinteticas(10000))
+
+        velas, resolucion = db.obtener_velas('BTC/USDT', '15m', max_puntos=100)
+
+        assert len(velas) == 100
+        assert resolucion == 100 * TF_MS
+        primero = velas[0]
+        assert primero == {'open_time': 0, 'open': 100.0, 'high': 100.5 + 99, 'low': 99.5,
+                           'close': 100.25 + 99, 'volumen': 100.0}
+
+    def test_ultimas_velas_en_orden(self, db):
+        db.guardar_velas('BTC/USDT', '15m', velas_sinteticas(50))
+        db.guardar_velas('BTC/USDT', '1h', velas_sinteticas(80))
+
+        velas = db.ultimas_velas('BTC/USDT', '15m', 10)
+
+        assert [v[0] for v in velas] == [i * TF_MS for i in range(40, 50)]
+        assert velas[-1] == [49 * TF_MS, 149.0, 149.5, 148.5, 149.25, 1.0]
+
+    def test_resolucion(self):
+        assert resolucion_velas(TF_MS, 0, 99 * TF_MS, 1000) == TF_MS
+        assert resolucion_velas(TF_MS, 0, 9999 * TF_MS, 1000) == 10 * TF_MS
+        # Resolución pedida: múltiplo del timeframe, nunca más fina que max_puntos
+        assert resolucion_velas(TF_MS, 0, 99 * TF_MS, 1000, resolucion_ms=60 * 60 * 1000) == 4 * TF_MS
+        assert resolucion_velas(TF_MS, 0, 9999 * TF_MS, 1000, resolucion_ms=1000) == 10 * TF_MS
+
+
+# Consultas del dashboard sobre la base del bot (dashboard/main.py)
+CONSULTAS_DASHBOARD = [
+    "SELECT * FROM trades ORDER BY timestamp_venta DESC LIMIT 50",
+]
+
+
+class TestPlanesDeConsulta:
+    """Las consultas frecuentes deben ser búsquedas por índice, no recorridos de tabla"""
+
+    @pytest.fixture
+    def db(self, tmp_path):
+        with Database(str(tmp_path / "argos_test.db"), intervalo_flush=0) as db:
+            ahora = datetime.now()
+            for i in reversed(range(50)):
+                venta = ahora - timedelta(hours=i * 7)
+                db.guardar_trade({
+                    'timestamp_compra': (venta - timedelta(minutes=30)).isoformat(),
+                    'timestamp_venta': venta.isoformat(),
+                    'precio_compra': 90000.0, 'precio_venta': 90100.0 if i % 2 else 89900.0,
+                    'cantidad': 0.01, 'pnl_usd': 1.0 if i % 2 else -1.0, 'pnl_pct': 0.1 if i % 2 else -0.1,
+                    'razon_salida': 'TP', 'duracion_minutos': 30,
+                })
+                db.guardar_precio(venta.isoformat(), 90000.0 + i)
+            db.conn.execute("ANALYZE")
+            yield db
+
+    # Tablas que crecen con cada tick/trade (metricas_acumuladas tiene una fila por día)
+    TABLAS_GRANDES = ("trades", "precios", "senales", "velas")
+
+    @classmethod
+    def recorridos_de_tabla(cls, conn, sql):
+        plan = [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        # SCAN recorre la tabla (o un índice) entero; solo vale si un LIMIT lo corta
+        # ("ORDER BY timestamp DESC LIMIT 50" lee 50 entradas del índice)
+        con_limite = re.search(r"\bLIMIT\b", sql, re.IGNORECASE)
+        return [paso for paso in plan
+                if paso.startswith("SCAN ") and paso.split()[1] in cls.TABLAS_GRANDES and not con_limite]
+
+    def consultas_ejecutadas(self, db, llamadas):
+        consultas = []
+        db.conn.set_trace_callback(consultas.append)
+        try:
+            for llamada in llamadas:
+                llamada()
+        finally:
+            db.conn.set_trace_callback(None)
+        return [c for c in consultas if c.lstrip().upper().startswith("SELECT")]
+
+    def test_consultas_de_metricas_y_reportes(self, db):
+        hace_una_semana = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+        metricas = MetricasPerformance(db)
+        consultas = self.consultas_ejecutadas(db, [
+            db.obtener_trades,
+            db.obtener_trades_hoy,
+            db.actualizar_metricas_diarias,
+            db.obtener_metricas_diarias,
+            lambda: db.obtener_metricas_acumuladas(hace_una_semana),
+            db.obtener_tramos_metricas,
+            lambda: metricas.generar_reporte_completo(periodo_dias=7),
+            lambda: metricas.calcular_win_rate_por_periodo("semanal"),
+        ])
+
+        assert len(consultas) >= 8
+        for sql in consultas:
+            assert self.recorridos_de_tabla(db.conn, sql) == [], sql
+
+    def test_consultas_del_dashboard(self, db):
+        ayer = (datetime.now() - timedelta(days=1)).isoformat()
+        consultas = CONSULTAS_DASHBOARD + self.consultas_ejecutadas(db, [
+            db.compactar,
+            lambda: db.obtener_precios_agregados(ayer),
+            lambda: db.obtener_precios_agregados(ayer, max_puntos=2),
+            lambda: db.obtener_precios_recientes(24),
+        ])
+
+        for sql in consultas:
+            assert self.recorridos_de_tabla(db.conn, sql) == [], sql
+
+    def test_filtro_por_dia_usa_el_indice_cubriente(self, db):
+        plan = " ".join(fila[3] for fila in db.conn.execute("""
+            EXPLAIN QUERY PLAN SELECT SUM(pnl_usd), AVG(pnl_pct) FROM trades
+            WHERE timestamp_venta >= ? AND timestamp_venta < ?
+        """, rango_dia("2025-01-05")))
+
+        assert "SEARCH trades USING COVERING INDEX idx_trades_venta_pnl" in plan
+
+    def test_rango_dia_equivale_a_date(self, db):
+        hoy = datetime.now().strftime("%Y-%m-%d")
+        con_date = db.conn.execute("SELECT COUNT(*) FROM trades WHERE date(timestamp_venta) = ?", (hoy,)).fetchone()[0]
+
+        assert len(db.obtener_trades_hoy()) == con_date
+        assert rango_dia("2024-12-31") == ("2024-12-31", "2025-01-01")
+
+    def test_base_anterior_migra_los_indices(self, tmp_path):
+        ruta = str(tmp_path / "vieja.db")
+        with Database(ruta) as db:
+            db.conn.execute("DROP INDEX idx_trades_venta_pnl")
+            db.conn.execute("CREATE INDEX idx_trades_timestamp ON trades(timestamp_venta)")
+            db.conn.commit()
+
+        with Database(ruta) as db:
+            indices = {fila[0] for fila in db.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+        assert "idx_trades_venta_pnl" in indices
+        assert "idx_trades_timestamp" not in indices
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
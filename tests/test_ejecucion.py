@@ -0,0 +1,121 @@
+"""
+Tests para las plantillas de órdenes y la latencia señal → ack
+"""
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mercados import SesionExchange
+from ejecucion import EjecutorOrdenes
+from latencias import RegistroLatencias
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture
+def exchange():
+    exchange = Mock()
+    exchange.load_markets.return_value = {
+        'BTC/USDT': {'symbol': 'BTC/USDT', 'limits': {'cost': {'min': 5.0}}},
+        'ETH/USDT': {'symbol': 'ETH/USDT', 'limits': {'cost': {'min': 5.0}}},
+    }
+    exchange.fetch_balance.return_value = {'USDT': {'free': 1000.0}, 'BTC': {'free': 0.0}}
+    exchange.amount_to_precision.side_effect = lambda symbol, cantidad: f"{cantidad:.4f}"
+    exchange.create_market_buy_order.side_effect = lambda symbol, cantidad: {
+        'side': 'buy', 'filled': float(cantidad), 'cost': float(cantidad) * 100.0, 'average': 100.0}
+    exchange.create_market_sell_order.side_effect = lambda symbol, cantidad: {
+        'side': 'sell', 'filled': float(cantidad), 'cost': float(cantidad) * 100.0, 'average': 100.0}
+    return exchange
+
+
+@pytest.fixture
+def ejecutor(exchange):
+    reloj = RelojFalso()
+    sesion = SesionExchange(exchange, reloj=reloj)
+    return EjecutorOrdenes(sesion, pos_size=0.5, ttl_plantilla=120, reloj=reloj, registro=RegistroLatencias())
+
+
+class TestPlantillas:
+
+    def test_plantilla_preparada(self, ejecutor):
+        plantillas = ejecutor.preparar(['BTC/USDT', 'ETH/USDT'], pares_libres=2)
+
+        assert plantillas['BTC/USDT'].gasto_usdt == pytest.approx(250.0)
+        assert plantillas['BTC/USDT'].min_cost == 5.0
+        assert plantillas['BTC/USDT'].motivo is None
+
+    def test_senal_no_hace_peticiones_previas(self, exchange, ejecutor):
+        """Con la plantilla lista, la compra es una sola llamada al exchange"""
+        ejecutor.preparar(['BTC/USDT'], pares_libres=1)
+        peticiones = ejecutor.sesion.peticiones
+
+        order = ejecutor.comprar(ejecutor.plantilla('BTC/USDT', 1), precio=100.0, t_senal=0.0)
+
+        assert ejecutor.sesion.peticiones - peticiones == 1
+        exchange.create_market_buy_order.assert_called_once_with('BTC/USDT', '5.0000')
+        assert order['filled'] == 5.0
+
+    def test_saldo_insuficiente(self, exchange, ejecutor):
+        exchange.fetch_balance.return_value = {'USDT': {'free': 10.0}}
+
+        plantilla = ejecutor.plantilla('BTC/USDT', 1)
+
+        assert plantilla.motivo.startswith("Saldo insuficiente")
+
+    def test_menor_al_minimo_del_exchange(self, exchange, ejecutor):
+        exchange.fetch_balance.return_value = {'USDT': {'free': 20.0}}
+
+        plantilla = ejecutor.plantilla('BTC/USDT', 4)
+
+        assert "mínimo" in plantilla.motivo
+
+    def test_plantilla_vencida_se_rehace(self, exchange, ejecutor):
+        ejecutor.preparar(['BTC/USDT'], pares_libres=1)
+        exchange.fetch_balance.return_value = {'USDT': {'free': 400.0}}
+        ejecutor.sesion.invalidar_balance()
+
+        assert ejecutor.plantilla('BTC/USDT', 1).gasto_usdt == pytest.approx(500.0)
+        ejecutor._reloj.t = 121
+        assert ejecutor.plantilla('BTC/USDT', 1).gasto_usdt == pytest.approx(200.0)
+
+    def test_orden_llenada_descarta_plantillas(self, ejecutor):
+        ejecutor.preparar(['BTC/USDT', 'ETH/USDT'], pares_libres=2)
+
+        ejecutor.comprar(ejecutor.plantilla('BTC/USDT', 2), precio=100.0)
+
+        # El saldo en caché bajó 250 USDT con el llenado: ETH se arma con lo que queda
+        assert ejecutor.plantilla('ETH/USDT', 1).gasto_usdt == pytest.approx(375.0)
+
+
+class TestLatencia:
+
+    def test_latencia_senal_ack(self, exchange, ejecutor):
+        def orden_lenta(symbol, cantidad):
+            ejecutor._reloj.t += 0.25
+            return {'side': 'sell', 'filled': float(cantidad), 'cost': 100.0}
+        exchange.create_market_sell_order.side_effect = orden_lenta
+        ejecutor._reloj.t = 10.0
+
+        ejecutor.vender('BTC/USDT', 1.0, t_senal=9.95)
+
+        resumen = ejecutor.resumen_latencias()
+        assert resumen['VENTA']['cantidad'] == 1
+        assert resumen['VENTA']['p50_ms'] == pytest.approx(300.0, rel=0.04)
+
+    def test_sin_t_senal_no_registra(self, ejecutor):
+        ejecutor.vender('BTC/USDT', 1.0)
+
+        assert ejecutor.resumen_latencias() == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
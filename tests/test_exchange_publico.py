@@ -0,0 +1,96 @@
+"""
+Tests para los datos públicos de Binance por REST (sin ccxt)
+"""
+import json
+import pytest
+import requests
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from exchange_publico import BinancePublico
+from mercados import SesionExchange, MercadosMultiples
+
+TF_MS = 15 * 60 * 1000
+T0 = 1600000000000
+
+
+class Respuesta:
+    def __init__(self, datos, status_code=200):
+        self.datos = datos
+        self.status_code = status_code
+
+    def json(self):
+        return self.datos
+
+    def raise_for_status(self):
+        if self.status_code != 200:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+
+class SesionFalsa:
+    """Responde klines y ticker/price como la API de Binance y registra las consultas"""
+
+    def __init__(self, precios=None, status_code=200):
+        self.consultas = []
+        self.precios = precios or {'BTCUSDT': '101.5', 'ETHUSDT': '3000.25', 'SOLUSDT': '150.0'}
+        self.status_code = status_code
+
+    def get(self, url, params=None, timeout=None):
+        self.consultas.append((url, dict(params)))
+        if url.endswith('/api/v3/klines'):
+            desde = params.get('startTime', T0)
+            return Respuesta([[desde + i * TF_MS, "100.0", "102.0", "99.0", "101.0", "12.5", 0, "0", 10, "0", "0", "0"]
+                              for i in range(params['limit'])], self.status_code)
+        if 'symbols' in params:
+            return Respuesta([{'symbol': s, 'price': p} for s, p in self.precios.items()], self.status_code)
+        return Respuesta({'symbol': params['symbol'], 'price': self.precios[params['symbol']]}, self.status_code)
+
+
+@pytest.fixture
+def sesion():
+    return SesionFalsa()
+
+
+class TestBinancePublico:
+
+    def test_klines_como_ohlcv_de_ccxt(self, sesion):
+        cliente = BinancePublico(url='https://api.test/', sesion=sesion)
+
+        velas = cliente.fetch_ohlcv('BTC/USDT', timeframe='15m', limit=3)
+
+        assert velas[0] == [T0, 100.0, 102.0, 99.0, 101.0, 12.5]
+        assert len(velas) == 3
+        assert sesion.consultas == [('https://api.test/api/v3/klines',
+                                     {'symbol': 'BTCUSDT', 'interval': '15m', 'limit': 3})]
+
+    def test_since_pide_desde_esa_vela(self, sesion):
+        BinancePublico(sesion=sesion).fetch_ohlcv('BTC/USDT', since=T0 + TF_MS, limit=2)
+
+        assert sesion.consultas[0][1]['startTime'] == T0 + TF_MS
+
+    def test_tickers_en_una_peticion(self, sesion):
+        tickers = BinancePublico(sesion=sesion).fetch_tickers(['BTC/USDT', 'ETH/USDT'])
+
+        assert tickers == {'BTC/USDT': {'symbol': 'BTC/USDT', 'last': 101.5},
+                           'ETH/USDT': {'symbol': 'ETH/USDT', 'last': 3000.25}}
+        assert len(sesion.consultas) == 1
+        assert json.loads(sesion.consultas[0][1]['symbols']) == ['BTCUSDT', 'ETHUSDT']
+
+    def test_error_http(self):
+        with pytest.raises(requests.HTTPError):
+            BinancePublico(sesion=SesionFalsa(status_code=429)).fetch_ticker('BTC/USDT')
+
+    def test_indicadores_sin_ccxt(self, sesion):
+        """Velas e indicadores de MercadosMultiples con el cliente público"""
+        mercados = MercadosMultiples(SesionExchange(BinancePublico(sesion=sesion)), ['BTC/USDT'], limite=100)
+
+        recibidas = mercados.actualizar(ahora_ms=T0 + 99 * TF_MS + 1000)
+
+        assert recibidas == {'BTC/USDT': 100}
+        assert mercados['BTC/USDT'].indicadores.ultimos()['EMA'] == pytest.approx(101.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
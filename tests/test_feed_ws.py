@@ -0,0 +1,132 @@
+"""
+Tests para el feed WebSocket de Binance (usando replay local, sin red)
+"""
+import json
+import time
+import threading
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from feed_ws import FeedBinance, ReplayWebSocket
+
+
+def msg_kline(close, t=1600000000000):
+    return json.dumps({
+        "stream": "btcusdt@kline_15m",
+        "data": {"e": "kline", "s": "BTCUSDT",
+                 "k": {"t": t, "o": "90000.0", "h": "90500.0", "l": "89500.0", "c": str(close), "v": "12.5"}}
+    })
+
+
+def msg_book(bid, ask):
+    return json.dumps({
+        "stream": "btcusdt@bookTicker",
+        "data": {"u": 1, "s": "BTCUSDT", "b": str(bid), "B": "1.0", "a": str(ask), "A": "1.0"}
+    })
+
+
+class TestMensajes:
+
+    def test_url_streams_combinados(self):
+        feed = FeedBinance('BTC/USDT', url='wss://ejemplo/stream')
+        assert feed.url == 'wss://ejemplo/stream?streams=btcusdt@kline_15m/btcusdt@bookTicker'
+
+    def test_kline_actualiza_precio(self):
+        feed = FeedBinance('BTC/USDT')
+        feed.procesar_mensaje(msg_kline(90100.5))
+
+        assert feed.ultimo_precio == 90100.5
+        assert feed.activo
+
+    def test_book_ticker_usa_bid(self):
+        """Para salidas se usa el mejor bid (precio de una venta a mercado)"""
+        feed = FeedBinance('BTC/USDT')
+        feed.procesar_mensaje(msg_book(90000.0, 90001.0))
+
+        assert feed.ultimo_precio == 90000.0
+
+    def test_mensaje_invalido_se_ignora(self):
+        feed = FeedBinance('BTC/USDT')
+        feed.procesar_mensaje("no es json")
+        feed.procesar_mensaje(json.dumps({"result": None, "id": 1}))
+
+        assert feed.ultimo_precio is None
+        assert not feed.activo
+
+    def test_esperar_precios_devuelve_el_mas_reciente(self):
+        feed = FeedBinance('BTC/USDT')
+        feed.procesar_mensaje(msg_book(1.0, 2.0))
+        feed.procesar_mensaje(msg_book(3.0, 4.0))
+
+        assert feed.esperar_precios(timeout=0.1) == {'BTC/USDT': 3.0}
+        assert feed.esperar_precios(timeout=0.05) == {}, "Sin precio nuevo no devuelve nada"
+
+    def test_varios_pares_en_una_conexion(self):
+        feed = FeedBinance(['BTC/USDT', 'ETH/USDT'], url='wss://ejemplo/stream')
+        assert feed.streams == ['btcusdt@kline_15m', 'btcusdt@bookTicker',
+                                'ethusdt@kline_15m', 'ethusdt@bookTicker']
+
+        feed.procesar_mensaje(msg_book(90000.0, 90001.0))
+        feed.procesar_mensaje(json.dumps({"data": {"s": "ETHUSDT", "b": "3000.5", "a": "3001.0"}}))
+        feed.procesar_mensaje(msg_book(90002.0, 90003.0))
+
+        assert feed.esperar_precios(timeout=0.1) == {'BTC/USDT': 90002.0, 'ETH/USDT': 3000.5}
+        assert feed.esperar_precios(timeout=0.05) == {}
+
+    def test_feed_inactivo_tras_silencio(self):
+        feed = FeedBinance('BTC/USDT', max_silencio_seg=0.05)
+        feed.procesar_mensaje(msg_book(1.0, 2.0))
+        time.sleep(0.1)
+
+        assert not feed.activo
+
+
+class TestReplay:
+
+    def test_replay_despierta_al_consumidor(self):
+        """Un precio recibido en el hilo del feed despierta a esperar_precios()"""
+        replay = ReplayWebSocket([msg_kline(91000.0)], pausa_seg=0.05)
+        feed = FeedBinance('BTC/USDT', conector=lambda url: replay, reconexion_min_seg=10)
+        feed.iniciar()
+        try:
+            assert feed.esperar_precios(timeout=2) == {'BTC/USDT': 91000.0}
+        finally:
+            feed.detener()
+
+    def test_reconexion_automatica(self):
+        """Al cerrarse la conexión, el feed se reconecta con una nueva"""
+        conexiones = []
+        recibidos = threading.Event()
+
+        def conector(url):
+            conexiones.append(url)
+            if len(conexiones) >= 3:
+                recibidos.set()
+            return ReplayWebSocket([msg_book(90000.0 + len(conexiones), 90010.0)])
+
+        feed = FeedBinance('BTC/USDT', conector=conector,
+                           reconexion_min_seg=0.01, reconexion_max_seg=0.02)
+        feed.iniciar()
+        try:
+            assert recibidos.wait(timeout=2)
+            assert feed.reconexiones >= 2
+            assert feed.ultimo_precio >= 90002.0
+        finally:
+            feed.detener()
+
+    def test_replay_desde_archivo(self, tmp_path):
+        ruta = tmp_path / "grabacion.jsonl"
+        ruta.write_text("\n".join([msg_book(1.0, 2.0), "", msg_kline(5.0)]) + "\n")
+
+        replay = ReplayWebSocket.desde_archivo(str(ruta))
+        feed = FeedBinance('BTC/USDT')
+        replay.ejecutar(feed.procesar_mensaje)
+
+        assert feed.ultimo_precio == 5.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
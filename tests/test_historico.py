@@ -0,0 +1,129 @@
+"""
+Tests para el archivo local de velas históricas
+"""
+import time
+import pytest
+import numpy as np
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from historico import ArchivoVelas, cargar_historico, main
+
+TF_MS = 15 * 60 * 1000
+
+
+class ExchangeFalso:
+    """fetch_ohlcv sobre una serie continua de velas hasta la vela abierta actual"""
+
+    def __init__(self, desde_ms, huecos=()):
+        ahora = int(time.time() * 1000) // TF_MS * TF_MS
+        self.velas = [[ts, 1.0, 2.0, 0.5, float(ts // TF_MS), 10.0]
+                      for ts in range(desde_ms, ahora + TF_MS, TF_MS)
+                      if not any(a <= ts <= b for a, b in huecos)]
+        self.peticiones = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=1000):
+        self.peticiones.append(since)
+        return [v for v in self.velas if v[0] >= since][:limit]
+
+
+@pytest.fixture
+def inicio():
+    return (int(time.time() * 1000) // TF_MS - 3000) * TF_MS
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    return ArchivoVelas('BTC/USDT', '15m', str(tmp_path))
+
+
+class TestArchivo:
+
+    def test_fusionar_ordena_y_deduplica(self, archivo):
+        archivo.fusionar([[3 * TF_MS, 1, 1, 1, 3, 1], [TF_MS, 1, 1, 1, 1, 1]])
+        archivo.fusionar([[2 * TF_MS, 1, 1, 1, 2, 1], [3 * TF_MS, 1, 1, 1, 33, 1]])
+
+        datos = archivo.cargar()
+        assert datos[0].tolist() == [TF_MS, 2 * TF_MS, 3 * TF_MS]
+        assert datos[4].tolist() == [1, 2, 33], "La vela nueva reemplaza a la guardada"
+
+    def test_huecos(self, archivo):
+        archivo.fusionar([[i * TF_MS, 1, 1, 1, 1, 1] for i in (0, 1, 5, 6, 9)])
+
+        assert archivo.huecos() == [(2 * TF_MS, 4 * TF_MS), (7 * TF_MS, 8 * TF_MS)]
+
+    def test_carga_con_memory_map(self, archivo):
+        archivo.fusionar([[i * TF_MS, 1, 1, 1, 1, 1] for i in range(10)])
+
+        assert isinstance(archivo.cargar(), np.memmap)
+
+    def test_archivo_vacio(self, archivo):
+        assert archivo.rango() is None
+        assert archivo.huecos() == []
+        assert archivo.a_dataframe().empty
+
+
+class TestDescarga:
+
+    def test_backfill_solo_velas_cerradas(self, archivo, inicio):
+        exchange = ExchangeFalso(inicio)
+
+        archivo.backfill(exchange, inicio)
+
+        datos = archivo.cargar()
+        assert datos.shape[1] == len(exchange.velas) - 1, "La vela abierta no se guarda"
+        assert archivo.huecos() == []
+
+    def test_backfill_rellena_huecos_y_tramo_anterior(self, archivo, inicio):
+        hueco = (inicio + 500 * TF_MS, inicio + 520 * TF_MS)
+        archivo.fusionar([v for v in ExchangeFalso(inicio + 100 * TF_MS, huecos=[hueco]).velas[:-1]])
+        assert archivo.huecos() == [hueco]
+
+        archivo.backfill(ExchangeFalso(inicio), inicio)
+
+        assert archivo.rango()[0] == inicio
+        assert archivo.huecos() == []
+
+    def test_actualizar_pide_solo_lo_nuevo(self, archivo, inicio):
+        exchange = ExchangeFalso(inicio)
+        archivo.fusionar(exchange.velas[:-11])
+        ultimo = archivo.rango()[1]
+
+        nuevas = archivo.actualizar(exchange)
+
+        assert nuevas == 10
+        assert exchange.peticiones == [ultimo + TF_MS]
+
+    def test_cargar_historico_sin_red_usa_disco(self, tmp_path, inicio):
+        ArchivoVelas('ETH/USDT', '15m', str(tmp_path)).fusionar(ExchangeFalso(inicio).velas[:-1])
+
+        df = cargar_historico('ETH/USDT', '15m', velas=4000, directorio=str(tmp_path))
+
+        assert len(df) == 3000
+        assert list(df.columns) == ['ts', 'open', 'high', 'low', 'close', 'vol', 'datetime']
+
+    def test_cargar_historico_hace_backfill_si_faltan_velas(self, tmp_path, inicio):
+        exchange = ExchangeFalso(inicio)
+
+        df = cargar_historico('BTC/USDT', '15m', velas=1000, exchange=exchange, directorio=str(tmp_path))
+
+        assert len(df) == 1000
+        assert df['ts'].iloc[-1] == exchange.velas[-2][0]
+
+
+class TestCLI:
+
+    def test_estado(self, tmp_path, capsys):
+        ArchivoVelas('BTC/USDT', '15m', str(tmp_path)).fusionar([[i * TF_MS, 1, 1, 1, 1, 1] for i in (0, 1, 3)])
+
+        main(['estado', '--directorio', str(tmp_path)])
+
+        salida = capsys.readouterr().out
+        assert "3 velas" in salida
+        assert "Huecos: 1" in salida
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
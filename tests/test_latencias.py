@@ -0,0 +1,159 @@
+"""
+Tests para los histogramas de latencia por etapa y su exposición en Prometheus
+"""
+import random
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import latencias
+from latencias import Histograma, RegistroLatencias, indice, techo
+from database import Database
+from mercados import SesionExchange
+
+
+class TestCubetas:
+
+    def test_cada_valor_cae_en_su_cubeta(self):
+        for us in list(range(0, 300)) + [10 ** k + d for k in range(3, 10) for d in (-1, 0, 1)]:
+            i = indice(us)
+            assert techo(i - 1) < us <= techo(i) if i > 0 else us == 0
+
+    def test_error_relativo_acotado(self):
+        for us in (100, 1234, 98765, 4_500_000, 3_600_000_000):
+            assert (techo(indice(us)) - us) / us <= 1 / 32
+
+
+class TestHistograma:
+
+    def test_percentiles_cerca_de_los_exactos(self):
+        rnd = random.Random(7)
+        valores = sorted(rnd.lognormvariate(-4, 1) for _ in range(5000))
+        h = Histograma()
+        for v in valores:
+            h.registrar(v)
+
+        for p in (50, 95, 99):
+            exacto = valores[int(p / 100 * len(valores)) - 1]
+            assert h.percentil(p) == pytest.approx(exacto, rel=0.04)
+        assert h.percentil(100) == valores[-1]
+        assert h.cantidad == 5000
+        assert h.suma == pytest.approx(sum(valores))
+
+    def test_vacio(self):
+        assert Histograma().percentil(95) == 0.0
+
+    def test_hasta_para_prometheus(self):
+        h = Histograma()
+        for v in (0.0002, 0.003, 0.003, 0.2, 4.0):
+            h.registrar(v)
+
+        assert h.hasta(0.001) == 1
+        assert h.hasta(0.01) == 3
+        assert h.hasta(1.0) == 4
+        assert h.hasta(60.0) == 5
+
+
+class TestRegistro:
+
+    def test_medir_y_cronometrado(self, monkeypatch):
+        registro = RegistroLatencias()
+        monkeypatch.setattr(latencias, "REGISTRO", registro)
+
+        @latencias.cronometrado("etapa_decorada")
+        def funcion(x):
+            return x * 2
+
+        with registro.medir("etapa"):
+            pass
+        assert funcion(3) == 6
+
+        assert registro.total["etapa"].cantidad == 1
+        assert registro.total["etapa_decorada"].cantidad == 1
+
+    def test_cronometrado_mide_aunque_falle(self, monkeypatch):
+        registro = RegistroLatencias()
+        monkeypatch.setattr(latencias, "REGISTRO", registro)
+
+        @latencias.cronometrado("falla")
+        def funcion():
+            raise ValueError("x")
+
+        with pytest.raises(ValueError):
+            funcion()
+        assert registro.total["falla"].cantidad == 1
+
+    def test_periodo_se_reinicia_y_el_total_no(self):
+        registro = RegistroLatencias()
+        registro.registrar("orden", 0.1)
+
+        periodo = registro.cerrar_periodo()
+        registro.registrar("orden", 0.2)
+
+        assert periodo["orden"].cantidad == 1
+        assert registro.periodo["orden"].cantidad == 1
+        assert registro.total["orden"].cantidad == 2
+
+    def test_llamadas_al_exchange_por_metodo(self):
+        exchange = Mock()
+        exchange.fetch_ticker.return_value = {'last': 1.0}
+        antes = latencias.REGISTRO.instantanea().get("exchange_fetch_ticker")
+
+        SesionExchange(exchange).llamar('fetch_ticker', 'BTC/USDT')
+
+        despues = latencias.REGISTRO.instantanea()["exchange_fetch_ticker"]
+        assert despues.cantidad == (antes.cantidad if antes else 0) + 1
+
+
+class TestPersistencia:
+
+    def test_guardar_y_cargar(self, tmp_path):
+        registro = RegistroLatencias()
+        for v in (0.01, 0.02, 0.5):
+            registro.registrar("mercado", v)
+        registro.registrar("estrategia", 0.001)
+
+        with Database(str(tmp_path / "argos_test.db")) as db:
+            db.guardar_latencias(registro.instantanea())
+            db.guardar_latencias({"mercado": registro.total["mercado"]})
+            cargados = db.obtener_latencias()
+
+        # Cada volcado reemplaza al anterior (acumulado desde el arranque)
+        assert set(cargados) == {"mercado"}
+        assert cargados["mercado"].cantidad == 3
+        assert cargados["mercado"].percentil(50) == pytest.approx(0.02, rel=0.04)
+        assert cargados["mercado"].maximo == 0.5
+
+
+class TestFormatos:
+
+    def test_prometheus(self):
+        registro = RegistroLatencias()
+        for v in (0.002, 0.004, 0.3):
+            registro.registrar('exchange_fetch_ohlcv', v)
+
+        texto = latencias.prometheus(registro.instantanea())
+
+        assert "# TYPE argos_etapa_segundos histogram" in texto
+        assert 'argos_etapa_segundos_bucket{etapa="exchange_fetch_ohlcv",le="0.005"} 2' in texto
+        assert 'argos_etapa_segundos_bucket{etapa="exchange_fetch_ohlcv",le="+Inf"} 3' in texto
+        assert 'argos_etapa_segundos_count{etapa="exchange_fetch_ohlcv"} 3' in texto
+        buckets = [int(l.rsplit(" ", 1)[1]) for l in texto.splitlines() if l.startswith("argos_etapa_segundos_bucket")]
+        assert buckets == sorted(buckets)
+        assert texto.endswith("\n")
+
+    def test_texto_resumen_en_orden_y_sin_vacias(self):
+        registro = RegistroLatencias()
+        registro.registrar("orden", 0.25)
+        registro.registrar("mercado", 1.5)
+
+        texto = latencias.texto_resumen(registro.instantanea(), ("mercado", "estrategia", "orden"))
+
+        assert texto.splitlines() == ["mercado: 1500 / 1500 / 1500 ms (1)", "orden: 250 / 250 / 250 ms (1)"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,222 @@
+"""
+Tests para los datos de mercado multi-par (sesión de exchange compartida)
+"""
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import Database
+from mercados import SesionExchange, MercadosMultiples
+
+TF_MS = 15 * 60 * 1000
+T0 = 1600000000000
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+
+def velas(n, close=100.0, desde=0):
+    return [[T0 + i * TF_MS, close, close, close, close, 1.0] for i in range(desde, desde + n)]
+
+
+@pytest.fixture
+def exchange():
+    exchange = Mock()
+    exchange.has = {'fetchTickers': True}
+    exchange.load_markets.return_value = {s: {'symbol': s} for s in SYMBOLS}
+    exchange.fetch_ohlcv.side_effect = lambda symbol, **kw: velas(100)
+    exchange.fetch_tickers.side_effect = lambda symbols: {s: {'symbol': s, 'last': 101.0} for s in symbols}
+    return exchange
+
+
+class TestSesionExchange:
+
+    def test_load_markets_una_sola_vez(self, exchange):
+        sesion = SesionExchange(exchange)
+
+        for symbol in SYMBOLS:
+            assert sesion.mercado(symbol)['symbol'] == symbol
+
+        assert exchange.load_markets.call_count == 1
+
+    def test_tickers_en_una_peticion(self, exchange):
+        sesion = SesionExchange(exchange)
+
+        tickers = sesion.obtener_tickers(SYMBOLS)
+
+        assert set(tickers) == set(SYMBOLS)
+        exchange.fetch_tickers.assert_called_once_with(SYMBOLS)
+        assert sesion.peticiones == 1
+
+    def test_tickers_uno_a_uno_si_no_hay_fetch_tickers(self, exchange):
+        exchange.has = {'fetchTickers': False}
+        exchange.fetch_ticker.side_effect = lambda s: {'last': 1.0}
+        sesion = SesionExchange(exchange)
+
+        tickers = sesion.obtener_tickers(SYMBOLS)
+
+        assert len(tickers) == 3
+        assert exchange.fetch_ticker.call_count == 3
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+class TestEstadoCuenta:
+
+    @pytest.fixture
+    def cuenta(self, exchange):
+        exchange.fetch_balance.return_value = {
+            'USDT': {'free': 1000.0}, 'BTC': {'free': 0.0}, 'free': {'USDT': 1000.0, 'BTC': 0.0}}
+        reloj = RelojFalso()
+        return SesionExchange(exchange, ttl_mercados=3600, ttl_balance=60, reloj=reloj), reloj
+
+    def test_balance_en_cache_hasta_vencer(self, exchange, cuenta):
+        sesion, reloj = cuenta
+
+        assert sesion.saldo_libre('USDT') == 1000.0
+        reloj.t = 30
+        assert sesion.saldo_libre('USDT') == 1000.0
+        assert exchange.fetch_balance.call_count == 1
+
+        reloj.t = 61
+        sesion.saldo_libre('USDT')
+        assert exchange.fetch_balance.call_count == 2
+
+    def test_compra_ajusta_balance_sin_pedirlo(self, exchange, cuenta):
+        sesion, _ = cuenta
+        sesion.saldo_libre('USDT')
+
+        sesion.aplicar_orden('BTC/USDT', {'side': 'buy', 'filled': 0.01, 'cost': 500.0,
+                                          'fee': {'cost': 0.00001, 'currency': 'BTC'}})
+
+        assert sesion.saldo_libre('USDT') == pytest.approx(500.0)
+        assert sesion.saldo_libre('BTC') == pytest.approx(0.00999)
+        assert sesion.balance()['free']['USDT'] == pytest.approx(500.0)
+        assert exchange.fetch_balance.call_count == 1
+
+    def test_venta_sin_costo_usa_precio_promedio(self, exchange, cuenta):
+        sesion, _ = cuenta
+        sesion.saldo_libre('USDT')
+
+        sesion.aplicar_orden('ETH/USDT', {'side': 'sell', 'filled': 2.0, 'cost': None, 'average': 100.0})
+
+        assert sesion.saldo_libre('USDT') == pytest.approx(1200.0)
+        assert sesion.saldo_libre('ETH') == pytest.approx(-2.0)
+
+    def test_orden_incompleta_invalida_balance(self, exchange, cuenta):
+        sesion, _ = cuenta
+        sesion.saldo_libre('USDT')
+
+        sesion.aplicar_orden('BTC/USDT', {'side': 'buy', 'filled': None})
+        sesion.saldo_libre('USDT')
+
+        assert exchange.fetch_balance.call_count == 2
+
+    def test_balance_devuelto_no_cambia_al_aplicar_orden(self, cuenta):
+        sesion, _ = cuenta
+        anterior = sesion.balance()
+
+        sesion.aplicar_orden('BTC/USDT', {'side': 'buy', 'filled': 0.01, 'cost': 500.0})
+
+        assert anterior['USDT']['free'] == 1000.0
+
+    def test_mercados_se_recargan_al_vencer(self, exchange, cuenta):
+        sesion, reloj = cuenta
+        sesion.mercado('BTC/USDT')
+        reloj.t = 1800
+        sesion.mercado('BTC/USDT')
+        assert exchange.load_markets.call_count == 1
+
+        reloj.t = 3601
+        sesion.mercado('BTC/USDT')
+        assert exchange.load_markets.call_count == 2
+        exchange.load_markets.assert_called_with(True)
+
+    def test_recarga_fallida_conserva_mercados(self, exchange, cuenta):
+        sesion, reloj = cuenta
+        sesion.cargar_mercados()
+        exchange.load_markets.side_effect = Exception("timeout")
+
+        reloj.t = 3601
+        assert sesion.mercado('ETH/USDT')['symbol'] == 'ETH/USDT'
+        # No se reintenta en cada llamada: la próxima recarga es en otro intervalo
+        sesion.mercado('ETH/USDT')
+        assert exchange.load_markets.call_count == 2
+
+    def test_precision_carga_mercados_antes(self, exchange, cuenta):
+        sesion, _ = cuenta
+        exchange.amount_to_precision.return_value = '0.001'
+
+        assert sesion.cantidad_a_precision('BTC/USDT', 0.00123) == '0.001'
+        assert exchange.load_markets.call_count == 1
+
+
+class TestMercadosMultiples:
+
+    def test_primera_carga_pide_ohlcv_por_par(self, exchange):
+        mercados = MercadosMultiples(SesionExchange(exchange), SYMBOLS)
+
+        recibidas = mercados.actualizar(ahora_ms=T0 + 99 * TF_MS + 1000)
+
+        assert recibidas == {s: 100 for s in SYMBOLS}
+        assert exchange.fetch_ohlcv.call_count == 3
+        exchange.fetch_tickers.assert_not_called()
+
+    def test_ciclo_dentro_de_la_vela_usa_solo_tickers(self, exchange):
+        """Mientras la vela sigue abierta basta una petición de tickers para todos los pares"""
+        mercados = MercadosMultiples(SesionExchange(exchange), SYMBOLS)
+        mercados.actualizar(ahora_ms=T0 + 99 * TF_MS + 1000)
+
+        recibidas = mercados.actualizar(ahora_ms=T0 + 99 * TF_MS + 5000)
+
+        assert recibidas == {s: 0 for s in SYMBOLS}
+        assert exchange.fetch_ohlcv.call_count == 3
+        assert exchange.fetch_tickers.call_count == 1
+        for symbol in SYMBOLS:
+            assert mercados[symbol].velas.velas[-1][4] == 101.0
+            assert mercados[symbol].indicadores.ultimos()['EMA'] > 100.0
+
+    def test_vela_nueva_pide_ohlcv(self, exchange):
+        mercados = MercadosMultiples(SesionExchange(exchange), SYMBOLS)
+        mercados.actualizar(ahora_ms=T0 + 99 * TF_MS + 1000)
+        exchange.fetch_ohlcv.side_effect = lambda symbol, **kw: velas(2, desde=99)
+
+        recibidas = mercados.actualizar(ahora_ms=T0 + 100 * TF_MS + 1000)
+
+        assert recibidas == {s: 2 for s in SYMBOLS}
+        assert mercados['ETH/USDT'].velas.ultimo_ts == T0 + 100 * TF_MS
+
+    def test_precarga_desde_la_base(self, exchange, tmp_path):
+        """Arranque en caliente: velas e indicadores desde la base, sin pedir OHLCV"""
+        with Database(str(tmp_path / "argos_test.db")) as db:
+            db.guardar_velas('BTC/USDT', '15m', velas(100))
+            mercados = MercadosMultiples(SesionExchange(exchange), SYMBOLS, limite=100)
+
+            precargadas = mercados.precargar(db)
+
+        assert precargadas == {'BTC/USDT': 100, 'ETH/USDT': 0, 'SOL/USDT': 0}
+        assert mercados['BTC/USDT'].indicadores.ultimos()['EMA'] == pytest.approx(100.0)
+        exchange.fetch_ohlcv.assert_not_called()
+
+    def test_error_en_un_par_no_afecta_a_los_demas(self, exchange):
+        def fetch_ohlcv(symbol, **kw):
+            if symbol == 'ETH/USDT':
+                raise Exception("timeout")
+            return velas(100)
+        exchange.fetch_ohlcv.side_effect = fetch_ohlcv
+        mercados = MercadosMultiples(SesionExchange(exchange), SYMBOLS)
+
+        recibidas = mercados.actualizar(ahora_ms=T0 + 99 * TF_MS + 1000)
+
+        assert recibidas == {'BTC/USDT': 100, 'SOL/USDT': 100}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
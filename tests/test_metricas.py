@@ -0,0 +1,158 @@
+"""
+Tests para las métricas incrementales (comparadas con el recálculo completo)
+"""
+import math
+import random
+from datetime import datetime, timedelta
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import Database
+from metricas import MetricasPerformance
+import metricas_incrementales as mi
+
+
+def trades_aleatorios(n, semilla=5, dias=20):
+    """Trades cerrados en los últimos `dias` días, en orden de venta"""
+    rnd = random.Random(semilla)
+    inicio = datetime.now() - timedelta(days=dias)
+    trades = []
+    for i in range(n):
+        venta = inicio + timedelta(minutes=int(i * dias * 24 * 60 / n))
+        pnl_pct = rnd.gauss(0.2, 1.5)
+        precio_compra = 90000.0
+        trades.append({
+            'timestamp_compra': (venta - timedelta(minutes=30)).isoformat(),
+            'timestamp_venta': venta.isoformat(),
+            'precio_compra': precio_compra,
+            'precio_venta': precio_compra * (1 + pnl_pct / 100),
+            'cantidad': 0.01,
+            'pnl_usd': precio_compra * 0.01 * pnl_pct / 100 * 10,
+            'pnl_pct': pnl_pct,
+            'razon_salida': 'TP' if pnl_pct > 0 else 'SL',
+            'max_precio': precio_compra * (1 + abs(pnl_pct) / 100) if i % 3 else None,
+            'duracion_minutos': 30,
+        })
+    return trades
+
+
+def referencia(trades):
+    """Recálculo completo sobre la lista de trades (como las consultas originales)"""
+    retornos = [t['pnl_pct'] / 100 for t in trades]
+    media = sum(retornos) / len(retornos)
+    desviacion = math.sqrt(sum((r - media) ** 2 for r in retornos) / (len(retornos) - 1))
+    capital = pico = mi.CAPITAL_INICIAL
+    max_dd = 0.0
+    for t in trades:
+        capital += t['pnl_usd']
+        pico = max(pico, capital)
+        max_dd = max(max_dd, (pico - capital) / pico * 100)
+    ganancias = sum(t['pnl_usd'] for t in trades if t['pnl_usd'] > 0)
+    perdidas = sum(t['pnl_usd'] for t in trades if t['pnl_usd'] <= 0)
+    return {'media': media, 'desviacion': desviacion, 'max_dd': max_dd,
+            'ganancias': ganancias, 'perdidas': perdidas}
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / "argos_test.db")) as db:
+        yield db
+
+
+class TestAcumulador:
+
+    def test_igual_al_recalculo_completo(self, db):
+        trades = trades_aleatorios(300)
+        for trade in trades:
+            db.guardar_trade(trade)
+
+        total = db.obtener_metricas_acumuladas()
+        esperado = referencia(trades)
+
+        assert total['trades'] == 300
+        assert total['media_retorno'] == pytest.approx(esperado['media'])
+        assert mi.desviacion_retornos(total) == pytest.approx(esperado['desviacion'])
+        assert total['max_drawdown'] == pytest.approx(esperado['max_dd'])
+        assert total['suma_ganancias'] == pytest.approx(esperado['ganancias'])
+        assert total['suma_perdidas'] == pytest.approx(esperado['perdidas'])
+
+    def test_combinar_tramos_diarios_igual_al_total(self, db):
+        db.guardar_trades(trades_aleatorios(200))
+
+        combinado = mi.combinar(db.obtener_tramos_metricas()[::-1])
+        total = db.obtener_metricas_acumuladas()
+
+        for campo in ('trades', 'ganadoras', 'suma_ganancias', 'media_retorno', 'm2_retorno', 'max_drawdown'):
+            assert combinado[campo] == pytest.approx(total[campo])
+
+    def test_periodo_solo_suma_los_dias_del_periodo(self, db):
+        trades = trades_aleatorios(200, dias=20)
+        db.guardar_trades(trades)
+        desde = (datetime.now() - timedelta(days=5)).strftime("%Y-%m-%d")
+
+        resumen = db.obtener_metricas_acumuladas(desde)
+
+        del_periodo = [t for t in trades if t['timestamp_venta'][:10] >= desde]
+        assert resumen['trades'] == len(del_periodo)
+        assert resumen['media_retorno'] == pytest.approx(referencia(del_periodo)['media'])
+
+    def test_trade_fuera_de_orden_reconstruye(self, db):
+        trades = trades_aleatorios(50)
+        for trade in trades[25:] + trades[:25]:
+            db.guardar_trade(trade)
+
+        total = db.obtener_metricas_acumuladas()
+
+        assert total['trades'] == 50
+        assert total['max_drawdown'] == pytest.approx(referencia(trades)['max_dd'])
+
+    def test_base_anterior_se_reconstruye_al_abrir(self, tmp_path):
+        ruta = str(tmp_path / "argos_test.db")
+        with Database(ruta) as db:
+            db.guardar_trades(trades_aleatorios(30))
+            db.conn.execute("DELETE FROM metricas_acumuladas")
+            db.conn.commit()
+
+        with Database(ruta) as db:
+            assert db.obtener_metricas_acumuladas()['trades'] == 30
+
+
+class TestReporte:
+
+    def test_reporte_desde_el_acumulado(self, db):
+        trades = trades_aleatorios(120)
+        db.guardar_trades(trades)
+        esperado = referencia(trades)
+
+        reporte = MetricasPerformance(db).generar_reporte_completo(periodo_dias=30)
+
+        sharpe = esperado['media'] / esperado['desviacion'] * math.sqrt(252 / 30)
+        assert reporte['sharpe_ratio'] == round(sharpe, 2)
+        assert reporte['max_drawdown_pct'] == round(esperado['max_dd'], 2)
+        assert reporte['profit_factor'] == round(esperado['ganancias'] / abs(esperado['perdidas']), 2)
+        assert reporte['total_trades'] == 120
+        assert reporte['pnl_total'] == pytest.approx(esperado['ganancias'] + esperado['perdidas'])
+        assert reporte['duracion_promedio_min'] == 30
+
+    def test_win_rate_por_periodo(self, db):
+        db.guardar_trades(trades_aleatorios(100))
+
+        diario = MetricasPerformance(db).calcular_win_rate_por_periodo("diario")
+
+        assert sum(d['total'] for d in diario) == 100
+        assert all(d['ganadoras'] + d['perdedoras'] == d['total'] for d in diario)
+
+    def test_retornos_identicos_sin_sharpe(self, db):
+        for i in range(10):
+            db.guardar_trade({**trades_aleatorios(1)[0], 'pnl_pct': 1.11, 'pnl_usd': 10.0,
+                              'timestamp_compra': f'x{i}',
+                              'timestamp_venta': (datetime.now() - timedelta(hours=10 - i)).isoformat()})
+
+        assert MetricasPerformance(db).calcular_sharpe_ratio(30) == 0.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
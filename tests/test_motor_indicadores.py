@@ -0,0 +1,158 @@
+"""
+Tests para el motor incremental de indicadores (RSI, Bollinger, EMA)
+"""
+import math
+import random
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from indicadores import (
+    MotorIndicadores, RSIIncremental, BollingerIncremental, EMAIncremental, calcular_series
+)
+
+BBL, BBM, BBU = 'BBL_20_2.0', 'BBM_20_2.0', 'BBU_20_2.0'
+
+
+def serie_precios(n, semilla=7, redondear=True):
+    """Random walk de precios estilo BTC"""
+    rnd = random.Random(semilla)
+    precio = 90000.0
+    precios = []
+    for _ in range(n):
+        precio *= 1 + rnd.gauss(0, 0.003)
+        precios.append(round(precio, 2) if redondear else precio)
+    return precios
+
+
+def referencia_pandas(cierres):
+    """Mismas fórmulas que pandas_ta (rsi, bbands ddof=0, ema con SMA inicial)"""
+    close = pd.Series(cierres, dtype=float)
+    negativo = close.diff(1)
+    positivo = negativo.copy()
+    positivo[positivo < 0] = 0
+    negativo[negativo > 0] = 0
+    pos_avg = positivo.ewm(alpha=1 / 14, min_periods=14).mean()
+    neg_avg = negativo.ewm(alpha=1 / 14, min_periods=14).mean()
+    rsi = 100 * pos_avg / (pos_avg + neg_avg.abs())
+
+    mid = close.rolling(20, min_periods=20).mean()
+    desvio = 2.0 * close.rolling(20, min_periods=20).var(0).apply(np.sqrt)
+
+    con_sma = close.copy()
+    sma = con_sma[0:20].mean()
+    con_sma[:19] = np.nan
+    con_sma.iloc[19] = sma
+    ema = con_sma.ewm(span=20, adjust=False).mean()
+
+    return {'RSI': rsi, BBL: mid - desvio, BBM: mid, BBU: mid + desvio, 'EMA': ema}
+
+
+class TestCompatibilidad:
+    """El motor debe reproducir exactamente los valores de la serie completa"""
+
+    @pytest.mark.parametrize("redondear", [True, False])
+    def test_igual_a_formulas_pandas(self, redondear):
+        cierres = serie_precios(500, redondear=redondear)
+        series = calcular_series(cierres)
+        esperado = referencia_pandas(cierres)
+
+        for nombre, valores in esperado.items():
+            assert np.array_equal(np.array(series[nombre]), valores.values, equal_nan=True), nombre
+
+    def test_serie_constante(self):
+        """Precio plano: desviación 0 y RSI indefinido, como en pandas"""
+        series = calcular_series([100.0] * 60)
+
+        assert series[BBL][-1] == series[BBU][-1] == 100.0
+        assert math.isnan(series['RSI'][-1])
+        assert series['EMA'][-1] == 100.0
+
+    def test_igual_a_pandas_ta(self):
+        """Comparación directa contra pandas_ta si está instalado"""
+        ta = pytest.importorskip("pandas_ta")
+        close = pd.Series(serie_precios(500), dtype=float)
+        series = calcular_series(close.tolist())
+        bbands = ta.bbands(close, length=20, std=2)
+
+        assert np.allclose(series['RSI'], ta.rsi(close, length=14), rtol=0, atol=1e-9, equal_nan=True)
+        assert np.allclose(series['EMA'], ta.ema(close, length=20), rtol=0, atol=1e-9, equal_nan=True)
+        for columna in (BBL, BBM, BBU):
+            assert np.allclose(series[columna], bbands[columna], rtol=0, atol=1e-9, equal_nan=True)
+
+
+class TestActualizacionIncremental:
+
+    def test_valores_insuficientes_son_nan(self):
+        rsi, bb, ema = RSIIncremental(14), BollingerIncremental(20, 2), EMAIncremental(20)
+        for precio in serie_precios(10):
+            assert math.isnan(rsi.actualizar(precio))
+            assert math.isnan(bb.actualizar(precio)[0])
+            assert math.isnan(ema.actualizar(precio))
+
+    def test_previsualizar_no_modifica_estado(self):
+        """La vela abierta se puede recalcular muchas veces sin alterar el estado"""
+        cierres = serie_precios(100)
+        motor = MotorIndicadores()
+        for cierre in cierres[:-1]:
+            motor.confirmar(cierre)
+
+        for precio in (89000.0, 91000.0, 90500.0):
+            motor.previsualizar(precio)
+        previsto = motor.previsualizar(cierres[-1])
+        motor.confirmar(cierres[-1])
+
+        esperado = calcular_series(cierres)
+        for nombre, valor in previsto.items():
+            assert valor == esperado[nombre][-1], nombre
+
+    def test_sincronizar_con_vela_abierta(self):
+        """Con velas OHLCV, la última se trata como abierta y se parchea en cada tick"""
+        tf = 15 * 60 * 1000
+        cierres = serie_precios(120)
+        velas = [[i * tf, c, c, c, c, 1.0] for i, c in enumerate(cierres)]
+        motor = MotorIndicadores()
+
+        motor.sincronizar(velas[:100], tf)
+        velas_tick = velas[:99] + [[99 * tf, 0, 0, 0, 90123.45, 1.0]]
+        motor.sincronizar(velas_tick, tf)
+        assert motor.ts_confirmado == 98 * tf
+
+        motor.sincronizar(velas, tf)
+
+        esperado = calcular_series(cierres)
+        columnas = motor.columnas(len(velas))
+        for nombre in esperado:
+            assert np.array_equal(np.array(columnas[nombre]), np.array(esperado[nombre]), equal_nan=True)
+        assert motor.ultimos()['RSI'] == esperado['RSI'][-1]
+
+    def test_sincronizar_resiembra_si_hay_hueco(self):
+        """Si faltan velas entre lo confirmado y lo recibido, se vuelve a sembrar"""
+        tf = 15 * 60 * 1000
+        cierres = serie_precios(200)
+        velas = [[i * tf, c, c, c, c, 1.0] for i, c in enumerate(cierres)]
+        motor = MotorIndicadores()
+
+        motor.sincronizar(velas[:50], tf)
+        motor.sincronizar(velas[100:], tf)
+
+        esperado = calcular_series(cierres[100:])
+        assert motor.ultimos()['EMA'] == esperado['EMA'][-1]
+
+    def test_columnas_rellena_con_nan(self):
+        motor = MotorIndicadores()
+        for cierre in serie_precios(30):
+            motor.confirmar(cierre)
+
+        columnas = motor.columnas(50)
+
+        assert len(columnas['RSI']) == 50
+        assert all(math.isnan(v) for v in columnas['RSI'][:20])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,167 @@
+"""
+Tests para el despachador de notificaciones de Telegram
+"""
+import threading
+import time
+import pytest
+import requests
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import notificaciones
+from notificaciones import DespachadorTelegram, ALTA, NORMAL, BAJA
+
+
+class Respuesta:
+    def __init__(self, status_code=200, datos=None):
+        self.status_code = status_code
+        self._datos = datos or {'ok': status_code == 200}
+        self.text = str(self._datos)
+
+    def json(self):
+        return self._datos
+
+
+class SesionFalsa:
+    """Sesión HTTP de prueba: registra los envíos y responde según `respuestas`"""
+
+    def __init__(self, respuestas=(), demora=0.0):
+        self.respuestas = list(respuestas)
+        self.demora = demora
+        self.envios = []
+        self.momentos = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def post(self, url, data=None, timeout=None):
+        self.liberar.wait(5)
+        time.sleep(self.demora)
+        self.envios.append(dict(data))
+        self.momentos.append(time.monotonic())
+        respuesta = self.respuestas.pop(0) if self.respuestas else Respuesta()
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+
+def despachador(sesion, **kwargs):
+    kwargs.setdefault('intervalo', 0.0)
+    return DespachadorTelegram("TOKEN", "42", sesion=sesion, dormir=lambda s: None, **kwargs)
+
+
+class TestDespachador:
+
+    def test_encolar_no_espera_a_telegram(self):
+        sesion = SesionFalsa(demora=2.0)
+        d = despachador(sesion)
+        d.iniciar()
+        try:
+            inicio = time.monotonic()
+            for i in range(20):
+                d.encolar(f"mensaje {i}")
+            assert time.monotonic() - inicio < 0.1
+        finally:
+            sesion.demora = 0
+            d.detener(timeout=3)
+
+    def test_rafaga_se_agrupa_en_un_resumen(self):
+        sesion = SesionFalsa()
+        sesion.liberar.clear()
+        d = despachador(sesion)
+        d.iniciar()
+        d.encolar("primero", "warning")
+        time.sleep(0.05)  # el primero ya está en vuelo
+        for _ in range(3):
+            d.encolar("SEÑAL OMITIDA", "warning")
+        d.encolar("otro aviso", "warning")
+        sesion.liberar.set()
+
+        assert d.vaciar(timeout=3)
+        d.detener()
+        assert len(sesion.envios) == 2
+        assert sesion.envios[1]['text'] == "⚠️ SEÑAL OMITIDA (x3)\n\n⚠️ otro aviso"
+
+    def test_respeta_el_intervalo_por_chat(self):
+        sesion = SesionFalsa()
+        d = despachador(sesion, intervalo=0.2)
+        d.iniciar()
+        for i in range(3):
+            d.encolar(f"m{i}", prioridad=[ALTA, NORMAL, BAJA][i])
+            time.sleep(0.01)
+
+        assert d.vaciar(timeout=3)
+        d.detener()
+        assert len(sesion.momentos) == 3
+        assert all(b - a >= 0.19 for a, b in zip(sesion.momentos, sesion.momentos[1:]))
+
+    def test_prioridad_alta_sale_primero(self):
+        sesion = SesionFalsa()
+        d = despachador(sesion)
+        d.encolar("heartbeat", prioridad=BAJA)
+        d.encolar("estado", prioridad=NORMAL)
+        d.encolar("STOP LOSS", "error", prioridad=ALTA)
+        d.iniciar()
+
+        assert d.vaciar(timeout=3)
+        d.detener()
+        assert [e['text'] for e in sesion.envios] == ["❌ STOP LOSS", "ℹ️ estado", "ℹ️ heartbeat"]
+
+    def test_cola_llena_descarta_baja_prioridad(self):
+        d = despachador(SesionFalsa(), max_cola=3)
+        d.encolar("hb1", prioridad=BAJA)
+        d.encolar("hb2", prioridad=BAJA)
+        d.encolar("info", prioridad=NORMAL)
+
+        assert d.encolar("trade", prioridad=ALTA)
+        assert not d.encolar("hb3", prioridad=BAJA)
+        assert [m.texto for m in d._cola] == ["hb1", "info", "trade"]
+        assert d.descartados == 2
+
+    def test_reintenta_con_backoff_y_retry_after(self):
+        esperas = []
+        sesion = SesionFalsa([requests.ConnectionError("caído"), Respuesta(502),
+                              Respuesta(429, {'ok': False, 'parameters': {'retry_after': 7}}), Respuesta()])
+        d = DespachadorTelegram("TOKEN", "42", sesion=sesion, dormir=esperas.append, intervalo=0)
+
+        assert d._enviar("42", "hola")
+        assert esperas == [1, 2, 7.0]
+        assert d.enviados == 1
+
+    def test_markdown_invalido_se_reenvia_como_texto(self):
+        sesion = SesionFalsa([Respuesta(400, {'ok': False, 'description': "can't parse entities"})])
+        d = despachador(sesion)
+
+        assert d._enviar("42", "precio_compra")
+        assert 'parse_mode' in sesion.envios[0] and 'parse_mode' not in sesion.envios[1]
+
+    def test_se_rinde_tras_los_reintentos(self):
+        sesion = SesionFalsa([Respuesta(500)] * 10)
+        d = despachador(sesion, reintentos=2)
+
+        assert not d._enviar("42", "hola")
+        assert len(sesion.envios) == 3
+        assert d.fallidos == 1
+
+
+class TestEnviarTelegram:
+
+    def test_sin_configurar_no_envia(self, monkeypatch, capsys):
+        monkeypatch.delenv('TELEGRAM_TOKEN', raising=False)
+        notificaciones.enviar_telegram("hola")
+
+        assert "no configurado" in capsys.readouterr().out
+
+    def test_errores_con_prioridad_alta(self, monkeypatch):
+        d = despachador(SesionFalsa())
+        monkeypatch.setattr(notificaciones, "obtener_despachador", lambda: d)
+
+        notificaciones.enviar_alerta_error("falló")
+        notificaciones.enviar_telegram("hola")
+
+        assert [(m.texto, m.prioridad) for m in d._cola] == [("falló", ALTA), ("hola", NORMAL)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
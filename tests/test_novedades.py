@@ -0,0 +1,203 @@
+"""
+Tests para las novedades del dashboard (SSE con cursor de reanudación)
+"""
+import asyncio
+import json
+import pytest
+import sys
+import os
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import novedades
+from conexiones import PoolLectura
+from database import Database
+from novedades import Cursor, FuenteNovedades, formatear_sse
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / "argos_test.db"), intervalo_flush=0) as db:
+        yield db
+
+
+@pytest.fixture
+def fuente(db):
+    pool = PoolLectura(db.db_file, tamano=1)
+    yield FuenteNovedades(pool)
+    pool.cerrar()
+
+
+def trade(i):
+    return {'timestamp_compra': f'2025-01-01T00:{i:02d}:00', 'timestamp_venta': f'2025-01-01T01:{i:02d}:00',
+            'precio_compra': 90000.0, 'precio_venta': 91000.0, 'cantidad': 0.01,
+            'pnl_usd': 10.0, 'pnl_pct': 1.11, 'razon_salida': 'TP'}
+
+
+def parsear(mensajes):
+    """[(evento, datos, id)] de una lista de mensajes SSE"""
+    salida = []
+    for mensaje in mensajes:
+        campos = dict(linea.split(": ", 1) for linea in mensaje.strip().split("\n"))
+        salida.append((campos["event"], json.loads(campos["data"]), campos.get("id")))
+    return salida
+
+
+class TestCursor:
+
+    def test_ida_y_vuelta(self):
+        cursor = Cursor(12, 3, '2025-01-01T10:00:00.123', '2025-01-01T10:00:01')
+
+        assert Cursor.desde_texto(str(cursor)) == cursor
+
+    @pytest.mark.parametrize("texto", [None, "", "basura", "a|b|c|d"])
+    def test_invalido(self, texto):
+        assert Cursor.desde_texto(texto) is None
+
+    def test_ida_y_vuelta_con_velas(self):
+        cursor = Cursor(1, 2, '', '', (('BTC/USDT', '15m', 1735689600000, 90100.5),
+                                       ('ETH/USDT', '15m', 1735689600000, 3300.0)))
+
+        assert Cursor.desde_texto(str(cursor)) == cursor
+
+    def test_cursor_sin_velas_de_versiones_anteriores(self):
+        assert Cursor.desde_texto("5|2||") == Cursor(5, 2)
+
+    def test_formato_sse(self):
+        assert formatear_sse("ticks", [1], "5|0||") == 'event: ticks\nid: 5|0||\ndata: [1]\n\n'
+
+
+class TestLeer:
+
+    def test_solo_lo_posterior_al_cursor(self, db, fuente):
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+        cursor = fuente.cursor_actual()
+        db.guardar_precio('2025-01-01T00:01:00', 90100.0)
+        db.guardar_trade(trade(1))
+
+        eventos, nuevo = fuente.leer(cursor)
+
+        tipos = dict(eventos)
+        assert [t['close'] for t in tipos['ticks']] == [90100.0]
+        assert tipos['ticks'][0]['time'] == int(datetime.fromisoformat('2025-01-01T00:01:00').timestamp())
+        assert len(tipos['trades']) == 1
+        assert nuevo.precio == cursor.precio + 1
+        assert fuente.leer(nuevo)[0] == []
+
+    def test_ticks_en_hora_local_como_el_historial(self, db, fuente, monkeypatch):
+        """El time de un tick es el mismo epoch que el de /api/history para esa fila"""
+        monkeypatch.setenv('TZ', 'America/Argentina/Buenos_Aires')
+        time.tzset()
+        try:
+            cursor = fuente.cursor_actual()
+            db.guardar_precio('2026-01-01T12:00:00', 90000.0)
+
+            ticks = dict(fuente.leer(cursor)[0])['ticks']
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+        assert ticks[0]['time'] == 1767279600
+
+    def test_cambios_de_estado(self, db, fuente):
+        cursor = fuente.cursor_actual()
+        estado = db.cargar_estado_simbolo('BTC/USDT')
+        estado['posicion_abierta'] = True
+        db.guardar_estado_simbolo('BTC/USDT', estado)
+
+        eventos, nuevo = fuente.leer(cursor)
+
+        pares = dict(eventos)['pares']
+        assert pares[0]['symbol'] == 'BTC/USDT' and pares[0]['posicion_abierta'] == 1
+        assert fuente.leer(nuevo)[0] == []
+
+    def test_velas_nuevas_y_vela_abierta(self, db, fuente):
+        t0 = 1735689600000
+        db.guardar_velas('BTC/USDT', '15m', [[t0, 100.0, 101.0, 99.0, 100.5, 1.0]])
+        db.flush()
+        cursor = fuente.cursor_actual()
+        assert fuente.leer(cursor)[0] == []
+
+        # La vela abierta se reescribe y cierra; llega la siguiente
+        db.guardar_velas('BTC/USDT', '15m', [[t0, 100.0, 102.0, 99.0, 101.5, 2.0],
+                                             [t0 + 900000, 101.5, 101.5, 101.0, 101.2, 0.5]])
+        db.flush()
+        eventos, nuevo = fuente.leer(cursor)
+
+        velas = dict(eventos)['velas']
+        assert [(v['time'], v['close']) for v in velas] == [(t0 // 1000, 101.5), (t0 // 1000 + 900, 101.2)]
+        assert fuente.leer(nuevo)[0] == []
+
+    def test_par_nuevo_empieza_en_su_ultima_vela(self, db, fuente):
+        cursor = fuente.cursor_actual()
+        db.guardar_velas('ETH/USDT', '15m', [[1735689600000 + i * 900000, 1.0, 1.0, 1.0, 1.0, 1.0]
+                                             for i in range(3)])
+        db.flush()
+
+        velas = dict(fuente.leer(cursor)[0])['velas']
+
+        assert [(v['symbol'], v['time']) for v in velas] == [('ETH/USDT', 1735689600 + 1800)]
+
+    def test_cliente_muy_atrasado_recarga(self, db, fuente, monkeypatch):
+        monkeypatch.setattr(novedades, 'LIMITE_TICKS', 5)
+        cursor = fuente.cursor_actual()
+        db.guardar_precios([(f'2025-01-01T00:{i:02d}:00', 90000.0 + i, None) for i in range(10)])
+
+        eventos, nuevo = fuente.leer(cursor)
+
+        assert eventos == [('reset', {})]
+        assert nuevo == fuente.cursor_actual()
+
+
+class TestTransmitir:
+
+    def recibir(self, fuente, cursor, cantidad, escribir=None):
+        """Primeros `cantidad` mensajes del flujo; `escribir` corre tras el primero"""
+        async def correr():
+            mensajes = []
+            flujo = fuente.transmitir(cursor, intervalo=0.01)
+            async for mensaje in flujo:
+                mensajes.append(mensaje)
+                if escribir and len(mensajes) == 1:
+                    await asyncio.to_thread(escribir)
+                if len(mensajes) == cantidad:
+                    break
+            await flujo.aclose()
+            return mensajes
+        return parsear(asyncio.run(asyncio.wait_for(correr(), timeout=5)))
+
+    def test_conexion_nueva_recibe_cursor_y_despues_lo_nuevo(self, db, fuente):
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+
+        mensajes = self.recibir(fuente, None, 2,
+                                escribir=lambda: db.guardar_precio('2025-01-01T00:01:00', 90100.0))
+
+        (evento, datos, id_cursor), (evento_tick, ticks, id_tick) = mensajes
+        assert evento == 'cursor' and datos['cursor'] == id_cursor
+        assert evento_tick == 'ticks' and [t['close'] for t in ticks] == [90100.0]
+        assert Cursor.desde_texto(id_tick).precio == Cursor.desde_texto(id_cursor).precio + 1
+
+    def test_reanudar_reenvia_lo_perdido(self, db, fuente):
+        db.guardar_precio('2025-01-01T00:00:00', 90000.0)
+        cursor = fuente.cursor_actual()
+        # Mientras el cliente estaba desconectado
+        db.guardar_precio('2025-01-01T00:01:00', 90100.0)
+        db.guardar_trade(trade(1))
+
+        mensajes = self.recibir(fuente, cursor, 2)
+
+        assert [m[0] for m in mensajes] == ['ticks', 'trades']
+
+    def test_se_detiene_al_desconectar(self, fuente):
+        async def correr():
+            async def desconectado():
+                return True
+            return [m async for m in fuente.transmitir(Cursor(), desconectado=desconectado)]
+
+        assert asyncio.run(correr()) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
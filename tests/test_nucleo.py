@@ -0,0 +1,197 @@
+"""
+Tests para el núcleo asíncrono (tareas de mercado, estrategia, órdenes, comandos y mantenimiento)
+"""
+import asyncio
+import threading
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from nucleo import NucleoAsync
+
+
+def ejecutar_hasta(nucleo, condicion, timeout=3.0):
+    """Corre el núcleo hasta que `condicion()` sea verdadera (o se agote el tiempo)"""
+    async def principal():
+        tarea = asyncio.create_task(nucleo.ejecutar_tareas())
+        limite = time.monotonic() + timeout
+        while not condicion() and time.monotonic() < limite:
+            await asyncio.sleep(0.01)
+        tarea.cancel()
+        try:
+            await tarea
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(principal())
+    return condicion()
+
+
+class TestNucleo:
+
+    def test_una_orden_a_la_vez(self):
+        """Mientras una orden está en curso, las señales nuevas se ignoran"""
+        aceptadas = []
+        liberar = threading.Event()
+        evaluaciones = []
+
+        def ejecutar(orden):
+            aceptadas.append(orden)
+            liberar.wait(2)
+
+        def evaluar(snap):
+            evaluaciones.append(snap)
+            return [{'tipo': 'COMPRA'}, {'tipo': 'COMPRA'}]
+
+        nucleo = NucleoAsync(
+            obtener_mercado=lambda: 1,
+            evaluar=evaluar,
+            ejecutar=ejecutar,
+            intervalo_mercado=0.01,
+        )
+
+        en_curso = []
+
+        def condicion():
+            # Varias evaluaciones con la primera orden todavía ejecutándose
+            if aceptadas and len(evaluaciones) >= 3 and not en_curso:
+                en_curso.append((len(aceptadas), nucleo.cola_ordenes.empty()))
+                liberar.set()
+            return bool(en_curso)
+
+        try:
+            assert ejecutar_hasta(nucleo, condicion)
+        finally:
+            liberar.set()
+        assert en_curso == [(1, True)]
+
+    def test_ordenes_de_varios_pares_en_un_snapshot(self):
+        """Una orden en curso de un par no bloquea las de los demás"""
+        ejecutadas = []
+        nucleo = NucleoAsync(
+            obtener_mercado=lambda: 1,
+            evaluar=lambda snap: [{'tipo': 'VENTA', 'symbol': 'A'}, {'tipo': 'VENTA', 'symbol': 'B'},
+                                  {'tipo': 'VENTA', 'symbol': 'A'}],
+            ejecutar=ejecutadas.append,
+            intervalo_mercado=10,
+        )
+
+        assert ejecutar_hasta(nucleo, lambda: len(ejecutadas) == 2)
+        assert [o['symbol'] for o in ejecutadas] == ['A', 'B']
+        assert not nucleo.en_curso
+
+    def test_mercado_sin_datos_reintenta(self):
+        llamadas = []
+
+        def obtener():
+            llamadas.append(1)
+            return None if len(llamadas) < 3 else 'snapshot'
+
+        evaluados = []
+        nucleo = NucleoAsync(
+            obtener_mercado=obtener,
+            evaluar=lambda snap: evaluados.append(snap) or [],
+            ejecutar=lambda orden: None,
+            reintento_mercado=0.01,
+        )
+
+        assert ejecutar_hasta(nucleo, lambda: evaluados == ['snapshot'])
+
+    def test_comandos_generan_ordenes(self):
+        ejecutadas = []
+        lotes = [['/vender']]
+        nucleo = NucleoAsync(
+            obtener_mercado=lambda: 'snap',
+            evaluar=lambda snap: [],
+            ejecutar=ejecutadas.append,
+            leer_comandos=lambda: lotes.pop() if lotes else [],
+            atender_comando=lambda cmd, snap: [{'tipo': 'VENTA', 'razon': cmd}] if cmd == '/vender' else [],
+            pausa_comandos=0.01,
+        )
+
+        assert ejecutar_hasta(nucleo, lambda: ejecutadas == [{'tipo': 'VENTA', 'razon': '/vender'}])
+
+    def test_comando_recibido_desde_otro_hilo(self):
+        """Un comando del long polling se atiende sin esperar a pausa_comandos"""
+        ejecutadas = []
+        nucleo = NucleoAsync(
+            obtener_mercado=lambda: 'snap',
+            evaluar=lambda snap: [],
+            ejecutar=ejecutadas.append,
+            atender_comando=lambda cmd, snap: [{'tipo': 'VENTA', 'razon': cmd}],
+        )
+        nucleo.recibir_comando('/vender')  # antes de iniciar: se atiende al arrancar
+        hilos = []
+
+        def condicion():
+            if len(ejecutadas) == 1 and not nucleo.en_curso and not hilos:
+                hilos.append(threading.Thread(target=nucleo.recibir_comando, args=('/vender btc/usdt',)))
+                hilos[0].start()
+            return len(ejecutadas) == 2
+
+        assert ejecutar_hasta(nucleo, condicion, timeout=1.0)
+        assert [o['razon'] for o in ejecutadas] == ['/vender', '/vender btc/usdt']
+
+    def test_feed_caido_usa_precios_rest(self):
+        """Sin datos del WebSocket las salidas se evalúan con precios REST, y al volver se usa el feed"""
+        class FeedFalso:
+            activo = False
+
+            def esperar_precios(self, timeout):
+                time.sleep(0.01)
+                return {'BTC/USDT': 2.0}
+
+        feed = FeedFalso()
+        evaluados = []
+
+        def evaluar_precio(symbol, precio):
+            evaluados.append(precio)
+            if len(evaluados) == 2:
+                feed.activo = True  # el WebSocket se reconecta
+            return []
+
+        nucleo = NucleoAsync(
+            obtener_mercado=lambda: None,
+            evaluar=lambda snap: [],
+            ejecutar=lambda orden: None,
+            feed=feed,
+            evaluar_precio=evaluar_precio,
+            obtener_precios=lambda: {'BTC/USDT': 1.0},
+            intervalo_precios_rest=0.01,
+            reintento_mercado=10,
+        )
+
+        assert ejecutar_hasta(nucleo, lambda: 2.0 in evaluados)
+        assert evaluados[:2] == [1.0, 1.0]
+
+    def test_mantenimiento_lento_no_frena_el_loop(self):
+        """El mantenimiento corre en un hilo: mientras tanto se siguen evaluando snapshots"""
+        liberar = threading.Event()
+        evaluados = []
+        nucleo = NucleoAsync(
+            obtener_mercado=lambda: 1,
+            evaluar=lambda snap: evaluados.append(snap) or [],
+            ejecutar=lambda orden: None,
+            mantenimiento=lambda: liberar.wait(2),
+            intervalo_mercado=0.01,
+        )
+
+        listo = []
+
+        def condicion():
+            if len(evaluados) >= 3 and not listo:
+                listo.append(True)
+                liberar.set()
+            return bool(listo)
+
+        try:
+            assert ejecutar_hasta(nucleo, condicion)
+        finally:
+            liberar.set()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,119 @@
+"""
+Tests para la optimización en paralelo con memoria compartida
+"""
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import optimize
+from indicadores import calcular_series
+
+
+def dataframe_sintetico(n, semilla=4):
+    """Columnas que usa optimize.py, con indicadores aleatorios cerca del precio"""
+    rnd = np.random.default_rng(semilla)
+    cierres = np.round(90000.0 * np.cumprod(1 + rnd.normal(0, 0.006, n)), 2)
+    return pd.DataFrame({
+        'close': cierres,
+        'RSI': rnd.uniform(0, 100, n),
+        'BB_LOWER': cierres * (1 + rnd.uniform(-0.01, 0.01, n)),
+        'EMA_20': cierres * (1 + rnd.uniform(-0.01, 0.01, n)),
+    })
+
+
+def backtest_original(df, params):
+    """Loop original de optimize.backtest_strategy (referencia)"""
+    rsi_limit, sl, tp, trailing = params
+    saldo = 1000.0
+    posicion = None
+    returns = []
+    for row in df.to_dict('records'):
+        price = row['close']
+        if posicion is None:
+            if row['RSI'] < rsi_limit and price < row['BB_LOWER'] and price > row['EMA_20']:
+                posicion = {'precio': price, 'max_price': price}
+        else:
+            precio_entrada = posicion['precio']
+            if price > posicion['max_price']:
+                posicion['max_price'] = price
+            stop_price = posicion['max_price'] * (1 - trailing)
+            sl_price = precio_entrada * (1 - sl)
+            exit_price = None
+            if price <= stop_price:
+                exit_price = stop_price if price > stop_price else price
+            elif price <= sl_price:
+                exit_price = sl_price if price > sl_price else price
+            elif price >= precio_entrada * (1 + tp):
+                exit_price = precio_entrada * (1 + tp)
+            if exit_price:
+                pnl = (exit_price - precio_entrada) / precio_entrada
+                saldo += saldo * pnl
+                returns.append(pnl)
+                posicion = None
+    return saldo, returns
+
+
+@pytest.fixture
+def datos_compartidos():
+    df = dataframe_sintetico(2000)
+    shm, descriptor = optimize.publicar_datos(df)
+    optimize.iniciar_worker(descriptor)
+    yield df
+    optimize._SHM.close()
+    shm.close()
+    shm.unlink()
+
+
+class TestMemoriaCompartida:
+
+    @pytest.mark.parametrize("params", [(35, 0.01, 0.02, 0.005), (25, 0.03, 0.04, 0.02), (40, 0.05, 0.15, 0.01)])
+    def test_igual_al_loop_original(self, datos_compartidos, params):
+        saldo, returns = backtest_original(datos_compartidos, params)
+
+        resultado = optimize.backtest_strategy(params)
+
+        assert resultado['Trades'] == len(returns) > 0
+        assert resultado['Saldo Final'] == saldo
+        s_returns = pd.Series(returns)
+        assert resultado['Sharpe'] == pytest.approx(s_returns.mean() / s_returns.std() * len(returns) ** 0.5)
+
+    def test_worker_ve_los_datos_sin_copia(self, datos_compartidos):
+        assert np.array_equal(optimize._DATOS['close'], datos_compartidos['close'].to_numpy())
+        assert not optimize._DATOS['close'].flags['OWNDATA']
+
+    def test_optimizar_con_pool(self):
+        """Los workers reciben solo tuplas de parámetros; el bloque se libera al terminar"""
+        df = dataframe_sintetico(1000)
+        combinaciones = [(35, 0.01, tp, 0.005) for tp in (0.02, 0.04, 0.06)]
+
+        resultados = optimize.optimizar(df, combinaciones, procesos=2)
+
+        assert [r['TP'] for r in resultados] == [0.02, 0.04, 0.06]
+        for params, r in zip(combinaciones, resultados):
+            assert r['Saldo Final'] == backtest_original(df, params)[0]
+
+
+class TestDatos:
+
+    def test_sin_pandas_ta_usa_el_motor_del_bot(self, monkeypatch):
+        """Sin pandas_ta, get_data calcula las columnas de la estrategia con indicadores.calcular_series"""
+        velas = dataframe_sintetico(300)[['close']]
+        monkeypatch.setattr(optimize, 'HAS_CCXT', False)
+        monkeypatch.setattr(optimize, 'HAS_PANDAS_TA', False)
+        monkeypatch.setattr(optimize, 'cargar_historico', lambda *args, **kwargs: velas.copy())
+
+        df = optimize.get_data()
+
+        esperado = pd.DataFrame(calcular_series(velas['close'])).dropna()
+        assert len(df) == len(esperado) > 0
+        assert np.array_equal(df['RSI'].to_numpy(), esperado['RSI'].to_numpy())
+        assert np.array_equal(df['EMA_20'].to_numpy(), esperado['EMA'].to_numpy())
+        assert np.array_equal(df['BB_LOWER'].to_numpy(), esperado['BBL_20_2.0'].to_numpy())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,159 @@
+"""
+Tests para la retención de precios/señales y los agregados de 1m/1h
+"""
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import Database
+import retencion
+
+AHORA = datetime(2025, 1, 20, 12, 0, 15)
+
+
+def ticks(desde, hasta, cada_seg=60):
+    """(timestamp, precio, volumen) cada `cada_seg` segundos con precio oscilante"""
+    filas = []
+    momento = desde
+    while momento < hasta:
+        i = len(filas)
+        filas.append((momento.isoformat(), 100 + 10 * math.sin(i / 50) + i * 0.001, 1.0))
+        momento += timedelta(seconds=cada_seg)
+    return filas
+
+
+def senales(desde, hasta, cada_seg=300):
+    filas = []
+    momento = desde
+    while momento < hasta:
+        filas.append({'timestamp': momento.isoformat(), 'tipo': 'CHECK_ENTRADA', 'precio': 100.0,
+                      'rsi': 40.0, 'posicion_abierta': False})
+        momento += timedelta(seconds=cada_seg)
+    return filas
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / "argos_test.db"), retencion_dias=2, retencion_1m_dias=5) as db:
+        with db.transaccion():
+            db.guardar_precios(ticks(AHORA - timedelta(days=10), AHORA))
+            db.guardar_senales(senales(AHORA - timedelta(days=10), AHORA))
+        yield db
+
+
+def contar(db, tabla, donde="1"):
+    return db.conn.execute(f"SELECT COUNT(*) FROM {tabla} WHERE {donde}").fetchone()[0]
+
+
+class TestCompactar:
+
+    def test_borra_lo_vencido_y_conserva_agregados(self, db):
+        db.compactar(AHORA)
+
+        corte_crudo = retencion.inicio_hora(AHORA - timedelta(days=2))
+        corte_1m = retencion.inicio_hora(AHORA - timedelta(days=5))
+        assert db.conn.execute("SELECT MIN(timestamp) FROM precios").fetchone()[0] >= corte_crudo
+        assert db.conn.execute("SELECT MIN(timestamp) FROM senales").fetchone()[0] >= corte_crudo
+        assert db.conn.execute("SELECT MIN(inicio) FROM precios_1m").fetchone()[0] >= corte_1m
+        # Horas cerradas de los 10 días (la hora en curso todavía no)
+        assert contar(db, "precios_1h") == 10 * 24
+        assert contar(db, "senales_1h") == 10 * 24
+        assert db.conn.execute("SELECT SUM(cantidad) FROM senales_1h").fetchone()[0] == 10 * 24 * 12
+
+    def test_vela_de_una_hora_igual_a_los_ticks(self, db):
+        hora = AHORA - timedelta(days=8, hours=3)
+        inicio = hora.strftime("%Y-%m-%dT%H:00")
+        fin = (hora + timedelta(hours=1)).strftime("%Y-%m-%dT%H:00")
+        crudos = [p for _, p in db.conn.execute(
+            "SELECT timestamp, precio FROM precios WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+            (inicio, fin))]
+
+        db.compactar(AHORA)
+
+        vela = dict(db.conn.execute("SELECT * FROM precios_1h WHERE inicio = ?", (inicio,)).fetchone())
+        assert vela == {'inicio': inicio, 'open': crudos[0], 'high': max(crudos), 'low': min(crudos),
+                        'close': crudos[-1], 'volumen': float(len(crudos)), 'ticks': len(crudos)}
+
+    def test_compactar_por_partes_igual_que_de_una_vez(self, db, tmp_path):
+        intermedio = AHORA - timedelta(days=6, minutes=17, seconds=40)
+        db.compactar(intermedio)
+        db.compactar(AHORA)
+
+        with Database(str(tmp_path / "otra.db"), retencion_dias=2, retencion_1m_dias=5) as otra:
+            otra.guardar_precios(ticks(AHORA - timedelta(days=10), AHORA))
+            otra.guardar_senales(senales(AHORA - timedelta(days=10), AHORA))
+            otra.compactar(AHORA)
+            for tabla in ("precios_1m", "precios_1h", "senales_1h"):
+                sql = f"SELECT * FROM {tabla} ORDER BY 1, 2"
+                assert [tuple(f) for f in db.conn.execute(sql)] == [tuple(f) for f in otra.conn.execute(sql)], tabla
+
+    def test_repetir_no_cambia_nada(self, db):
+        db.compactar(AHORA)
+        antes = [tuple(f) for f in db.conn.execute("SELECT * FROM precios_1h ORDER BY inicio")]
+
+        db.compactar(AHORA)
+
+        assert [tuple(f) for f in db.conn.execute("SELECT * FROM precios_1h ORDER BY inicio")] == antes
+
+    def test_sin_retencion_no_borra(self, tmp_path):
+        with Database(str(tmp_path / "argos_test.db"), retencion_dias=0, retencion_1m_dias=0) as db:
+            db.guardar_precios(ticks(AHORA - timedelta(days=3), AHORA))
+            db.compactar(AHORA)
+
+            assert contar(db, "precios") == 3 * 24 * 60
+
+    def test_vacuum_incremental_devuelve_espacio(self, db):
+        cambios = db.compactar(AHORA)
+
+        assert cambios["paginas_liberadas"] > 0
+        assert db.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+
+    def test_compactar_si_vencido(self, db):
+        db.intervalo_compactar = 3600
+        db.compactar_si_vencido()
+        assert contar(db, "precios_1h") == 0
+
+        db._ultima_compactacion -= 3600
+        db.compactar_si_vencido()
+        assert contar(db, "precios_1h") > 0
+
+
+class TestConsultarPrecios:
+
+    @pytest.fixture(autouse=True)
+    def compactada(self, db):
+        db.compactar(AHORA)
+
+    def test_rango_reciente_usa_ticks_crudos(self, db):
+        filas, tabla = db.obtener_precios_agregados((AHORA - timedelta(hours=3)).isoformat())
+
+        assert tabla == "precios"
+        assert len(filas) == 3 * 60
+
+    def test_rango_largo_usa_velas_de_una_hora(self, db):
+        filas, tabla = db.obtener_precios_agregados((AHORA - timedelta(days=9)).isoformat())
+
+        assert tabla == "precios_1h"
+        # Horas que empiezan después de `desde`, sin la hora en curso
+        assert len(filas) == 9 * 24 - 1
+        assert filas == sorted(filas, key=lambda f: f['inicio'])
+
+    def test_rango_viejo_usa_velas_de_un_minuto(self, db):
+        desde = AHORA - timedelta(days=4)
+
+        filas, tabla = db.obtener_precios_agregados(desde.isoformat(), (desde + timedelta(hours=2)).isoformat())
+
+        assert tabla == "precios_1m", "Los ticks crudos de hace 4 días ya se borraron"
+        assert len(filas) == 120
+
+    def test_base_vacia(self, tmp_path):
+        with Database(str(tmp_path / "vacia.db")) as db:
+            assert db.obtener_precios_agregados(AHORA.isoformat()) == ([], "precios")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
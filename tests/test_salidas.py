@@ -0,0 +1,365 @@
+"""
+Tests para las salidas colocadas en el exchange (OCO, stop-limit y trailing re-anclado)
+"""
+import threading
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import Database
+from mercados import SesionExchange
+from salidas import GestorSalidas, OCO, STOP
+
+SL, TP, TS = 0.01, 0.015, 0.005
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class ExchangeFalso:
+    """Órdenes en memoria: OCO de Binance, stop-limit, cancelación y consulta"""
+
+    def __init__(self):
+        self.ordenes = {}
+        self.siguiente = 1
+        self.canceladas = []
+        self.mercados = {'BTC/USDT': {'id': 'BTCUSDT', 'symbol': 'BTC/USDT'}}
+        self.has = {}
+        self.fallar_cancelacion = False
+
+    def load_markets(self, reload=False):
+        return self.mercados
+
+    def amount_to_precision(self, symbol, cantidad):
+        return f"{cantidad:.5f}"
+
+    def price_to_precision(self, symbol, precio):
+        return f"{precio:.2f}"
+
+    def fetch_balance(self):
+        return {'USDT': {'free': 100.0}, 'BTC': {'free': 0.01}}
+
+    def _nueva(self, tipo, precio, cantidad, lista=None):
+        id_orden = str(self.siguiente)
+        self.siguiente += 1
+        self.ordenes[id_orden] = {'id': id_orden, 'type': tipo, 'status': 'open', 'filled': 0.0,
+                                  'price': precio, 'amount': cantidad, 'lista': lista}
+        return id_orden
+
+    def private_post_orderlist_oco(self, params):
+        lista = self.siguiente
+        id_stop = self._nueva('STOP_LOSS_LIMIT', params['belowPrice'], params['quantity'], lista)
+        id_tp = self._nueva('LIMIT_MAKER', params['abovePrice'], params['quantity'], lista)
+        self.oco = params
+        return {'orderListId': lista, 'orderReports': [
+            {'type': 'STOP_LOSS_LIMIT', 'orderId': int(id_stop)},
+            {'type': 'LIMIT_MAKER', 'orderId': int(id_tp)}]}
+
+    def create_order(self, symbol, tipo, lado, cantidad, precio, params):
+        self.stop = params
+        return {'id': self._nueva(tipo, precio, cantidad)}
+
+    def fetch_open_orders(self, symbol):
+        return [o for o in self.ordenes.values() if o['status'] == 'open']
+
+    def fetch_order(self, id_orden, symbol):
+        return self.ordenes[id_orden]
+
+    def cancel_order(self, id_orden, symbol):
+        orden = self.ordenes[id_orden]
+        if self.fallar_cancelacion or orden['status'] != 'open':
+            raise Exception("Unknown order sent")
+        for o in self.ordenes.values():
+            if o is orden or (orden['lista'] and o['lista'] == orden['lista']):
+                o['status'] = 'canceled'
+        self.canceladas.append(id_orden)
+
+    def llenar(self, id_orden, precio):
+        """Llenar una pata; la otra de la misma lista se cancela (como una OCO)"""
+        orden = self.ordenes[id_orden]
+        for o in self.ordenes.values():
+            if orden['lista'] and o['lista'] == orden['lista']:
+                o['status'] = 'canceled'
+        orden.update(status='closed', filled=orden['amount'], average=precio)
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / "argos_test.db")) as db:
+        yield db
+
+
+@pytest.fixture
+def exchange():
+    return ExchangeFalso()
+
+
+@pytest.fixture
+def reloj():
+    return RelojFalso()
+
+
+def crear_gestor(exchange, db, reloj, oco=True):
+    return GestorSalidas(SesionExchange(exchange), SL, TP, TS, db, oco=oco, reanclaje=60, reloj=reloj)
+
+
+def posicion(precio=100.0, maximo=100.0):
+    return {"posicion_abierta": True, "precio_compra": precio, "cantidad": 0.01, "max_precio": maximo}
+
+
+class TestColocacion:
+
+    def test_oco_con_take_profit_y_stop(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+
+        orden = gestor.proteger('BTC/USDT', posicion())
+
+        assert orden.tipo == OCO
+        assert exchange.oco['symbol'] == 'BTCUSDT'
+        assert exchange.oco['abovePrice'] == 101.5
+        assert exchange.oco['belowStopPrice'] == 99.5   # trailing 0.5% sobre el SL de 1%
+        assert exchange.oco['belowPrice'] < 99.5
+        assert gestor.cubre('BTC/USDT', 100.0)
+
+    def test_stop_limit_sin_oco(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj, oco=False)
+
+        orden = gestor.proteger('BTC/USDT', posicion())
+
+        assert orden.tipo == STOP
+        assert exchange.stop == {'stopPrice': 99.5}
+        # Sin OCO el take profit sigue en el loop
+        assert gestor.cubre('BTC/USDT', 100.0)
+        assert not gestor.cubre('BTC/USDT', 101.6)
+
+    def test_precio_bajo_el_limite_no_esta_cubierto(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+
+        assert not gestor.cubre('BTC/USDT', orden.limite - 0.01)
+
+    def test_error_al_colocar_deja_el_loop(self, exchange, db, reloj):
+        exchange.private_post_orderlist_oco = Mock(side_effect=Exception("Filter failure: PERCENT_PRICE"))
+        gestor = crear_gestor(exchange, db, reloj)
+
+        assert gestor.proteger('BTC/USDT', posicion()) is None
+        assert not gestor.activa('BTC/USDT')
+
+
+class TestReconciliacion:
+
+    def test_sin_cambios_una_consulta(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        gestor.proteger('BTC/USDT', posicion())
+        sesion = gestor.sesion
+        antes = sesion.peticiones
+
+        assert gestor.reconciliar('BTC/USDT', posicion()) is None
+        assert sesion.peticiones - antes == 1
+
+    def test_take_profit_llenado(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+        exchange.llenar(orden.id_tp, 101.6)
+
+        llenado = gestor.reconciliar('BTC/USDT', posicion())
+
+        assert llenado.razon == "TAKE PROFIT"
+        assert llenado.precio == 101.6
+        assert llenado.cantidad == 0.01
+        assert not gestor.activa('BTC/USDT')
+
+    def test_trailing_stop_llenado(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+        exchange.llenar(orden.id_stop, 99.4)
+
+        assert gestor.reconciliar('BTC/USDT', posicion()).razon == "TRAILING STOP"
+
+    def test_stop_loss_llenado(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        gestor.ts = 0.05   # trailing más ancho que el stop loss: el stop queda en el SL
+        orden = gestor.proteger('BTC/USDT', posicion())
+        exchange.llenar(orden.id_stop, 98.9)
+
+        assert orden.stop == 99.0
+        assert gestor.reconciliar('BTC/USDT', posicion()).razon == "STOP LOSS"
+
+    def test_llenado_con_el_bot_apagado(self, exchange, db, reloj):
+        """Las salidas vivas se guardan: otro proceso reconcilia el llenado"""
+        orden = crear_gestor(exchange, db, reloj).proteger('BTC/USDT', posicion())
+        exchange.llenar(orden.id_stop, 99.3)
+
+        gestor = crear_gestor(exchange, db, reloj)
+
+        assert gestor.activa('BTC/USDT')
+        assert gestor.reconciliar('BTC/USDT', posicion()).precio == 99.3
+        assert db.obtener_ordenes_salida() == {}
+
+    def test_posicion_sin_salida_se_protege(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+
+        gestor.reconciliar('BTC/USDT', posicion())
+
+        assert gestor.activa('BTC/USDT')
+
+    def test_cancelada_desde_fuera_se_vuelve_a_colocar(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+        exchange.cancel_order(orden.id_stop, 'BTC/USDT')
+
+        assert gestor.reconciliar('BTC/USDT', posicion()) is None
+        assert gestor.ordenes['BTC/USDT'].id_stop != orden.id_stop
+
+    def test_posicion_cerrada_cancela_la_salida(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+
+        gestor.reconciliar('BTC/USDT', {"posicion_abierta": False})
+
+        assert not gestor.activa('BTC/USDT')
+        assert exchange.canceladas == [orden.id_stop]
+        assert db.obtener_ordenes_salida() == {}
+
+    def test_proteger_dos_veces_coloca_una_sola_salida(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+
+        primera = gestor.proteger('BTC/USDT', posicion())
+
+        assert gestor.proteger('BTC/USDT', posicion()) is primera
+        assert len(exchange.ordenes) == 2
+
+    def test_no_protege_durante_una_venta(self, exchange, db, reloj):
+        """Entre cancelar y vender, la reconciliación espera y después ve la posición cerrada"""
+        gestor = crear_gestor(exchange, db, reloj)
+        gestor.proteger('BTC/USDT', posicion())
+        estado = posicion()
+
+        with gestor.bloqueo('BTC/USDT'):
+            gestor.cancelar('BTC/USDT')
+            hilo = threading.Thread(target=gestor.reconciliar, args=('BTC/USDT', estado))
+            hilo.start()
+            hilo.join(0.1)
+            assert hilo.is_alive()
+            estado["posicion_abierta"] = False  # la venta de mercado cerró la posición
+        hilo.join(1)
+
+        assert not gestor.activa('BTC/USDT')
+        assert [o['status'] for o in exchange.ordenes.values()] == ['canceled', 'canceled']
+
+
+class TestTrailing:
+
+    def test_reancla_al_subir_el_maximo(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+
+        reloj.t += 61
+        gestor.reconciliar('BTC/USDT', posicion(maximo=102.0))
+
+        assert exchange.canceladas == [orden.id_stop]
+        assert gestor.ordenes['BTC/USDT'].stop == pytest.approx(102.0 * (1 - TS), abs=0.01)
+
+    def test_no_reancla_antes_del_intervalo(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        gestor.proteger('BTC/USDT', posicion())
+
+        reloj.t += 30
+        gestor.reconciliar('BTC/USDT', posicion(maximo=102.0))
+
+        assert exchange.canceladas == []
+
+    def test_no_reancla_por_una_suba_minima(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        gestor.proteger('BTC/USDT', posicion())
+
+        reloj.t += 61
+        gestor.reconciliar('BTC/USDT', posicion(maximo=100.05))
+
+        assert exchange.canceladas == []
+
+
+class TestCancelacion:
+
+    def test_cancelar_antes_de_vender(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+
+        assert gestor.cancelar('BTC/USDT') is None
+        assert exchange.ordenes[orden.id_tp]['status'] == 'canceled'
+        assert not gestor.activa('BTC/USDT')
+
+    def test_cancelar_ya_llenada_devuelve_el_llenado(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        orden = gestor.proteger('BTC/USDT', posicion())
+        exchange.llenar(orden.id_tp, 101.5)
+
+        llenado = gestor.cancelar('BTC/USDT')
+
+        assert llenado.razon == "TAKE PROFIT"
+        assert not gestor.activa('BTC/USDT')
+
+    def test_cancelacion_fallida_con_orden_abierta_propaga(self, exchange, db, reloj):
+        gestor = crear_gestor(exchange, db, reloj)
+        gestor.proteger('BTC/USDT', posicion())
+        exchange.fallar_cancelacion = True
+
+        with pytest.raises(Exception):
+            gestor.cancelar('BTC/USDT')
+        assert gestor.activa('BTC/USDT')
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch, exchange, db, reloj):
+    """main en modo real con la salida colocada en el exchange falso (log y trades.csv en tmp_path)"""
+    monkeypatch.chdir(tmp_path)
+    import main
+    gestor = crear_gestor(exchange, db, reloj)
+    monkeypatch.setattr(main, 'SIMULATION_MODE', False)
+    monkeypatch.setattr(main, 'db', db)
+    monkeypatch.setattr(main, 'sesion', gestor.sesion)
+    monkeypatch.setattr(main, 'salidas', gestor)
+    monkeypatch.setattr(main, 'ejecutor', Mock())
+    monkeypatch.setattr(main, 'estados', {'BTC/USDT': posicion()})
+    monkeypatch.setattr(main, 'notificar', Mock())
+    gestor.proteger('BTC/USDT', main.estados['BTC/USDT'])
+    return main
+
+
+class TestVentaDesdeMain:
+
+    def test_venta_fallida_deja_la_posicion_protegida(self, bot, tmp_path):
+        """Si la venta falla tras cancelar la salida, la posición sigue abierta y se vuelve a proteger"""
+        bot.ejecutor.vender.side_effect = Exception("Account has insufficient balance")
+
+        bot.ejecutar_venta('BTC/USDT', 'TRAILING STOP', 99.0)
+
+        assert bot.estados['BTC/USDT']["posicion_abierta"]
+        assert not bot.salidas.activa('BTC/USDT')
+        assert not (tmp_path / 'trades.csv').exists(), "No se registra un trade que no ocurrió"
+
+        bot.reconciliar_salidas()
+
+        assert bot.salidas.activa('BTC/USDT')
+
+    def test_vende_el_saldo_libre_con_tope_en_la_posicion(self, bot, exchange, monkeypatch):
+        """Un stop llenado en parte deja menos saldo que la cantidad guardada"""
+        monkeypatch.setattr(exchange, 'fetch_balance', lambda: {'BTC': {'free': 0.004}})
+        bot.ejecutor.vender.return_value = {'average': 99.0}
+
+        bot.ejecutar_venta('BTC/USDT', 'TRAILING STOP', 99.0)
+
+        bot.ejecutor.vender.assert_called_once_with('BTC/USDT', 0.004, None)
+        assert not bot.estados['BTC/USDT']["posicion_abierta"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,162 @@
+"""
+Tests para la caché incremental de velas OHLCV
+"""
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from velas import CacheVelas, timeframe_a_ms
+
+TF_MS = 15 * 60 * 1000
+T0 = 1600000000000
+
+
+def vela(i, close=100.0):
+    """Vela sintética número i (timeframe 15m)"""
+    return [T0 + i * TF_MS, close, close + 1, close - 1, close, 10.0]
+
+
+@pytest.fixture
+def exchange():
+    exchange = Mock()
+    exchange.fetch_ohlcv.return_value = [vela(i) for i in range(500)]
+    return exchange
+
+
+class TestTimeframe:
+
+    def test_conversion_timeframes(self):
+        assert timeframe_a_ms('15m') == TF_MS
+        assert timeframe_a_ms('1h') == 60 * 60 * 1000
+        assert timeframe_a_ms('1d') == 24 * 60 * 60 * 1000
+
+    def test_timeframe_invalido(self):
+        with pytest.raises(ValueError):
+            timeframe_a_ms('15x')
+
+
+class TestCacheVelas:
+
+    def test_primera_carga_completa(self, exchange):
+        """La primera actualización descarga la ventana completa"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        recibidas = cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        assert recibidas == 500
+        exchange.fetch_ohlcv.assert_called_once_with('BTC/USDT', timeframe='15m', limit=500)
+        assert cache.ultimo_ts == vela(499)[0]
+
+    def test_actualizacion_incremental_parchea_vela_abierta(self, exchange):
+        """Si no cerró ninguna vela, solo se pide y reemplaza la vela abierta"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        exchange.fetch_ohlcv.return_value = [vela(499, close=105.0)]
+        recibidas = cache.actualizar(ahora_ms=vela(499)[0] + 60000)
+
+        assert recibidas == 1
+        exchange.fetch_ohlcv.assert_called_with('BTC/USDT', timeframe='15m', since=vela(499)[0], limit=1)
+        assert len(cache.velas) == 500
+        assert cache.velas[-1][4] == 105.0
+
+    def test_actualizacion_incremental_agrega_vela_nueva(self, exchange):
+        """Al cerrar una vela se parchea su valor final y se agrega la nueva"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        exchange.fetch_ohlcv.return_value = [vela(499, close=101.0), vela(500, close=102.0)]
+        cache.actualizar(ahora_ms=vela(500)[0] + 1000)
+
+        exchange.fetch_ohlcv.assert_called_with('BTC/USDT', timeframe='15m', since=vela(499)[0], limit=2)
+        assert len(cache.velas) == 500, "La ventana no debe crecer más allá del límite"
+        assert cache.velas[0][0] == vela(1)[0]
+        assert cache.velas[-2][4] == 101.0
+        assert cache.velas[-1][4] == 102.0
+
+    def test_ignora_velas_antiguas(self, exchange):
+        """Velas anteriores a la última guardada no modifican la caché"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        cache.aplicar([vela(10, close=999.0)])
+
+        assert cache.velas[10][4] == 100.0
+
+    def test_recarga_completa_tras_caida_larga(self, exchange):
+        """Si faltan más velas que la ventana, se recarga todo"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        exchange.fetch_ohlcv.return_value = [vela(i) for i in range(1000, 1500)]
+        cache.actualizar(ahora_ms=vela(1499)[0] + 1000)
+
+        exchange.fetch_ohlcv.assert_called_with('BTC/USDT', timeframe='15m', limit=500)
+        assert cache.velas[0][0] == vela(1000)[0]
+
+    def test_columnas(self, exchange):
+        """Las columnas sin pandas siguen el orden de COLUMNAS"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        columnas = cache.columnas()
+
+        assert list(columnas) == ['ts', 'open', 'high', 'low', 'close', 'vol']
+        assert len(columnas['close']) == 500
+        assert columnas['ts'][-1] == vela(499)[0]
+        assert list(columnas['high'][:2]) == [101.0, 101.0]
+
+    def test_aplicar_precio_parchea_vela_abierta(self, exchange):
+        """Un precio de ticker dentro de la vela abierta actualiza close/high/low"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        assert cache.aplicar_precio(105.0, ahora_ms=vela(499)[0] + 2000)
+        assert cache.velas[-1][2:5] == [105.0, 99.0, 105.0]
+        assert exchange.fetch_ohlcv.call_count == 1
+
+    def test_aplicar_precio_fuera_de_la_vela_abierta(self, exchange):
+        """Si ya abrió una vela nueva, el precio no alcanza: hay que pedir OHLCV"""
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        assert not cache.aplicar_precio(105.0, ahora_ms=vela(500)[0] + 1000)
+        assert cache.velas[-1][4] == 100.0
+
+
+class TestPrecarga:
+
+    def test_arranque_en_caliente_pide_solo_lo_que_falta(self, exchange):
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=100)
+
+        assert cache.precargar([vela(i) for i in range(150)]) == 100
+        exchange.fetch_ohlcv.return_value = [vela(149, close=101.0), vela(150), vela(151)]
+        recibidas = cache.actualizar(ahora_ms=vela(151)[0] + 1000)
+
+        assert recibidas == 3
+        exchange.fetch_ohlcv.assert_called_once_with('BTC/USDT', timeframe='15m', since=vela(149)[0], limit=3)
+        assert cache.velas[0][0] == vela(52)[0]
+        assert cache.velas[-3][4] == 101.0
+
+    def test_hueco_deja_solo_el_tramo_final(self, exchange):
+        """Solo el tramo contiguo final; si no llena la ventana, recarga completa"""
+        corta = CacheVelas(exchange, 'BTC/USDT', limite=100)
+        assert corta.precargar([vela(i) for i in range(200) if i != 120]) == 0
+        assert corta.velas == []
+
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=100)
+        assert cache.precargar([vela(i) for i in range(200) if i != 50]) == 100
+        assert cache.velas[0][0] == vela(100)[0]
+
+    def test_no_pisa_una_cache_cargada(self, exchange):
+        cache = CacheVelas(exchange, 'BTC/USDT', limite=500)
+        cache.actualizar(ahora_ms=vela(499)[0] + 1000)
+
+        assert cache.precargar([vela(i) for i in range(600, 1100)]) == 0
+        assert cache.ultimo_ts == vela(499)[0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
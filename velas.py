@@ -0,0 +1,139 @@
+"""
+Caché incremental de velas OHLCV para Argos Trading Bot
+Carga el histórico una sola vez y luego solo pide las velas nuevas
+(y la vela abierta) en cada iteración del loop.
+"""
+import logging
+import time
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('ArgosBot')
+
+COLUMNAS = ['ts', 'open', 'high', 'low', 'close', 'vol']
+
+_UNIDADES_MS = {
+    's': 1000,
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def timeframe_a_ms(timeframe: str) -> int:
+    """Convertir un timeframe estilo ccxt ('15m', '1h', '1d') a milisegundos"""
+    try:
+        return int(timeframe[:-1]) * _UNIDADES_MS[timeframe[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Timeframe no soportado: {timeframe}")
+
+
+class CacheVelas:
+    """
+    Almacén en memoria de velas OHLCV de un par.
+
+    La primera llamada a `actualizar()` descarga `limite` velas. Las siguientes
+    solo piden las velas desde el timestamp de la última vela guardada: la vela
+    abierta se reemplaza (parche) y las nuevas se agregan al final, manteniendo
+    siempre como máximo `limite` velas.
+    """
+
+    def __init__(self, exchange, symbol: str, timeframe: str = '15m', limite: int = 500):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.limite = limite
+        self.timeframe_ms = timeframe_a_ms(timeframe)
+        self.velas: List[list] = []
+
+    @property
+    def ultimo_ts(self) -> Optional[int]:
+        """Timestamp (ms) de apertura de la última vela guardada"""
+        return self.velas[-1][0] if self.velas else None
+
+    def _recarga_completa(self) -> int:
+        velas = self.exchange.fetch_ohlcv(self.symbol, timeframe=self.timeframe, limit=self.limite)
+        self.velas = [list(v) for v in velas]
+        logger.debug(f"Caché de velas cargada: {len(self.velas)} velas de {self.symbol}")
+        return len(self.velas)
+
+    def precargar(self, velas: List[list]) -> int:
+        """
+        Sembrar la caché con velas guardadas (arranque en caliente): el
+        siguiente `actualizar()` pide solo las velas desde la última guardada.
+        Solo se usa el tramo contiguo final, y solo si llena la ventana; si no,
+        la recarga completa da los mismos indicadores que antes del reinicio.
+
+        Returns:
+            Velas precargadas (0 si no alcanzaron)
+        """
+        if self.velas or not velas:
+            return 0
+        inicio = len(velas) - 1
+        while inicio > 0 and velas[inicio][0] - velas[inicio - 1][0] == self.timeframe_ms:
+            inicio -= 1
+        tramo = velas[inicio:][-self.limite:]
+        if len(tramo) < self.limite:
+            return 0
+        self.velas = [list(v) for v in tramo]
+        return len(self.velas)
+
+    def _velas_faltantes(self, ahora_ms: int) -> int:
+        return (ahora_ms - self.ultimo_ts) // self.timeframe_ms
+
+    def actualizar(self, ahora_ms: Optional[int] = None) -> int:
+        """
+        Sincronizar la caché con el exchange.
+
+        Returns:
+            Número de velas recibidas del exchange en esta llamada
+        """
+        if ahora_ms is None:
+            ahora_ms = int(time.time() * 1000)
+
+        # Sin histórico, o tras una caída más larga que la ventana: recargar todo
+        if not self.velas or self._velas_faltantes(ahora_ms) >= self.limite:
+            return self._recarga_completa()
+
+        nuevas = self.exchange.fetch_ohlcv(
+            self.symbol, timeframe=self.timeframe, since=self.ultimo_ts,
+            limit=max(self._velas_faltantes(ahora_ms), 0) + 1
+        )
+        self.aplicar(nuevas)
+        return len(nuevas)
+
+    def aplicar(self, nuevas: List[list]):
+        """Fusionar velas recibidas: parchear la vela abierta y agregar las nuevas"""
+        for vela in nuevas:
+            ts = vela[0]
+            if not self.velas or ts > self.velas[-1][0]:
+                self.velas.append(list(vela))
+            elif ts == self.velas[-1][0]:
+                self.velas[-1] = list(vela)
+            # Velas más antiguas que la última guardada ya están cerradas: se ignoran
+
+        if len(self.velas) > self.limite:
+            del self.velas[:len(self.velas) - self.limite]
+
+    def aplicar_precio(self, precio: float, ahora_ms: Optional[int] = None) -> bool:
+        """
+        Parchear la vela abierta con un precio de ticker (sin pedir OHLCV).
+
+        Returns:
+            False si no hay vela abierta para `ahora_ms` (hay que llamar a `actualizar()`)
+        """
+        if ahora_ms is None:
+            ahora_ms = int(time.time() * 1000)
+        if not self.velas or not (self.ultimo_ts <= ahora_ms < self.ultimo_ts + self.timeframe_ms):
+            return False
+
+        vela = self.velas[-1]
+        vela[2] = max(vela[2], precio)
+        vela[3] = min(vela[3], precio)
+        vela[4] = precio
+        return True
+
+    def columnas(self) -> Dict[str, array]:
+        """Columnas OHLCV como arrays de float (sin pandas: es lo que usa el loop)"""
+        return {nombre: array('d', [v[i] for v in self.velas]) for i, nombre in enumerate(COLUMNAS)}
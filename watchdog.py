@@ -3,7 +3,7 @@ import time
 import os
 import json
 from notificaciones import enviar_telegram
-import sqlite3
+from conexiones import abrir_escritura
 
 # Configuración dinámica de procesos
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "procesos_config.json")
@@ -14,11 +14,15 @@ DB_PATH = os.getenv("ARGOS_DB_PATH", "argos.db")
 COOLDOWN = 30  # segundos entre reinicios para evitar bucles
 
 
-def log_evento(evento, detalle=""):
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""
+_conn = None
+
+
+def conexion_eventos():
+    """Conexión WAL del watchdog, abierta una sola vez (crea la tabla eventos)"""
+    global _conn
+    if _conn is None:
+        conn = abrir_escritura(DB_PATH)
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS eventos (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -26,9 +30,19 @@ def log_evento(evento, detalle=""):
                 detalle TEXT
             )
         """)
-        c.execute("INSERT INTO eventos (evento, detalle) VALUES (?, ?)", (evento, detalle))
+        # El dashboard filtra por tipo y rango de fechas y ordena por timestamp
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_eventos_timestamp ON eventos(timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_eventos_evento ON eventos(evento, timestamp)")
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+def log_evento(evento, detalle=""):
+    try:
+        conn = conexion_eventos()
+        conn.execute("INSERT INTO eventos (evento, detalle) VALUES (?, ?)", (evento, detalle))
         conn.commit()
-        conn.close()
     except Exception as e:
         from notificaciones import enviar_alerta_error
         enviar_alerta_error(f"Error al registrar evento: {e}")